@@ -0,0 +1,41 @@
+'''
+Listados de rutas en JSON (orjson) vs MessagePack vs CBOR: tamaño y tiempo de codificación.
+
+Uso: python -m backend.benchmarks.bench_binary_formats
+'''
+import gzip
+import time
+
+from backend.benchmarks.payloads import SCENARIOS, make_route_docs
+from backend.core.negotiation import CBOR, MSGPACK, available_media_types, encode
+from backend.core.serialization import dump_json, route_public_dict
+
+REPEAT = 5
+
+
+def _best_time(fn, obj) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(obj)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    encoders = [("json", dump_json)]
+    for media in (MSGPACK, CBOR):
+        if media in available_media_types():
+            encoders.append((media.split("/")[1], lambda obj, m=media: encode(obj, m)))
+    print(f"{'escenario':<20}{'formato':<10}{'KB':>10}{'KB gzip':>10}{'ms':>10}")
+    for name, n_routes, n_points in SCENARIOS:
+        docs = [route_public_dict(d) for d in make_route_docs(n_routes, n_points)]
+        for label, fn in encoders:
+            body = fn(docs)
+            seconds = _best_time(fn, docs)
+            print(f"{name:<20}{label:<10}{len(body) / 1024:>10.1f}"
+                  f"{len(gzip.compress(body, 6)) / 1024:>10.1f}{seconds * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
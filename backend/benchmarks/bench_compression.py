@@ -0,0 +1,49 @@
+'''
+Bytes ahorrados vs CPU gastada al comprimir listados RoutePublic con gzip.
+
+Uso: python -m backend.benchmarks.bench_compression
+'''
+import time
+
+from pydantic import TypeAdapter
+
+from backend.benchmarks.payloads import SCENARIOS, make_route_docs
+from backend.core.compression import gzip_bytes
+from backend.db.schemas.route import RoutePublic
+
+LEVELS = (1, 3, 6, 9)
+REPEAT = 5
+
+_adapter = TypeAdapter(list[RoutePublic])
+
+
+def _render(docs) -> bytes:
+    # Mismo camino que FastAPI con response_model=list[RoutePublic]
+    return _adapter.dump_json(_adapter.validate_python(docs), by_alias=True)
+
+
+def _best_time(fn, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    print(f"{'escenario':<20}{'nivel':>6}{'original':>12}{'gzip':>12}{'ratio':>8}{'ms':>9}{'MB/s':>9}")
+    for name, n_routes, n_points in SCENARIOS:
+        body = _render(make_route_docs(n_routes, n_points))
+        for level in LEVELS:
+            packed = gzip_bytes(body, level)
+            seconds = _best_time(gzip_bytes, body, level)
+            print(
+                f"{name:<20}{level:>6}{len(body):>12,}{len(packed):>12,}"
+                f"{len(body) / len(packed):>8.1f}{seconds * 1000:>9.2f}"
+                f"{len(body) / seconds / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+'''
+Geometría pesada: en línea (bloquea el event loop) vs pool de procesos con memoria
+compartida. Mide el tiempo de cada cálculo y el lag máximo del event loop mientras
+se ejecutan varios a la vez.
+
+Uso: python -m backend.benchmarks.bench_geometry_pool
+'''
+import asyncio
+import time
+
+from backend.benchmarks.payloads import make_points
+from backend.geo.pool import GeometryPool
+
+SIZES = (20_000, 100_000, 500_000)
+CONCURRENT = 4
+
+
+async def _max_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(0.005)
+        worst = max(worst, loop.time() - started - 0.005)
+    return worst
+
+
+async def _run(pool: GeometryPool, points) -> tuple[float, float]:
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_max_lag(stop))
+    await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(pool.simplify(points, 2.0) for _ in range(CONCURRENT)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    return elapsed, await lag
+
+
+async def main() -> None:
+    inline = GeometryPool(workers=0, min_points=0)
+    pooled = GeometryPool(workers=CONCURRENT, min_points=0)
+    await pooled.simplify(make_points(10), 2.0)          # arranque de los procesos fuera de la medida
+    print(f"{'puntos':>8}  {'modo':<8}{'total ms':>10}{'lag máx ms':>12}")
+    try:
+        for n in SIZES:
+            points = make_points(n)
+            for name, pool in (("inline", inline), ("pool", pooled)):
+                elapsed, lag = await _run(pool, points)
+                print(f"{n:>8}  {name:<8}{elapsed * 1000:>10.1f}{lag * 1000:>12.1f}")
+    finally:
+        await pooled.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
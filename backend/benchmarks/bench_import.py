@@ -0,0 +1,76 @@
+'''
+Importación de tracks: parser incremental (geo/importers.py) vs cargar el fichero entero.
+
+Uso: python -m backend.benchmarks.bench_import
+'''
+import asyncio
+import json
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from backend.benchmarks.payloads import iter_geojson, iter_gpx, make_points
+from backend.geo.importers import import_track
+
+N_POINTS = 100_000
+CHUNK = 64 * 1024
+MAX_POINTS = 5000
+
+
+def _rechunk(parts, size=CHUNK):
+    buf = bytearray()
+    for part in parts:
+        buf += part
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    if buf:
+        yield bytes(buf)
+
+
+async def _aiter(chunks):
+    for c in chunks:
+        yield c
+
+
+def streaming(fmt, chunks):
+    return asyncio.run(import_track(_aiter(chunks), fmt, max_points=MAX_POINTS))
+
+
+def whole_file(fmt, chunks):
+    # Lo que haría un endpoint que lee todo el body y lo parsea de golpe
+    body = b"".join(chunks)
+    if fmt == "gpx":
+        root = ET.fromstring(body)
+        return [(float(e.get("lat")), float(e.get("lon"))) for e in root.iter() if e.tag.endswith("trkpt")]
+    return [(c[1], c[0]) for c in json.loads(body)["geometry"]["coordinates"]]
+
+
+def _measure(fn, *args):
+    # Tiempo y memoria por separado: tracemalloc ralentiza mucho el parser en Python
+    t0 = time.perf_counter()
+    fn(*args)
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    points = make_points(N_POINTS)
+    files = {
+        "gpx": list(_rechunk(iter_gpx(points))),
+        "geojson": list(_rechunk(iter_geojson(points))),
+    }
+    print(f"{'formato':<10}{'camino':<14}{'MB':>8}{'ms':>10}{'pico MB':>10}")
+    for fmt, chunks in files.items():
+        size = sum(map(len, chunks)) / 1e6
+        for label, fn in (("streaming", streaming), ("fichero", whole_file)):
+            seconds, peak = _measure(fn, fmt, chunks)
+            print(f"{fmt:<10}{label:<14}{size:>8.1f}{seconds * 1000:>10.0f}{peak / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
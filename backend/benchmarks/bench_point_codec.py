@@ -0,0 +1,59 @@
+'''
+Almacenamiento de puntos: lista de subdocumentos BSON vs Binary int32 / varint (db/models/route.py).
+
+Uso: python -m backend.benchmarks.bench_point_codec
+'''
+import time
+
+import bson
+
+from backend.benchmarks.payloads import make_points
+from backend.core.serialization import public_points
+from backend.db.models.route import decode_points, encode_points
+
+SIZES = (300, 2000, 20000)
+REPEAT = 5
+
+
+def _best_time(fn, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _read_dicts(raw: bytes):
+    # Lo que hace Motor al leer el documento + lo que necesita la respuesta
+    return public_points(bson.decode(raw)["points"])
+
+
+def _read_packed(raw: bytes, codec: str):
+    doc = bson.decode(raw)
+    return public_points(decode_points(doc["points"], codec))
+
+
+def _decode_only(raw: bytes, codec: str):
+    return decode_points(bson.decode(raw)["points"], codec)
+
+
+def main() -> None:
+    print(f"{'puntos':>7}{'codec':>8}{'bytes':>10}{'x':>6}{'encode ms':>11}{'decode ms':>11}{'decode+json ms':>16}")
+    for n in SIZES:
+        pts = make_points(n)
+        raw_dicts = bson.encode({"points": pts})
+        print(f"{n:>7}{'dicts':>8}{len(raw_dicts):>10,}{1.0:>6.1f}"
+              f"{_best_time(bson.encode, {'points': pts}) * 1000:>11.2f}"
+              f"{_best_time(bson.decode, raw_dicts) * 1000:>11.2f}"
+              f"{_best_time(_read_dicts, raw_dicts) * 1000:>16.2f}")
+        for codec in ("int32", "varint"):
+            raw = bson.encode({"points": encode_points(pts, codec)})
+            print(f"{n:>7}{codec:>8}{len(raw):>10,}{len(raw_dicts) / len(raw):>6.1f}"
+                  f"{_best_time(encode_points, pts, codec) * 1000:>11.2f}"
+                  f"{_best_time(_decode_only, raw, codec) * 1000:>11.2f}"
+                  f"{_best_time(_read_packed, raw, codec) * 1000:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+'''
+Validación de puntos: List[Point] con pydantic vs geo/points.py (NumPy y Python puro).
+
+Uso: python -m backend.benchmarks.bench_points_validation
+'''
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from backend.benchmarks.payloads import make_points
+from backend.db.schemas.route import Point
+from backend.geo import points as points_mod
+
+REPEAT = 5
+SIZES = (1_000, 10_000, 50_000)
+
+_adapter = TypeAdapter(List[Point])
+
+
+def _best_time(fn, value) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(value)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _python_only(value):
+    np, points_mod.np = points_mod.np, None
+    try:
+        return points_mod.validate_points(value)
+    finally:
+        points_mod.np = np
+
+
+def main() -> None:
+    print(f"{'puntos':>8}  {'entrada':<8}{'camino':<18}{'ms':>10}{'x':>8}")
+    for n in SIZES:
+        dicts = make_points(n)
+        pairs = [[p["latitude"], p["longitude"]] for p in dicts]
+        base = _best_time(_adapter.validate_python, dicts)
+        rows = [("dicts", "List[Point]", base)]
+        for label, value in (("dicts", dicts), ("pares", pairs)):
+            if points_mod.np is not None:
+                rows.append((label, "numpy", _best_time(points_mod.validate_points, value)))
+            rows.append((label, "python", _best_time(_python_only, value)))
+        for label, path, seconds in rows:
+            print(f"{n:>8}  {label:<8}{path:<18}{seconds * 1000:>10.2f}{base / seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+'''
+Camino actual (response_model=list[RoutePublic]) vs camino rápido (core/serialization.py).
+
+Uso: python -m backend.benchmarks.bench_serialization
+'''
+import json
+import time
+
+from pydantic import TypeAdapter
+
+from backend.benchmarks.payloads import SCENARIOS, make_route_docs
+from backend.core.serialization import dump_routes
+from backend.db.schemas.route import RoutePublic
+
+REPEAT = 5
+
+_adapter = TypeAdapter(list[RoutePublic])
+
+
+def response_model_path(docs) -> bytes:
+    # Lo que hace FastAPI: validar contra el modelo, volcar a python "json" y json.dumps (JSONResponse)
+    content = _adapter.dump_python(_adapter.validate_python(docs), mode="json", by_alias=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def type_adapter_path(docs) -> bytes:
+    # Intermedio: validar + dump_json en Rust
+    return _adapter.dump_json(_adapter.validate_python(docs), by_alias=True)
+
+
+def _best_time(fn, docs) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    paths = [("response_model", response_model_path), ("type_adapter", type_adapter_path),
+             ("fast (orjson)", dump_routes)]
+    print(f"{'escenario':<20}{'camino':<18}{'ms':>10}{'x':>8}")
+    for name, n_routes, n_points in SCENARIOS:
+        docs = make_route_docs(n_routes, n_points)
+        base = None
+        for label, fn in paths:
+            seconds = _best_time(fn, docs)
+            base = base or seconds
+            print(f"{name:<20}{label:<18}{seconds * 1000:>10.2f}{base / seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
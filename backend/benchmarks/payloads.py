@@ -0,0 +1,83 @@
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+# Barcelona como origen de los tracks sintéticos
+_ORIGIN = (41.3874, 2.1686)
+
+
+def make_points(n: int, *, seed: int = 0) -> list[dict]:
+    '''
+    Track realista: paseo aleatorio con rumbo suave y pasos de ~5-15 m (como un GPS).
+    '''
+    rnd = random.Random(seed)
+    lat, lon = _ORIGIN
+    heading = rnd.uniform(0, 2 * math.pi)
+    points = []
+    for _ in range(n):
+        heading += rnd.gauss(0, 0.3)
+        step = rnd.uniform(5, 15) / 111_320
+        lat += step * math.cos(heading)
+        lon += step * math.sin(heading) / math.cos(math.radians(lat))
+        points.append({"latitude": round(lat, 6), "longitude": round(lon, 6)})
+    return points
+
+
+def make_route_doc(i: int, n_points: int, *, seed: int = 0) -> dict:
+    '''
+    Documento tal y como lo guarda db/models/route.py (con _id en str, como lo normaliza el CRUD).
+    '''
+    return {
+        "_id": str(ObjectId()),
+        "owner_id": str(ObjectId()),
+        "name": f"Ruta {i}",
+        "points": make_points(n_points, seed=seed + i),
+        "visibility": True,
+        "description": "Ruta de prueba generada para benchmarks",
+        "category": ["gastronomia", "cultura", "naturaleza"][i % 3],
+        "created_at": datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i),
+        "duration_minutes": 30 + i % 90,
+        "rating": round((i % 50) / 10, 1),
+    }
+
+
+def make_route_docs(n_routes: int, n_points: int, *, seed: int = 0) -> list[dict]:
+    return [make_route_doc(i, n_points, seed=seed) for i in range(n_routes)]
+
+
+# Escenarios comunes a todos los benchmarks: (nombre, nº rutas, puntos por ruta)
+SCENARIOS = [
+    ("explore-small", 20, 50),
+    ("explore-typical", 100, 300),
+    ("explore-heavy", 200, 2000),
+    ("single-long-track", 1, 20000),
+]
+
+
+# ---- Ficheros de track sintéticos (importación / exportación) ----
+def iter_gpx(points: list[dict], *, name: str = "Track sintético"):
+    '''
+    GPX 1.1 generado a trozos (bytes), para no tener el fichero entero en memoria.
+    '''
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="rex-bench" xmlns="http://www.topografix.com/GPX/1/1">\n'
+        f'<metadata><name>{name}</name></metadata>\n<trk><name>{name}</name><trkseg>\n'
+    ).encode()
+    for p in points:
+        yield f'<trkpt lat="{p["latitude"]}" lon="{p["longitude"]}"><ele>12.0</ele></trkpt>\n'.encode()
+    yield b"</trkseg></trk>\n</gpx>\n"
+
+
+def iter_geojson(points: list[dict], *, name: str = "Track sintético"):
+    '''
+    Feature LineString generada a trozos (bytes).
+    '''
+    yield ('{"type":"Feature","properties":{"name":%s},"geometry":{"type":"LineString","coordinates":['
+           % json.dumps(name)).encode()
+    for i, p in enumerate(points):
+        yield f'{"," if i else ""}[{p["longitude"]},{p["latitude"]},12.0]'.encode()
+    yield b"]}}"
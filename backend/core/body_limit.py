@@ -0,0 +1,76 @@
+'''
+Tamaño máximo del cuerpo por endpoint, comprobado antes de que FastAPI lo lea.
+
+FastAPI parsea el formulario (y vuelca los UploadFile a disco) antes de ejecutar
+dependencias y handler, así que un límite comprobado dentro del endpoint llega
+tarde: el fichero ya se ha recibido entero. Con @max_body_size(n):
+
+- Content-Length mayor que n -> 413 al momento, sin leer el cuerpo;
+- sin Content-Length (chunked) o si miente -> se cuentan los bytes según llegan
+  y se corta con 413 en cuanto se pasa de n.
+'''
+from typing import Callable, Optional, Union
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+_DETAIL = "El cuerpo de la petición es demasiado grande"
+
+
+def max_body_size(limit: Union[int, Callable[[], int]]) -> Callable:
+    '''
+    Decorador declarativo (como request_budget): límite del cuerpo en bytes, o una
+    función que lo devuelve (se evalúa en cada petición, p. ej. desde settings)
+    '''
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__max_body_size__ = limit
+        return endpoint
+    return decorator
+
+
+def _declared_length(request: Request) -> Optional[int]:
+    try:
+        return int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _limited(request: Request, limit: int) -> Request:
+    receive = request.receive
+    read = 0
+
+    async def limited_receive():
+        nonlocal read
+        message = await receive()
+        if message["type"] == "http.request":
+            read += len(message.get("body", b""))
+            if read > limit:
+                raise HTTPException(status_code=413, detail=_DETAIL)
+        return message
+
+    return Request(request.scope, limited_receive, request._send)
+
+
+class BodyLimitRoute(APIRoute):
+    '''
+    route_class base: aplica @max_body_size antes de leer el cuerpo
+    '''
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        limit = getattr(self.endpoint, "__max_body_size__", None)
+        if limit is None:
+            return handler
+
+        async def body_limit_handler(request):
+            max_bytes = limit() if callable(limit) else limit
+            declared = _declared_length(request)
+            if declared is not None and declared > max_bytes:
+                return JSONResponse({"detail": _DETAIL}, status_code=413, headers={"Connection": "close"})
+            return await handler(_limited(request, max_bytes))
+
+        return body_limit_handler
+
+
+__all__ = ["BodyLimitRoute", "max_body_size"]
@@ -0,0 +1,243 @@
+'''
+Compartimentos de concurrencia (bulkheads) para proteger el pool de conexiones de Motor.
+
+Cada compartimento es un semáforo con una cola de espera acotada:
+- hay hueco -> la petición entra;
+- está lleno -> espera en cola como mucho BULKHEAD_QUEUE_TIMEOUT_SECONDS;
+- cola llena o espera agotada -> 503 con Retry-After (sin tocar la base de datos).
+
+Los límites salen de repartir MONGO_MAX_POOL_SIZE (por worker) según
+BULKHEAD_POOL_SHARES: un pico de lecturas (GET /routes) solo puede ocupar su parte
+y el resto queda reservado para login/registro ("auth") y escrituras ("writes").
+
+Uso declarativo:
+- por router:    APIRouter(..., dependencies=[Depends(bulkhead_guard())])
+                 (GET/HEAD -> "reads", el resto -> "writes"), o bulkhead_guard(AUTH);
+- por endpoint:  @bulkhead(AUTH) debajo de @router.get(...), tiene prioridad.
+
+La dependencia libera el hueco al volver el endpoint, antes de enviar el cuerpo.
+Las respuestas en streaming que siguen leyendo de la base de datos (exportaciones
+desde el cursor) deben pasar por `hold_for_stream(request, response)`: el hueco
+se mantiene hasta enviar (o abandonar) el último trozo.
+
+Las métricas (ocupación, profundidad de cola, rechazos) se exportan en GET /metrics.
+'''
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException, Request
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from backend.core import metrics
+from backend.core.config import settings
+
+READS = "reads"
+WRITES = "writes"
+AUTH = "auth"
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class BulkheadFull(Exception):
+    def __init__(self, name: str, reason: str) -> None:
+        super().__init__(f"Bulkhead '{name}' lleno ({reason})")
+        self.name = name
+        self.reason = reason            # "queue_full" | "timeout"
+
+
+class Bulkhead:
+    '''
+    Semáforo con cola de espera acotada y contadores para /metrics
+    '''
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired_total = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds_total = 0.0
+
+    def _reject(self, reason: str) -> BulkheadFull:
+        self.rejected[reason] += 1
+        return BulkheadFull(self.name, reason)
+
+    async def acquire(self) -> None:
+        if self._sem.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                raise self._reject("queue_full")
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("timeout") from None
+            finally:
+                self.waiting -= 1
+                self.wait_seconds_total += time.monotonic() - started
+        else:
+            await self._sem.acquire()   # hay hueco: no espera
+        self.in_use += 1
+        self.acquired_total += 1
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._sem.release()
+
+    def samples(self) -> list[metrics.Sample]:
+        labels = {"bulkhead": self.name}
+        return [
+            metrics.Sample("rex_bulkhead_limit", self.limit, "gauge", "Peticiones concurrentes permitidas", labels),
+            metrics.Sample("rex_bulkhead_in_use", self.in_use, "gauge", "Peticiones dentro del compartimento", labels),
+            metrics.Sample("rex_bulkhead_queue_depth", self.waiting, "gauge", "Peticiones esperando en cola", labels),
+            metrics.Sample("rex_bulkhead_queue_depth_max", self.max_waiting, "gauge",
+                           "Máxima profundidad de cola observada", labels),
+            metrics.Sample("rex_bulkhead_acquired_total", self.acquired_total, "counter",
+                           "Peticiones admitidas", labels),
+            metrics.Sample("rex_bulkhead_wait_seconds_total", self.wait_seconds_total, "counter",
+                           "Tiempo total esperado en cola", labels),
+            *(
+                metrics.Sample("rex_bulkhead_rejected_total", count, "counter",
+                               "Peticiones rechazadas con 503", {**labels, "reason": reason})
+                for reason, count in self.rejected.items()
+            ),
+        ]
+
+
+class _Slot:
+    '''
+    Hueco ocupado por una petición; se libera una sola vez
+    '''
+
+    def __init__(self, bh: Bulkhead) -> None:
+        self._bh = bh
+        self.streaming = False
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._bh.release()
+
+
+_bulkheads: dict[str, Bulkhead] = {}
+
+
+def get_bulkhead(name: str) -> Bulkhead:
+    '''
+    Compartimento `name`, creado en la primera petición (ya con el tamaño de pool del worker)
+    '''
+    bh = _bulkheads.get(name)
+    if bh is None:
+        share = settings.BULKHEAD_POOL_SHARES[name]
+        bh = Bulkhead(
+            name,
+            limit=max(1, int(settings.MONGO_MAX_POOL_SIZE * share)),
+            max_queue=settings.BULKHEAD_QUEUE_SIZES.get(name, 0),
+            timeout=settings.BULKHEAD_QUEUE_TIMEOUT_SECONDS,
+        )
+        _bulkheads[name] = bh
+    return bh
+
+
+def reset_bulkheads() -> None:
+    '''
+    Descarta los compartimentos (se recrean con la configuración actual)
+    '''
+    _bulkheads.clear()
+
+
+def bulkhead(name: str) -> Callable:
+    '''
+    Decorador declarativo por endpoint (como cache_control): se coloca debajo de @router.x(...)
+    '''
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__bulkhead__ = name
+        return endpoint
+    return decorator
+
+
+def compartment_for(request: Request, default: Optional[str] = None) -> str:
+    route = request.scope.get("route")
+    name = getattr(getattr(route, "endpoint", None), "__bulkhead__", None)
+    if name:
+        return name
+    if default:
+        return default
+    return READS if request.method in _SAFE_METHODS else WRITES
+
+
+def bulkhead_guard(default: Optional[str] = None) -> Callable:
+    '''
+    Dependencia para `dependencies=[Depends(bulkhead_guard())]` de un router o endpoint
+    '''
+    async def guard(request: Request) -> AsyncIterator[None]:
+        if not settings.BULKHEADS_ENABLED:
+            yield
+            return
+        bh = get_bulkhead(compartment_for(request, default))
+        try:
+            await bh.acquire()
+        except BulkheadFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+                headers={"Retry-After": str(settings.BULKHEAD_RETRY_AFTER_SECONDS)},
+            )
+        slot = request.state.bulkhead_slot = _Slot(bh)
+        try:
+            yield
+        finally:
+            if not slot.streaming:
+                slot.release()
+
+    return guard
+
+
+def hold_for_stream(request: Request, response: StreamingResponse) -> StreamingResponse:
+    '''
+    Traspasa el hueco de la petición al cuerpo en streaming de `response`
+    '''
+    slot: Optional[_Slot] = getattr(request.state, "bulkhead_slot", None)
+    if slot is None or slot.released:
+        return response
+    slot.streaming = True
+    body = response.body_iterator
+
+    async def guarded():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            slot.release()
+
+    async def after(previous=response.background):
+        # Si el cliente se desconecta el generador no siempre se cierra: se libera aquí
+        slot.release()
+        if previous is not None:
+            await previous()
+
+    response.body_iterator = guarded()
+    response.background = BackgroundTask(after)
+    return response
+
+
+def _collect() -> list[metrics.Sample]:
+    return [s for bh in list(_bulkheads.values()) for s in bh.samples()]
+
+
+metrics.register("bulkheads", _collect)
+
+
+__all__ = [
+    "READS", "WRITES", "AUTH", "Bulkhead", "BulkheadFull", "bulkhead", "bulkhead_guard",
+    "compartment_for", "get_bulkhead", "hold_for_stream", "reset_bulkheads",
+]
@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from backend.core.config import settings
+from backend.core.deadline import DeadlineRoute
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Política de caché HTTP de un endpoint (se traduce a la cabecera Cache-Control).
+    """
+    public: bool = False
+    private: bool = False
+    no_store: bool = False
+    no_cache: bool = False
+    max_age: Optional[int] = None
+    stale_while_revalidate: Optional[int] = None
+    stale_if_error: Optional[int] = None
+
+    def header_value(self) -> str:
+        if self.no_store:
+            return "no-store"
+        parts = []
+        if self.public:
+            parts.append("public")
+        if self.private:
+            parts.append("private")
+        if self.no_cache:
+            parts.append("no-cache")
+        if self.max_age is not None:
+            parts.append(f"max-age={self.max_age}")
+        if self.stale_while_revalidate is not None:
+            parts.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        if self.stale_if_error is not None:
+            parts.append(f"stale-if-error={self.stale_if_error}")
+        return ", ".join(parts)
+
+
+# ---- Políticas de la API ----
+# Catálogo público: cualquier caché (navegador, proxy, CDN) puede guardarlo un rato
+# y seguir sirviéndolo mientras revalida en segundo plano.
+PUBLIC_CATALOG = CachePolicy(
+    public=True,
+    max_age=settings.CACHE_PUBLIC_MAX_AGE,
+    stale_while_revalidate=settings.CACHE_PUBLIC_STALE_WHILE_REVALIDATE,
+    stale_if_error=settings.CACHE_PUBLIC_STALE_IF_ERROR,
+)
+# Datos del usuario: solo el navegador, y siempre revalidando (ETag -> 304)
+PRIVATE_REVALIDATE = CachePolicy(private=True, no_cache=True)
+# Nunca almacenar (tokens, comprobaciones puntuales)
+NO_STORE = CachePolicy(no_store=True)
+
+
+def cache_control(policy: CachePolicy) -> Callable:
+    '''
+    Decorador declarativo: se coloca debajo de @router.get(...).
+    Solo anota el endpoint; CachePolicyRoute aplica la cabecera.
+    '''
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__cache_policy__ = policy
+        return endpoint
+    return decorator
+
+
+def get_cache_policy(endpoint: Callable) -> Optional[CachePolicy]:
+    return getattr(endpoint, "__cache_policy__", None)
+
+
+class CachePolicyRoute(DeadlineRoute):
+    '''
+    route_class de los routers: añade Cache-Control a las respuestas correctas
+    (< 400) de los endpoints anotados, salvo que el handler ya haya puesto una.
+    Hereda el deadline por petición de DeadlineRoute.
+    '''
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        policy = get_cache_policy(self.endpoint)
+        if policy is None:
+            return handler
+        value = policy.header_value()
+
+        async def policy_handler(request):
+            response = await handler(request)
+            if response.status_code < 400 and "cache-control" not in response.headers:
+                response.headers["Cache-Control"] = value
+            return response
+
+        return policy_handler
+
+
+__all__ = [
+    "CachePolicy", "CachePolicyRoute", "cache_control", "get_cache_policy",
+    "PUBLIC_CATALOG", "PRIVATE_REVALIDATE", "NO_STORE",
+]
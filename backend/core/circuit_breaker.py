@@ -0,0 +1,370 @@
+'''
+Circuit breaker alrededor de Mongo y modo degradado con la última respuesta buena.
+
+Sin él, con Mongo caído cada petición espera la selección de servidor (o el deadline)
+y luego falla. Con él:
+
+- CERRADO: todo pasa. Cada ConnectionFailure de pymongo (selección de servidor
+  agotada, red caída, AutoReconnect) cuenta como fallo; cualquier comando que Mongo
+  completa (listener de pymongo, también los de tareas de fondo) pone el contador a 0.
+  Un timeout por haberse agotado el deadline de la petición (core/deadline.py) no
+  cuenta: sigue hacia DeadlineRoute, que responde 504.
+- ABIERTO: tras CIRCUIT_BREAKER_FAILURE_THRESHOLD fallos seguidos. Ninguna petición
+  llega a Motor: las escrituras responden 503 al momento (Retry-After) y las lecturas
+  anotadas con @stale_on_outage devuelven la última respuesta correcta guardada,
+  marcada como obsoleta (Warning: 110, X-Cache: STALE). Los endpoints anotados con
+  @serves_from_snapshot(check) se ejecutan igualmente si check(request) dice que
+  pueden responder desde memoria (la foto del catálogo público, db/catalog.py).
+- SEMIABIERTO: pasados CIRCUIT_BREAKER_RESET_SECONDS se deja pasar una sola petición
+  de prueba; si Mongo responde se cierra, si vuelve a fallar se abre otra vez.
+
+La caché de respuestas es un LRU por proceso (limitado en entradas y bytes) con clave
+método + ruta + query + Accept + credencial, así que una respuesta privada solo se
+devuelve a quien presenta el mismo token. No se invalida con escrituras: solo se usa
+cuando no hay forma de leer datos más recientes.
+'''
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+from pymongo.errors import ConnectionFailure
+
+from backend.core import metrics
+from backend.core.body_limit import BodyLimitRoute
+from backend.core.config import settings
+from backend.core.etag import etag_matches
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+_SAFE_METHODS = {"GET", "HEAD"}
+# Cabeceras que no se guardan con la respuesta (se recalculan o son de un solo uso)
+_SKIP_HEADERS = {"content-length", "set-cookie", "cache-control", "date"}
+
+
+class CircuitBreaker:
+    '''
+    Máquina de estados cerrado -> abierto -> semiabierto -> cerrado
+    '''
+
+    def __init__(self, *, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()       # los éxitos llegan desde hilos de pymongo
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # Observabilidad
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def acquire(self) -> Optional[str]:
+        '''
+        Estado con el que entra la petición (HALF_OPEN = es la prueba), o None si se rechaza
+        '''
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return CLOSED
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return HALF_OPEN
+            self.rejected += 1
+            return None
+
+    def end_probe(self) -> None:
+        '''
+        Fin de la petición de prueba; si no llegó a tocar Mongo, la siguiente vuelve a probar
+        '''
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                logger.warning("Circuit breaker de Mongo: cerrado")
+            self._state = CLOSED
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+                self.trips += 1
+                logger.warning("Circuit breaker de Mongo: abierto tras %s fallos", self._failures)
+
+    def retry_after(self) -> int:
+        '''
+        Segundos hasta la siguiente petición de prueba
+        '''
+        with self._lock:
+            left = self.reset_timeout - (self._clock() - self._opened_at)
+        return max(1, math.ceil(left))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def samples(self) -> list[metrics.Sample]:
+        return [
+            metrics.Sample("rex_circuit_breaker_state", _STATE_VALUE[self.state], "gauge",
+                           "Estado del circuit breaker de Mongo (0 cerrado, 1 semiabierto, 2 abierto)"),
+            metrics.Sample("rex_circuit_breaker_trips_total", self.trips, "counter",
+                           "Veces que se ha abierto el circuito"),
+            metrics.Sample("rex_circuit_breaker_rejected_total", self.rejected, "counter",
+                           "Peticiones que no llegaron a Mongo por el circuito abierto"),
+        ]
+
+
+@dataclass(frozen=True)
+class _Stored:
+    status_code: int
+    headers: tuple[tuple[str, str], ...]
+    body: bytes
+    stored_at: float
+    etag: Optional[str]
+
+
+class StaleCache:
+    '''
+    LRU de las últimas respuestas correctas, limitado en entradas y en bytes
+    '''
+
+    def __init__(self, *, max_entries: int, max_bytes: int, max_age: float,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._clock = clock
+        self._entries: OrderedDict[tuple, _Stored] = OrderedDict()
+        self.size = 0
+        self.served = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, key: tuple, response: Response) -> None:
+        body = getattr(response, "body", None)
+        if not isinstance(body, bytes) or len(body) > self.max_bytes:
+            return                          # streaming o demasiado grande
+        headers = tuple((k, v) for k, v in response.headers.items() if k not in _SKIP_HEADERS)
+        self._discard(key)
+        self._entries[key] = _Stored(response.status_code, headers, body, self._clock(),
+                                     response.headers.get("etag"))
+        self.size += len(body)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    def get(self, key: tuple) -> Optional[_Stored]:
+        stored = self._entries.get(key)
+        if stored is None:
+            return None
+        if self._clock() - stored.stored_at > self.max_age:
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return stored
+
+    def _discard(self, key: tuple) -> None:
+        stored = self._entries.pop(key, None)
+        if stored is not None:
+            self.size -= len(stored.body)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def respond(self, request: Request, stored: _Stored) -> Response:
+        self.served += 1
+        age = max(0, int(self._clock() - stored.stored_at))
+        extra = {
+            "Warning": '110 - "Response is Stale"',
+            "X-Cache": "STALE",
+            "Age": str(age),
+            "Cache-Control": "no-store",    # que ninguna caché compartida lo alargue más
+        }
+        if stored.etag and etag_matches(request, stored.etag):
+            return Response(status_code=304, headers={"ETag": stored.etag, **extra})
+        response = Response(content=stored.body, status_code=stored.status_code)
+        for name, value in stored.headers:
+            response.headers.append(name, value)
+        response.headers.update(extra)
+        return response
+
+    def samples(self) -> list[metrics.Sample]:
+        return [
+            metrics.Sample("rex_stale_cache_entries", len(self._entries), "gauge",
+                           "Respuestas guardadas para el modo degradado"),
+            metrics.Sample("rex_stale_cache_bytes", self.size, "gauge", "Bytes de esas respuestas"),
+            metrics.Sample("rex_stale_responses_total", self.served, "counter",
+                           "Respuestas obsoletas servidas con Mongo no disponible"),
+        ]
+
+
+class BreakerListener(monitoring.CommandListener):
+    '''
+    Cada comando que Mongo completa demuestra que está accesible: cierra el circuito
+    '''
+
+    def __init__(self, breaker: CircuitBreaker) -> None:
+        self.breaker = breaker
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        self.breaker.record_success()
+
+    def failed(self, event) -> None:
+        pass                                # los errores se cuentan en BreakerRoute
+
+
+def stale_on_outage(endpoint: Callable) -> Callable:
+    '''
+    Decorador declarativo (como cache_control): con Mongo caído el endpoint sirve
+    su última respuesta correcta en vez de 503
+    '''
+    endpoint.__stale_on_outage__ = True
+    return endpoint
+
+
+def serves_from_snapshot(check: Callable[[Request], bool]) -> Callable:
+    '''
+    Decorador declarativo: con el circuito abierto el endpoint se ejecuta igual si
+    `check(request)` es cierto (responde desde memoria sin tocar Mongo)
+    '''
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__serves_from_snapshot__ = check
+        return endpoint
+    return decorator
+
+
+def _credential(request: Request) -> str:
+    token = request.headers.get("authorization") or request.cookies.get("access_token")
+    if not token:
+        return "anon"
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def stale_key(request: Request) -> tuple:
+    return (
+        request.method,
+        request.url.path,
+        request.url.query,
+        request.headers.get("accept", ""),
+        _credential(request),
+    )
+
+
+def _unavailable(retry_after: int) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Base de datos no disponible, inténtalo de nuevo en unos segundos"},
+        status_code=503,
+        headers={"Retry-After": str(retry_after), "Cache-Control": "no-store"},
+    )
+
+
+def _deadline_expired(exc: ConnectionFailure) -> bool:
+    # NetworkTimeout / selección agotada porque venció pymongo.timeout, no porque Mongo falle
+    from backend.core.deadline import remaining    # deadline.py importa este módulo
+    return exc.timeout and remaining() == 0
+
+
+class BreakerRoute(BodyLimitRoute):
+    '''
+    route_class base: corta las peticiones con el circuito abierto y guarda / sirve
+    la última respuesta buena de los endpoints @stale_on_outage
+    '''
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        stale_ok = getattr(self.endpoint, "__stale_on_outage__", False)
+        from_snapshot = getattr(self.endpoint, "__serves_from_snapshot__", None)
+
+        async def breaker_handler(request):
+            if not settings.CIRCUIT_BREAKER_ENABLED:
+                return await handler(request)
+            cacheable = stale_ok and request.method in _SAFE_METHODS
+            key = stale_key(request) if cacheable else None
+
+            permit = db_breaker.acquire()
+            if permit is None and from_snapshot is not None and from_snapshot(request):
+                permit = OPEN           # sin Mongo pero con datos en memoria: no es prueba
+            if permit is None:
+                stored = stale_cache.get(key) if cacheable else None
+                if stored is not None:
+                    return stale_cache.respond(request, stored)
+                return _unavailable(db_breaker.retry_after())
+            try:
+                response = await handler(request)
+            except ConnectionFailure as exc:
+                if _deadline_expired(exc):
+                    raise
+                db_breaker.record_failure()
+                logger.warning("Mongo no disponible en %s %s", request.method, request.url.path)
+                stored = stale_cache.get(key) if cacheable else None
+                if stored is not None:
+                    return stale_cache.respond(request, stored)
+                return _unavailable(db_breaker.retry_after())
+            finally:
+                if permit == HALF_OPEN:
+                    db_breaker.end_probe()
+            if cacheable and response.status_code == 200:
+                stale_cache.put(key, response)
+            return response
+
+        return breaker_handler
+
+
+# Instancias del proceso (las usan los routers y db/client.py)
+db_breaker = CircuitBreaker(
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS,
+)
+stale_cache = StaleCache(
+    max_entries=settings.CIRCUIT_BREAKER_STALE_MAX_ENTRIES,
+    max_bytes=settings.CIRCUIT_BREAKER_STALE_MAX_BYTES,
+    max_age=settings.CIRCUIT_BREAKER_STALE_MAX_AGE_SECONDS,
+)
+breaker_listener = BreakerListener(db_breaker)
+
+metrics.register("circuit_breaker", lambda: [*db_breaker.samples(), *stale_cache.samples()])
+
+
+__all__ = [
+    "CLOSED", "OPEN", "HALF_OPEN", "CircuitBreaker", "StaleCache", "BreakerListener", "BreakerRoute",
+    "stale_on_outage", "serves_from_snapshot", "stale_key", "db_breaker", "stale_cache", "breaker_listener",
+]
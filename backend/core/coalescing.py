@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Cabeceras de la petición que cambian la respuesta: negociación y condicionales
+# (un 304 sin cuerpo solo vale para quien mandó el mismo If-None-Match / If-Modified-Since)
+_VARY_HEADERS = (b"accept", b"accept-encoding", b"origin", b"if-none-match", b"if-modified-since")
+
+
+@dataclass(frozen=True)
+class _Rendered:
+    """
+    Respuesta ya renderizada (status, cabeceras y cuerpo) que se reparte a los que esperan.
+    """
+    status: int
+    headers: tuple[tuple[bytes, bytes], ...]
+    body: bytes
+
+
+def _path_matches(path: str, prefixes: Iterable[str]) -> bool:
+    for prefix in prefixes:
+        prefix = prefix.rstrip("/")
+        if path == prefix or path.startswith(prefix + "/"):
+            return True
+    return False
+
+
+class RequestCoalescingMiddleware:
+    '''
+    Agrupa peticiones GET idénticas que llegan mientras otra igual está en curso.
+
+    La primera petición (líder) ejecuta el handler; las demás esperan y reciben
+    los mismos bytes. La clave es método + path + query + cabeceras de negociación
+    + ámbito de visibilidad:
+    - Peticiones anónimas comparten el ámbito "anon".
+    - Peticiones con credenciales (cookie o Bearer) solo se agrupan con otras del
+      mismo token, nunca entre usuarios distintos.
+    - Los paths de `exclude_paths` (endpoints propios del usuario) nunca se agrupan.
+    - Solo se reparten respuestas sin Set-Cookie ni `no-store` (ni `private` en el
+      ámbito anónimo), con status < 500 y de tamaño acotado; si no, cada petición se
+      ejecuta por sí misma.
+    '''
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        paths: Iterable[str] = ("/routes",),
+        exclude_paths: Iterable[str] = (),
+        max_body_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        self.app = app
+        self.paths = tuple(paths)
+        self.exclude_paths = tuple(exclude_paths)
+        self.max_body_bytes = max_body_bytes
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        # Contadores sencillos para observabilidad / tests
+        self.leaders = 0
+        self.followers = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._eligible(scope):
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.followers += 1
+            rendered = await asyncio.shield(pending)
+            if rendered is not None:
+                await self._replay(rendered, send)
+                return
+            # La respuesta del líder no era compartible: se ejecuta normalmente
+            await self.app(scope, receive, send)
+            return
+
+        self.leaders += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        status: Optional[int] = None
+        headers: tuple[tuple[bytes, bytes], ...] = ()
+        chunks: list[bytes] = []
+        size = 0
+        shareable = True
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, headers, size, shareable
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = tuple((k, v) for k, v in message.get("headers", []))
+                shareable = self._shareable(status, headers, key[-1] == "anon")
+            elif message["type"] == "http.response.body" and shareable:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_body_bytes:
+                    shareable = False
+                    chunks.clear()
+                else:
+                    chunks.append(chunk)
+            await send(message)
+
+        rendered: Optional[_Rendered] = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+            if shareable and status is not None:
+                rendered = _Rendered(status, headers, b"".join(chunks))
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result(rendered)
+
+    # ---- Reglas de seguridad ----
+
+    def _eligible(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return False
+        path = scope["path"]
+        if not _path_matches(path, self.paths) or _path_matches(path, self.exclude_paths):
+            return False
+        # El cliente pide explícitamente una respuesta nueva
+        for name, value in scope.get("headers", []):
+            if name == b"cache-control" and b"no-cache" in value.lower():
+                return False
+        return True
+
+    @staticmethod
+    def _shareable(status: int, headers: tuple[tuple[bytes, bytes], ...], anonymous: bool) -> bool:
+        if status >= 500:
+            return False
+        for name, value in headers:
+            name, value = name.lower(), value.lower()
+            if name == b"set-cookie":
+                return False
+            if name == b"cache-control" and b"no-store" in value:
+                return False
+            # `private` solo se comparte dentro del mismo ámbito con credenciales
+            if name == b"cache-control" and b"private" in value and anonymous:
+                return False
+        return True
+
+    @staticmethod
+    def _visibility_scope(scope: Scope) -> str:
+        '''
+        "anon" si no hay credenciales; si no, un hash del token (nunca el token en claro).
+        '''
+        token = b""
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                token = value
+            elif name == b"cookie" and not token:
+                for part in value.split(b";"):
+                    k, _, v = part.strip().partition(b"=")
+                    if k == b"access_token":
+                        token = v
+        if not token:
+            return "anon"
+        return "user:" + hashlib.sha256(token).hexdigest()
+
+    def _key(self, scope: Scope) -> tuple:
+        vary = tuple(
+            (name, value) for name, value in scope.get("headers", []) if name in _VARY_HEADERS
+        )
+        return (
+            scope["method"],
+            scope["path"],
+            scope.get("query_string", b""),
+            vary,
+            self._visibility_scope(scope),
+        )
+
+    @staticmethod
+    async def _replay(rendered: _Rendered, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": rendered.status,
+            "headers": list(rendered.headers),
+        })
+        await send({"type": "http.response.body", "body": rendered.body})
+
+
+__all__ = ["RequestCoalescingMiddleware"]
@@ -0,0 +1,157 @@
+import gzip
+import zlib
+from typing import Iterable
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def accepted_encodings(header: str) -> dict[str, float]:
+    '''
+    {codificación: q} de un Accept-Encoding ("gzip;q=0" la rechaza explícitamente)
+    '''
+    accepted: dict[str, float] = {}
+    for item in header.split(","):
+        name, *params = item.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = name.strip().lower()
+        if name:
+            accepted[name] = q
+    return accepted
+
+
+def accepts_gzip(header: str) -> bool:
+    accepted = accepted_encodings(header)
+    return accepted.get("gzip", accepted.get("*", 0.0)) > 0
+
+
+def gzip_bytes(body: bytes, level: int) -> bytes:
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def gzip_etag(etag: str) -> str:
+    '''
+    ETag de la variante comprimida: distinta de la original pero igual de fuerte.
+    '''
+    if etag.endswith('"'):
+        return etag[:-1] + '-gzip"'
+    return etag
+
+
+class JSONCompressionMiddleware:
+    '''
+    Comprime con gzip las respuestas JSON (listados de rutas con todos sus puntos).
+
+    - Solo si el cliente acepta gzip, el content-type está en `content_types`,
+      la respuesta no viene ya codificada y el cuerpo supera `minimum_size`.
+    - Cuerpos de `offload_size` o más se comprimen en un hilo para no bloquear
+      el event loop mientras se atienden otras peticiones.
+    - Respuestas en streaming (exportaciones) se comprimen trozo a trozo.
+    '''
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        minimum_size: int = 1024,
+        level: int = 6,
+        content_types: Iterable[str] = ("application/json",),
+        offload_size: int = 256 * 1024,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.content_types = tuple(content_types)
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        if not accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+        responder = _GzipResponder(self, send)
+        await self.app(scope, receive, responder.send)
+
+    def wants(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.content_types
+
+    async def compress(self, body: bytes) -> bytes:
+        if len(body) >= self.offload_size:
+            return await anyio.to_thread.run_sync(gzip_bytes, body, self.level)
+        return gzip_bytes(body, self.level)
+
+
+class _GzipResponder:
+    def __init__(self, owner: JSONCompressionMiddleware, send: Send) -> None:
+        self.owner = owner
+        self._send = send
+        self.start: Message | None = None
+        self.active = False
+        self.streaming = False
+        self.compressor = None
+
+    def _encoded_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers:
+            headers["ETag"] = gzip_etag(headers["etag"])
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.active = self.owner.wants(MutableHeaders(raw=message["headers"]))
+            if not self.active:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or not self.active:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+
+        if not self.streaming and not more_body:
+            # Respuesta completa en un único mensaje (el caso de los routers)
+            if len(body) < self.owner.minimum_size:
+                await self._send(self.start)
+                await self._send(message)
+                return
+            compressed = await self.owner.compress(body)
+            self._encoded_headers(headers)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        if not self.streaming:
+            # Primer trozo de un streaming: gzip incremental, sin Content-Length
+            self.streaming = True
+            self.compressor = zlib.compressobj(self.owner.level, zlib.DEFLATED, 31)
+            self._encoded_headers(headers)
+            del headers["Content-Length"]
+            await self._send(self.start)
+
+        chunk = self.compressor.compress(body)
+        if more_body:
+            chunk += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            chunk += self.compressor.flush()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+__all__ = ["JSONCompressionMiddleware", "accepted_encodings", "accepts_gzip", "gzip_bytes", "gzip_etag"]
@@ -1,7 +1,8 @@
 # Calse base que mapea variables de entorno a atributos tipados
+from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 # Tipado para listas (CORS_ORIGINS)
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 
 # Definimos un modelo de configuración que lee del entorno .env.
@@ -18,6 +19,168 @@ class Settings(BaseSettings):
 
     CORS_ORIGINS: List[str]
 
+    # Agrupación de peticiones GET idénticas en vuelo (ver core/coalescing.py)
+    COALESCE_ENABLED: bool = True
+    COALESCE_PATHS: List[str] = ["/routes", "/tiles"]
+    COALESCE_EXCLUDE_PATHS: List[str] = ["/routes/me", "/routes/check-name"]
+    COALESCE_MAX_BODY_BYTES: int = 8 * 1024 * 1024
+
+    # Catálogo público en memoria (ver db/catalog.py)
+    PUBLIC_CATALOG_ENABLED: bool = True
+    PUBLIC_CATALOG_PAGE_SIZE: int = 100
+    PUBLIC_CATALOG_REFRESH_SECONDS: float = 5.0
+    PUBLIC_CATALOG_MAX_STALENESS_SECONDS: float = 30.0
+
+    # Invalidación de cachés entre workers vía change streams (ver db/client.py)
+    CHANGE_FEED_ENABLED: bool = True
+    CHANGE_FEED_NAME: str = "cache-invalidation"
+    CHANGE_FEED_TOKEN_SAVE_SECONDS: float = 1.0
+
+    # Cache-Control de los endpoints públicos (ver core/cache_control.py)
+    CACHE_PUBLIC_MAX_AGE: int = 30
+    CACHE_PUBLIC_STALE_WHILE_REVALIDATE: int = 300
+    CACHE_PUBLIC_STALE_IF_ERROR: int = 86400
+
+    # Frontend estático: precomprimir al arrancar si el build no lo hizo (core/static_assets.py)
+    STATIC_PRECOMPRESS_ON_STARTUP: bool = True
+
+    # Compresión gzip de respuestas JSON (ver core/compression.py)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_LEVEL: int = 6
+    COMPRESSION_CONTENT_TYPES: List[str] = [
+        "application/json", "application/geo+json", "application/msgpack", "application/cbor",
+        "application/vnd.mapbox-vector-tile",
+    ]
+    COMPRESSION_OFFLOAD_SIZE: int = 256 * 1024
+
+    # Respuestas en MessagePack / CBOR si el cliente las pide con Accept (core/negotiation.py)
+    BINARY_RESPONSES_ENABLED: bool = True
+
+    # Límites de POST /routes/bulk
+    BULK_ROUTES_MAX_ITEMS: int = 100
+    BULK_ROUTES_MAX_TOTAL_POINTS: int = 100_000
+
+    # Importación de GPX / GeoJSON en POST /routes/import (ver geo/importers.py)
+    ROUTE_IMPORT_MAX_BYTES: int = 50 * 1024 * 1024
+    ROUTE_IMPORT_MAX_POINTS: int = 5000
+    ROUTE_IMPORT_CHUNK_SIZE: int = 64 * 1024
+
+    # Dónde se guardan los puntos de las rutas (ver db/models/route_geometry.py):
+    # "embedded" (dentro del documento) o "separate" (route_geometries / GridFS)
+    ROUTE_GEOMETRY_STORAGE: Literal["embedded", "separate"] = "embedded"
+    ROUTE_GEOMETRY_GRIDFS_MIN_POINTS: int = 50_000
+
+    # Máximo de puntos por ruta al validar RouteCreate (ver geo/points.py)
+    ROUTE_MAX_POINTS: int = 50_000
+
+    # Formato de los puntos en BSON (ver db/models/route.py): "dicts", "int32" o "varint"
+    ROUTE_POINTS_CODEC: Literal["dicts", "int32", "varint"] = "dicts"
+
+    # Pool de conexiones de Motor por proceso (por defecto de pymongo: 100)
+    MONGO_MAX_POOL_SIZE: int = 100
+    # Conexiones totales que aguanta el cluster para esta app (entre todos los workers);
+    # None -> sin límite. python -m backend.server reparte el presupuesto entre workers
+    MONGO_POOL_BUDGET: Optional[int] = None
+    MONGO_MIN_POOL_PER_WORKER: int = 10
+
+    # Compartimentos de concurrencia (core/bulkhead.py): reparto de MONGO_MAX_POOL_SIZE por
+    # compartimento; lo que no usa "reads" queda reservado para login y escrituras
+    BULKHEADS_ENABLED: bool = True
+    BULKHEAD_POOL_SHARES: Dict[str, float] = {"reads": 0.6, "writes": 0.25, "auth": 0.15}
+    BULKHEAD_QUEUE_SIZES: Dict[str, int] = {"reads": 200, "writes": 100, "auth": 100}
+    BULKHEAD_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    BULKHEAD_RETRY_AFTER_SECONDS: int = 1
+
+    # Descarte de carga (core/load_shedding.py): retraso "de pie" tolerado (lag del event loop
+    # o latencia de Mongo), ventana del control CoDel y periodo de muestreo del lag
+    LOAD_SHED_ENABLED: bool = True
+    LOAD_SHED_TARGET_MS: float = 50.0
+    LOAD_SHED_INTERVAL_MS: float = 500.0
+    LOAD_SHED_SAMPLE_MS: float = 50.0
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 2
+    # Prioridad por "MÉTODO /patrón" (fnmatch); sin regla: GET normal, escrituras críticas
+    LOAD_SHED_LOW_PRIORITY: List[str] = [
+        "GET /routes", "GET /routes/user/*", "GET /routes/me/export", "GET /routes/*/export",
+        "GET /users/me/stats*", "GET /tiles/*",
+    ]
+    LOAD_SHED_CRITICAL: List[str] = ["* /auth/*", "POST /users"]
+    LOAD_SHED_EXEMPT_PATHS: List[str] = ["/health", "/metrics"]
+
+    # Deadline por petición (core/deadline.py), propagado a Mongo como maxTimeMS;
+    # el cliente puede acortarlo con X-Request-Timeout
+    REQUEST_DEADLINE_ENABLED: bool = True
+    REQUEST_DEADLINE_SECONDS: float = 10.0
+    REQUEST_DEADLINE_MIN_SECONDS: float = 0.1
+
+    # Circuit breaker de Mongo (core/circuit_breaker.py): fallos de conexión seguidos para
+    # abrirlo, segundos hasta la petición de prueba y caché de la última respuesta buena
+    # que sirven las lecturas @stale_on_outage mientras está abierto
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 10.0
+    CIRCUIT_BREAKER_STALE_MAX_ENTRIES: int = 2000
+    CIRCUIT_BREAKER_STALE_MAX_BYTES: int = 64 * 1024 * 1024
+    CIRCUIT_BREAKER_STALE_MAX_AGE_SECONDS: float = 86400.0
+    # Espera máxima para encontrar un servidor (por defecto de pymongo: 30 s)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+
+    # Trabajos en segundo plano (jobs/runner.py): "mongo" (colección jobs, sobrevive a
+    # reinicios y se reparte entre workers) o "memory" (tests / desarrollo)
+    JOBS_ENABLED: bool = True
+    JOBS_BACKEND: Literal["mongo", "memory"] = "mongo"
+    JOBS_CONCURRENCY: int = 4                     # trabajos a la vez por worker
+    JOBS_POLL_SECONDS: float = 2.0
+    JOBS_LEASE_SECONDS: float = 300.0             # duración máxima de un trabajo
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_BACKOFF_BASE_SECONDS: float = 5.0
+    JOBS_BACKOFF_MAX_SECONDS: float = 600.0
+    JOBS_DRAIN_SECONDS: float = 5.0               # espera a los trabajos en curso al parar
+    JOBS_RETENTION_SECONDS: int = 7 * 24 * 3600   # terminados: se borran pasado este tiempo
+
+    # Pool de procesos para geometría pesada (geo/pool.py): procesos por worker web
+    # (None -> la mitad de los núcleos; python -m backend.server lo reparte entre workers;
+    # 0 -> todo en línea) y tamaño mínimo para salir del event loop
+    GEOMETRY_POOL_WORKERS: Optional[int] = None
+    GEOMETRY_POOL_MIN_POINTS: int = 20_000
+
+    # Miniaturas PNG de las rutas (geo/thumbnail.py): tamaños permitidos (px), caché en
+    # disco compartida por los workers (None -> <tmp>/rex-thumbnails) y su tamaño máximo
+    THUMBNAIL_SIZES: list[int] = [128, 256, 512]
+    THUMBNAIL_DEFAULT_SIZE: int = 256
+    THUMBNAIL_CACHE_DIR: Optional[str] = None
+    THUMBNAIL_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    THUMBNAIL_MAX_AGE: int = 7 * 24 * 3600        # la URL no cambia pero la geometría sí puede
+
+    # Teselas vectoriales de las rutas públicas (geo/tiles.py): zoom máximo servido,
+    # resolución y margen de la tesela (unidades MVT) y tamaño de la caché por (z, x, y)
+    TILES_MAX_ZOOM: int = 18
+    TILES_EXTENT: int = 4096
+    TILES_BUFFER: int = 64
+    TILES_CACHE_MAX_ENTRIES: int = 20_000
+    TILES_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+
+    # Grupos de salidas de rutas públicas (geo/clusters.py): zooms precalculados,
+    # celdas por lado de tesela y máximo de grupos por respuesta (si no caben, baja el zoom)
+    CLUSTERS_MAX_ZOOM: int = 16
+    CLUSTERS_GRID: int = 8
+    CLUSTERS_MAX_RESULTS: int = 150
+    CLUSTERS_REBUILD_THRESHOLD: int = 1000        # más cambios a la vez -> se reconstruye en un hilo
+
+    # GET /metrics (formato Prometheus, core/metrics.py)
+    METRICS_ENABLED: bool = True
+
+    # Servidor de producción: python -m backend.server (gunicorn + workers uvicorn)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = Field(8000, validation_alias=AliasChoices("SERVER_PORT", "PORT"))  # Azure pone PORT
+    SERVER_WORKERS: Optional[int] = None          # None -> según núcleos y MONGO_POOL_BUDGET
+    SERVER_PRELOAD: bool = False
+    SERVER_GRACEFUL_TIMEOUT: int = 30             # segundos para drenar peticiones en SIGTERM
+    SERVER_TIMEOUT: int = 60                      # worker sin responder -> se reinicia
+    SERVER_KEEPALIVE: int = 5
+    SERVER_MAX_REQUESTS: int = 0                  # reciclar workers tras N peticiones (0 = nunca)
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+
     model_config = SettingsConfigDict(
         env_file="../.env",                  # Ajusta si tu .env vive en otra ruta
         env_file_encoding="utf-8",
@@ -0,0 +1,139 @@
+'''
+Deadline de cada petición, propagado hasta Mongo.
+
+- Presupuesto: REQUEST_DEADLINE_SECONDS por defecto, o el de @request_budget(s) en
+  el endpoint. El cliente puede acortarlo (nunca alargarlo) con la cabecera
+  `X-Request-Timeout: <segundos>`.
+- Durante el handler se activa pymongo.timeout(presupuesto): pymongo calcula en cada
+  operación lo que queda del deadline y lo envía como maxTimeMS (find, getMore,
+  count_documents, aggregate, escrituras), así que Mongo aborta la consulta en el
+  servidor en vez de seguir trabajando para un cliente que ya no espera. Motor copia
+  el contexto a sus hilos, por eso basta con activarlo aquí y db/models no cambia.
+- Si vence el deadline el handler se cancela (asyncio.timeout) y se responde 504;
+  un error de timeout de pymongo también se traduce a 504.
+- Las respuestas en streaming (exportaciones) siguen emitiéndose después del
+  handler, ya fuera del deadline.
+'''
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+import pymongo
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+
+from backend.core.circuit_breaker import BreakerRoute
+from backend.core.config import settings
+
+HEADER = "x-request-timeout"
+
+_UNSET = object()
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def request_budget(seconds: Optional[float]) -> Callable:
+    '''
+    Decorador declarativo (como cache_control): presupuesto propio del endpoint;
+    None lo deja sin deadline
+    '''
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__request_budget__ = seconds
+        return endpoint
+    return decorator
+
+
+def _client_timeout(request: Request) -> Optional[float]:
+    raw = request.headers.get(HEADER)
+    if not raw:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        return None
+    if not math.isfinite(value) or value <= 0:
+        return None
+    return max(value, settings.REQUEST_DEADLINE_MIN_SECONDS)
+
+
+def budget_for(request: Request, endpoint: Optional[Callable] = None) -> Optional[float]:
+    '''
+    Segundos de la petición: el del endpoint (o el global) acotado por la cabecera del cliente
+    '''
+    if not settings.REQUEST_DEADLINE_ENABLED:
+        return None
+    budget = getattr(endpoint, "__request_budget__", _UNSET)
+    if budget is _UNSET:
+        budget = settings.REQUEST_DEADLINE_SECONDS
+    if budget is None:
+        return None
+    client = _client_timeout(request)
+    return min(budget, client) if client is not None else budget
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    '''
+    Activa el deadline (y el de pymongo) para el bloque; los anidados solo lo acortan
+    '''
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        with pymongo.timeout(seconds):
+            yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    '''
+    Segundos que quedan del deadline de la petición en curso (None si no hay)
+    '''
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def _timeout_response() -> JSONResponse:
+    return JSONResponse(
+        {"detail": "La petición ha superado su tiempo límite"},
+        status_code=504,
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+class DeadlineRoute(BreakerRoute):
+    '''
+    route_class base: ejecuta el handler dentro del deadline de la petición.
+    Por dentro va el circuit breaker, que ve los errores de conexión antes de
+    que aquí se traduzcan a 504.
+    '''
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        endpoint = self.endpoint
+
+        async def deadline_handler(request):
+            budget = budget_for(request, endpoint)
+            if budget is None:
+                return await handler(request)
+            try:
+                with deadline_scope(budget):
+                    async with asyncio.timeout(budget):
+                        return await handler(request)
+            except TimeoutError:
+                return _timeout_response()
+            except PyMongoError as exc:
+                if exc.timeout:
+                    return _timeout_response()
+                raise
+
+        return deadline_handler
+
+
+__all__ = [
+    "DeadlineRoute", "request_budget", "budget_for", "deadline_scope", "remaining", "HEADER",
+]
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    '''
+    ETag fuerte a partir de los datos que identifican la versión (ids, fechas, ...).
+    '''
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+
+def _opaque(tag: str) -> str:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    # Las variantes gzip (core/compression.py) y MessagePack / CBOR (core/negotiation.py)
+    # representan la misma versión
+    for suffix in ('-gzip"', '-msgpack"', '-cbor"'):
+        if tag.endswith(suffix):
+            tag = tag[:-len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    '''
+    True si el cliente ya tiene esta versión (cabecera If-None-Match).
+    '''
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = _opaque(etag)
+    return any(_opaque(t) == wanted for t in header.split(","))
+
+
+def has_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers
+
+
+def not_modified(etag: str) -> Response:
+    '''
+    304 sin cuerpo: el cliente reutiliza su copia.
+    '''
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def document_version(doc: dict):
+    '''
+    Versión de un documento: updated_at si existe; si no, created_at.
+    '''
+    return doc.get("updated_at") or doc.get("created_at")
+
+
+__all__ = ["make_etag", "etag_matches", "has_conditional", "not_modified", "document_version"]
@@ -0,0 +1,311 @@
+'''
+Descarte adaptativo de carga (load shedding) por lag del event loop y latencia de Mongo.
+
+Señales, muestreadas de forma continua en cada worker:
+- lag del event loop: cuánto se retrasa un sleep corto respecto a lo pedido;
+- latencia de Mongo: duración de cada comando y espera para sacar una conexión del
+  pool (listeners de pymongo registrados en el cliente de Motor).
+
+Control estilo CoDel: lo que importa es el retraso "de pie", así que por cada
+ventana de `interval` se toma el MÍNIMO de cada señal (una ráfaga puntual no
+cuenta). Si ese mínimo supera `target` durante un intervalo completo se sube un
+nivel, y mientras siga por encima se sigue subiendo cada interval/sqrt(n) (ley de
+control de CoDel). Cuando baja de `target`, el nivel baja de uno en uno por intervalo.
+
+Nivel -> probabilidad de rechazo (503 + Retry-After) por prioridad:
+- LOW (catálogo público, estadísticas, exportaciones): nivel/2 -> todo a partir del 2;
+- NORMAL (resto de lecturas): (nivel-2)/2 -> todo en el nivel 4;
+- CRITICAL (auth y escrituras): nunca.
+'''
+import asyncio
+import fnmatch
+import logging
+import math
+import random
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+import orjson
+from pymongo import monitoring
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.core import metrics
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LOW = "low"
+NORMAL = "normal"
+CRITICAL = "critical"
+
+MAX_LEVEL = 4
+_LEVEL_OFFSET = {LOW: 0, NORMAL: 2}
+
+
+class LoadShedder:
+    '''
+    Controlador: recibe muestras, cierra ventanas con `tick` y decide con `should_shed`
+    '''
+
+    def __init__(self, *, target: float, interval: float, sample_period: float = 0.05,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Callable[[], float] = random.random) -> None:
+        self.target = target
+        self.interval = interval
+        self.sample_period = sample_period
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()       # las muestras de Mongo llegan desde hilos de pymongo
+        self._min_lag: Optional[float] = None
+        self._min_db: Optional[float] = None
+        self._window_end = clock() + interval
+        # Estado CoDel
+        self.level = 0
+        self.dropping = False
+        self.count = 0
+        self._first_above: Optional[float] = None
+        self._next_step = 0.0
+        self._next_decay = 0.0
+        # Observabilidad (última ventana cerrada)
+        self.last_lag = 0.0
+        self.last_db: Optional[float] = None
+        self.admitted = {LOW: 0, NORMAL: 0, CRITICAL: 0}
+        self.rejected = {LOW: 0, NORMAL: 0, CRITICAL: 0}
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- Muestras ----
+    def observe_loop_lag(self, seconds: float) -> None:
+        with self._lock:
+            self._min_lag = seconds if self._min_lag is None else min(self._min_lag, seconds)
+
+    def observe_db(self, seconds: float) -> None:
+        with self._lock:
+            self._min_db = seconds if self._min_db is None else min(self._min_db, seconds)
+
+    # ---- Control ----
+    def tick(self) -> int:
+        '''
+        Cierra la ventana actual si ha vencido y actualiza el nivel
+        '''
+        now = self._clock()
+        if now < self._window_end:
+            return self.level
+        with self._lock:
+            lag, db = self._min_lag or 0.0, self._min_db
+            self._min_lag = self._min_db = None
+        self._window_end = now + self.interval
+        self.last_lag, self.last_db = lag, db
+        self._control(now, max(lag, db or 0.0))
+        return self.level
+
+    def _control(self, now: float, delay: float) -> None:
+        previous = self.level
+        if delay <= self.target:
+            self._first_above = None
+            self.dropping = False
+            if self.level and now >= self._next_decay:
+                self.level -= 1
+                self._next_decay = now + self.interval
+        elif self._first_above is None:
+            # Tiene que mantenerse por encima un intervalo completo
+            self._first_above = now + self.interval
+        elif not self.dropping:
+            if now >= self._first_above:
+                self.dropping = True
+                self.count = 1
+                self._raise(now)
+        elif now >= self._next_step:
+            self.count += 1
+            self._raise(now)
+        if self.level != previous:
+            logger.warning("Load shedding: nivel %s -> %s (lag=%.3fs, mongo=%s)", previous, self.level,
+                           self.last_lag, "-" if self.last_db is None else f"{self.last_db:.3f}s")
+
+    def _raise(self, now: float) -> None:
+        self.level = min(MAX_LEVEL, self.level + 1)
+        self._next_step = now + self.interval / math.sqrt(self.count)
+        self._next_decay = now + self.interval
+
+    def shed_probability(self, priority: str) -> float:
+        offset = _LEVEL_OFFSET.get(priority)
+        if offset is None:
+            return 0.0
+        return min(1.0, max(0, self.level - offset) / 2)
+
+    def should_shed(self, priority: str) -> bool:
+        p = self.shed_probability(priority)
+        shed = p > 0 and (p >= 1 or self._rng() < p)
+        (self.rejected if shed else self.admitted)[priority] += 1
+        return shed
+
+    # ---- Muestreo del event loop ----
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.sample_period)
+            self.observe_loop_lag(max(0.0, loop.time() - started - self.sample_period))
+            self.tick()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._window_end = self._clock() + self.interval
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def samples(self) -> list[metrics.Sample]:
+        out = [
+            metrics.Sample("rex_load_shed_level", self.level, "gauge", "Nivel de descarte (0-4)"),
+            metrics.Sample("rex_event_loop_lag_seconds", self.last_lag, "gauge",
+                           "Lag mínimo del event loop en la última ventana"),
+        ]
+        if self.last_db is not None:
+            out.append(metrics.Sample("rex_mongo_latency_seconds", self.last_db, "gauge",
+                                      "Latencia mínima de Mongo (comando o espera de pool) en la última ventana"))
+        for priority in (LOW, NORMAL, CRITICAL):
+            labels = {"priority": priority}
+            out.append(metrics.Sample("rex_load_shed_admitted_total", self.admitted[priority], "counter",
+                                      "Peticiones admitidas", labels))
+            out.append(metrics.Sample("rex_load_shed_rejected_total", self.rejected[priority], "counter",
+                                      "Peticiones rechazadas por sobrecarga", labels))
+        return out
+
+
+class MongoLatencyListener(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+    '''
+    Lleva al controlador la duración de cada comando y la espera por conexión del pool.
+
+    No cuentan los getMore (en el change stream y los cursores tailable el servidor
+    espera datos nuevos hasta ~1 s: es una espera larga, no lentitud) ni el aggregate
+    que abre un $changeStream.
+    '''
+
+    def __init__(self, shedder: LoadShedder) -> None:
+        self.shedder = shedder
+        self._ignored: set[int] = set()     # request_id de comandos que no cuentan
+
+    def started(self, event) -> None:
+        pipeline = event.command.get("pipeline") if event.command_name == "aggregate" else None
+        if pipeline and "$changeStream" in pipeline[0]:
+            self._ignored.add(event.request_id)
+
+    def _counts(self, event) -> bool:
+        if event.command_name == "getMore":
+            return False
+        if self._ignored:
+            try:
+                self._ignored.remove(event.request_id)
+                return False
+            except KeyError:
+                pass
+        return True
+
+    def succeeded(self, event) -> None:
+        if self._counts(event):
+            self.shedder.observe_db(event.duration_micros / 1e6)
+
+    def failed(self, event) -> None:
+        if self._counts(event):
+            self.shedder.observe_db(event.duration_micros / 1e6)
+
+    def connection_checked_out(self, event) -> None:
+        if getattr(event, "duration", None) is not None:
+            self.shedder.observe_db(event.duration)
+
+    def connection_check_out_failed(self, event) -> None:
+        if getattr(event, "duration", None) is not None:
+            self.shedder.observe_db(event.duration)
+
+    # Resto de eventos del pool: sin interés aquí
+    def pool_created(self, event) -> None: pass
+    def pool_ready(self, event) -> None: pass
+    def pool_cleared(self, event) -> None: pass
+    def pool_closed(self, event) -> None: pass
+    def connection_created(self, event) -> None: pass
+    def connection_ready(self, event) -> None: pass
+    def connection_closed(self, event) -> None: pass
+    def connection_check_out_started(self, event) -> None: pass
+    def connection_checked_in(self, event) -> None: pass
+
+
+def _rules(patterns: Iterable[str]) -> tuple[tuple[str, str], ...]:
+    rules = []
+    for pattern in patterns:
+        method, _, path = pattern.strip().partition(" ")
+        rules.append((method.upper(), path.strip()))
+    return tuple(rules)
+
+
+def _matches(rules, method: str, path: str) -> bool:
+    return any((m == "*" or m == method) and fnmatch.fnmatchcase(path, p) for m, p in rules)
+
+
+class LoadSheddingMiddleware:
+    '''
+    Clasifica cada petición por prioridad ("MÉTODO /patrón", con comodines de fnmatch)
+    y la rechaza con 503 antes de hacer ningún trabajo si el controlador lo decide.
+    Sin regla: GET/HEAD son NORMAL y el resto CRITICAL.
+    '''
+
+    def __init__(self, app: ASGIApp, *, shedder: LoadShedder, low_priority: Iterable[str] = (),
+                 critical: Iterable[str] = (), exempt_paths: Iterable[str] = (),
+                 retry_after: int = 2) -> None:
+        self.app = app
+        self.shedder = shedder
+        self.low = _rules(low_priority)
+        self.critical = _rules(critical)
+        self.exempt = tuple(exempt_paths)
+        self.retry_after = retry_after
+
+    def priority(self, method: str, path: str) -> str:
+        if _matches(self.critical, method, path):
+            return CRITICAL
+        if _matches(self.low, method, path):
+            return LOW
+        return NORMAL if method in ("GET", "HEAD") else CRITICAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        if not self.shedder.should_shed(self.priority(scope["method"], scope["path"])):
+            await self.app(scope, receive, send)
+            return
+        body = orjson.dumps({"detail": "Servidor sobrecargado, inténtalo de nuevo en unos segundos"})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+                (b"cache-control", b"no-store"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Instancia del proceso (la usan main.py y db/client.py)
+load_shedder = LoadShedder(
+    target=settings.LOAD_SHED_TARGET_MS / 1000,
+    interval=settings.LOAD_SHED_INTERVAL_MS / 1000,
+    sample_period=settings.LOAD_SHED_SAMPLE_MS / 1000,
+)
+mongo_latency_listener = MongoLatencyListener(load_shedder)
+
+metrics.register("load_shedding", load_shedder.samples)
+
+
+__all__ = [
+    "LOW", "NORMAL", "CRITICAL", "LoadShedder", "LoadSheddingMiddleware", "MongoLatencyListener",
+    "load_shedder", "mongo_latency_listener",
+]
@@ -0,0 +1,75 @@
+'''
+Registro mínimo de métricas en formato de texto de Prometheus (GET /metrics).
+
+Cada componente registra un "collector": una función sin argumentos que devuelve
+muestras `Sample` con el valor actual. No hay dependencia de prometheus_client;
+los valores son por proceso (con varios workers, cada scrape ve uno de ellos).
+'''
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Literal
+
+from fastapi import Response
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass(frozen=True)
+class Sample:
+    name: str
+    value: float
+    kind: Literal["counter", "gauge"] = "gauge"
+    help: str = ""
+    labels: dict = field(default_factory=dict)
+
+
+Collector = Callable[[], Iterable[Sample]]
+
+_collectors: dict[str, Collector] = {}
+
+
+def register(name: str, collector: Collector) -> None:
+    '''
+    Registra (o reemplaza) el collector `name`
+    '''
+    _collectors[name] = collector
+
+
+def unregister(name: str) -> None:
+    _collectors.pop(name, None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render() -> str:
+    # Las muestras de una misma métrica van juntas, bajo un único HELP / TYPE
+    grouped: dict[str, list[Sample]] = {}
+    for collector in list(_collectors.values()):
+        for s in collector():
+            grouped.setdefault(s.name, []).append(s)
+    lines: list[str] = []
+    for name, samples in grouped.items():
+        if samples[0].help:
+            lines.append(f"# HELP {name} {samples[0].help}")
+        lines.append(f"# TYPE {name} {samples[0].kind}")
+        lines.extend(f"{name}{_labels(s.labels)} {_value(s.value)}" for s in samples)
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response() -> Response:
+    return Response(content=render(), media_type=CONTENT_TYPE, headers={"Cache-Control": "no-store"})
+
+
+__all__ = ["Sample", "register", "unregister", "render", "metrics_response", "CONTENT_TYPE"]
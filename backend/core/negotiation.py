@@ -0,0 +1,215 @@
+'''
+Negociación del formato de respuesta por cabecera Accept: JSON (por defecto),
+MessagePack o CBOR, con los mismos datos en los tres.
+
+- Los helpers de core/serialization.py codifican directamente en el formato
+  negociado (listados y detalle de rutas, sin pasar por JSON).
+- El resto de respuestas JSON de los endpoints (response_model de FastAPI) se
+  transcodifican en NegotiatedRoute.
+- Las fechas viajan como la misma cadena ISO 8601 que en JSON, para que
+  un cliente vea idénticos valores en cualquier formato.
+- Errores (HTTPException, 422) y descargas en streaming siguen siendo lo que eran.
+
+msgpack y cbor2 son opcionales: si no están instalados ese formato no se ofrece
+y la respuesta sale en JSON.
+'''
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Optional
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from backend.core.cache_control import CachePolicyRoute
+from backend.core.config import settings
+
+try:                                    # opcional
+    import msgpack
+except ImportError:                     # pragma: no cover - depende del entorno
+    msgpack = None
+
+try:                                    # opcional
+    import cbor2
+except ImportError:                     # pragma: no cover - depende del entorno
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Nombres alternativos que usan algunas librerías cliente
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+_SUFFIXES = {MSGPACK: "msgpack", CBOR: "cbor"}
+
+_current: ContextVar[str] = ContextVar("response_media_type", default=JSON)
+
+
+def available_media_types() -> tuple[str, ...]:
+    '''
+    Formatos que se pueden servir, en orden de preferencia del servidor
+    '''
+    types = [JSON]
+    if settings.BINARY_RESPONSES_ENABLED:
+        if msgpack is not None:
+            types.append(MSGPACK)
+        if cbor2 is not None:
+            types.append(CBOR)
+    return tuple(types)
+
+
+def negotiate(accept: Optional[str]) -> str:
+    '''
+    Formato a servir según Accept (q-values incluidos). Un tipo nombrado
+    explícitamente gana a los comodines con el mismo q; sin acuerdo posible, JSON.
+    '''
+    if not accept:
+        return JSON
+    offered = available_media_types()
+    best, best_score = JSON, (0.0, -1, 0)
+    for item in accept.split(","):
+        media, *params = [p.strip() for p in item.split(";")]
+        media = _ALIASES.get(media.lower(), media.lower())
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q <= 0:
+            continue
+        for i, candidate in enumerate(offered):
+            if media == candidate:
+                specificity = 2
+            elif media == "application/*":
+                specificity = 1
+            elif media == "*/*":
+                specificity = 0
+            else:
+                continue
+            score = (q, specificity, -i)
+            if score > best_score:
+                best, best_score = candidate, score
+    return best
+
+
+def current_media_type() -> str:
+    '''
+    Formato negociado para la petición en curso (JSON fuera de NegotiatedRoute)
+    '''
+    return _current.get()
+
+
+# ---- Codificadores ----
+def _iso(value: datetime) -> str:
+    # Misma cadena que orjson con OPT_UTC_Z (core/serialization.py)
+    return orjson.dumps(value, option=orjson.OPT_UTC_Z)[1:-1].decode()
+
+
+def _msgpack_default(value):
+    if isinstance(value, datetime):
+        return _iso(value)
+    return str(value)                   # ObjectId y similares, como default=str en JSON
+
+
+def _cbor_datetime(encoder, value) -> None:
+    encoder.encode(_iso(value))
+
+
+def _cbor_default(encoder, value) -> None:
+    encoder.encode(str(value))
+
+
+def encode(obj, media_type: str) -> bytes:
+    '''
+    Serializa `obj` (tipos JSON más datetime / ObjectId) en un formato binario
+    '''
+    if media_type == MSGPACK:
+        return msgpack.packb(obj, default=_msgpack_default, use_bin_type=True, datetime=False)
+    if media_type == CBOR:
+        return cbor2.dumps(obj, default=_cbor_default, encoders={datetime: _cbor_datetime})
+    raise ValueError(f"Formato no soportado: {media_type}")
+
+
+def variant_etag(etag: str, media_type: str) -> str:
+    '''
+    ETag de la variante binaria (como gzip_etag en core/compression.py)
+    '''
+    suffix = _SUFFIXES.get(media_type)
+    if suffix and etag.endswith('"'):
+        return f'{etag[:-1]}-{suffix}"'
+    return etag
+
+
+def _transcode(response: Response, media_type: str) -> Response:
+    content = encode(orjson.loads(response.body), media_type)
+    out = Response(content=content, status_code=response.status_code,
+                   media_type=media_type, background=response.background)
+    out.raw_headers.extend(
+        (k, v) for k, v in response.raw_headers if k not in (b"content-length", b"content-type")
+    )
+    return out
+
+
+def _binary_content(response_schema: dict) -> dict:
+    schema = {k: v for k, v in response_schema.items() if k != "$defs"}
+    return {media: {"schema": schema} for media in available_media_types() if media != JSON}
+
+
+class NegotiatedRoute(CachePolicyRoute):
+    '''
+    route_class de los routers con formatos binarios: negocia el formato, lo deja
+    en un ContextVar para los helpers de serialización, transcodifica las
+    respuestas JSON que no lo hayan usado y añade `Vary: Accept`.
+    En OpenAPI, la respuesta correcta documenta también los tipos binarios.
+    '''
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if self.response_model is None or len(available_media_types()) == 1:
+            return
+        model = self.response_model
+        if isinstance(model, type) and issubclass(model, BaseModel):
+            # Mismo componente que application/json
+            schema = {"$ref": f"#/components/schemas/{model.__name__}"}
+        else:
+            schema = TypeAdapter(model).json_schema(
+                mode="serialization", ref_template="#/components/schemas/{model}"
+            )
+        code = self.status_code or 200
+        extra = self.responses.setdefault(code, {})
+        extra.setdefault("content", {}).update(_binary_content(schema))
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request):
+            media_type = negotiate(request.headers.get("accept"))
+            token = _current.set(media_type)
+            try:
+                response = await handler(request)
+            finally:
+                _current.reset(token)
+            if media_type != JSON:
+                content_type = response.headers.get("content-type", "").split(";")[0].strip()
+                body = getattr(response, "body", b"")
+                if content_type == JSON and body and 200 <= response.status_code < 300:
+                    response = _transcode(response, media_type)
+                if "etag" in response.headers:
+                    response.headers["ETag"] = variant_etag(response.headers["etag"], media_type)
+            response.headers.add_vary_header("Accept")
+            return response
+
+        return negotiated_handler
+
+
+__all__ = [
+    "JSON", "MSGPACK", "CBOR", "NegotiatedRoute", "available_media_types", "negotiate",
+    "current_media_type", "encode", "variant_etag",
+]
@@ -69,4 +69,17 @@ async def get_current_user(request: Request):
     if not user or not user.get("is_active"):
         raise HTTPException(status_code=401, detail="Usuario no disponible")
     
-    return user
\ No newline at end of file
+    return user
+
+async def get_optional_user(request: Request):
+    '''
+    Como get_current_user, pero None si la petición no trae credenciales válidas
+    (endpoints que también sirven contenido público, p. ej. miniaturas en <img>:
+    una cookie caducada no debe impedir ver lo público; el endpoint decide el 401)
+    '''
+    if not request.cookies.get("access_token") and not request.headers.get("Authorization"):
+        return None
+    try:
+        return await get_current_user(request)
+    except HTTPException:
+        return None
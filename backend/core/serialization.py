@@ -0,0 +1,92 @@
+from typing import Any, Iterable, Mapping, Optional
+
+import orjson                                   # viene con fastapi[all]
+from fastapi import Response
+
+from backend.core.negotiation import JSON, current_media_type, encode
+
+# Opciones equivalentes a la salida de pydantic: UTC como "Z", claves str, sin NaN
+_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _float(v):
+    return None if v is None else float(v)
+
+
+def public_points(points) -> list:
+    # Mismo formato que List[Point]: floats aunque en BD haya enteros
+    if hasattr(points, "coords"):
+        # PackedPoints (codec binario de db/models/route.py): ya son floats
+        return [{"latitude": lat, "longitude": lon} for lat, lon in points.coords()]
+    return [{"latitude": float(p["latitude"]), "longitude": float(p["longitude"])} for p in points]
+
+
+def route_public_dict(doc: Mapping[str, Any], owner_username: Optional[str] = None) -> dict:
+    '''
+    Proyección de un documento de `routes` (escrito por nuestro CRUD) a la forma de RoutePublic,
+    sin construir modelos pydantic: solo renombra _id -> id y normaliza tipos.
+    '''
+    _id = doc.get("_id", doc.get("id"))
+    return {
+        "name": doc.get("name"),
+        "points": public_points(doc.get("points") or []),
+        "visibility": bool(doc.get("visibility", False)),
+        "description": doc.get("description"),
+        "category": doc.get("category"),
+        "duration_minutes": doc.get("duration_minutes"),
+        "rating": _float(doc.get("rating")),
+        "id": str(_id) if _id is not None else None,
+        "owner_id": str(doc.get("owner_id")) if doc.get("owner_id") is not None else None,
+        "created_at": doc.get("created_at"),
+        "owner_username": owner_username if owner_username is not None else doc.get("owner_username"),
+    }
+
+
+def dump_json(obj) -> bytes:
+    return orjson.dumps(obj, default=str, option=_OPTIONS)
+
+
+def dump_route(doc: Mapping[str, Any]) -> bytes:
+    return orjson.dumps(route_public_dict(doc), default=str, option=_OPTIONS)
+
+
+def dump_routes(docs: Iterable[Mapping[str, Any]]) -> bytes:
+    return orjson.dumps([route_public_dict(d) for d in docs], default=str, option=_OPTIONS)
+
+
+def json_response(body: bytes, *, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    '''
+    Respuesta con bytes ya serializados. Los endpoints mantienen su response_model
+    (OpenAPI intacto); FastAPI no vuelve a validar cuando se devuelve un Response.
+    '''
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def encoded_response(obj, *, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    '''
+    `obj` en el formato negociado para la petición (JSON salvo que Accept pida
+    MessagePack / CBOR, ver core/negotiation.py)
+    '''
+    media_type = current_media_type()
+    if media_type == JSON:
+        return json_response(dump_json(obj), status_code=status_code, headers=headers)
+    return Response(content=encode(obj, media_type), status_code=status_code,
+                    headers=headers, media_type=media_type)
+
+
+def routes_response(docs, *, headers: Optional[dict] = None) -> Response:
+    if current_media_type() == JSON:
+        return json_response(dump_routes(docs), headers=headers)
+    return encoded_response([route_public_dict(d) for d in docs], headers=headers)
+
+
+def route_response(doc, *, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    if current_media_type() == JSON:
+        return json_response(dump_route(doc), status_code=status_code, headers=headers)
+    return encoded_response(route_public_dict(doc), status_code=status_code, headers=headers)
+
+
+__all__ = [
+    "public_points", "route_public_dict", "dump_json", "dump_route", "dump_routes",
+    "json_response", "encoded_response", "routes_response", "route_response",
+]
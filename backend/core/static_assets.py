@@ -0,0 +1,255 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from backend.core.compression import accepted_encodings
+
+try:  # zstd es opcional: si no está instalado solo se genera gzip
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Extensiones que merece la pena comprimir (texto); imágenes/fuentes ya van comprimidas
+COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".wasm"}
+MIN_COMPRESS_SIZE = 1024
+
+# Vite genera assets/<nombre>-<hash>.<ext>: su contenido nunca cambia para esa URL
+_HASHED_NAME = re.compile(r"[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Sufijo en disco y preferencia (mayor = mejor) de cada codificación
+_ENCODINGS = {"zstd": (".zst", 2), "gzip": (".gz", 1)}
+
+
+# ============ PRECOMPRESIÓN (build o arranque) ============
+
+def _compress_file(src: Path, encoding: str) -> Optional[Path]:
+    suffix = _ENCODINGS[encoding][0]
+    dst = src.with_name(src.name + suffix)
+    if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+        return dst
+    data = src.read_bytes()
+    if encoding == "gzip":
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+    else:
+        packed = zstandard.ZstdCompressor(level=19).compress(data)
+    # Solo vale la pena si realmente ahorra bytes
+    if len(packed) >= len(data):
+        return None
+    # Fichero temporal propio de cada proceso: sin --preload todos los workers
+    # precomprimen a la vez y no deben pisarse a medio escribir
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(packed)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return dst
+
+
+def precompress_directory(root: Path | str) -> int:
+    '''
+    Genera <fichero>.gz (y <fichero>.zst si hay zstandard) junto a cada asset de texto.
+    Devuelve cuántas variantes se han escrito o ya estaban al día.
+    '''
+    encodings = ["gzip"] + (["zstd"] if zstandard is not None else [])
+    count = 0
+    for path in Path(root).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        if path.stat().st_size < MIN_COMPRESS_SIZE:
+            continue
+        for encoding in encodings:
+            try:
+                if _compress_file(path, encoding) is not None:
+                    count += 1
+            except OSError:
+                # Disco de solo lectura, etc.: se sirve sin comprimir
+                logger.warning("No se pudo precomprimir %s (%s)", path, encoding)
+    return count
+
+
+# ============ ÍNDICE EN MEMORIA ============
+
+@dataclass(frozen=True)
+class _Variant:
+    path: str
+    stat: os.stat_result
+    etag: str
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    """
+    Metadatos de un fichero servido (todo calculado al construir el índice).
+    """
+    media_type: str
+    cache_control: str
+    identity: _Variant
+    encoded: dict = field(default_factory=dict)     # "gzip"/"zstd" -> _Variant
+
+    @property
+    def compressible(self) -> bool:
+        return bool(self.encoded)
+
+
+def _etag_for(st: os.stat_result, rel: str, encoding: str = "") -> str:
+    raw = f"{rel}:{st.st_size}:{st.st_mtime_ns}:{encoding}".encode()
+    return '"' + hashlib.md5(raw, usedforsecurity=False).hexdigest() + '"'
+
+
+def _is_hashed(rel: str) -> bool:
+    return rel.startswith("assets/") and bool(_HASHED_NAME.search(rel))
+
+
+def build_index(root: Path | str) -> dict[str, StaticAsset]:
+    '''
+    Recorre el directorio una sola vez: después ninguna petición toca el sistema de ficheros
+    salvo para leer el contenido.
+    '''
+    root = Path(root)
+    index: dict[str, StaticAsset] = {}
+    suffixes = {s for s, _ in _ENCODINGS.values()}
+    for path in root.rglob("*"):
+        if not path.is_file() or path.suffix in suffixes or path.name.endswith(".tmp"):
+            continue
+        rel = path.relative_to(root).as_posix()
+        st = path.stat()
+        encoded = {}
+        for encoding, (suffix, _) in _ENCODINGS.items():
+            variant = path.with_name(path.name + suffix)
+            if variant.is_file():
+                vst = variant.stat()
+                encoded[encoding] = _Variant(str(variant), vst, _etag_for(st, rel, encoding))
+        index[rel] = StaticAsset(
+            media_type=guess_type(path.name)[0] or "application/octet-stream",
+            cache_control=IMMUTABLE_CACHE if _is_hashed(rel) else REVALIDATE_CACHE,
+            identity=_Variant(str(path), st, _etag_for(st, rel)),
+            encoded=encoded,
+        )
+    return index
+
+
+def choose_encoding(asset: StaticAsset, accept_encoding: str) -> Optional[str]:
+    '''
+    Mejor variante disponible que acepte el cliente (zstd > gzip), o None (sin comprimir).
+    '''
+    if not asset.encoded or not accept_encoding:
+        return None
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_rank = None, (0.0, 0)
+    for encoding in asset.encoded:
+        q = accepted.get(encoding, wildcard)
+        rank = (q, _ENCODINGS[encoding][1])
+        if q > 0 and rank > best_rank:
+            best, best_rank = encoding, rank
+    return best
+
+
+# ============ APP ASGI ============
+
+class PrecompressedStaticFiles:
+    '''
+    Sustituto de StaticFiles(html=True) para el build de React:
+    - sirve la variante precomprimida según Accept-Encoding (Vary: Accept-Encoding);
+    - assets con hash de Vite -> `immutable` un año; el resto (index.html) -> `no-cache`;
+    - ETag por variante y 304 con If-None-Match;
+    - metadatos desde el índice en memoria (sin stat por petición).
+    '''
+
+    def __init__(self, directory: Path | str, *, html: bool = True, precompress: bool = True) -> None:
+        self.directory = Path(directory)
+        self.html = html
+        if precompress:
+            precompress_directory(self.directory)
+        self.index = build_index(self.directory)
+
+    def reload(self) -> None:
+        self.index = build_index(self.directory)
+
+    def _lookup(self, path: str) -> tuple[Optional[StaticAsset], int]:
+        rel = path.lstrip("/")
+        asset = self.index.get(rel)
+        if asset is not None:
+            return asset, 200
+        if self.html:
+            # Directorio -> index.html, como StaticFiles(html=True)
+            index_rel = (rel.rstrip("/") + "/index.html").lstrip("/")
+            asset = self.index.get(index_rel)
+            if asset is not None:
+                return asset, 200
+            not_found = self.index.get("404.html")
+            if not_found is not None:
+                return not_found, 404
+        return None, 404
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response: Response = PlainTextResponse("Method Not Allowed", status_code=405)
+            await response(scope, receive, send)
+            return
+
+        path = scope.get("path", "/")
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        asset, status_code = self._lookup(path)
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(asset, request_headers.get("accept-encoding", ""))
+        variant = asset.encoded[encoding] if encoding else asset.identity
+
+        headers = {"cache-control": asset.cache_control, "etag": variant.etag}
+        if asset.compressible:
+            headers["vary"] = "Accept-Encoding"
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        if_none_match = request_headers.get("if-none-match", "")
+        if status_code == 200 and variant.etag in [t.strip() for t in if_none_match.split(",")]:
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        response = FileResponse(
+            variant.path,
+            status_code=status_code,
+            headers=headers,
+            media_type=asset.media_type,
+            stat_result=variant.stat,
+        )
+        await response(scope, receive, send)
+
+
+if __name__ == "__main__":
+    # Uso en el build: python -m backend.core.static_assets backend/static
+    target = sys.argv[1] if len(sys.argv) > 1 else str(Path(__file__).resolve().parents[1] / "static")
+    print(f"{precompress_directory(target)} variantes precomprimidas en {target}")
+
+
+__all__ = ["PrecompressedStaticFiles", "StaticAsset", "build_index", "choose_encoding", "precompress_directory"]
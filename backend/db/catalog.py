@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Optional
+
+import backend.db.client as db_client
+from backend.core.config import settings
+from backend.db.models import route as route_crud
+from backend.core.serialization import dump_routes
+
+logger = logging.getLogger(__name__)
+
+def sort_key(doc: dict):
+    # Orden estable: fecha de creación y, a igualdad, _id (también para paginar desde BD)
+    return (doc.get("created_at") or datetime.min, doc["_id"])
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Foto inmutable del catálogo público, ya serializada a bytes.
+    """
+    routes: tuple[dict, ...]
+    ids: frozenset[str]
+    body: bytes                     # Lista completa (GET /routes)
+    pages: tuple[bytes, ...]        # Páginas de `page_size` rutas (GET /routes?page=N)
+    page_size: int
+    last_created_at: Optional[datetime]
+    built_at: float                 # time.monotonic() del momento de construcción
+
+    def page(self, n: int) -> bytes:
+        if n < len(self.pages):
+            return self.pages[n]
+        return b"[]"
+
+
+def build_snapshot(docs, page_size: int) -> CatalogSnapshot:
+    routes = tuple(sorted(docs, key=sort_key))
+    pages = tuple(
+        dump_routes(routes[i:i + page_size]) for i in range(0, len(routes), page_size)
+    )
+    created = [d["created_at"] for d in routes if d.get("created_at") is not None]
+    return CatalogSnapshot(
+        routes=routes,
+        ids=frozenset(d["_id"] for d in routes),
+        body=dump_routes(routes),
+        pages=pages,
+        page_size=page_size,
+        last_created_at=max(created) if created else None,
+        built_at=time.monotonic(),
+    )
+
+
+class PublicRouteCatalog:
+    '''
+    Catálogo en memoria de las rutas públicas, refrescado en segundo plano.
+
+    Cada refresco es incremental:
+    - rutas nuevas: las creadas desde el último `created_at` conocido;
+    - borradas/ocultadas: diferencia con los _id públicos actuales (proyección solo _id);
+    - rezagadas: _id públicos que no estaban en la foto se piden por `$in`.
+    La nueva foto sustituye a la anterior con una única asignación (swap atómico),
+    así que los lectores nunca ven un estado a medias.
+    '''
+
+    def __init__(self, *, page_size: int, refresh_seconds: float, max_staleness_seconds: float):
+        self.page_size = page_size
+        self.refresh_seconds = refresh_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        '''
+        Devuelve la foto si respeta la cota de antigüedad; si no, None (el endpoint va a BD).
+        '''
+        snap = self._snapshot
+        if snap is None:
+            return None
+        if time.monotonic() - snap.built_at > self.max_staleness_seconds:
+            return None
+        return snap
+
+    def available(self, request=None) -> bool:
+        '''
+        Hay foto utilizable (para @serves_from_snapshot con el circuito de Mongo abierto)
+        '''
+        return self.current() is not None
+
+    async def refresh(self) -> CatalogSnapshot:
+        async with self._lock:
+            prev = self._snapshot
+            if prev is None:
+                docs = await route_crud.get_public_routes_since(None)
+                snap = build_snapshot(docs, self.page_size)
+            else:
+                snap = await self._incremental(prev)
+            self._snapshot = snap
+            return snap
+
+    async def _incremental(self, prev: CatalogSnapshot) -> CatalogSnapshot:
+        new_docs = await route_crud.get_public_routes_since(prev.last_created_at)
+        public_ids = await route_crud.get_public_route_ids()
+
+        by_id = {d["_id"]: d for d in prev.routes if d["_id"] in public_ids}
+        for d in new_docs:
+            if d["_id"] in public_ids:
+                by_id[d["_id"]] = d
+
+        missing = public_ids - by_id.keys()
+        if missing:
+            for d in await route_crud.get_routes_by_ids(list(missing)):
+                if d.get("visibility"):
+                    by_id[d["_id"]] = d
+
+        changed = by_id.keys() != prev.ids or any(d["_id"] not in prev.ids for d in new_docs)
+        if not changed:
+            # Nada cambió: misma foto, solo se renueva la marca de tiempo
+            return replace(prev, built_at=time.monotonic())
+        return build_snapshot(by_id.values(), self.page_size)
+
+    def request_refresh(self) -> None:
+        '''
+        Adelanta el siguiente refresco (p. ej. tras crear o borrar una ruta).
+        '''
+        self._wake.set()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("No se pudo construir el catálogo público inicial")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.refresh()
+            except Exception:
+                # Se sigue sirviendo la foto anterior mientras respete la cota de antigüedad
+                logger.exception("Fallo al refrescar el catálogo público")
+
+
+public_catalog = PublicRouteCatalog(
+    page_size=settings.PUBLIC_CATALOG_PAGE_SIZE,
+    refresh_seconds=settings.PUBLIC_CATALOG_REFRESH_SECONDS,
+    max_staleness_seconds=settings.PUBLIC_CATALOG_MAX_STALENESS_SECONDS,
+)
+
+# Cualquier escritura en "routes" (de este u otro worker) adelanta el refresco
+db_client.subscribe("routes", lambda event: public_catalog.request_refresh())
+
+__all__ = ["CatalogSnapshot", "PublicRouteCatalog", "build_snapshot", "public_catalog", "sort_key"]
@@ -1,6 +1,16 @@
-from typing import Optional
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
 from ..core.config import settings
+from ..core.load_shedding import mongo_latency_listener
+from ..core.circuit_breaker import breaker_listener
+
+logger = logging.getLogger(__name__)
 
 _client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
@@ -14,7 +24,13 @@ async def init_db() -> None:
     """
     global _client, _db, db
     if _client is None:
-        _client = AsyncIOMotorClient(settings.MONGODB_URI)
+        _client = AsyncIOMotorClient(
+            settings.MONGODB_URI,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            # latencias para el load shedding; comandos correctos cierran el circuit breaker
+            event_listeners=[mongo_latency_listener, breaker_listener],
+        )
         _db = _client[settings.DATABASE_NAME]
         # Mantener alias de compatibilidad
         db = _db
@@ -34,7 +50,7 @@ def get_db() -> AsyncIOMotorDatabase:
 
 async def close_db() -> None:
     """
-    Cierra el cliente (opcional: úsalo en shutdown si quieres).
+    Cierra el cliente. Se llama en el 'shutdown' de FastAPI.
     """
     global _client, _db, db
     if _client is not None:
@@ -43,4 +59,176 @@ async def close_db() -> None:
     _db = None
     db = None
 
-__all__ = ["init_db", "get_db", "close_db"]
+
+# ============ INVALIDACIÓN DE CACHÉS ============
+# Cualquier caché en memoria (catálogo público, etc.) se registra con `subscribe`.
+# Con change streams (replica set / Atlas) todos los workers reciben las escrituras
+# de todos; si no están disponibles (Mongo standalone, tests) las escrituras de este
+# proceso se publican en un bus local desde el propio CRUD (`notify_change`).
+
+WATCHED_COLLECTIONS = ("routes", "users", "favorites")
+CHANGE_FEED_STATE_COLL = "_change_feed_state"
+
+# Códigos de Mongo: change streams no soportados / histórico perdido al reanudar
+_UNSUPPORTED_CODES = {40573}
+_HISTORY_LOST_CODES = {260, 280, 286}
+
+
+@dataclass(frozen=True)
+class InvalidationEvent:
+    """
+    Aviso de que un documento (o toda la colección si document_id es None) ha cambiado.
+    """
+    collection: str                 # "routes" | "users" | "favorites"
+    operation: str                  # "insert" | "update" | "replace" | "delete" | "invalidate"
+    document_id: Optional[str] = None
+
+
+_subscribers: dict[str, list[Callable[[InvalidationEvent], None]]] = defaultdict(list)
+_change_feed_task: Optional[asyncio.Task] = None
+_change_feed_active = False
+
+
+def subscribe(collection: str, callback: Callable[[InvalidationEvent], None]) -> None:
+    """
+    Registra un callback síncrono (y barato) que se llama con cada evento de la colección.
+    """
+    _subscribers[collection].append(callback)
+
+def unsubscribe(collection: str, callback: Callable[[InvalidationEvent], None]) -> None:
+    if callback in _subscribers.get(collection, []):
+        _subscribers[collection].remove(callback)
+
+def publish(event: InvalidationEvent) -> None:
+    """
+    Entrega el evento a las cachés registradas; un callback que falla no afecta al resto.
+    """
+    for callback in list(_subscribers.get(event.collection, [])):
+        try:
+            callback(event)
+        except Exception:
+            logger.exception("Fallo en un suscriptor de invalidación (%s)", event.collection)
+
+def notify_change(collection: str, operation: str, document_id=None) -> None:
+    """
+    Llamado por el CRUD tras cada escritura. Si el change stream está activo el evento
+    llegará por él (a todos los workers); si no, se publica directamente en el bus local.
+    """
+    if _change_feed_active:
+        return
+    publish(InvalidationEvent(collection, operation, str(document_id) if document_id is not None else None))
+
+def change_feed_mode() -> str:
+    return "change-stream" if _change_feed_active else "local"
+
+
+def _event_from_change(change: dict) -> Optional[InvalidationEvent]:
+    coll = (change.get("ns") or {}).get("coll")
+    op = change.get("operationType")
+    if coll not in WATCHED_COLLECTIONS or op is None:
+        return None
+    key = (change.get("documentKey") or {}).get("_id")
+    if op in ("drop", "rename", "invalidate"):
+        return InvalidationEvent(coll, "invalidate", None)
+    return InvalidationEvent(coll, op, str(key) if key is not None else None)
+
+def _invalidate_all() -> None:
+    for coll in WATCHED_COLLECTIONS:
+        publish(InvalidationEvent(coll, "invalidate", None))
+
+async def _load_resume_token():
+    doc = await get_db()[CHANGE_FEED_STATE_COLL].find_one({"_id": settings.CHANGE_FEED_NAME})
+    return doc.get("resume_token") if doc else None
+
+async def _save_resume_token(token) -> None:
+    await get_db()[CHANGE_FEED_STATE_COLL].update_one(
+        {"_id": settings.CHANGE_FEED_NAME},
+        {"$set": {"resume_token": token}},
+        upsert=True,
+    )
+
+async def _consume(stream) -> None:
+    """
+    Publica los cambios del stream y persiste el resume token (como mucho cada
+    CHANGE_FEED_TOKEN_SAVE_SECONDS) para que un reinicio no pierda eventos.
+    """
+    last_saved = time.monotonic()
+    pending_token = None
+    try:
+        async for change in stream:
+            event = _event_from_change(change)
+            if event is not None:
+                publish(event)
+            pending_token = stream.resume_token
+            if time.monotonic() - last_saved >= settings.CHANGE_FEED_TOKEN_SAVE_SECONDS:
+                await _save_resume_token(pending_token)
+                pending_token = None
+                last_saved = time.monotonic()
+    finally:
+        if pending_token is not None:
+            try:
+                await _save_resume_token(pending_token)
+            except PyMongoError:
+                logger.warning("No se pudo guardar el último resume token")
+
+async def _run_change_feed() -> None:
+    global _change_feed_active
+    pipeline = [{"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}}}]
+    backoff = 1.0
+    token_lost = False              # token caducado que quizá no se pudo borrar de BD
+    while True:
+        try:
+            token = None if token_lost else await _load_resume_token()
+            async with get_db().watch(pipeline, resume_after=token) as stream:
+                _change_feed_active = True
+                token_lost = False
+                backoff = 1.0
+                await _consume(stream)
+        except OperationFailure as exc:
+            _change_feed_active = False
+            if exc.code in _UNSUPPORTED_CODES:
+                logger.info("Change streams no disponibles; se usa el bus de eventos local")
+                return
+            if exc.code in _HISTORY_LOST_CODES:
+                # El token ya no es válido: se empieza de cero y se vacían las cachés
+                logger.warning("Resume token caducado; se invalidan todas las cachés")
+                token_lost = True
+                _invalidate_all()
+                try:
+                    await _save_resume_token(None)
+                except PyMongoError:
+                    logger.warning("No se pudo borrar el resume token caducado")
+                else:
+                    continue
+            logger.exception("Error en el change stream")
+        except PyMongoError:
+            _change_feed_active = False
+            logger.exception("Change stream interrumpido; reintentando")
+        _change_feed_active = False
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+async def start_change_feed() -> None:
+    """
+    Arranca el suscriptor de change streams en segundo plano (llamar tras init_db).
+    """
+    global _change_feed_task
+    if _change_feed_task is None and settings.CHANGE_FEED_ENABLED:
+        _change_feed_task = asyncio.create_task(_run_change_feed())
+
+async def stop_change_feed() -> None:
+    global _change_feed_task, _change_feed_active
+    if _change_feed_task is not None:
+        _change_feed_task.cancel()
+        try:
+            await _change_feed_task
+        except asyncio.CancelledError:
+            pass
+    _change_feed_task = None
+    _change_feed_active = False
+
+__all__ = [
+    "init_db", "get_db", "close_db",
+    "InvalidationEvent", "subscribe", "unsubscribe", "publish", "notify_change",
+    "change_feed_mode", "start_change_feed", "stop_change_feed",
+]
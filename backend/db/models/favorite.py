@@ -28,6 +28,7 @@ async def add_favorite(user_id: str, route_id: str) -> None:
             "$set": {"updated_at": datetime.now(timezone.utc)},
         },
     )
+    db_client.notify_change(COLL, "update", user_id)
 
 
 async def remove_favorite(user_id: str, route_id: str) -> None:
@@ -39,6 +40,7 @@ async def remove_favorite(user_id: str, route_id: str) -> None:
             "$set": {"updated_at": datetime.now(timezone.utc)},
         },
     )
+    db_client.notify_change(COLL, "update", user_id)
 
 
 async def list_favorites(user_id: str) -> list[str]:
@@ -1,9 +1,166 @@
 # from db.client import db
+import sys
+from array import array
+from collections.abc import Sequence
+
 import backend.db.client as db_client
-from bson import ObjectId
+from backend.core.config import settings
+from backend.db.models import route_geometry as geometry
+from bson import Binary, ObjectId
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timezone
 # from typing import Dict
 
+# ============ CODEC DE PUNTOS ======================
+# Con ROUTE_POINTS_CODEC distinto de "dicts" los puntos se guardan en un BSON Binary
+# (campo `points` + `points_codec`) en vez de una lista de subdocumentos:
+# - "int32": punto fijo a 1e-7 grados (~1 cm), pares lat/lon intercalados little-endian;
+#   se decodifica sin copiar con memoryview.cast("i").
+# - "varint": los mismos enteros como deltas zigzag en LEB128 (tracks GPS: 2-3 bytes
+#   por coordenada); se decodifica a un array("i") en una sola pasada.
+# Los routers no ven la diferencia: reciben un PackedPoints, una secuencia de puntos
+# que solo crea el dict {"latitude", "longitude"} de un punto cuando alguien lo pide.
+POINT_SCALE = 10_000_000
+CODECS = ("int32", "varint")
+_LITTLE = sys.byteorder == "little"
+
+
+class PackedPoints(Sequence):
+    '''
+    Vista de solo lectura sobre enteros intercalados [lat0, lon0, lat1, lon1, ...]
+    '''
+    __slots__ = ("_ints",)
+
+    def __init__(self, ints) -> None:
+        self._ints = ints               # memoryview("i") o array("i")
+
+    def __len__(self) -> int:
+        return len(self._ints) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                # Sin copia: memoryview y array admiten cortes
+                return PackedPoints(self._ints[2 * start:2 * max(start, stop)])
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("índice de punto fuera de rango")
+        return {"latitude": self._ints[2 * index] / POINT_SCALE,
+                "longitude": self._ints[2 * index + 1] / POINT_SCALE}
+
+    def __iter__(self):
+        for lat, lon in self.coords():
+            yield {"latitude": lat, "longitude": lon}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PackedPoints):
+            return list(self._ints) == list(other._ints)
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PackedPoints({len(self)} puntos)"
+
+    def coords(self):
+        '''
+        Pares (lat, lon) en grados, sin crear dicts
+        '''
+        ints = self._ints
+        for lat, lon in zip(ints[0::2], ints[1::2]):
+            yield lat / POINT_SCALE, lon / POINT_SCALE
+
+    def to_list(self) -> list[dict]:
+        return list(self)
+
+
+def _scaled(points) -> array:
+    ints = array("i")
+    for p in points:
+        ints.append(round(float(p["latitude"]) * POINT_SCALE))
+        ints.append(round(float(p["longitude"]) * POINT_SCALE))
+    return ints
+
+
+def _zigzag_varints(ints: array) -> bytes:
+    out = bytearray()
+    prev = [0, 0]                       # último lat / último lon
+    for i, v in enumerate(ints):
+        delta = v - prev[i & 1]
+        prev[i & 1] = v
+        z = (delta << 1) ^ (delta >> 63)
+        while z >= 0x80:
+            out.append((z & 0x7F) | 0x80)
+            z >>= 7
+        out.append(z)
+    return bytes(out)
+
+
+def _read_varints(data) -> array:
+    ints = array("i")
+    shift = acc = 0
+    for byte in memoryview(data).tobytes():
+        acc |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        delta = (acc >> 1) ^ -(acc & 1)
+        # Deltas por eje: cada coordenada respecto a la misma del punto anterior
+        ints.append(ints[-2] + delta if len(ints) >= 2 else delta)
+        acc = shift = 0
+    if shift:
+        raise ValueError("varint truncado")
+    return ints
+
+
+def encode_points(points, codec: str) -> Binary:
+    '''
+    Lista de puntos -> Binary. OverflowError si alguna coordenada no cabe en int32.
+    '''
+    if isinstance(points, PackedPoints):
+        points = points.to_list()
+    ints = _scaled(points)
+    if codec == "int32":
+        if not _LITTLE:
+            ints.byteswap()
+        return Binary(ints.tobytes())
+    if codec == "varint":
+        return Binary(_zigzag_varints(ints))
+    raise ValueError(f"Codec de puntos desconocido: {codec}")
+
+
+def decode_points(data, codec: str) -> PackedPoints:
+    if codec == "int32":
+        if _LITTLE:
+            return PackedPoints(memoryview(data).cast("B").cast("i"))
+        ints = array("i")
+        ints.frombytes(bytes(data))
+        ints.byteswap()
+        return PackedPoints(ints)
+    if codec == "varint":
+        return PackedPoints(_read_varints(data))
+    raise ValueError(f"Codec de puntos desconocido: {codec}")
+
+
+def _decode(doc: dict | None) -> dict | None:
+    # Puntos empaquetados -> PackedPoints; listas de dicts se dejan tal cual
+    if doc is not None and doc.get("points_codec") and isinstance(doc.get("points"), (bytes, Binary)):
+        doc["points"] = decode_points(doc["points"], doc["points_codec"])
+    return doc
+
+
+async def _load(docs: list[dict]) -> list[dict]:
+    '''
+    Deja los documentos leídos listos para los routers: geometría separada + decodificada
+    '''
+    await geometry.hydrate(docs)
+    for d in docs:
+        _decode(d)
+    return docs
+
 # ============ HELPERS ======================
 
 def _normalize(doc: dict) -> dict:
@@ -12,12 +169,11 @@ def _normalize(doc: dict) -> dict:
         d["_id"] = str(d["_id"])
     return d
 
-# ============ CREATE OPERATIONS ============
-async def create_route(owner_id: str, route_data:dict) -> dict:
+def _route_doc(owner_id: str, route_data: dict) -> dict:
     '''
-    Crea una nueva ruta asociada a un usuario
+    Documento tal y como se guarda en `routes` (común a create_route y create_routes_bulk)
     '''
-    route = {
+    return {
         "owner_id": str(owner_id),
         "name": route_data["name"],
         "points": route_data["points"],
@@ -29,16 +185,133 @@ async def create_route(owner_id: str, route_data:dict) -> dict:
         "rating": route_data.get("rating"),
     }
 
-    result = await db_client.db["routes"].insert_one(route)
+async def _store_points(route: dict) -> list:
+    '''
+    Prepara la geometría de un documento nuevo según ROUTE_POINTS_CODEC y
+    ROUTE_GEOMETRY_STORAGE (guardándola aparte si toca). Devuelve los puntos originales.
+    '''
+    points = route["points"]
+    codec = settings.ROUTE_POINTS_CODEC
+    if codec != "dicts":
+        try:
+            route["points"] = encode_points(points, codec)
+            route["points_codec"] = codec
+            route["points_count"] = len(points)
+        except OverflowError:
+            # Coordenadas fuera de rango: se guardan sin empaquetar
+            route["points"] = points
+    if geometry.separate_storage():
+        # La geometría va primero: nunca hay una ruta visible sin sus puntos
+        route["_id"] = ObjectId()
+        stored = route.pop("points")
+        route["points_count"] = len(points)
+        route["geometry"] = await geometry.save_geometry(route["_id"], stored)
+    return points
+
+# ============ CREATE OPERATIONS ============
+async def create_route(owner_id: str, route_data:dict) -> dict:
+    '''
+    Crea una nueva ruta asociada a un usuario
+    '''
+    route = _route_doc(owner_id, route_data)
+    points = await _store_points(route)
+
+    try:
+        result = await db_client.db["routes"].insert_one(route)
+    except Exception:
+        # Sin ruta no debe quedar su geometría huérfana (igual que en create_routes_bulk)
+        if "geometry" in route:
+            await geometry.delete_geometry(route["_id"])
+        raise
+    route["points"] = points
+    route.pop("points_codec", None)
     route["_id"] = result.inserted_id
+    db_client.notify_change("routes", "insert", result.inserted_id)
     return route
 
+async def create_routes_bulk(owner_id: str, routes_data: list[dict]) -> tuple[list[dict], dict[int, int]]:
+    '''
+    Inserta varias rutas de un usuario con un único insert_many(ordered=False).
+    Devuelve (documentos insertados, {índice: código de error de Mongo} de los que fallaron);
+    un fallo (p. ej. clave duplicada) no impide insertar el resto del lote.
+    '''
+    if not routes_data:
+        return [], {}
+    docs = [_route_doc(owner_id, data) for data in routes_data]
+    separate = geometry.separate_storage()
+    points_by_doc = [await _store_points(d) for d in docs]
+    failed: dict[int, int] = {}
+    try:
+        await db_client.db["routes"].insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        for err in exc.details.get("writeErrors", []):
+            failed[int(err["index"])] = int(err.get("code", 0))
+    for i, d in enumerate(docs):
+        if i in failed:
+            if separate:
+                await geometry.delete_geometry(d["_id"])
+        else:
+            d["points"] = points_by_doc[i]
+            d.pop("points_codec", None)
+    # insert_many asigna el _id en cada documento antes de enviarlo
+    inserted = [d for i, d in enumerate(docs) if i not in failed]
+    for d in inserted:
+        db_client.notify_change("routes", "insert", d["_id"])
+    return inserted, failed
+
 # ============ GET OPERATIONS ============
 async def get_route_by_id(route_id: str) -> dict | None:
     '''
     Devuelve una ruta por su ID o None si no existe
     '''
-    return await db_client.db["routes"].find_one({"_id": ObjectId(route_id)})
+    route = await db_client.db["routes"].find_one({"_id": ObjectId(route_id)})
+    if route is not None:
+        await _load([route])
+    return route
+
+# Campos de una ruta sin geometría: lo único que leen las consultas de metadatos
+_METADATA_FIELDS = {"points": 0}
+
+async def get_route_metadata(route_id: str) -> dict | None:
+    '''
+    Ruta sin puntos (en cualquier layout), con points_count/geometry si está separada
+    '''
+    return await db_client.db["routes"].find_one({"_id": ObjectId(route_id)}, _METADATA_FIELDS)
+
+async def get_route_points(route: dict, *, offset: int = 0, limit: int = 500) -> tuple[int, list[dict]]:
+    '''
+    (total, puntos[offset:offset+limit]) de una ruta ya leída con get_route_metadata
+    '''
+    codec = route.get("points_codec")
+    if not codec:
+        return await geometry.get_points_slice(route, offset, limit)
+    # Empaquetados: el Binary entero es pequeño y cortar un PackedPoints no copia
+    if route.get("geometry"):
+        raw = await geometry.load_points(route)
+    else:
+        doc = await db_client.db["routes"].find_one({"_id": ObjectId(str(route["_id"]))}, {"points": 1})
+        raw = (doc or {}).get("points", b"")
+    points = decode_points(raw, codec)
+    return len(points), points[offset:offset + limit].to_list()
+
+
+# ---- Versiones (proyección mínima para ETags / GET condicionales) ----
+_VERSION_FIELDS = {"owner_id": 1, "visibility": 1, "created_at": 1, "updated_at": 1}
+
+async def get_route_version(route_id: str) -> dict | None:
+    '''
+    Igual que get_route_by_id pero sin puntos: solo owner, visibilidad y fechas
+    '''
+    return await db_client.db["routes"].find_one({"_id": ObjectId(route_id)}, _VERSION_FIELDS)
+
+async def get_route_versions_by_owner(owner_id: str, *, skip: int = 0, limit: int = 50) -> list[dict]:
+    '''
+    Versiones de la misma página que devuelve get_routes_by_owner (public_only=None)
+    '''
+    cur = db_client.db["routes"].find(
+        {"owner_id": str(owner_id)}, {"created_at": 1, "updated_at": 1}
+    ).skip(int(skip)).limit(int(limit))
+    return [_normalize(d) async for d in cur]
 
 
 async def get_routes_by_ids(route_ids: list[str]) -> list[dict]:
@@ -57,13 +330,46 @@ async def get_routes_by_ids(route_ids: list[str]) -> list[dict]:
         d["_id"] = str(d["_id"])
         out.append(d)
 
-    return out
+    return await _load(out)
 
 async def get_all_routes(public_only: bool = False) -> list[dict]:
     """Obtiene todas las rutas (públicas o todas si admin)."""
     query = {"visibility": True} if public_only else {}
     routes = db_client.db["routes"].find(query).to_list(length=None)
-    return await routes
+    return await _load(await routes)
+
+# ---- Consultas incrementales para el catálogo público (db/catalog.py) ----
+async def get_public_routes_since(created_after: datetime | None) -> list[dict]:
+    '''
+    Rutas públicas creadas en o después de `created_after` (todas si es None)
+    '''
+    query: dict = {"visibility": True}
+    if created_after is not None:
+        query["created_at"] = {"$gte": created_after}
+    return await _load([_normalize(d) async for d in db_client.db["routes"].find(query)])
+
+async def get_public_route_ids() -> set[str]:
+    '''
+    Solo los _id de las rutas públicas (proyección mínima, sin puntos)
+    '''
+    cur = db_client.db["routes"].find({"visibility": True}, {"_id": 1})
+    return {str(d["_id"]) async for d in cur}
+
+_START_FIELDS = {"_id": 1, "created_at": 1, "updated_at": 1, "measures.start": 1,
+                 "points": {"$slice": 1}, "points_codec": 1, "points_count": 1, "geometry": 1}
+
+async def get_public_route_starts() -> list[dict]:
+    '''
+    Rutas públicas con lo justo para situar su salida (geo/clusters.py): _id,
+    versión, measures.start y el primer punto. Solo las que aún no tienen la
+    salida medida y guardan la geometría aparte necesitan otra lectura.
+    '''
+    docs = []
+    async for d in db_client.db["routes"].find({"visibility": True}, _START_FIELDS):
+        if not (d.get("measures") or {}).get("start") and d.get("geometry"):
+            _, d["points"] = await get_route_points(d, offset=0, limit=1)
+        docs.append(_decode(d))
+    return docs
 
 # ---- Aquí obtenemos la lista de rutas que crea un usuario ---
 async def get_routes_by_owner(owner_id: str, *, public_only: bool | None = None,
@@ -77,7 +383,19 @@ async def get_routes_by_owner(owner_id: str, *, public_only: bool | None = None,
 
     cur = db_client.db["routes"].find(q).skip(int(skip)).limit(int(limit))
 
-    return [_normalize(d) async for d in cur]
+    return await _load([_normalize(d) async for d in cur])
+
+async def iter_routes_by_owner(owner_id: str, *, batch_size: int = 100):
+    '''
+    Todas las rutas de un usuario como generador asíncrono sobre el cursor (exportación):
+    Motor trae los documentos por lotes y nunca están todos en memoria a la vez.
+    '''
+    cur = db_client.db["routes"].find({"owner_id": str(owner_id)}).sort("_id", 1).batch_size(int(batch_size))
+    async for d in cur:
+        d = _normalize(d)
+        if "points" not in d:
+            d["points"] = await geometry.load_points(d)
+        yield _decode(d)
 
 async def get_route_by_name(owner_id: str, name: str) -> dict | None:
     return await db_client.db["routes"].find_one({
@@ -85,15 +403,38 @@ async def get_route_by_name(owner_id: str, name: str) -> dict | None:
         "name": name
     })
 
+async def get_existing_route_names(owner_id: str, names: list[str]) -> set[str]:
+    '''
+    De `names`, los que ya usa alguna ruta del usuario (una sola consulta $in)
+    '''
+    if not names:
+        return set()
+    cur = db_client.db["routes"].find(
+        {"owner_id": str(owner_id), "name": {"$in": list(names)}}, {"name": 1}
+    )
+    return {d["name"] async for d in cur}
+
 
 async def get_public_route_by_name(name: str) -> dict | None:
     """
     Busca una ruta por su nombre sin importar el propietario.
     """
-    return await db_client.db["routes"].find_one({
+    route = await db_client.db["routes"].find_one({
         "name": name,
         "visibility": True,
     })
+    if route is not None:
+        await _load([route])
+    return route
+
+# ============ UPDATE OPERATIONS ============
+async def set_route_measures(route_id: str, measures: dict) -> bool:
+    '''
+    Guarda las medidas calculadas en segundo plano (jobs/route_jobs.py). No avisa al bus
+    de cambios: no alteran nada de lo que sirven las cachés.
+    '''
+    result = await db_client.db["routes"].update_one({"_id": ObjectId(route_id)}, {"$set": {"measures": measures}})
+    return result.matched_count == 1
 
 # ============ DELETE OPERATIONS ============
 async def delete_route(route_id: str, user_id: str) -> bool:
@@ -101,4 +442,67 @@ async def delete_route(route_id: str, user_id: str) -> bool:
     Elimina una ruta solo si pertenece al usuario.
     '''
     result = await db_client.db["routes"].delete_one({"_id": ObjectId(route_id), "owner_id": user_id})
+    if result.deleted_count == 1:
+        if geometry.separate_storage():
+            await geometry.delete_geometry(route_id)
+        db_client.notify_change("routes", "delete", route_id)
     return result.deleted_count == 1
+
+
+# ============ MIGRACIÓN DE CODEC ============
+async def migrate_points_codec(codec: str, *, batch_size: int = 100) -> int:
+    '''
+    Reescribe los puntos guardados (embebidos o en route_geometries) con `codec`
+    ("dicts", "int32" o "varint"). Las rutas en GridFS no cambian. Idempotente.
+    '''
+    routes = db_client.db["routes"]
+    # $ne también encuentra los documentos sin points_codec (listas de dicts)
+    query = {"points_codec": {"$ne": codec}} if codec != "dicts" else {"points_codec": {"$exists": True}}
+    moved = 0
+    cur = routes.find(query).batch_size(batch_size)
+    async for route in cur:
+        if route.get("geometry") == geometry.GRIDFS:
+            continue
+        separate = "points" not in route and route.get("geometry") == geometry.COLLECTION
+        raw = await geometry.load_points(route) if separate else route.get("points", [])
+        old = route.get("points_codec")
+        points = decode_points(raw, old).to_list() if old else list(raw)
+        update: dict = {"$set": {"points_count": len(points)}}
+        if codec == "dicts":
+            stored = points
+            update["$unset"] = {"points_codec": ""}
+        else:
+            try:
+                stored = encode_points(points, codec)
+            except OverflowError:
+                continue
+            update["$set"]["points_codec"] = codec
+        if separate:
+            storage = await geometry.save_geometry(route["_id"], stored)
+            update["$set"]["geometry"] = storage
+            if storage != geometry.COLLECTION:
+                # Pasa a GridFS: el documento empaquetado de route_geometries sobra
+                await db_client.db[geometry.COLL].delete_one({"_id": route["_id"]})
+        else:
+            update["$set"]["points"] = stored
+        await routes.update_one({"_id": route["_id"]}, update)
+        moved += 1
+    return moved
+
+
+async def _main(codec: str) -> None:
+    await db_client.init_db()
+    try:
+        moved = await migrate_points_codec(codec)
+        print(f"{moved} rutas reescritas con el codec '{codec}'")
+    finally:
+        await db_client.close_db()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Migra el formato de almacenamiento de los puntos")
+    parser.add_argument("--codec", choices=("dicts",) + CODECS, required=True)
+    asyncio.run(_main(parser.parse_args().codec))
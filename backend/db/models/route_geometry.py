@@ -0,0 +1,223 @@
+'''
+Geometría de las rutas fuera del documento de `routes` (ROUTE_GEOMETRY_STORAGE="separate").
+
+Con el layout separado el documento de la ruta solo guarda metadatos más
+`points_count` y `geometry` (dónde están los puntos):
+- "collection": documento en `route_geometries` con el mismo _id que la ruta.
+- "gridfs": tracks de ROUTE_GEOMETRY_GRIDFS_MIN_POINTS puntos o más, en el bucket
+  `route_geometries_fs` como pares float64 (lat, lon) de ancho fijo, así que un
+  rango de puntos se lee con un seek sin descargar el fichero entero.
+
+Las consultas de metadatos (nombre, dueño, recuentos) solo tocan documentos pequeños;
+los puntos se cargan bajo demanda con `load_points` / `hydrate` / `get_points_slice`.
+Las rutas con `points` embebidos (layout "embedded", el de siempre) se sirven igual.
+
+Migración entre layouts: python -m backend.db.models.route_geometry --to separate|embedded
+'''
+import argparse
+import asyncio
+import struct
+import sys
+from array import array
+
+import backend.db.client as db_client
+from bson import Binary, ObjectId
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from backend.core.config import settings
+
+COLL = "route_geometries"
+BUCKET = "route_geometries_fs"
+
+EMBEDDED = "embedded"
+COLLECTION = "collection"
+GRIDFS = "gridfs"
+
+_PAIR = struct.Struct("<dd")        # (lat, lon) por punto en GridFS
+
+
+def separate_storage() -> bool:
+    return settings.ROUTE_GEOMETRY_STORAGE == "separate"
+
+
+def storage_for(n_points: int) -> str:
+    return GRIDFS if n_points >= settings.ROUTE_GEOMETRY_GRIDFS_MIN_POINTS else COLLECTION
+
+
+def _oid(route_id) -> ObjectId:
+    return route_id if isinstance(route_id, ObjectId) else ObjectId(str(route_id))
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db_client.db, bucket_name=BUCKET)
+
+
+# ---- Formato GridFS: float64 little-endian intercalados lat, lon ----
+def pack_pairs(points: list[dict]) -> bytes:
+    flat = array("d")
+    for p in points:
+        flat.append(float(p["latitude"]))
+        flat.append(float(p["longitude"]))
+    if sys.byteorder == "big":
+        flat.byteswap()
+    return flat.tobytes()
+
+
+def unpack_pairs(data: bytes) -> list[dict]:
+    flat = array("d")
+    flat.frombytes(data)
+    if sys.byteorder == "big":
+        flat.byteswap()
+    return [{"latitude": flat[i], "longitude": flat[i + 1]} for i in range(0, len(flat), 2)]
+
+
+# ============ ESCRITURA ============
+async def save_geometry(route_id, points: list[dict]) -> str:
+    '''
+    Guarda los puntos de una ruta y devuelve el tipo de almacenamiento usado
+    '''
+    # Puntos ya empaquetados (ROUTE_POINTS_CODEC) son compactos: siempre en la colección
+    packed = isinstance(points, (bytes, Binary))
+    storage = COLLECTION if packed else storage_for(len(points))
+    if storage == GRIDFS:
+        await _bucket().upload_from_stream_with_id(
+            _oid(route_id), str(route_id), pack_pairs(points), metadata={"points_count": len(points)}
+        )
+    else:
+        await db_client.db[COLL].replace_one({"_id": _oid(route_id)}, {"points": points}, upsert=True)
+    return storage
+
+
+async def delete_geometry(route_id) -> None:
+    oid = _oid(route_id)
+    await db_client.db[COLL].delete_one({"_id": oid})
+    try:
+        await _bucket().delete(oid)
+    except NoFile:
+        pass
+
+
+# ============ LECTURA ============
+async def _read_gridfs(route_id, offset: int = 0, limit: int | None = None) -> list[dict]:
+    stream = await _bucket().open_download_stream(_oid(route_id))
+    if offset:
+        stream.seek(offset * _PAIR.size)
+    size = -1 if limit is None else limit * _PAIR.size
+    return unpack_pairs(await stream.read(size))
+
+
+async def load_points(route: dict) -> list[dict]:
+    '''
+    Carga perezosa de los puntos de una ruta (embebidos o no)
+    '''
+    if "points" in route:
+        return route["points"]
+    storage = route.get("geometry")
+    if storage == GRIDFS:
+        return await _read_gridfs(route["_id"])
+    if storage == COLLECTION:
+        doc = await db_client.db[COLL].find_one({"_id": _oid(route["_id"])})
+        return doc["points"] if doc else []
+    return []
+
+
+async def hydrate(routes: list[dict]) -> list[dict]:
+    '''
+    Rellena `points` en las rutas que no los llevan embebidos: una consulta $in para
+    las de `route_geometries` y una lectura por ruta en GridFS. Sin rutas separadas
+    no se hace ninguna consulta.
+    '''
+    pending = [r for r in routes if "points" not in r and r.get("geometry") in (COLLECTION, GRIDFS)]
+    if not pending:
+        return routes
+    in_coll = {str(r["_id"]): r for r in pending if r["geometry"] == COLLECTION}
+    if in_coll:
+        cur = db_client.db[COLL].find({"_id": {"$in": [_oid(i) for i in in_coll]}})
+        async for doc in cur:
+            in_coll[str(doc["_id"])]["points"] = doc["points"]
+    for r in pending:
+        if r["geometry"] == GRIDFS:
+            r["points"] = await _read_gridfs(r["_id"])
+        r.setdefault("points", [])
+    return routes
+
+
+async def get_points_slice(route: dict, offset: int, limit: int) -> tuple[int, list[dict]]:
+    '''
+    (total, puntos[offset:offset+limit]) leyendo solo ese rango de la base de datos.
+    `route` es el documento de metadatos (al menos _id y, si existen, points_count/geometry).
+    '''
+    storage = route.get("geometry", EMBEDDED)
+    if storage == GRIDFS:
+        total = int(route.get("points_count", 0))
+        if offset >= total:
+            return total, []
+        return total, await _read_gridfs(route["_id"], offset, limit)
+
+    coll = COLL if storage == COLLECTION else "routes"
+    pipeline = [
+        {"$match": {"_id": _oid(route["_id"])}},
+        {"$project": {
+            "_id": 0,
+            "total": {"$size": {"$ifNull": ["$points", []]}},
+            "points": {"$slice": [{"$ifNull": ["$points", []]}, int(offset), int(limit)]},
+        }},
+    ]
+    async for doc in db_client.db[coll].aggregate(pipeline):
+        return int(doc["total"]), doc["points"]
+    return 0, []
+
+
+# ============ MIGRACIÓN ============
+async def migrate(to: str, *, batch_size: int = 100) -> int:
+    '''
+    Mueve la geometría de todas las rutas al layout `to` ("separate" o "embedded").
+    Idempotente: las rutas que ya están en ese layout se saltan.
+    '''
+    routes = db_client.db["routes"]
+    moved = 0
+    if to == "separate":
+        cur = routes.find({"points": {"$exists": True}}).batch_size(batch_size)
+        async for route in cur:
+            points = route["points"]
+            count = len(points)
+            if route.get("points_codec"):
+                # Puntos empaquetados: len() contaría bytes, no puntos
+                from backend.db.models.route import decode_points
+                count = len(decode_points(points, route["points_codec"]))
+            await delete_geometry(route["_id"])     # restos de una migración interrumpida
+            storage = await save_geometry(route["_id"], points)
+            await routes.update_one(
+                {"_id": route["_id"]},
+                {"$set": {"points_count": count, "geometry": storage}, "$unset": {"points": ""}},
+            )
+            moved += 1
+    elif to == "embedded":
+        cur = routes.find({"points": {"$exists": False}, "geometry": {"$in": [COLLECTION, GRIDFS]}},
+                          {"geometry": 1, "points_count": 1}).batch_size(batch_size)
+        async for route in cur:
+            points = await load_points(route)
+            await routes.update_one(
+                {"_id": route["_id"]},
+                {"$set": {"points": points}, "$unset": {"geometry": ""}},
+            )
+            await delete_geometry(route["_id"])
+            moved += 1
+    else:
+        raise ValueError(f"Layout desconocido: {to}")
+    return moved
+
+
+async def _main(to: str) -> None:
+    await db_client.init_db()
+    try:
+        moved = await migrate(to)
+        print(f"{moved} rutas migradas a '{to}'")
+    finally:
+        await db_client.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra la geometría de las rutas entre layouts")
+    parser.add_argument("--to", choices=("separate", "embedded"), required=True)
+    asyncio.run(_main(parser.parse_args().to))
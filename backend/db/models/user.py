@@ -1,11 +1,12 @@
 # backend/db/models/user.py
 
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any, Literal
 from bson import ObjectId
 from bson.errors import InvalidId
 from pymongo.errors import DuplicateKeyError
 
-from ..client import get_db                   # referencia a la DB (AsyncIOMotorDatabase)
+from ..client import get_db, notify_change    # referencia a la DB (AsyncIOMotorDatabase)
 from ...core.security import get_password_hash
 
 # Permite “inyectar” la colección en tests si hiciera falta
@@ -63,6 +64,7 @@ async def create_user(
         raise
 
     doc["_id"] = result.inserted_id
+    notify_change("users", "insert", result.inserted_id)
     return doc
 
 
@@ -86,6 +88,14 @@ async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     return await col.find_one({"email": email})
 
 
+async def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve un usuario por username o None (lo usa GET /routes/user/{username}).
+    """
+    col = _users_col()
+    return await col.find_one({"username": username})
+
+
 # ---- Métricas de perfil ----
 
 async def _count_routes_created(user_id: str) -> int:
@@ -187,11 +197,15 @@ async def update_user_fields(
         # Nada que actualizar -> devuelve el actual
         return await col.find_one({"_id": _id})
 
+    # Marca de versión del documento (ETags)
+    update.setdefault("$set", {})["updated_at"] = datetime.now(timezone.utc)
+
     try:
         await col.update_one({"_id": _id}, update)
     except DuplicateKeyError:
         # por si en el futuro añades constraint único en username, etc.
         raise
+    notify_change("users", "update", user_id)
 
     return await col.find_one({"_id": _id})
 
@@ -1,16 +1,49 @@
-from pydantic import BaseModel, Field, field_validator, AliasChoices
-from typing import List
+from pydantic import BaseModel, Field, field_validator, AliasChoices, PlainSerializer, WrapValidator
+from pydantic_core import core_schema
+from typing import Annotated, Any, List, Literal
 from datetime import datetime
+from backend.geo.points import validate_points
 
 # Modelo simple para representar un punto geográfico
 class Point(BaseModel):
     latitude: float     # Lattitude en grados
     longitude: float    # Longtitude en grados
 
+# Lista de puntos validada en bloque (ver geo/points.py): admite también [[lat, lon], ...]
+# y [lat, lon, lat, lon, ...]; se guarda como PointArray y se vuelca como List[Point]
+def _validate_points(value, _handler):
+    return validate_points(value)
+
+def _dump_points(points) -> list:
+    if hasattr(points, "to_list"):
+        return points.to_list()
+    return [p.model_dump() if isinstance(p, BaseModel) else p for p in points]
+
+class _PointsJsonSchema:
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        as_objects = handler(core_schema.list_schema(Point.__pydantic_core_schema__))
+        if handler.mode != "validation":
+            return as_objects
+        number = {"type": "number"}
+        return {"anyOf": [
+            as_objects,
+            {"type": "array", "items": {"type": "array", "items": number, "minItems": 2, "maxItems": 2},
+             "description": "Pares [latitud, longitud]"},
+            {"type": "array", "items": number, "description": "[lat, lon, lat, lon, ...]"},
+        ]}
+
+Points = Annotated[
+    List[Point],
+    WrapValidator(_validate_points),
+    PlainSerializer(_dump_points, return_type=Any),
+    _PointsJsonSchema,
+]
+
 # Campos comunes para las rutas
 class RouteBase(BaseModel):
     name: str                       # Nombre de la ruta
-    points: List[Point]             # Lista ordenada de puntos que forman la ruta
+    points: Points                  # Lista ordenada de puntos que forman la ruta
     visibility: bool = False        # Visibilidad de la ruta públicamente (por defecto, no)
     description: str # | None = None  # Descripción de la ruta (opcional)
     category: str # | None = None     # Categoría opcional de la ruta
@@ -29,7 +62,7 @@ class RouteBase(BaseModel):
     # Mensajes personalizacos (para que coincidan con la UI)
     @field_validator("points")
     @classmethod
-    def _min_points(cls, v: List[Point]):
+    def _min_points(cls, v: Points):
         if len(v) < 3:
             raise ValueError("Mínimo se han de seleccionar 3 puntos de interés")
         return v
@@ -71,3 +104,36 @@ class RoutePublic(RouteBase):
     owner_id: str                   # Identificador del propietario de la ruta    
     created_at: datetime            # Fecha y hora de la creación
     owner_username: str | None = None
+
+# Página de puntos de GET /routes/{route_id}/points
+class RoutePointsPage(BaseModel):
+    route_id: str
+    offset: int
+    limit: int
+    total: int                      # Puntos totales de la ruta
+    next_offset: int | None = None  # None si ya no quedan más
+    points: List[Point]
+
+# Resultado de POST /routes/bulk para cada elemento del lote (mismo orden que la petición)
+class RouteBulkItemResult(BaseModel):
+    index: int                      # Posición del elemento en el lote
+    status: Literal["created", "error"]
+    status_code: int                # Código HTTP equivalente: 201, 409, 422 o 500
+    id: str | None = None           # _id de la ruta creada
+    error: str | None = None        # Mensaje para la UI si no se ha creado
+
+class RouteBulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[RouteBulkItemResult]
+
+# Grupo de salidas de rutas públicas (GET /routes/clusters)
+class RouteCluster(BaseModel):
+    lat: float                      # Centroide de las salidas del grupo
+    lon: float
+    count: int                      # Rutas del grupo
+    route_id: str                   # Ruta representativa (la única si count == 1)
+
+class RouteClusterPage(BaseModel):
+    zoom: int                       # Zoom usado (menor que el pedido si no cabían)
+    clusters: List[RouteCluster]
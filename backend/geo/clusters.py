@@ -0,0 +1,271 @@
+'''
+Agrupación por zoom de los puntos de salida de las rutas públicas
+(GET /routes/clusters?bbox=&zoom=).
+
+Rejilla jerárquica en coordenadas Web Mercator: a cada zoom z la tesela se divide
+en `grid` x `grid` celdas y la celda (cx, cy) de z+1 está dentro de
+(cx >> 1, cy >> 1) de z. Cada ruta se guarda una vez por zoom en la celda que le
+toca, con su número de rutas, la suma de coordenadas (para el centroide) y una
+ruta representativa.
+
+- Alta y baja de una ruta: O(zooms), del más fino al más grueso. Al quitar la
+  representativa de una celda se elige la del hijo con más rutas.
+- `sync(docs)` compara con la foto anterior del catálogo (db/catalog.py) en un hilo
+  y aplica solo las altas, bajas y rutas cuya salida ha cambiado. Si son muchas
+  (arranque, primera carga) el índice se construye entero en el hilo y se sustituye
+  de una vez, como la foto del catálogo.
+- Una consulta no devuelve más de `max_results` grupos: si la caja envolvente es
+  demasiado grande para el zoom pedido se responde con un zoom menor, así la
+  respuesta ocupa unos pocos KB sea cual sea el tamaño del catálogo.
+'''
+import asyncio
+from typing import Iterable, Optional
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.etag import document_version
+from backend.geo import mvt
+from backend.geo.pool import flatten
+
+
+class _Cell:
+    __slots__ = ("count", "lat", "lon", "rep", "ids")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.lat = 0.0                  # sumas, para el centroide
+        self.lon = 0.0
+        self.rep: Optional[str] = None
+        self.ids: Optional[set] = None  # solo en el zoom más fino
+
+
+def start_point(doc: dict) -> Optional[tuple[float, float]]:
+    '''
+    (lat, lon) de salida: la medida guardada (jobs/route_jobs.py) o el primer punto
+    '''
+    start = (doc.get("measures") or {}).get("start")
+    if start:
+        return float(start[0]), float(start[1])
+    flat = flatten((doc.get("points") or [])[:1])
+    return (flat[0], flat[1]) if flat else None
+
+
+def _signature(doc: dict):
+    return document_version(doc), tuple((doc.get("measures") or {}).get("start") or ())
+
+
+def bbox_cells(bbox: tuple[float, float, float, float], z: int, grid: int) -> list[tuple[int, int, int, int]]:
+    '''
+    Rangos de celdas [(x0, y0, x1, y1)] de la caja (min_lon, min_lat, max_lon, max_lat)
+    a ese zoom; dos si cruza el antimeridiano
+    '''
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if min_lon > max_lon:
+        return (bbox_cells((min_lon, min_lat, 180.0, max_lat), z, grid)
+                + bbox_cells((-180.0, min_lat, max_lon, max_lat), z, grid))
+    side = grid << z
+    x0, y1 = mvt.world_xy(min_lat, min_lon)
+    x1, y0 = mvt.world_xy(max_lat, max_lon)
+
+    def cell(v: float) -> int:
+        return min(side - 1, max(0, int(v * side)))
+    return [(cell(x0), cell(y0), cell(x1), cell(y1))]
+
+
+class RouteClusters:
+    '''
+    Índice jerárquico de salidas de rutas públicas
+    '''
+
+    def __init__(self, *, max_zoom: int, grid: int, max_results: int, rebuild_threshold: int = 1000) -> None:
+        self.max_zoom = max_zoom
+        self.grid = grid
+        self.max_results = max_results
+        self.rebuild_threshold = rebuild_threshold
+        self._lock = asyncio.Lock()
+        self._levels: list[dict[tuple[int, int], _Cell]] = [{} for _ in range(max_zoom + 1)]
+        self._routes: dict[str, tuple[float, float, int, int]] = {}    # id -> (lat, lon, cx, cy) finos
+        self._signatures: dict[str, tuple] = {}
+        self._source = None
+        self.generation = 0
+        self.queries = 0
+        self.coarsened = 0
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    # ---- Altas y bajas ----
+    def add(self, route_id: str, lat: float, lon: float) -> None:
+        if route_id in self._routes:
+            self.remove(route_id)
+        side = self.grid << self.max_zoom
+        wx, wy = mvt.world_xy(lat, lon)
+        cx, cy = min(side - 1, int(wx * side)), min(side - 1, int(wy * side))
+        self._routes[route_id] = (lat, lon, cx, cy)
+        for z in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - z
+            cell = self._levels[z].get((cx >> shift, cy >> shift))
+            if cell is None:
+                cell = self._levels[z][(cx >> shift, cy >> shift)] = _Cell()
+                if z == self.max_zoom:
+                    cell.ids = set()
+            cell.count += 1
+            cell.lat += lat
+            cell.lon += lon
+            if cell.ids is not None:
+                cell.ids.add(route_id)
+            if cell.rep is None:
+                cell.rep = route_id
+        self.generation += 1
+
+    def remove(self, route_id: str) -> bool:
+        entry = self._routes.pop(route_id, None)
+        if entry is None:
+            return False
+        lat, lon, cx, cy = entry
+        for z in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - z
+            key = (cx >> shift, cy >> shift)
+            cell = self._levels[z][key]
+            cell.count -= 1
+            if cell.count == 0:
+                del self._levels[z][key]
+                continue
+            cell.lat -= lat
+            cell.lon -= lon
+            if cell.ids is not None:
+                cell.ids.discard(route_id)
+                if cell.rep == route_id:
+                    cell.rep = min(cell.ids)
+            elif cell.rep == route_id:
+                cell.rep = self._busiest_child_rep(z, key)
+        self.generation += 1
+        return True
+
+    def _busiest_child_rep(self, z: int, key: tuple[int, int]) -> Optional[str]:
+        children = self._levels[z + 1]
+        best = None
+        for dx in (0, 1):
+            for dy in (0, 1):
+                child = children.get((2 * key[0] + dx, 2 * key[1] + dy))
+                if child is not None and (best is None or child.count > best.count):
+                    best = child
+        return best.rep if best is not None else None
+
+    # ---- Sincronización con el catálogo ----
+    async def sync(self, docs: Iterable[dict], source=None) -> int:
+        '''
+        Aplica las rutas públicas actuales; devuelve cuántas altas/bajas/cambios hubo
+        '''
+        if source is not None and source is self._source:
+            return 0
+        async with self._lock:
+            if source is not None and source is self._source:
+                return 0
+            seen, changes = await asyncio.to_thread(self._diff, docs)
+            if len(changes) > self.rebuild_threshold:
+                fresh = await asyncio.to_thread(self._rebuilt, changes)
+                self._levels, self._routes = fresh._levels, fresh._routes
+                self.generation += 1
+            else:
+                for route_id, start in changes.items():
+                    if start is None:
+                        self.remove(route_id)
+                    else:
+                        self.add(route_id, *start)
+            self._signatures = seen
+            self._source = source
+            return len(changes)
+
+    def _diff(self, docs: Iterable[dict]) -> tuple[dict, dict]:
+        # {id: firma}, {id: nueva salida o None si sale del índice}
+        seen: dict[str, tuple] = {}
+        changes: dict[str, Optional[tuple[float, float]]] = {}
+        for doc in docs:
+            route_id = str(doc["_id"])
+            sig = seen[route_id] = _signature(doc)
+            if self._signatures.get(route_id) == sig:
+                continue
+            start = start_point(doc)
+            known = self._routes.get(route_id)
+            if start is None:
+                if known is not None:
+                    changes[route_id] = None
+            elif known is None or known[:2] != start:
+                changes[route_id] = start
+        for route_id in self._signatures.keys() - seen.keys():
+            if route_id in self._routes:
+                changes[route_id] = None
+        return seen, changes
+
+    def _rebuilt(self, changes: dict) -> "RouteClusters":
+        fresh = RouteClusters(max_zoom=self.max_zoom, grid=self.grid, max_results=self.max_results)
+        for route_id, (lat, lon, _, _) in self._routes.items():
+            if route_id not in changes:
+                fresh.add(route_id, lat, lon)
+        for route_id, start in changes.items():
+            if start is not None:
+                fresh.add(route_id, *start)
+        return fresh
+
+    # ---- Consultas ----
+    def query(self, bbox: tuple[float, float, float, float], zoom: int) -> tuple[int, list[dict]]:
+        '''
+        (zoom usado, grupos) dentro de la caja; el zoom baja hasta que caben en max_results
+        '''
+        self.queries += 1
+        levels = self._levels           # referencia local: un sync puede sustituir el índice
+        z = max(0, min(int(zoom), self.max_zoom))
+        while z > 0:
+            clusters = self._collect(levels[z], bbox, z, self.max_results)
+            if clusters is not None:
+                return z, clusters
+            z -= 1
+            self.coarsened += 1
+        return 0, self._collect(levels[0], bbox, 0, None)         # a zoom 0 hay como mucho grid x grid celdas
+
+    def _collect(self, level: dict, bbox, z: int, limit: Optional[int]) -> Optional[list[dict]]:
+        out = []
+        for x0, y0, x1, y1 in bbox_cells(bbox, z, self.grid):
+            area = (x1 - x0 + 1) * (y1 - y0 + 1)
+            # Se recorre lo más pequeño: las celdas de la caja o las ocupadas
+            if area <= len(level):
+                cells = (level.get((x, y)) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+            else:
+                cells = (c for (x, y), c in level.items() if x0 <= x <= x1 and y0 <= y <= y1)
+            for cell in cells:
+                if cell is None:
+                    continue
+                out.append({
+                    "lat": round(cell.lat / cell.count, 5),
+                    "lon": round(cell.lon / cell.count, 5),
+                    "count": cell.count,
+                    "route_id": cell.rep,
+                })
+                if limit is not None and len(out) > limit:
+                    return None
+        return out
+
+    def samples(self) -> list[metrics.Sample]:
+        return [
+            metrics.Sample("rex_clusters_routes", len(self._routes), "gauge", "Rutas públicas en el índice de grupos"),
+            metrics.Sample("rex_clusters_cells", sum(len(level) for level in self._levels), "gauge",
+                           "Celdas ocupadas en todos los zooms"),
+            metrics.Sample("rex_clusters_queries_total", self.queries, "counter", "Consultas de grupos"),
+            metrics.Sample("rex_clusters_coarsened_total", self.coarsened, "counter",
+                           "Veces que se ha bajado el zoom para acotar la respuesta"),
+        ]
+
+
+# Instancia del proceso
+route_clusters = RouteClusters(
+    max_zoom=settings.CLUSTERS_MAX_ZOOM,
+    grid=settings.CLUSTERS_GRID,
+    max_results=settings.CLUSTERS_MAX_RESULTS,
+    rebuild_threshold=settings.CLUSTERS_REBUILD_THRESHOLD,
+)
+
+metrics.register("clusters", route_clusters.samples)
+
+
+__all__ = ["RouteClusters", "route_clusters", "start_point", "bbox_cells"]
@@ -0,0 +1,216 @@
+'''
+Exportación de rutas a GPX, GeoJSON y KML en streaming.
+
+Todo son generadores: una ruta se convierte en trozos de texto de como mucho
+`POINTS_PER_CHUNK` puntos y las colecciones (o el zip) se emiten ruta a ruta a
+partir de un cursor, de modo que exportar miles de rutas ocupa memoria constante.
+'''
+import re
+import unicodedata
+import zipfile
+from typing import AsyncIterable, Iterator, Mapping
+from xml.sax.saxutils import escape
+
+import orjson
+
+FORMATS = ("gpx", "geojson", "kml")
+
+MEDIA_TYPES = {
+    "gpx": "application/gpx+xml",
+    "geojson": "application/geo+json",
+    "kml": "application/vnd.google-earth.kml+xml",
+    "zip": "application/zip",
+}
+
+POINTS_PER_CHUNK = 1000
+
+_GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" creator="Rex" xmlns="http://www.topografix.com/GPX/1/1">\n'
+)
+_KML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n'
+)
+
+
+def _points(route: Mapping) -> list:
+    return route.get("points") or []
+
+
+def _batches(points: list) -> Iterator[list]:
+    for i in range(0, len(points), POINTS_PER_CHUNK):
+        yield points[i:i + POINTS_PER_CHUNK]
+
+
+# ---- GPX ----
+def gpx_track(route: Mapping) -> Iterator[str]:
+    yield f"<trk><name>{escape(str(route.get('name', '')))}</name>"
+    if route.get("description"):
+        yield f"<desc>{escape(str(route['description']))}</desc>"
+    yield "<trkseg>\n"
+    for batch in _batches(_points(route)):
+        yield "".join(
+            f'<trkpt lat="{float(p["latitude"])}" lon="{float(p["longitude"])}"/>\n' for p in batch
+        )
+    yield "</trkseg></trk>\n"
+
+
+def gpx_document(route: Mapping) -> Iterator[str]:
+    yield _GPX_HEADER
+    yield f"<metadata><name>{escape(str(route.get('name', '')))}</name></metadata>\n"
+    yield from gpx_track(route)
+    yield "</gpx>\n"
+
+
+# ---- GeoJSON ----
+def _feature_properties(route: Mapping) -> dict:
+    return {
+        "id": str(route.get("_id", route.get("id", ""))),
+        "name": route.get("name"),
+        "description": route.get("description"),
+        "category": route.get("category"),
+        "visibility": bool(route.get("visibility", False)),
+        "duration_minutes": route.get("duration_minutes"),
+        "rating": route.get("rating"),
+        "created_at": route.get("created_at"),
+    }
+
+
+def geojson_feature(route: Mapping) -> Iterator[str]:
+    props = orjson.dumps(_feature_properties(route), default=str, option=orjson.OPT_UTC_Z).decode()
+    yield f'{{"type":"Feature","properties":{props},"geometry":{{"type":"LineString","coordinates":['
+    first = True
+    for batch in _batches(_points(route)):
+        # Posiciones GeoJSON: [lon, lat]
+        part = ",".join(f'[{float(p["longitude"])},{float(p["latitude"])}]' for p in batch)
+        yield part if first else "," + part
+        first = False
+    yield "]}}"
+
+
+def geojson_document(route: Mapping) -> Iterator[str]:
+    yield from geojson_feature(route)
+    yield "\n"
+
+
+# ---- KML ----
+def kml_placemark(route: Mapping) -> Iterator[str]:
+    yield f"<Placemark><name>{escape(str(route.get('name', '')))}</name>"
+    if route.get("description"):
+        yield f"<description>{escape(str(route['description']))}</description>"
+    yield "<LineString><tessellate>1</tessellate><coordinates>\n"
+    for batch in _batches(_points(route)):
+        yield "".join(f'{float(p["longitude"])},{float(p["latitude"])} ' for p in batch)
+    yield "\n</coordinates></LineString></Placemark>\n"
+
+
+def kml_document(route: Mapping) -> Iterator[str]:
+    yield _KML_HEADER
+    yield from kml_placemark(route)
+    yield "</Document>\n</kml>\n"
+
+
+_DOCUMENTS = {"gpx": gpx_document, "geojson": geojson_document, "kml": kml_document}
+_EXTENSIONS = {"gpx": "gpx", "geojson": "geojson", "kml": "kml"}
+
+
+def route_document(route: Mapping, fmt: str) -> Iterator[bytes]:
+    '''
+    Fichero completo de una ruta, en trozos de bytes
+    '''
+    for part in _DOCUMENTS[fmt](route):
+        yield part.encode("utf-8")
+
+
+async def collection_stream(routes: AsyncIterable[Mapping], fmt: str) -> AsyncIterable[bytes]:
+    '''
+    Varias rutas en un único fichero: GPX con un <trk> por ruta, FeatureCollection
+    o KML con un Placemark por ruta. Solo hay una ruta en memoria a la vez.
+    '''
+    if fmt == "gpx":
+        yield _GPX_HEADER.encode()
+        async for route in routes:
+            yield "".join(gpx_track(route)).encode("utf-8")
+        yield b"</gpx>\n"
+    elif fmt == "geojson":
+        yield b'{"type":"FeatureCollection","features":[\n'
+        sep = ""
+        async for route in routes:
+            yield (sep + "".join(geojson_feature(route))).encode("utf-8")
+            sep = ",\n"
+        yield b"\n]}\n"
+    elif fmt == "kml":
+        yield _KML_HEADER.encode()
+        async for route in routes:
+            yield "".join(kml_placemark(route)).encode("utf-8")
+        yield b"</Document>\n</kml>\n"
+    else:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+
+def safe_filename(name: str, default: str = "ruta") -> str:
+    '''
+    Nombre de fichero ASCII a partir del nombre de la ruta ("Ruta Ñandú" -> "ruta-nandu")
+    '''
+    ascii_name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", ascii_name).strip("-").lower()
+    return slug[:60] or default
+
+
+class _ChunkSink:
+    '''
+    Destino no "seekable" para ZipFile: acumula lo escrito hasta que se recoge.
+    ZipFile detecta que no puede hacer seek y usa data descriptors, así que el zip
+    se puede emitir entrada a entrada.
+    '''
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._parts)
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+async def zip_stream(routes: AsyncIterable[Mapping], fmt: str) -> AsyncIterable[bytes]:
+    '''
+    Zip con un fichero por ruta, emitido a medida que se comprime cada entrada
+    '''
+    sink = _ChunkSink()
+    used: set[str] = set()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        async for route in routes:
+            base = safe_filename(str(route.get("name", "")))
+            name, n = f"{base}.{_EXTENSIONS[fmt]}", 1
+            while name in used:
+                n += 1
+                name = f"{base}-{n}.{_EXTENSIONS[fmt]}"
+            used.add(name)
+            with zf.open(name, mode="w", force_zip64=False) as entry:
+                for part in route_document(route, fmt):
+                    entry.write(part)
+                    if sink.pending:
+                        yield sink.take()
+            if sink.pending:
+                yield sink.take()
+    # Directorio central
+    yield sink.take()
+
+
+__all__ = [
+    "FORMATS", "MEDIA_TYPES", "gpx_document", "geojson_document", "kml_document",
+    "route_document", "collection_stream", "zip_stream", "safe_filename",
+]
@@ -0,0 +1,339 @@
+'''
+Importación incremental de tracks GPX y GeoJSON.
+
+Los parsers reciben el fichero a trozos (`feed`) y devuelven los puntos a medida que
+aparecen, sin construir nunca el árbol XML / JSON completo. `Decimator` aplica el
+diezmado durante la ingesta, así que la memoria queda acotada por `max_points`
+aunque el fichero tenga cientos de miles de puntos.
+'''
+import codecs
+import json
+import math
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Optional
+
+FORMATS = ("gpx", "geojson")
+
+# Elementos GPX que son puntos de un track o ruta (los <wpt> sueltos no forman la línea)
+_GPX_POINT_TAGS = {"trkpt", "rtept"}
+_GPX_META_PARENTS = {"metadata", "trk", "rte"}
+
+# Un token JSON con el espacio previo; strings con escapes incluidos
+_JSON_TOKEN = re.compile(
+    r'\s*(?:("(?:[^"\\]|\\.)*")|([\[\]{}:,])|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null))'
+)
+# Camino rápido dentro de "coordinates": una posición completa [lon, lat(, alt...)]
+_NUM = r'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'
+_JSON_POSITION = re.compile(
+    rf'\s*,?\s*\[\s*({_NUM})\s*,\s*({_NUM})(?:\s*,\s*{_NUM})*\s*\]'
+)
+# Ningún token legítimo (un nombre, una descripción) debería pasar de aquí
+_MAX_PENDING_CHARS = 1024 * 1024
+
+_EARTH_RADIUS_M = 6_371_000.0
+
+
+class ImportFormatError(ValueError):
+    '''El fichero no es un GPX / GeoJSON válido o no contiene un track'''
+
+
+def _local(tag: str) -> str:
+    # "{http://www.topografix.com/GPX/1/1}trkpt" -> "trkpt"
+    return tag.rsplit("}", 1)[-1]
+
+
+def _coord(lat: float, lon: float) -> tuple[float, float]:
+    if not (math.isfinite(lat) and math.isfinite(lon)) or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ImportFormatError("Coordenadas fuera de rango")
+    return lat, lon
+
+
+class GPXParser:
+    '''
+    GPX con XMLPullParser (expat): cada elemento se descarta de su padre en cuanto se
+    cierra, de modo que el árbol en memoria nunca pasa de la profundidad del documento.
+    '''
+
+    def __init__(self) -> None:
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._stack: list[ET.Element] = []
+        self.name: Optional[str] = None
+        self.description: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> list[tuple[float, float]]:
+        try:
+            self._parser.feed(chunk)
+        except ET.ParseError as exc:
+            raise ImportFormatError("Archivo GPX no válido") from exc
+        return self._drain()
+
+    def close(self) -> list[tuple[float, float]]:
+        try:
+            self._parser.close()
+        except ET.ParseError as exc:
+            raise ImportFormatError("Archivo GPX no válido") from exc
+        return self._drain()
+
+    def _drain(self) -> list[tuple[float, float]]:
+        out = []
+        try:
+            events = list(self._parser.read_events())
+        except ET.ParseError as exc:
+            raise ImportFormatError("Archivo GPX no válido") from exc
+        for event, elem in events:
+            if event == "start":
+                self._stack.append(elem)
+                continue
+            self._stack.pop()
+            tag = _local(elem.tag)
+            parent = self._stack[-1] if self._stack else None
+            if tag in _GPX_POINT_TAGS:
+                try:
+                    out.append(_coord(float(elem.get("lat")), float(elem.get("lon"))))
+                except (TypeError, ValueError) as exc:
+                    raise ImportFormatError("Punto GPX sin lat/lon válidos") from exc
+            elif parent is not None and _local(parent.tag) in _GPX_META_PARENTS and elem.text:
+                if tag == "name" and self.name is None:
+                    self.name = elem.text.strip() or None
+                elif tag == "desc" and self.description is None:
+                    self.description = elem.text.strip() or None
+            if parent is not None:
+                parent.remove(elem)
+        return out
+
+
+class GeoJSONParser:
+    '''
+    Escáner incremental de GeoJSON: tokeniza el texto a medida que llega y solo
+    materializa los pares [lon, lat] que cuelgan de una clave "coordinates" (Point,
+    LineString, MultiLineString, Feature o FeatureCollection; todo se concatena en
+    orden). También recoge `properties.name` / `properties.description` del primero.
+    '''
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buf = ""
+        # Pila de contenedores: [tipo, clave pendiente / actual, ¿se espera clave?]
+        self._stack: list[list] = []
+        self._coords_depth: Optional[int] = None   # profundidad del array "coordinates"
+        self._numbers: list[float] = []
+        self._seen_root = False
+        self.name: Optional[str] = None
+        self.description: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> list[tuple[float, float]]:
+        try:
+            self._buf += self._decoder.decode(chunk)
+        except UnicodeDecodeError as exc:
+            raise ImportFormatError("Archivo GeoJSON no válido") from exc
+        return self._scan(final=False)
+
+    def close(self) -> list[tuple[float, float]]:
+        try:
+            self._buf += self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError as exc:
+            raise ImportFormatError("Archivo GeoJSON no válido") from exc
+        out = self._scan(final=True)
+        if self._stack or not self._seen_root:
+            raise ImportFormatError("Archivo GeoJSON no válido")
+        return out
+
+    def _scan(self, final: bool) -> list[tuple[float, float]]:
+        out: list[tuple[float, float]] = []
+        buf, pos, end = self._buf, 0, len(self._buf)
+        while True:
+            if self._coords_depth is not None and not self._numbers:
+                m = _JSON_POSITION.match(buf, pos)
+                if m is not None and (m.end() < end or final):
+                    out.append(_coord(float(m.group(2)), float(m.group(1))))
+                    pos = m.end()
+                    continue
+            m = _JSON_TOKEN.match(buf, pos)
+            # Un token que toca el final del buffer puede estar cortado: esperar al siguiente trozo
+            if m is None or (m.end() == end and not final):
+                break
+            string, punct, number, literal = m.groups()
+            # "12." o "1e" al final del trozo: el número sigue en el siguiente
+            if number is not None and not final and buf[m.end()] in ".eE+-":
+                break
+            pos = m.end()
+            if number is not None:
+                self._value()
+                if self._coords_depth is not None:
+                    self._numbers.append(float(number))
+            elif string is not None:
+                self._string(string)
+            elif punct is not None:
+                self._punct(punct, out)
+            else:
+                self._value()
+        rest = buf[pos:]
+        if final and rest.strip():
+            raise ImportFormatError("Archivo GeoJSON no válido")
+        if len(rest) > _MAX_PENDING_CHARS:
+            raise ImportFormatError("Archivo GeoJSON no válido")
+        self._buf = rest
+        return out
+
+    def _value(self) -> None:
+        if not self._stack:
+            self._seen_root = True
+
+    def _string(self, raw: str) -> None:
+        top = self._stack[-1] if self._stack else None
+        if top is not None and top[0] == "obj" and top[2]:
+            top[1] = raw[1:-1]
+            top[2] = False
+            return
+        self._value()
+        if top is None or top[0] != "obj" or top[1] not in ("name", "description"):
+            return
+        parent = self._stack[-2] if len(self._stack) > 1 else None
+        if parent is None or parent[0] != "obj" or parent[1] != "properties":
+            return
+        text = json.loads(raw).strip() or None
+        if top[1] == "name" and self.name is None:
+            self.name = text
+        elif top[1] == "description" and self.description is None:
+            self.description = text
+
+    def _punct(self, p: str, out: list) -> None:
+        if p == "{":
+            self._value()
+            self._stack.append(["obj", None, True])
+        elif p == "[":
+            self._value()
+            top = self._stack[-1] if self._stack else None
+            if self._coords_depth is None and top is not None and top[0] == "obj" and top[1] == "coordinates":
+                self._coords_depth = len(self._stack)
+            self._stack.append(["arr", None, False])
+        elif p in "]}":
+            if not self._stack or self._stack[-1][0] != ("arr" if p == "]" else "obj"):
+                raise ImportFormatError("Archivo GeoJSON no válido")
+            self._stack.pop()
+            if p == "]" and self._coords_depth is not None:
+                if self._numbers:
+                    # Posición GeoJSON: [lon, lat, (altitud)]
+                    if len(self._numbers) < 2:
+                        raise ImportFormatError("Coordenada GeoJSON incompleta")
+                    out.append(_coord(self._numbers[1], self._numbers[0]))
+                    self._numbers = []
+                if len(self._stack) == self._coords_depth:
+                    self._coords_depth = None
+        elif p == ",":
+            top = self._stack[-1] if self._stack else None
+            if top is not None and top[0] == "obj":
+                top[2] = True
+        # ":" no cambia el estado: la clave ya quedó fijada
+
+
+def _distance_m(a: tuple[float, float], b: tuple[float, float]) -> float:
+    # Equirectangular: suficiente para distancias de pocos metros entre puntos seguidos
+    lat = math.radians((a[0] + b[0]) / 2)
+    dx = math.radians(b[1] - a[1]) * math.cos(lat)
+    dy = math.radians(b[0] - a[0])
+    return _EARTH_RADIUS_M * math.hypot(dx, dy)
+
+
+class Decimator:
+    '''
+    Diezmado en streaming:
+    - `min_distance_m`: descarta puntos a menos de esa distancia del último conservado.
+    - `max_points`: si se supera, se queda con uno de cada dos y duplica el paso, así
+      la lista nunca crece por encima de `max_points` sin conocer el total de antemano.
+    El último punto del track se conserva siempre.
+    '''
+
+    def __init__(self, *, min_distance_m: float = 0.0, max_points: int = 5000) -> None:
+        if max_points < 2:
+            raise ValueError("max_points debe ser >= 2")
+        self.min_distance_m = min_distance_m
+        self.max_points = max_points
+        self.points: list[tuple[float, float]] = []
+        self.total = 0                  # puntos leídos del fichero
+        self._stride = 1
+        self._pending = 0               # aceptados por distancia desde el último guardado
+        self._last_seen: Optional[tuple[float, float]] = None
+        self._last_accepted: Optional[tuple[float, float]] = None
+
+    def add(self, point: tuple[float, float]) -> None:
+        self.total += 1
+        self._last_seen = point
+        if (self.min_distance_m > 0 and self._last_accepted is not None
+                and _distance_m(self._last_accepted, point) < self.min_distance_m):
+            return
+        self._last_accepted = point
+        if self._pending % self._stride == 0:
+            self.points.append(point)
+            if len(self.points) > self.max_points:
+                del self.points[1::2]
+                self._stride *= 2
+                self._pending = 0
+        self._pending += 1
+
+    def extend(self, points) -> None:
+        for p in points:
+            self.add(p)
+
+    def finish(self) -> list[tuple[float, float]]:
+        if self._last_seen is not None and (not self.points or self.points[-1] != self._last_seen):
+            if len(self.points) >= self.max_points:
+                self.points[-1] = self._last_seen
+            else:
+                self.points.append(self._last_seen)
+        return self.points
+
+
+@dataclass
+class ImportedTrack:
+    points: list[dict] = field(default_factory=list)     # formato de Point
+    name: Optional[str] = None
+    description: Optional[str] = None
+    total_points: int = 0                                # antes de diezmar
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    '''
+    "gpx" / "geojson" según la extensión o el Content-Type del fichero subido
+    '''
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith(".gpx") or "gpx" in ctype:
+        return "gpx"
+    if name.endswith((".geojson", ".json")) or "geo+json" in ctype or ctype == "application/json":
+        return "geojson"
+    return None
+
+
+def make_parser(fmt: str):
+    if fmt == "gpx":
+        return GPXParser()
+    if fmt == "geojson":
+        return GeoJSONParser()
+    raise ValueError(f"Formato no soportado: {fmt}")
+
+
+async def import_track(chunks: AsyncIterable[bytes], fmt: str, *,
+                       min_distance_m: float = 0.0, max_points: int = 5000) -> ImportedTrack:
+    '''
+    Consume el fichero trozo a trozo, parsea y diezma a la vez
+    '''
+    parser = make_parser(fmt)
+    decimator = Decimator(min_distance_m=min_distance_m, max_points=max_points)
+    async for chunk in chunks:
+        decimator.extend(parser.feed(chunk))
+    decimator.extend(parser.close())
+    return ImportedTrack(
+        points=[{"latitude": lat, "longitude": lon} for lat, lon in decimator.finish()],
+        name=parser.name,
+        description=parser.description,
+        total_points=decimator.total,
+    )
+
+
+__all__ = [
+    "FORMATS", "ImportFormatError", "GPXParser", "GeoJSONParser", "Decimator",
+    "ImportedTrack", "detect_format", "make_parser", "import_track",
+]
@@ -0,0 +1,180 @@
+'''
+Cálculos de geometría sobre buffers planos de float64 [lat0, lon0, lat1, lon1, ...].
+
+Son funciones puras sin dependencias de la app (ni settings ni Mongo): se ejecutan
+igual en el event loop (entradas pequeñas) que en los procesos de geo/pool.py,
+que solo importan este módulo. En los procesos los buffers llegan por
+`multiprocessing.shared_memory` y `run_shared` los enlaza sin copiarlos.
+
+Con NumPy los bucles van vectorizados; sin él, en Python puro.
+'''
+import math
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional
+
+try:                                    # opcional, como en geo/points.py
+    import numpy as np
+except ImportError:                     # pragma: no cover - depende del entorno
+    np = None
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+class GeometryTaskError(Exception):
+    '''
+    Error de un cálculo dentro del pool (solo el mensaje: la traza retendría los buffers)
+    '''
+
+
+# ============ MEDIDAS ============
+def measure(flat, n: int) -> Optional[dict]:
+    '''
+    Mismo resultado que geo.measure.route_measures
+    '''
+    if n == 0:
+        return None
+    if np is not None:
+        a = np.frombuffer(flat, dtype=np.float64, count=2 * n) if not isinstance(flat, np.ndarray) else flat[:2 * n]
+        lat, lon = a[0::2], a[1::2]
+        length = 0.0
+        if n > 1:
+            p1, p2 = np.radians(lat[:-1]), np.radians(lat[1:])
+            dlat = p2 - p1
+            dlon = np.radians(lon[1:] - lon[:-1])
+            h = np.sin(dlat / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+            length = float(np.sum(2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(h)))))
+        bbox = [float(lat.min()), float(lon.min()), float(lat.max()), float(lon.max())]
+        start = [float(lat[0]), float(lon[0])]
+    else:
+        from backend.geo.measure import route_measures
+        return route_measures((flat[2 * i], flat[2 * i + 1]) for i in range(n))
+    return {"length_m": round(length, 1), "points": n, "bbox": bbox, "start": start}
+
+
+# ============ SIMPLIFICACIÓN (Douglas-Peucker) ============
+def _project(flat, n: int, ref_lat: float):
+    # Equirectangular local en metros: válida a la escala de una ruta
+    k = math.cos(math.radians(ref_lat))
+    if np is not None:
+        a = np.frombuffer(flat, dtype=np.float64, count=2 * n) if not isinstance(flat, np.ndarray) else flat[:2 * n]
+        return np.radians(a[1::2]) * k * EARTH_RADIUS_M, np.radians(a[0::2]) * EARTH_RADIUS_M
+    xs = array("d", (math.radians(flat[2 * i + 1]) * k * EARTH_RADIUS_M for i in range(n)))
+    ys = array("d", (math.radians(flat[2 * i]) * EARTH_RADIUS_M for i in range(n)))
+    return xs, ys
+
+
+def _segment_distances_np(xs, ys, i: int, j: int):
+    px, py = xs[i + 1:j], ys[i + 1:j]
+    ax, ay, bx, by = xs[i], ys[i], xs[j], ys[j]
+    dx, dy = bx - ax, by - ay
+    seg = dx * dx + dy * dy
+    if seg == 0:
+        return np.hypot(px - ax, py - ay)
+    t = np.clip(((px - ax) * dx + (py - ay) * dy) / seg, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def _segment_distance(xs, ys, k: int, i: int, j: int) -> float:
+    ax, ay, bx, by = xs[i], ys[i], xs[j], ys[j]
+    dx, dy = bx - ax, by - ay
+    seg = dx * dx + dy * dy
+    if seg == 0:
+        return math.hypot(xs[k] - ax, ys[k] - ay)
+    t = min(1.0, max(0.0, ((xs[k] - ax) * dx + (ys[k] - ay) * dy) / seg))
+    return math.hypot(xs[k] - (ax + t * dx), ys[k] - (ay + t * dy))
+
+
+def simplify_indices(flat, n: int, tolerance_m: float) -> array:
+    '''
+    Índices de los puntos que conserva Douglas-Peucker con tolerancia en metros
+    (siempre el primero y el último)
+    '''
+    if n <= 2:
+        return array("I", range(n))
+    xs, ys = _project(flat, n, flat[0])
+    keep = bytearray(n)
+    keep[0] = keep[n - 1] = 1
+    stack = [(0, n - 1)]                # iterativo: sin límite de recursión con tracks largos
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        if np is not None:
+            d = _segment_distances_np(xs, ys, i, j)
+            k = int(np.argmax(d))
+            dmax, k = float(d[k]), i + 1 + k
+        else:
+            dmax, k = -1.0, i
+            for m in range(i + 1, j):
+                dist = _segment_distance(xs, ys, m, i, j)
+                if dist > dmax:
+                    dmax, k = dist, m
+        if dmax > tolerance_m:
+            keep[k] = 1
+            stack.append((i, k))
+            stack.append((k, j))
+    return array("I", (i for i in range(n) if keep[i]))
+
+
+# ============ SIMILITUD ============
+def hausdorff_m(flat_a, na: int, flat_b, nb: int) -> float:
+    '''
+    Distancia de Hausdorff simétrica en metros: 0 para trazados idénticos; cuanto
+    menor, más se parecen dos rutas
+    '''
+    if na == 0 or nb == 0:
+        return math.inf
+    ref = flat_a[0]
+    ax, ay = _project(flat_a, na, ref)
+    bx, by = _project(flat_b, nb, ref)
+    return max(_directed(ax, ay, bx, by), _directed(bx, by, ax, ay))
+
+
+def _directed(ax, ay, bx, by) -> float:
+    if np is not None:
+        worst = 0.0
+        for s in range(0, len(ax), 1024):       # bloques: memoria acotada a 1024 x len(b)
+            d = np.hypot(ax[s:s + 1024, None] - bx[None, :], ay[s:s + 1024, None] - by[None, :])
+            worst = max(worst, float(d.min(axis=1).max()))
+        return worst
+    return max(min(math.hypot(x - u, y - v) for u, v in zip(bx, by)) for x, y in zip(ax, ay))
+
+
+KERNELS = {
+    "measure": measure,
+    "simplify": simplify_indices,
+    "hausdorff": hausdorff_m,
+}
+
+
+# ============ ENTRADA EN LOS PROCESOS DEL POOL ============
+def _call(task: str, views: list, counts: list[int], args: tuple):
+    operands = [x for pair in zip(views, counts) for x in pair]
+    return KERNELS[task](*operands, *args)
+
+
+def run_shared(task: str, blocks: list[tuple[str, int]], args: tuple = ()):
+    '''
+    Ejecuta `task` sobre bloques de memoria compartida [(nombre, nº de puntos), ...]
+    creados por el proceso padre, que es quien los libera (unlink)
+    '''
+    attached = [shared_memory.SharedMemory(name=name) for name, _ in blocks]
+    error = None
+    try:
+        views = [shm.buf[:16 * n].cast("d") for shm, (_, n) in zip(attached, blocks)]
+        try:
+            result = _call(task, views, [n for _, n in blocks], args)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        for v in views:
+            v.release()
+    finally:
+        for shm in attached:
+            shm.close()
+    if error is not None:
+        raise GeometryTaskError(error)
+    return result
+
+
+__all__ = ["GeometryTaskError", "KERNELS", "measure", "simplify_indices", "hausdorff_m", "run_shared"]
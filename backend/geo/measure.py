@@ -0,0 +1,63 @@
+'''
+Medidas de una ruta a partir de sus coordenadas: longitud, caja envolvente y punto
+de salida. Reciben pares (lat, lon) en grados en cualquier iterable, sin dicts.
+'''
+import hashlib
+import math
+import sys
+from array import array
+from typing import Iterable, Optional
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def haversine_m(a: tuple[float, float], b: tuple[float, float]) -> float:
+    lat1, lat2 = math.radians(a[0]), math.radians(b[0])
+    dlat = lat2 - lat1
+    dlon = math.radians(b[1] - a[1])
+    h = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def route_measures(coords: Iterable[tuple[float, float]]) -> Optional[dict]:
+    '''
+    {"length_m", "points", "bbox": [min_lat, min_lon, max_lat, max_lon], "start": [lat, lon]}
+    o None si no hay puntos
+    '''
+    length = 0.0
+    count = 0
+    prev = start = None
+    min_lat = min_lon = math.inf
+    max_lat = max_lon = -math.inf
+    for lat, lon in coords:
+        point = (float(lat), float(lon))
+        if prev is None:
+            start = point
+        else:
+            length += haversine_m(prev, point)
+        prev = point
+        count += 1
+        min_lat, max_lat = min(min_lat, point[0]), max(max_lat, point[0])
+        min_lon, max_lon = min(min_lon, point[1]), max(max_lon, point[1])
+    if start is None:
+        return None
+    return {
+        "length_m": round(length, 1),
+        "points": count,
+        "bbox": [min_lat, min_lon, max_lat, max_lon],
+        "start": list(start),
+    }
+
+
+def geometry_hash(flat: array) -> str:
+    '''
+    Huella de la geometría (float64 little-endian [lat, lon, ...]): misma ruta, mismo hash
+    en cualquier máquina. Clave de las cachés que dependen solo de la forma (miniaturas).
+    '''
+    if sys.byteorder != "little":
+        flat = array("d", flat)
+        flat.byteswap()
+    return hashlib.sha256(memoryview(flat).cast("B")).hexdigest()[:32]
+
+
+__all__ = ["EARTH_RADIUS_M", "haversine_m", "route_measures", "geometry_hash"]
@@ -0,0 +1,198 @@
+'''
+Codificación de teselas vectoriales (Mapbox Vector Tile 2.1) sin dependencias.
+
+- Coordenadas "mundo" Web Mercator normalizadas: x, y en [0, 1], y hacia el sur.
+  La tesela (z, x, y) cubre [x, x+1] / 2^z en cada eje.
+- `clip_line` recorta una polilínea (ya en coordenadas de tesela) contra la tesela
+  más un margen: un trazado que sale y vuelve a entrar da varios tramos.
+- `encode_tile` escribe el protobuf a mano (varints, campos delimitados por
+  longitud y geometría con comandos MoveTo/LineTo y deltas en zigzag).
+'''
+import math
+from typing import Iterable, Optional
+
+EXTENT = 4096
+
+# Tipos de geometría del esquema
+LINESTRING = 2
+
+_MOVE_TO = 1
+_LINE_TO = 2
+
+
+# ============ PROYECCIÓN ============
+def world_xy(lat: float, lon: float) -> tuple[float, float]:
+    lat = max(-85.0511, min(85.0511, lat))
+    s = math.sin(math.radians(lat))
+    return (lon + 180.0) / 360.0, 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    '''
+    (min_x, min_y, max_x, max_y) de la tesela en coordenadas mundo
+    '''
+    n = 1 << z
+    return x / n, y / n, (x + 1) / n, (y + 1) / n
+
+
+# ============ RECORTE ============
+def _clip_segment(x0, y0, x1, y1, lo, hi) -> Optional[tuple[float, float, float, float]]:
+    # Liang-Barsky contra el cuadrado [lo, hi]^2
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - lo), (dx, hi - x0), (-dy, y0 - lo), (dy, hi - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        r = q / p
+        if p < 0:
+            if r > t1:
+                return None
+            t0 = max(t0, r)
+        else:
+            if r < t0:
+                return None
+            t1 = min(t1, r)
+    return x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy
+
+
+def clip_line(points: list[tuple[float, float]], lo: float, hi: float) -> list[list[tuple[int, int]]]:
+    '''
+    Tramos de la polilínea dentro de [lo, hi]^2, en enteros y sin puntos repetidos
+    '''
+    parts: list[list[tuple[int, int]]] = []
+    current: list[tuple[int, int]] = []
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        seg = _clip_segment(x0, y0, x1, y1, lo, hi)
+        if seg is None:
+            if len(current) > 1:
+                parts.append(current)
+            current = []
+            continue
+        a = (round(seg[0]), round(seg[1]))
+        b = (round(seg[2]), round(seg[3]))
+        if not current or current[-1] != a:
+            if len(current) > 1:
+                parts.append(current)
+            current = [a]
+        if current[-1] != b:
+            current.append(b)
+        if (seg[2], seg[3]) != (x1, y1):            # sale de la tesela
+            if len(current) > 1:
+                parts.append(current)
+            current = []
+    if len(current) > 1:
+        parts.append(current)
+    return parts
+
+
+# ============ PROTOBUF ============
+def _varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _field(number: int, wire_type: int, out: bytearray) -> None:
+    _varint((number << 3) | wire_type, out)
+
+
+def _bytes_field(number: int, data: bytes, out: bytearray) -> None:
+    _field(number, 2, out)
+    _varint(len(data), out)
+    out += data
+
+
+def _packed(values: Iterable[int]) -> bytes:
+    out = bytearray()
+    for v in values:
+        _varint(v, out)
+    return bytes(out)
+
+
+def line_geometry(parts: list[list[tuple[int, int]]]) -> list[int]:
+    '''
+    Comandos de una (multi)línea: MoveTo + LineTo(n-1) por tramo, deltas en zigzag
+    '''
+    cmds: list[int] = []
+    cx = cy = 0
+    for part in parts:
+        x, y = part[0]
+        cmds += ((1 << 3) | _MOVE_TO, _zigzag(x - cx), _zigzag(y - cy))
+        cx, cy = x, y
+        cmds.append(((len(part) - 1) << 3) | _LINE_TO)
+        for x, y in part[1:]:
+            cmds += (_zigzag(x - cx), _zigzag(y - cy))
+            cx, cy = x, y
+    return cmds
+
+
+def _value(value) -> bytes:
+    out = bytearray()
+    if isinstance(value, bool):
+        _field(7, 0, out)
+        _varint(int(value), out)
+    elif isinstance(value, int):
+        _field(6, 0, out)                           # sint_value
+        _varint(_zigzag(value), out)
+    else:
+        _bytes_field(1, str(value).encode(), out)   # string_value
+    return bytes(out)
+
+
+def encode_layer(name: str, features: list[tuple[dict, list[list[tuple[int, int]]]]],
+                 extent: int = EXTENT) -> bytes:
+    '''
+    Capa con líneas: `features` es [(propiedades, tramos), ...]
+    '''
+    keys: dict[str, int] = {}
+    values: dict[bytes, int] = {}
+    out = bytearray()
+    _bytes_field(1, name.encode(), out)
+    for n, (props, parts) in enumerate(features, start=1):
+        feature = bytearray()
+        _field(1, 0, feature)
+        _varint(n, feature)
+        tags = []
+        for key, value in props.items():
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(_value(value), len(values)))
+        if tags:
+            _bytes_field(2, _packed(tags), feature)
+        _field(3, 0, feature)
+        _varint(LINESTRING, feature)
+        _bytes_field(4, _packed(line_geometry(parts)), feature)
+        _bytes_field(2, bytes(feature), out)
+    for key in keys:
+        _bytes_field(3, key.encode(), out)
+    for value in values:
+        _bytes_field(4, value, out)
+    _field(5, 0, out)
+    _varint(extent, out)
+    _field(15, 0, out)
+    _varint(2, out)                                 # versión del esquema
+    return bytes(out)
+
+
+def encode_tile(layers: dict[str, bytes]) -> bytes:
+    '''
+    Tesela con las capas ya codificadas (sin capas vacías: b"" es una tesela vacía válida)
+    '''
+    out = bytearray()
+    for layer in layers.values():
+        if layer:
+            _bytes_field(3, layer, out)
+    return bytes(out)
+
+
+__all__ = [
+    "EXTENT", "world_xy", "tile_bounds", "clip_line", "line_geometry", "encode_layer", "encode_tile",
+]
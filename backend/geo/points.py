@@ -0,0 +1,173 @@
+'''
+Validación vectorizada de la lista de puntos de una ruta.
+
+Acepta tres formas de entrada:
+- la de siempre: [{"latitude": .., "longitude": ..}, ...] (o modelos Point);
+- compacta por pares: [[lat, lon], ...];
+- compacta plana: [lat, lon, lat, lon, ...].
+
+Las coordenadas se pasan a dos arrays float64 (NumPy si está instalado, si no
+`array("d")`) y se comprueban de una vez: NaN / infinitos, rangos de latitud y
+longitud y número máximo de puntos. En la entrada compacta además se quitan los
+puntos consecutivos repetidos (típico de un GPS parado). El resultado es un
+PointArray: no se construye un modelo Point por punto salvo que alguien lo pida.
+'''
+import math
+from array import array
+from collections.abc import Mapping, Sequence
+
+try:                                    # opcional: sin NumPy se valida en Python puro
+    import numpy as np
+except ImportError:                     # pragma: no cover - depende del entorno
+    np = None
+
+MSG_FORMAT = "Formato de puntos no válido"
+MSG_NOT_FINITE = "Las coordenadas no pueden ser NaN ni infinitas"
+MSG_LATITUDE = "Latitud fuera de rango (-90 a 90)"
+MSG_LONGITUDE = "Longitud fuera de rango (-180 a 180)"
+
+
+def _max_points() -> int:
+    from backend.core.config import settings
+    return settings.ROUTE_MAX_POINTS
+
+
+class PointArray(Sequence):
+    '''
+    Puntos validados como dos arrays paralelos de latitudes y longitudes
+    '''
+    __slots__ = ("lat", "lon")
+
+    def __init__(self, lat, lon) -> None:
+        self.lat = lat
+        self.lon = lon
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PointArray(self.lat[index], self.lon[index])
+        from backend.db.schemas.route import Point
+        return Point(latitude=float(self.lat[index]), longitude=float(self.lon[index]))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PointArray):
+            return self.to_list() == other.to_list()
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self) and all(
+                _as_pair(o) == c for o, c in zip(other, self.coords())
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PointArray({len(self)} puntos)"
+
+    def coords(self):
+        return zip(self.lat.tolist(), self.lon.tolist())
+
+    def to_list(self) -> list[dict]:
+        return [{"latitude": a, "longitude": b} for a, b in self.coords()]
+
+
+def _as_pair(p) -> tuple:
+    if isinstance(p, Mapping):
+        return float(p["latitude"]), float(p["longitude"])
+    if hasattr(p, "latitude"):
+        return float(p.latitude), float(p.longitude)
+    return float(p[0]), float(p[1])
+
+
+def _flatten(value) -> tuple[list, bool]:
+    '''
+    Lista plana [lat, lon, ...] y si la entrada era compacta
+    '''
+    if hasattr(value, "coords"):            # PointArray / PackedPoints
+        return [c for pair in value.coords() for c in pair], False
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(MSG_FORMAT)
+    if not value:
+        return [], False
+    first = value[0]
+    try:
+        if isinstance(first, Mapping):
+            return [c for p in value for c in (p["latitude"], p["longitude"])], False
+        if hasattr(first, "latitude"):
+            return [c for p in value for c in (p.latitude, p.longitude)], False
+        if isinstance(first, (list, tuple)):
+            if any(len(p) != 2 for p in value):
+                raise ValueError(MSG_FORMAT)
+            return [c for p in value for c in p], True
+    except (KeyError, TypeError, AttributeError) as exc:
+        raise ValueError(MSG_FORMAT) from exc
+    if len(value) % 2:
+        raise ValueError(MSG_FORMAT)
+    return list(value), True
+
+
+def _validate_numpy(flat: list, compact: bool) -> PointArray:
+    try:
+        coords = np.asarray(flat, dtype=np.float64).reshape(-1, 2)
+    except (TypeError, ValueError) as exc:
+        raise ValueError(MSG_FORMAT) from exc
+    if not np.isfinite(coords).all():
+        raise ValueError(MSG_NOT_FINITE)
+    lat, lon = coords[:, 0], coords[:, 1]
+    if (np.abs(lat) > 90).any():
+        raise ValueError(MSG_LATITUDE)
+    if (np.abs(lon) > 180).any():
+        raise ValueError(MSG_LONGITUDE)
+    if compact and len(lat) > 1:
+        keep = np.empty(len(lat), dtype=bool)
+        keep[0] = True
+        np.not_equal(lat[1:], lat[:-1], out=keep[1:])
+        keep[1:] |= lon[1:] != lon[:-1]
+        lat, lon = lat[keep], lon[keep]
+    return PointArray(np.ascontiguousarray(lat), np.ascontiguousarray(lon))
+
+
+def _validate_python(flat: list, compact: bool) -> PointArray:
+    try:
+        values = array("d", flat)
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise ValueError(MSG_FORMAT) from exc
+    if not all(map(math.isfinite, values)):
+        raise ValueError(MSG_NOT_FINITE)
+    lat, lon = values[0::2], values[1::2]
+    if any(abs(v) > 90 for v in lat):
+        raise ValueError(MSG_LATITUDE)
+    if any(abs(v) > 180 for v in lon):
+        raise ValueError(MSG_LONGITUDE)
+    if compact and len(lat) > 1:
+        keep = [0] + [i for i in range(1, len(lat)) if lat[i] != lat[i - 1] or lon[i] != lon[i - 1]]
+        lat = array("d", (lat[i] for i in keep))
+        lon = array("d", (lon[i] for i in keep))
+    return PointArray(lat, lon)
+
+
+def count_points(value) -> int:
+    '''
+    Nº de puntos de una entrada sin validar (la forma plana cuenta dos valores por punto)
+    '''
+    if not isinstance(value, (list, tuple)):
+        return 0
+    if value and isinstance(value[0], (int, float)) and not isinstance(value[0], bool):
+        return len(value) // 2
+    return len(value)
+
+
+def validate_points(value) -> PointArray:
+    '''
+    Valida cualquiera de las formas de entrada. Lanza ValueError con el mensaje para la UI.
+    '''
+    if count_points(value) > _max_points():
+        raise ValueError(f"Una ruta no puede tener más de {_max_points()} puntos")
+    flat, compact = _flatten(value)
+    if len(flat) // 2 > _max_points():
+        raise ValueError(f"Una ruta no puede tener más de {_max_points()} puntos")
+    if np is not None:
+        return _validate_numpy(flat, compact)
+    return _validate_python(flat, compact)
+
+
+__all__ = ["PointArray", "count_points", "validate_points"]
@@ -0,0 +1,210 @@
+'''
+Pool de procesos para los cálculos de geometría pesados (geo/kernels.py).
+
+Medir, simplificar o comparar un track de cientos de miles de puntos en el event
+loop bloquea todas las peticiones del worker. Este servicio los manda a un
+ProcessPoolExecutor propio:
+
+- Los puntos viajan como un bloque de `multiprocessing.shared_memory` con float64
+  intercalados [lat, lon, ...]: el proceso hijo los lee sin deserializar nada (no se
+  picklea una lista de dicts). Solo vuelve el resultado (pequeño). El padre crea y
+  libera (unlink) cada bloque.
+- Entradas con menos de GEOMETRY_POOL_MIN_POINTS puntos se calculan en línea: crear
+  el bloque y cruzar de proceso cuesta más que el cálculo.
+- Tamaño: GEOMETRY_POOL_WORKERS procesos por worker web (python -m backend.server lo
+  ajusta a núcleos / workers); 0 desactiva el pool y todo va en línea.
+- Los procesos se crean con "forkserver" (no se hace fork de un proceso con los
+  hilos de Motor) y solo importan geo/kernels.py.
+- Si un proceso muere (BrokenProcessPool) el pool se recrea y la tarea se calcula en línea.
+
+API tipada: `measure`, `simplify` y `hausdorff_m` aceptan PointArray, PackedPoints,
+listas de dicts, de pares o planas.
+'''
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.geo import kernels
+
+logger = logging.getLogger(__name__)
+
+INLINE = "inline"
+POOL = "pool"
+
+
+def flatten(points) -> array:
+    '''
+    Cualquier forma de puntos -> array("d") [lat0, lon0, lat1, lon1, ...]
+    '''
+    if isinstance(points, array) and points.typecode == "d":
+        return points
+    out = array("d")
+    if hasattr(points, "lat") and hasattr(points, "lon"):          # PointArray
+        if kernels.np is not None:
+            flat = kernels.np.empty(2 * len(points.lat), dtype=kernels.np.float64)
+            flat[0::2], flat[1::2] = points.lat, points.lon
+            out.frombytes(flat.tobytes())
+            return out
+        for lat, lon in zip(points.lat, points.lon):
+            out.append(lat)
+            out.append(lon)
+        return out
+    if hasattr(points, "coords"):                                   # PackedPoints
+        for lat, lon in points.coords():
+            out.append(lat)
+            out.append(lon)
+        return out
+    for p in points:
+        if isinstance(p, dict):
+            out.append(float(p["latitude"]))
+            out.append(float(p["longitude"]))
+        elif isinstance(p, (list, tuple)):
+            out.append(float(p[0]))
+            out.append(float(p[1]))
+        else:                                                       # lista plana
+            out.append(float(p))
+    return out
+
+
+def _context():
+    method = "forkserver" if sys.platform.startswith("linux") else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def default_workers() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)) // 2)
+    except AttributeError:              # macOS / Windows
+        return max(1, (os.cpu_count() or 2) // 2)
+
+
+class GeometryPool:
+    '''
+    Servicio de cálculo de geometría: en línea o en procesos según el tamaño
+    '''
+
+    def __init__(self, *, workers: int, min_points: int) -> None:
+        self.workers = workers
+        self.min_points = min_points
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.tasks = {(task, mode): 0 for task in kernels.KERNELS for mode in (INLINE, POOL)}
+        self.seconds = {mode: 0.0 for mode in (INLINE, POOL)}
+        self.broken = 0
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+        return self._executor
+
+    def _inline(self, task: str, buffers: list[array], args: tuple):
+        operands = [x for buf in buffers for x in (buf, len(buf) // 2)]
+        return kernels.KERNELS[task](*operands, *args)
+
+    async def _submit(self, pool: ProcessPoolExecutor, task: str, buffers: list[array], args: tuple):
+        blocks: list[shared_memory.SharedMemory] = []
+        try:
+            for buf in buffers:
+                size = max(1, len(buf) * buf.itemsize)
+                shm = shared_memory.SharedMemory(create=True, size=size)
+                blocks.append(shm)
+                shm.buf[:len(buf) * buf.itemsize] = memoryview(buf).cast("B")
+            specs = [(shm.name, len(buf) // 2) for shm, buf in zip(blocks, buffers)]
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, kernels.run_shared, task, specs, args)
+        finally:
+            # Si la petición se cancela el hijo puede seguir leyendo: unlink solo quita el
+            # nombre, la memoria se libera cuando el último proceso la cierra
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    async def run(self, task: str, *points, args: tuple = ()) -> Any:
+        buffers = [flatten(p) for p in points]
+        size = max((len(b) // 2 for b in buffers), default=0)
+        pool = self._pool() if size >= self.min_points else None
+        mode = POOL if pool is not None else INLINE
+        started = time.perf_counter()
+        self.in_flight += 1
+        try:
+            if pool is None:
+                return self._inline(task, buffers, args)
+            try:
+                return await self._submit(pool, task, buffers, args)
+            except BrokenProcessPool:
+                logger.exception("Pool de geometría roto; se recrea y la tarea se calcula en línea")
+                self.broken += 1
+                self._executor = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                mode = INLINE
+                return self._inline(task, buffers, args)
+        finally:
+            self.in_flight -= 1
+            self.tasks[(task, mode)] += 1
+            self.seconds[mode] += time.perf_counter() - started
+
+    # ---- API tipada ----
+    async def measure(self, points) -> Optional[dict]:
+        '''
+        Longitud (m), nº de puntos, caja envolvente y punto de salida
+        '''
+        return await self.run("measure", points)
+
+    async def simplify(self, points, tolerance_m: float) -> list[tuple[float, float]]:
+        '''
+        Douglas-Peucker: pares (lat, lon) que quedan con esa tolerancia en metros
+        '''
+        flat = flatten(points)
+        keep = await self.run("simplify", flat, args=(tolerance_m,))
+        return [(flat[2 * i], flat[2 * i + 1]) for i in keep]
+
+    async def hausdorff_m(self, a, b) -> float:
+        '''
+        Parecido entre dos trazados: distancia de Hausdorff en metros
+        '''
+        return await self.run("hausdorff", a, b)
+
+    # ---- Ciclo de vida ----
+    async def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def samples(self) -> list[metrics.Sample]:
+        out = [
+            metrics.Sample("rex_geometry_pool_workers", self.workers, "gauge", "Procesos del pool de geometría"),
+            metrics.Sample("rex_geometry_in_flight", self.in_flight, "gauge", "Cálculos de geometría en curso"),
+            metrics.Sample("rex_geometry_pool_broken_total", self.broken, "counter",
+                           "Veces que se ha recreado el pool tras morir un proceso"),
+        ]
+        for (task, mode), count in self.tasks.items():
+            out.append(metrics.Sample("rex_geometry_tasks_total", count, "counter",
+                                      "Cálculos de geometría por tarea y modo", {"task": task, "mode": mode}))
+        for mode, seconds in self.seconds.items():
+            out.append(metrics.Sample("rex_geometry_seconds_total", seconds, "counter",
+                                      "Tiempo total de los cálculos", {"mode": mode}))
+        return out
+
+
+# Instancia del proceso (main.py la para en el shutdown)
+geometry_pool = GeometryPool(
+    workers=default_workers() if settings.GEOMETRY_POOL_WORKERS is None else settings.GEOMETRY_POOL_WORKERS,
+    min_points=settings.GEOMETRY_POOL_MIN_POINTS,
+)
+
+metrics.register("geometry_pool", geometry_pool.samples)
+
+
+__all__ = ["GeometryPool", "geometry_pool", "flatten", "INLINE", "POOL"]
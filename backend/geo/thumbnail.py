@@ -0,0 +1,268 @@
+'''
+Miniaturas PNG de una ruta, dibujadas en el servidor sin servidor de teselas.
+
+- Proyección Web Mercator encajada en un lienzo cuadrado con margen.
+- El trazado se simplifica antes (Douglas-Peucker a medio píxel, en el pool de
+  geometría si es grande): una miniatura de 256 px no necesita 100 000 puntos.
+- Línea con halo blanco, punto de salida verde y de llegada rojo. Se pinta por
+  tramos horizontales (asignación de slices) sobre un bytearray de índices de paleta
+  y se codifica como PNG de paleta (1 byte por píxel, zlib): unos pocos KB.
+
+Caché en disco direccionada por contenido: el nombre del fichero es el hash de la
+geometría + tamaño + versión del estilo, así que nunca hay que invalidarla (una
+geometría distinta es otro fichero). Se escribe de forma atómica (fichero temporal
++ os.replace) y se recorta por antigüedad al superar THUMBNAIL_CACHE_MAX_BYTES.
+'''
+import asyncio
+import math
+import os
+import struct
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.geo.measure import geometry_hash
+from backend.geo.pool import flatten, geometry_pool
+
+# Cambiar si cambia el dibujo: las miniaturas viejas dejan de usarse
+STYLE_VERSION = 1
+
+# Paleta: fondo, halo, línea, salida, llegada
+_PALETTE = bytes([
+    0xF3, 0xF1, 0xEC,
+    0xFF, 0xFF, 0xFF,
+    0x25, 0x63, 0xEB,
+    0x16, 0xA3, 0x4A,
+    0xDC, 0x26, 0x26,
+])
+BACKGROUND, HALO, LINE, START, END = range(5)
+
+
+# ============ DIBUJO ============
+def _mercator(lat: float, lon: float) -> tuple[float, float]:
+    lat = max(-85.0511, min(85.0511, lat))
+    return math.radians(lon), math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+def fit(flat, size: int, padding: int) -> list[tuple[float, float]]:
+    '''
+    Coordenadas de píxel de cada punto, centradas y con la misma escala en x e y
+    '''
+    projected = [_mercator(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]
+    xs = [p[0] for p in projected]
+    ys = [p[1] for p in projected]
+    min_x, max_x, min_y, max_y = min(xs), max(xs), min(ys), max(ys)
+    span = max(max_x - min_x, max_y - min_y)
+    inner = size - 2 * padding
+    scale = inner / span if span > 0 else 0.0
+    off_x = padding + (inner - (max_x - min_x) * scale) / 2
+    off_y = padding + (inner - (max_y - min_y) * scale) / 2
+    # y de píxel hacia abajo: norte arriba
+    return [(off_x + (x - min_x) * scale, off_y + (max_y - y) * scale) for x, y in projected]
+
+
+class Canvas:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.pixels = bytearray(size * size)        # todo BACKGROUND (0)
+
+    def disc(self, cx: float, cy: float, radius: int, color: int) -> None:
+        size = self.size
+        cx, cy = int(round(cx)), int(round(cy))
+        fill = bytes([color])
+        for dy in range(-radius, radius + 1):
+            y = cy + dy
+            if not 0 <= y < size:
+                continue
+            half = int(math.sqrt(radius * radius - dy * dy + radius))     # disco algo redondeado
+            x0, x1 = max(0, cx - half), min(size, cx + half + 1)
+            if x0 < x1:
+                row = y * size
+                self.pixels[row + x0:row + x1] = fill * (x1 - x0)
+
+    def polyline(self, points: list[tuple[float, float]], radius: int, color: int) -> None:
+        if len(points) == 1:
+            self.disc(*points[0], radius, color)
+            return
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            steps = max(1, int(max(abs(x1 - x0), abs(y1 - y0))))
+            for s in range(steps + 1):
+                t = s / steps
+                self.disc(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t, radius, color)
+
+    def png(self) -> bytes:
+        size = self.size
+        raw = bytearray()
+        for y in range(size):
+            raw.append(0)                           # filtro "None" por fila
+            raw += self.pixels[y * size:(y + 1) * size]
+        return b"".join((
+            b"\x89PNG\r\n\x1a\n",
+            _chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 3, 0, 0, 0)),
+            _chunk(b"PLTE", _PALETTE),
+            _chunk(b"IDAT", zlib.compress(bytes(raw), 9)),
+            _chunk(b"IEND", b""),
+        ))
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def render_png(flat, size: int) -> bytes:
+    '''
+    PNG cuadrado de `size` px con el trazado `flat` ([lat, lon, ...], ya simplificado)
+    '''
+    canvas = Canvas(size)
+    if len(flat) >= 2:
+        width = max(1, size // 96)
+        pixels = fit(flat, size, padding=max(4, size // 12))
+        canvas.polyline(pixels, width + 1, HALO)
+        canvas.polyline(pixels, width, LINE)
+        canvas.disc(*pixels[-1], width * 2 + 1, END)
+        canvas.disc(*pixels[0], width * 2 + 1, START)
+    return canvas.png()
+
+
+def simplify_tolerance_m(flat, size: int) -> float:
+    '''
+    Medio píxel en metros: lo que Douglas-Peucker puede quitar sin que se note
+    '''
+    lats, lons = flat[0::2], flat[1::2]
+    mid = math.radians((max(lats) + min(lats)) / 2)
+    extent_m = max(
+        (max(lats) - min(lats)) * 111_320,
+        (max(lons) - min(lons)) * 111_320 * math.cos(mid),
+    )
+    return 0.5 * extent_m / size if extent_m > 0 else 0.0
+
+
+# ============ CACHÉ EN DISCO ============
+class ThumbnailCache:
+    '''
+    PNGs en `directory/<2 primeros caracteres>/<hash>-<size>-v<estilo>.png`
+    '''
+
+    def __init__(self, directory: Path, *, max_bytes: int, prune_every: int = 100) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, geometry_hash: str, size: int) -> Path:
+        return self.directory / geometry_hash[:2] / f"{geometry_hash}-{size}-v{STYLE_VERSION}.png"
+
+    def get(self, geometry_hash: str, size: int) -> Optional[bytes]:
+        try:
+            data = self.path(geometry_hash, size).read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, geometry_hash: str, size: int, data: bytes) -> None:
+        target = self.path(geometry_hash, size)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, target)                 # atómico: nadie lee un PNG a medias
+        except OSError:
+            return                                  # sin disco la miniatura se sirve igual
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        '''
+        Borra las más antiguas hasta quedar por debajo de max_bytes; devuelve cuántas
+        '''
+        files = []
+        for path in self.directory.glob("*/*.png"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(f[1] for f in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+# ============ SERVICIO ============
+class Thumbnails:
+    '''
+    Miniatura de unos puntos: de la caché en disco o dibujada (y guardada)
+    '''
+
+    def __init__(self, cache: ThumbnailCache) -> None:
+        self.cache = cache
+        self.renders = 0
+
+    async def cached(self, digest: str, size: int) -> Optional[bytes]:
+        '''
+        PNG ya dibujado para ese hash de geometría, sin tocar los puntos
+        '''
+        return await asyncio.to_thread(self.cache.get, digest, size)
+
+    async def render(self, points, size: int, digest: str) -> bytes:
+        '''
+        Dibuja la miniatura y la guarda en la caché en disco
+        '''
+        flat = flatten(points)
+        if len(flat) >= 6:
+            tolerance = simplify_tolerance_m(flat, size)
+            flat = flatten(await geometry_pool.simplify(flat, tolerance))
+        data = await asyncio.to_thread(render_png, flat, size)
+        self.renders += 1
+        await asyncio.to_thread(self.cache.put, digest, size, data)
+        return data
+
+    async def png(self, points, size: int, known_hash: Optional[str] = None) -> tuple[str, bytes]:
+        '''
+        (hash de la geometría, PNG). `known_hash` evita recalcularlo si ya se tiene
+        '''
+        flat = flatten(points)
+        digest = known_hash or geometry_hash(flat)
+        data = await self.cached(digest, size)
+        if data is None:
+            data = await self.render(flat, size, digest)
+        return digest, data
+
+    def samples(self) -> list[metrics.Sample]:
+        return [
+            metrics.Sample("rex_thumbnail_cache_hits_total", self.cache.hits, "counter",
+                           "Miniaturas servidas desde la caché en disco"),
+            metrics.Sample("rex_thumbnail_cache_misses_total", self.cache.misses, "counter",
+                           "Miniaturas que no estaban en la caché en disco"),
+            metrics.Sample("rex_thumbnail_renders_total", self.renders, "counter",
+                           "Miniaturas dibujadas"),
+        ]
+
+
+# Instancia del proceso; la caché en disco la comparten todos los workers
+thumbnails = Thumbnails(ThumbnailCache(
+    Path(settings.THUMBNAIL_CACHE_DIR or Path(tempfile.gettempdir()) / "rex-thumbnails"),
+    max_bytes=settings.THUMBNAIL_CACHE_MAX_BYTES,
+))
+
+metrics.register("thumbnails", thumbnails.samples)
+
+
+__all__ = ["STYLE_VERSION", "render_png", "simplify_tolerance_m", "ThumbnailCache", "Thumbnails", "thumbnails"]
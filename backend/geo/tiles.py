@@ -0,0 +1,241 @@
+'''
+Teselas vectoriales de las rutas públicas (GET /tiles/routes/{z}/{x}/{y}.mvt).
+
+El mapa de Explorar ya no descarga todos los trazados completos: pide las teselas
+de su vista y cada una lleva solo los tramos que caen dentro, simplificados para
+su zoom.
+
+- `RouteTiles.sync(docs)` recibe las rutas públicas (la foto del catálogo en
+  memoria, db/catalog.py) y compara con la anterior por _id y versión. Solo las
+  rutas nuevas, cambiadas o desaparecidas invalidan teselas, y solo las que
+  tocan su caja envolvente (con la de antes y la de ahora).
+- Por ruta se guarda el trazado en coordenadas mundo y, por zoom y bajo demanda,
+  los índices que conserva Douglas-Peucker a medio píxel de tesela
+  (geo/kernels.simplify_indices, vectorizado con NumPy).
+- Caché LRU por (z, x, y) acotada en entradas y bytes.
+'''
+import asyncio
+import math
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.etag import document_version
+from backend.geo import kernels, mvt
+from backend.geo.pool import flatten
+
+LAYER = "routes"
+_EQUATOR_M = 2 * math.pi * kernels.EARTH_RADIUS_M
+
+
+@dataclass
+class RouteGeometry:
+    '''
+    Trazado de una ruta pública listo para cortar en teselas
+    '''
+    id: str
+    properties: dict
+    flat: object                        # array("d") [lat, lon, ...]
+    xs: list[float]                     # coordenadas mundo
+    ys: list[float]
+    bbox: tuple[float, float, float, float]
+    levels: dict = field(default_factory=dict)     # zoom -> índices conservados
+
+    def at_zoom(self, z: int, extent: int) -> list[int]:
+        keep = self.levels.get(z)
+        if keep is None:
+            # Medio píxel de tesela en metros (escala de Mercator en la latitud de salida)
+            tolerance = 0.5 * _EQUATOR_M * math.cos(math.radians(self.flat[0])) / (extent << z)
+            keep = self.levels[z] = kernels.simplify_indices(self.flat, len(self.xs), tolerance)
+        return keep
+
+
+def route_geometry(doc: dict) -> Optional[RouteGeometry]:
+    flat = flatten(doc.get("points") or [])
+    if len(flat) < 4:
+        return None                     # un punto no es una línea
+    xs, ys = [], []
+    for i in range(0, len(flat), 2):
+        x, y = mvt.world_xy(flat[i], flat[i + 1])
+        xs.append(x)
+        ys.append(y)
+    props = {"id": str(doc["_id"]), "name": doc.get("name"), "category": doc.get("category")}
+    return RouteGeometry(props["id"], props, flat, xs, ys, (min(xs), min(ys), max(xs), max(ys)))
+
+
+def _signature(doc: dict):
+    return document_version(doc), doc.get("name"), doc.get("category")
+
+
+def _intersects(a, b) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class TileCache:
+    '''
+    LRU de teselas codificadas por (z, x, y)
+    '''
+
+    def __init__(self, *, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._tiles: OrderedDict[tuple[int, int, int], bytes] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, key: tuple[int, int, int]) -> Optional[bytes]:
+        data = self._tiles.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._tiles.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: tuple[int, int, int], data: bytes) -> None:
+        old = self._tiles.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self._tiles[key] = data
+        self.bytes += len(data)
+        while self._tiles and (len(self._tiles) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self._tiles.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def invalidate(self, bbox: tuple[float, float, float, float], margin: float) -> int:
+        '''
+        Borra las teselas que tocan `bbox` (coordenadas mundo; `margin` en fracción de tesela)
+        '''
+        gone = []
+        for key in self._tiles:
+            z, x, y = key
+            n = 1 << z
+            pad = margin / n
+            if _intersects(bbox, (x / n - pad, y / n - pad, (x + 1) / n + pad, (y + 1) / n + pad)):
+                gone.append(key)
+        for key in gone:
+            self.bytes -= len(self._tiles.pop(key))
+        self.invalidated += len(gone)
+        return len(gone)
+
+    def clear(self) -> None:
+        self.invalidated += len(self._tiles)
+        self._tiles.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+
+class RouteTiles:
+    '''
+    Índice de trazados públicos + caché de teselas
+    '''
+
+    def __init__(self, cache: TileCache, *, extent: int = mvt.EXTENT, buffer: int = 64) -> None:
+        self.cache = cache
+        self.extent = extent
+        self.buffer = buffer
+        self._source = None
+        self._signatures: dict[str, tuple] = {}
+        self._routes: dict[str, RouteGeometry] = {}
+        self._generation = 0            # sube con cada cambio: una tesela a medias no se guarda
+        self._lock = asyncio.Lock()
+        self.renders = 0
+
+    # ---- Sincronización con el catálogo ----
+    async def sync(self, docs: Iterable[dict], source=None) -> int:
+        '''
+        Aplica las rutas públicas actuales; devuelve cuántas han cambiado.
+        `source` (p. ej. la foto del catálogo) evita repetir la comparación.
+        '''
+        if source is not None and source is self._source:
+            return 0
+        async with self._lock:
+            if source is not None and source is self._source:
+                return 0
+            docs = list(docs)
+            seen = {str(d["_id"]): _signature(d) for d in docs}
+            changed = [d for d in docs if self._signatures.get(str(d["_id"])) != seen[str(d["_id"])]]
+            removed = self._signatures.keys() - seen.keys()
+            # Proyectar trazados nuevos es O(puntos): fuera del event loop
+            geoms = await asyncio.to_thread(lambda: [route_geometry(d) for d in changed]) if changed else []
+
+            margin = self.buffer / self.extent
+            for route_id in removed | {str(d["_id"]) for d in changed}:
+                old = self._routes.pop(route_id, None)
+                if old is not None:
+                    self.cache.invalidate(old.bbox, margin)
+            for geom in geoms:
+                if geom is not None:
+                    self._routes[geom.id] = geom
+                    self.cache.invalidate(geom.bbox, margin)
+            self._signatures = seen
+            self._source = source
+            if changed or removed:
+                self._generation += 1
+            return len(changed) + len(removed)
+
+    # ---- Teselas ----
+    async def tile(self, z: int, x: int, y: int) -> bytes:
+        data = self.cache.get((z, x, y))
+        if data is not None:
+            return data
+        generation = self._generation
+        data = await asyncio.to_thread(self.render, z, x, y, tuple(self._routes.values()))
+        if generation == self._generation:
+            self.cache.put((z, x, y), data)
+        return data
+
+    def render(self, z: int, x: int, y: int, routes: Optional[tuple] = None) -> bytes:
+        '''
+        Codifica la tesela (sin tocar la caché ni el índice: se ejecuta en un hilo)
+        '''
+        if routes is None:
+            routes = tuple(self._routes.values())
+        n, extent = 1 << z, self.extent
+        pad = self.buffer / extent / n
+        bounds = mvt.tile_bounds(z, x, y)
+        window = (bounds[0] - pad, bounds[1] - pad, bounds[2] + pad, bounds[3] + pad)
+        features = []
+        for geom in routes:
+            if not _intersects(geom.bbox, window):
+                continue
+            xs, ys = geom.xs, geom.ys
+            points = [((xs[i] * n - x) * extent, (ys[i] * n - y) * extent)
+                      for i in geom.at_zoom(z, extent)]
+            parts = mvt.clip_line(points, -self.buffer, extent + self.buffer)
+            if parts:
+                features.append((geom.properties, parts))
+        data = mvt.encode_tile({LAYER: mvt.encode_layer(LAYER, features, extent)} if features else {})
+        self.renders += 1
+        return data
+
+    def samples(self) -> list[metrics.Sample]:
+        return [
+            metrics.Sample("rex_tiles_routes", len(self._routes), "gauge", "Trazados públicos en el índice de teselas"),
+            metrics.Sample("rex_tiles_cached", len(self.cache), "gauge", "Teselas en caché"),
+            metrics.Sample("rex_tiles_cache_bytes", self.cache.bytes, "gauge", "Bytes de teselas en caché"),
+            metrics.Sample("rex_tiles_cache_hits_total", self.cache.hits, "counter", "Teselas servidas desde la caché"),
+            metrics.Sample("rex_tiles_cache_misses_total", self.cache.misses, "counter", "Teselas que no estaban en caché"),
+            metrics.Sample("rex_tiles_invalidated_total", self.cache.invalidated, "counter",
+                           "Teselas invalidadas por cambios en rutas públicas"),
+            metrics.Sample("rex_tiles_renders_total", self.renders, "counter", "Teselas codificadas"),
+        ]
+
+
+# Instancia del proceso
+route_tiles = RouteTiles(
+    TileCache(max_entries=settings.TILES_CACHE_MAX_ENTRIES, max_bytes=settings.TILES_CACHE_MAX_BYTES),
+    extent=settings.TILES_EXTENT,
+    buffer=settings.TILES_BUFFER,
+)
+
+metrics.register("tiles", route_tiles.samples)
+
+
+__all__ = ["LAYER", "RouteGeometry", "RouteTiles", "TileCache", "route_geometry", "route_tiles"]
@@ -0,0 +1,50 @@
+'''
+Trabajos que siguen a la creación de una ruta. Los endpoints solo encolan
+(`enqueue_route_jobs`); el ejecutor del proceso (jobs/runner.py) los corre después.
+
+- route.metrics: longitud, caja envolvente, punto de salida y hash de la geometría
+  -> campo `measures` (en el pool de procesos de geometría si el track es grande).
+  El hash permite responder 304 a las miniaturas sin leer los puntos.
+'''
+from bson.errors import InvalidId
+
+from backend.db.models import route as route_crud
+from backend.geo.measure import geometry_hash
+from backend.geo.pool import flatten, geometry_pool
+from backend.jobs.runner import enqueue_job, enqueue_jobs, job_handler
+
+ROUTE_METRICS = "route.metrics"
+
+
+@job_handler(ROUTE_METRICS)
+async def compute_route_metrics(payload: dict) -> None:
+    try:
+        route = await route_crud.get_route_by_id(payload["route_id"])
+    except InvalidId:
+        return
+    if route is None:
+        return                          # borrada antes de procesarse: nada que hacer
+    flat = flatten(route.get("points") or [])
+    measures = await geometry_pool.measure(flat)
+    if measures is not None:
+        measures["geometry_hash"] = geometry_hash(flat)
+        await route_crud.set_route_measures(payload["route_id"], measures)
+
+
+async def enqueue_route_jobs(route_id) -> None:
+    '''
+    Trabajo posterior a crear (o reimportar) una ruta; idempotente por ruta
+    '''
+    route_id = str(route_id)
+    await enqueue_job(ROUTE_METRICS, {"route_id": route_id}, dedupe_key=f"{ROUTE_METRICS}:{route_id}")
+
+
+async def enqueue_bulk_route_jobs(route_ids) -> None:
+    '''
+    Lo mismo para un lote de rutas (POST /routes/bulk) con una sola escritura
+    '''
+    ids = [str(route_id) for route_id in route_ids]
+    await enqueue_jobs(ROUTE_METRICS, [({"route_id": i}, f"{ROUTE_METRICS}:{i}") for i in ids])
+
+
+__all__ = ["ROUTE_METRICS", "compute_route_metrics", "enqueue_route_jobs", "enqueue_bulk_route_jobs"]
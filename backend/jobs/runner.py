@@ -0,0 +1,325 @@
+'''
+Ejecutor de trabajos en segundo plano dentro del propio proceso (asyncio).
+
+Para el trabajo caro que sigue a una escritura (métricas de la ruta, simplificación,
+miniaturas...) sin alargar la respuesta: el endpoint encola y responde; cada worker
+de la app reclama trabajos del almacén (jobs/stores.py) y los ejecuta.
+
+- Concurrencia: como mucho JOBS_CONCURRENCY trabajos a la vez por worker.
+- Reintentos: un handler que lanza excepción se reintenta con backoff exponencial
+  (JOBS_BACKOFF_BASE_SECONDS * 2^(intento-1), tope JOBS_BACKOFF_MAX_SECONDS, con
+  jitter) hasta `max_attempts`; después queda `failed` con el último error.
+- Lease: un trabajo no puede durar más que JOBS_LEASE_SECONDS; si el worker muere
+  a medias, al vencer el lease otro lo vuelve a reclamar. Los handlers deben ser
+  idempotentes (entrega "al menos una vez").
+- Deduplicación: `dedupe_key` (p. ej. "route.metrics:<id>") evita encolar dos veces
+  el mismo trabajo mientras sigue pendiente.
+
+Uso desde cualquier router:
+
+    from backend.jobs.runner import enqueue_job, job_handler
+
+    @job_handler("route.metrics")
+    async def compute(payload: dict) -> None: ...
+
+    await enqueue_job("route.metrics", {"route_id": rid}, dedupe_key=f"route.metrics:{rid}")
+'''
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from pymongo.errors import PyMongoError
+
+from backend.core import metrics
+from backend.core.config import settings
+from backend.jobs.stores import make_store
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class _Registered:
+    handler: Handler
+    max_attempts: Optional[int]
+
+
+class _Counters:
+    def __init__(self) -> None:
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+
+class JobRunner:
+    '''
+    Bucle que reclama trabajos del almacén y los ejecuta con concurrencia limitada
+    '''
+
+    def __init__(self, store, *, concurrency: int, poll_interval: float, lease_seconds: float,
+                 max_attempts: int, backoff_base: float, backoff_max: float, drain_seconds: float,
+                 rng: Callable[[], float] = random.random) -> None:
+        self.store = store
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.drain_seconds = drain_seconds
+        self._rng = rng
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: dict[str, _Registered] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: set[asyncio.Task] = set()
+        self._stats: dict[str, _Counters] = {}
+        self.queue_depth = 0
+
+    # ---- Registro y encolado ----
+    def handler(self, name: str, *, max_attempts: Optional[int] = None) -> Callable[[Handler], Handler]:
+        '''
+        Decorador: registra la corrutina que ejecuta los trabajos `name`
+        '''
+        def decorator(fn: Handler) -> Handler:
+            self._handlers[name] = _Registered(fn, max_attempts)
+            return fn
+        return decorator
+
+    def _counters(self, name: str) -> _Counters:
+        return self._stats.setdefault(name, _Counters())
+
+    async def enqueue(self, name: str, payload: Optional[dict] = None, *,
+                      dedupe_key: Optional[str] = None, delay: float = 0.0,
+                      max_attempts: Optional[int] = None) -> str:
+        registered = self._handlers.get(name)
+        attempts = max_attempts or (registered and registered.max_attempts) or self.max_attempts
+        job_id, created = await self.store.add(name, payload or {}, dedupe_key=dedupe_key,
+                                               max_attempts=attempts, delay=delay)
+        counters = self._counters(name)
+        if created:
+            counters.enqueued += 1
+            self._wake.set()
+        else:
+            counters.deduplicated += 1
+        return job_id
+
+    async def enqueue_many(self, name: str, jobs: list[tuple[dict, Optional[str]]], *,
+                           delay: float = 0.0, max_attempts: Optional[int] = None) -> int:
+        '''
+        Varios trabajos [(payload, dedupe_key)] en una sola escritura; devuelve cuántos son nuevos
+        '''
+        registered = self._handlers.get(name)
+        attempts = max_attempts or (registered and registered.max_attempts) or self.max_attempts
+        created, deduplicated = await self.store.add_many(name, jobs, max_attempts=attempts, delay=delay)
+        counters = self._counters(name)
+        counters.enqueued += created
+        counters.deduplicated += deduplicated
+        if created:
+            self._wake.set()
+        return created
+
+    # ---- Ejecución ----
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(0, attempt - 1))
+        return delay * (0.5 + self._rng() / 2)
+
+    async def _execute(self, job: dict) -> None:
+        name = job["name"]
+        counters = self._counters(name)
+        registered = self._handlers.get(name)
+        if registered is None:
+            counters.failed += 1
+            await self.store.fail(job, f"Sin handler para '{name}'")
+            return
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.lease_seconds):
+                await registered.handler(job.get("payload") or {})
+        except asyncio.CancelledError:
+            # Parada del worker: vuelve a la cola sin gastar un intento
+            await asyncio.shield(self.store.reschedule(job, delay=0, count_attempt=False))
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if job["attempts"] >= job.get("max_attempts", self.max_attempts):
+                counters.failed += 1
+                logger.error("Trabajo %s (%s) fallido tras %s intentos: %s",
+                             name, job["_id"], job["attempts"], error)
+                await self.store.fail(job, error)
+            else:
+                counters.retried += 1
+                delay = self.backoff(job["attempts"])
+                logger.warning("Trabajo %s (%s) falló (intento %s), reintento en %.1fs: %s",
+                               name, job["_id"], job["attempts"], delay, error)
+                await self.store.reschedule(job, delay=delay, error=error)
+        else:
+            counters.succeeded += 1
+            await self.store.complete(job)
+        finally:
+            counters.seconds += time.monotonic() - started
+
+    async def _execute_logged(self, job: dict) -> None:
+        try:
+            await self._execute(job)
+        except PyMongoError:
+            # No se pudo anotar el resultado: al vencer el lease se volverá a ejecutar
+            logger.exception("No se pudo actualizar el trabajo %s (%s)", job["name"], job["_id"])
+
+    async def run_once(self) -> bool:
+        '''
+        Reclama y ejecuta un trabajo (en esta corrutina); False si no había ninguno listo
+        '''
+        job = await self.store.claim(lease_seconds=self.lease_seconds, worker=self.worker_id)
+        if job is None:
+            return False
+        await self._execute(job)
+        return True
+
+    async def run_until_idle(self) -> int:
+        '''
+        Ejecuta trabajos hasta vaciar la cola de los que ya están listos (tests, scripts)
+        '''
+        done = 0
+        while await self.run_once():
+            done += 1
+        return done
+
+    async def _run(self) -> None:
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            self._wake.clear()          # antes de reclamar: un encolado posterior despierta el bucle
+            try:
+                job = await self.store.claim(lease_seconds=self.lease_seconds, worker=self.worker_id)
+            except PyMongoError:
+                logger.warning("No se pudo reclamar un trabajo; reintentando", exc_info=True)
+                job = None
+            if job is None:
+                slots.release()
+                await self._idle()
+                continue
+            task = asyncio.create_task(self._execute_logged(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _t: slots.release())
+
+    async def _idle(self) -> None:
+        try:
+            self.queue_depth = await self.store.pending_count()
+        except PyMongoError:
+            pass
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    # ---- Ciclo de vida (startup / shutdown de la app) ----
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        try:
+            await self.store.ensure_indexes()
+        except PyMongoError:
+            logger.exception("No se pudieron crear los índices de la colección de trabajos")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        '''
+        Deja de reclamar y espera a los trabajos en curso como mucho `drain_seconds`;
+        los que no terminan se cancelan y vuelven a la cola
+        '''
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if self._running:
+            _, pending = await asyncio.wait(set(self._running), timeout=self.drain_seconds)
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def samples(self) -> list[metrics.Sample]:
+        out = [
+            metrics.Sample("rex_jobs_running", len(self._running), "gauge", "Trabajos ejecutándose en este worker"),
+            metrics.Sample("rex_jobs_queue_depth", self.queue_depth, "gauge",
+                           "Trabajos pendientes en el almacén (última consulta)"),
+        ]
+        for name, c in list(self._stats.items()):
+            labels = {"job": name}
+            out += [
+                metrics.Sample("rex_jobs_enqueued_total", c.enqueued, "counter", "Trabajos encolados", labels),
+                metrics.Sample("rex_jobs_deduplicated_total", c.deduplicated, "counter",
+                               "Encolados descartados por dedupe_key", labels),
+                metrics.Sample("rex_jobs_succeeded_total", c.succeeded, "counter", "Trabajos completados", labels),
+                metrics.Sample("rex_jobs_retried_total", c.retried, "counter", "Reintentos programados", labels),
+                metrics.Sample("rex_jobs_failed_total", c.failed, "counter",
+                               "Trabajos fallidos definitivamente", labels),
+                metrics.Sample("rex_jobs_seconds_total", c.seconds, "counter", "Tiempo total de ejecución", labels),
+            ]
+        return out
+
+
+# Instancia del proceso (la arranca main.py; el almacén según JOBS_BACKEND)
+job_runner = JobRunner(
+    make_store(settings.JOBS_BACKEND),
+    concurrency=settings.JOBS_CONCURRENCY,
+    poll_interval=settings.JOBS_POLL_SECONDS,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    backoff_base=settings.JOBS_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.JOBS_BACKOFF_MAX_SECONDS,
+    drain_seconds=settings.JOBS_DRAIN_SECONDS,
+)
+
+metrics.register("jobs", job_runner.samples)
+
+
+def job_handler(name: str, *, max_attempts: Optional[int] = None) -> Callable[[Handler], Handler]:
+    return job_runner.handler(name, max_attempts=max_attempts)
+
+
+async def enqueue_job(name: str, payload: Optional[dict] = None, *, dedupe_key: Optional[str] = None,
+                      delay: float = 0.0, max_attempts: Optional[int] = None) -> Optional[str]:
+    '''
+    Encola en el ejecutor del proceso. Un fallo al encolar no debe tumbar la petición
+    que ya ha escrito: se registra y se devuelve None.
+    '''
+    if not settings.JOBS_ENABLED:
+        return None
+    try:
+        return await job_runner.enqueue(name, payload, dedupe_key=dedupe_key, delay=delay,
+                                        max_attempts=max_attempts)
+    except (PyMongoError, RuntimeError):
+        logger.exception("No se pudo encolar el trabajo %s", name)
+        return None
+
+
+async def enqueue_jobs(name: str, jobs: list[tuple[dict, Optional[str]]], *, delay: float = 0.0,
+                       max_attempts: Optional[int] = None) -> int:
+    '''
+    Como enqueue_job para un lote [(payload, dedupe_key)]: una sola escritura en el almacén
+    '''
+    if not settings.JOBS_ENABLED or not jobs:
+        return 0
+    try:
+        return await job_runner.enqueue_many(name, jobs, delay=delay, max_attempts=max_attempts)
+    except (PyMongoError, RuntimeError):
+        logger.exception("No se pudieron encolar %d trabajos %s", len(jobs), name)
+        return 0
+
+
+__all__ = ["JobRunner", "job_runner", "job_handler", "enqueue_job", "enqueue_jobs"]
@@ -0,0 +1,268 @@
+'''
+Almacenes de trabajos en segundo plano (ver jobs/runner.py).
+
+- MongoJobStore: colección `jobs`; los trabajos sobreviven a reinicios y los reparten
+  entre todos los workers (el reclamo es un find_one_and_update atómico).
+- MemoryJobStore: misma semántica en un dict del proceso (tests y desarrollo local).
+
+Estados: pending -> running -> done | failed. Un trabajo `running` cuyo lease ha
+vencido (el worker murió a medias) vuelve a poder reclamarse.
+
+Deduplicación: mientras un trabajo con `dedupe_key` está pendiente, encolar otro con
+la misma clave devuelve el existente. Cuando ya se está ejecutando sí se encola uno
+nuevo, porque el que corre puede haber leído datos anteriores al cambio.
+'''
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import backend.db.client as db_client
+from backend.core.config import settings
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _new_job(name: str, payload: dict, dedupe_key: Optional[str], max_attempts: int,
+             run_at: datetime, now: datetime) -> dict:
+    doc = {
+        "_id": ObjectId(),
+        "name": name,
+        "payload": payload,
+        "status": PENDING,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": run_at,
+        "created_at": now,
+    }
+    if dedupe_key is not None:
+        doc["dedupe_key"] = dedupe_key
+        doc["queued"] = True            # índice único parcial: solo entre pendientes
+    return doc
+
+
+class MongoJobStore:
+    '''
+    Trabajos en la colección `jobs` (los terminados caducan con un índice TTL)
+    '''
+
+    def __init__(self, collection: str = "jobs", clock: Callable[[], datetime] = _utcnow) -> None:
+        self.collection = collection
+        self._clock = clock
+
+    def _col(self):
+        return db_client.get_db()[self.collection]
+
+    async def ensure_indexes(self) -> None:
+        col = self._col()
+        await col.create_index([("status", 1), ("run_at", 1)])
+        await col.create_index("dedupe_key", unique=True, partialFilterExpression={"queued": True})
+        await col.create_index("finished_at", expireAfterSeconds=settings.JOBS_RETENTION_SECONDS)
+
+    async def add(self, name: str, payload: dict, *, dedupe_key: Optional[str] = None,
+                  max_attempts: int, delay: float = 0.0) -> tuple[str, bool]:
+        '''
+        Encola el trabajo; devuelve (id, False) si ya había uno pendiente con la misma clave
+        '''
+        now = self._clock()
+        for _ in range(2):
+            doc = _new_job(name, payload, dedupe_key, max_attempts, now + timedelta(seconds=delay), now)
+            try:
+                await self._col().insert_one(doc)
+                return str(doc["_id"]), True
+            except DuplicateKeyError:
+                existing = await self._col().find_one({"dedupe_key": dedupe_key, "queued": True}, {"_id": 1})
+                if existing is not None:
+                    return str(existing["_id"]), False
+                # Lo acaban de reclamar entre el insert y la búsqueda: se reintenta
+        raise RuntimeError(f"No se pudo encolar el trabajo {name} ({dedupe_key})")
+
+    async def add_many(self, name: str, jobs: list[tuple[dict, Optional[str]]], *,
+                       max_attempts: int, delay: float = 0.0) -> tuple[int, int]:
+        '''
+        Encola varios trabajos [(payload, dedupe_key)] con un único insert_many(ordered=False);
+        devuelve (creados, deduplicados)
+        '''
+        if not jobs:
+            return 0, 0
+        now = self._clock()
+        run_at = now + timedelta(seconds=delay)
+        docs = [_new_job(name, payload, key, max_attempts, run_at, now) for payload, key in jobs]
+        try:
+            await self._col().insert_many(docs, ordered=False)
+            return len(docs), 0
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            conflicts = [docs[int(err["index"])] for err in errors]
+        # Clave ya pendiente: deduplicado. Si el pendiente se reclamó entretanto, se reintenta solo
+        keys = [d["dedupe_key"] for d in conflicts]
+        queued = {d["dedupe_key"] async for d in self._col().find(
+            {"dedupe_key": {"$in": keys}, "queued": True}, {"dedupe_key": 1})}
+        created = len(docs) - len(conflicts)
+        for doc in conflicts:
+            if doc["dedupe_key"] not in queued:
+                _, was_created = await self.add(name, doc["payload"], dedupe_key=doc["dedupe_key"],
+                                                max_attempts=max_attempts, delay=delay)
+                created += was_created
+        return created, len(docs) - created
+
+    async def claim(self, *, lease_seconds: float, worker: str) -> Optional[dict]:
+        now = self._clock()
+        return await self._col().find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "run_at": {"$lte": now}},
+                {"status": RUNNING, "lease_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": RUNNING, "worker": worker, "started_at": now,
+                         "lease_until": now + timedelta(seconds=lease_seconds)},
+                "$unset": {"queued": ""},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def complete(self, job: dict) -> None:
+        await self._col().update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": DONE, "finished_at": self._clock()}, "$unset": {"lease_until": ""}},
+        )
+
+    async def fail(self, job: dict, error: str) -> None:
+        await self._col().update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": FAILED, "finished_at": self._clock(), "last_error": error},
+             "$unset": {"lease_until": ""}},
+        )
+
+    async def reschedule(self, job: dict, *, delay: float, error: Optional[str] = None,
+                         count_attempt: bool = True) -> None:
+        '''
+        Vuelve a dejarlo pendiente dentro de `delay` segundos. Si entretanto se encoló otro
+        con la misma clave, este se da por terminado: el nuevo ya hará el trabajo.
+        '''
+        now = self._clock()
+        update: dict = {
+            "$set": {"status": PENDING, "run_at": now + timedelta(seconds=delay)},
+            "$unset": {"lease_until": ""},
+        }
+        if error is not None:
+            update["$set"]["last_error"] = error
+        if "dedupe_key" in job:
+            update["$set"]["queued"] = True
+        if not count_attempt:
+            update["$inc"] = {"attempts": -1}
+        try:
+            await self._col().update_one({"_id": job["_id"]}, update)
+        except DuplicateKeyError:
+            await self._col().update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": DONE, "finished_at": now, "superseded": True},
+                 "$unset": {"lease_until": ""}},
+            )
+
+    async def pending_count(self) -> int:
+        return await self._col().count_documents({"status": PENDING})
+
+
+class MemoryJobStore:
+    '''
+    Misma interfaz que MongoJobStore, en memoria (se pierde al reiniciar)
+    '''
+
+    def __init__(self, clock: Callable[[], datetime] = _utcnow) -> None:
+        self._clock = clock
+        self.jobs: dict[ObjectId, dict] = {}
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+    def _queued(self, dedupe_key: str, exclude=None) -> Optional[dict]:
+        for job in self.jobs.values():
+            if job.get("queued") and job.get("dedupe_key") == dedupe_key and job["_id"] != exclude:
+                return job
+        return None
+
+    async def add(self, name: str, payload: dict, *, dedupe_key: Optional[str] = None,
+                  max_attempts: int, delay: float = 0.0) -> tuple[str, bool]:
+        if dedupe_key is not None and (existing := self._queued(dedupe_key)) is not None:
+            return str(existing["_id"]), False
+        now = self._clock()
+        doc = _new_job(name, payload, dedupe_key, max_attempts, now + timedelta(seconds=delay), now)
+        self.jobs[doc["_id"]] = doc
+        return str(doc["_id"]), True
+
+    async def add_many(self, name: str, jobs: list[tuple[dict, Optional[str]]], *,
+                       max_attempts: int, delay: float = 0.0) -> tuple[int, int]:
+        created = 0
+        for payload, key in jobs:
+            _, was_created = await self.add(name, payload, dedupe_key=key, max_attempts=max_attempts, delay=delay)
+            created += was_created
+        return created, len(jobs) - created
+
+    async def claim(self, *, lease_seconds: float, worker: str) -> Optional[dict]:
+        now = self._clock()
+        ready = [
+            j for j in self.jobs.values()
+            if (j["status"] == PENDING and j["run_at"] <= now)
+            or (j["status"] == RUNNING and j["lease_until"] < now)
+        ]
+        if not ready:
+            return None
+        job = min(ready, key=lambda j: j["run_at"])
+        job.pop("queued", None)
+        job.update(status=RUNNING, worker=worker, started_at=now, attempts=job["attempts"] + 1,
+                   lease_until=now + timedelta(seconds=lease_seconds))
+        return dict(job)
+
+    async def complete(self, job: dict) -> None:
+        stored = self.jobs[job["_id"]]
+        stored.pop("lease_until", None)
+        stored.update(status=DONE, finished_at=self._clock())
+
+    async def fail(self, job: dict, error: str) -> None:
+        stored = self.jobs[job["_id"]]
+        stored.pop("lease_until", None)
+        stored.update(status=FAILED, finished_at=self._clock(), last_error=error)
+
+    async def reschedule(self, job: dict, *, delay: float, error: Optional[str] = None,
+                         count_attempt: bool = True) -> None:
+        stored = self.jobs[job["_id"]]
+        stored.pop("lease_until", None)
+        now = self._clock()
+        if "dedupe_key" in stored and self._queued(stored["dedupe_key"], exclude=stored["_id"]):
+            stored.update(status=DONE, finished_at=now, superseded=True)
+            return
+        stored.update(status=PENDING, run_at=now + timedelta(seconds=delay))
+        if "dedupe_key" in stored:
+            stored["queued"] = True
+        if error is not None:
+            stored["last_error"] = error
+        if not count_attempt:
+            stored["attempts"] -= 1
+
+    async def pending_count(self) -> int:
+        # Equivalente al TTL de Mongo: se olvidan los terminados hace más de JOBS_RETENTION_SECONDS
+        cutoff = self._clock() - timedelta(seconds=settings.JOBS_RETENTION_SECONDS)
+        for job_id in [k for k, j in self.jobs.items() if j.get("finished_at") and j["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+        return sum(1 for j in self.jobs.values() if j["status"] == PENDING)
+
+
+def make_store(backend: str):
+    return MemoryJobStore() if backend == "memory" else MongoJobStore()
+
+
+__all__ = ["PENDING", "RUNNING", "DONE", "FAILED", "MongoJobStore", "MemoryJobStore", "make_store"]
@@ -1,11 +1,18 @@
 from fastapi import FastAPI
 from fastapi.concurrency import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from .core.config import settings
-from .db.client import init_db
-from .routers import users, auth, routes, users_profile, favorite
+from .core.coalescing import RequestCoalescingMiddleware
+from .core.compression import JSONCompressionMiddleware
+from .core.static_assets import PrecompressedStaticFiles
+from .core.metrics import metrics_response
+from .core.load_shedding import LoadSheddingMiddleware, load_shedder
+from .db.client import init_db, close_db, start_change_feed, stop_change_feed
+from .db.catalog import public_catalog
+from .jobs.runner import job_runner
+from .geo.pool import geometry_pool
+from .routers import users, auth, routes, users_profile, favorite, tiles
 
 # === Instancia principal ===
 app = FastAPI(title=settings.PROJECT_NAME)
@@ -19,6 +26,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# === Compresión gzip de respuestas JSON ===
+# Va por dentro de la agrupación: los seguidores reciben los bytes ya comprimidos
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        JSONCompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        level=settings.COMPRESSION_LEVEL,
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+        offload_size=settings.COMPRESSION_OFFLOAD_SIZE,
+    )
+
+# === Agrupación de GETs idénticos en vuelo ===
+if settings.COALESCE_ENABLED:
+    app.add_middleware(
+        RequestCoalescingMiddleware,
+        paths=settings.COALESCE_PATHS,
+        exclude_paths=settings.COALESCE_EXCLUDE_PATHS,
+        max_body_bytes=settings.COALESCE_MAX_BODY_BYTES,
+    )
+
+# === Descarte de carga (lo más externo: rechaza antes de hacer ningún trabajo) ===
+if settings.LOAD_SHED_ENABLED:
+    app.add_middleware(
+        LoadSheddingMiddleware,
+        shedder=load_shedder,
+        low_priority=settings.LOAD_SHED_LOW_PRIORITY,
+        critical=settings.LOAD_SHED_CRITICAL,
+        exempt_paths=settings.LOAD_SHED_EXEMPT_PATHS,
+        retry_after=settings.LOAD_SHED_RETRY_AFTER_SECONDS,
+    )
+
 # === Archivos estáticos ===
 # app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -26,6 +64,22 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    if settings.LOAD_SHED_ENABLED:
+        load_shedder.start()
+    await start_change_feed()
+    if settings.PUBLIC_CATALOG_ENABLED:
+        await public_catalog.start()
+    if settings.JOBS_ENABLED:
+        await job_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_runner.stop()
+    await geometry_pool.stop()
+    await public_catalog.stop()
+    await stop_change_feed()
+    await load_shedder.stop()
+    await close_db()
 
 # === Routers ===
 app.include_router(users.router)
@@ -33,19 +87,31 @@ app.include_router(users_profile.router)
 app.include_router(auth.router)
 app.include_router(routes.router)
 app.include_router(favorite.router)
+app.include_router(tiles.router)
 
 # === Endpoint de salud ===
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+# === Métricas (Prometheus) ===
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return metrics_response()
 # ---------- Frontend React ----------
 
 BASE_DIR = Path(__file__).resolve().parent
 FRONTEND_DIST = BASE_DIR / "static"   # aquí copiamos el build en el workflow
 
 if FRONTEND_DIST.exists():
+    # Variantes gzip/zstd + índice en memoria + caché inmutable para assets con hash
     app.mount(
         "/",
-        StaticFiles(directory=str(FRONTEND_DIST), html=True),
+        PrecompressedStaticFiles(
+            FRONTEND_DIST,
+            html=True,
+            precompress=settings.STATIC_PRECOMPRESS_ON_STARTUP,
+        ),
         name="frontend",
     )
\ No newline at end of file
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, HTTPException, status, Response, Request, Depends
 from backend.db.models import user as user_crud
 from backend.db.schemas.user import LogIn, TokenOut, UserPublic
+from backend.core.cache_control import CachePolicyRoute, cache_control, NO_STORE
+from backend.core.bulkhead import AUTH, bulkhead_guard
 from backend.core.security import verify_password, create_access_token, create_refresh_token, decode_token, get_current_user
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=CachePolicyRoute,
+                   dependencies=[Depends(bulkhead_guard(AUTH))])
 
 COOKIE = {"httponly": True, "samesite": "lax"}
 
 @router.post("/login", response_model=TokenOut)
+@cache_control(NO_STORE)
 async def login(payload: LogIn, response: Response):
     '''
     Autentica al usuario, creat tokens y los guarda en cookies
@@ -22,6 +26,7 @@ async def login(payload: LogIn, response: Response):
     return TokenOut(access_token=access, refresh_token=refresh)
 
 @router.get("/me", response_model=UserPublic)
+@cache_control(NO_STORE)
 async def me(current_user: dict = Depends(get_current_user)):
     '''
     Devuelve los datos del usuario autenticado
@@ -34,6 +39,7 @@ async def me(current_user: dict = Depends(get_current_user)):
     }
 
 @router.post("/refresh", response_model=TokenOut)
+@cache_control(NO_STORE)
 async def refresh(request: Request, response: Response):
     '''
     Renueva el acces token usando el refresh token
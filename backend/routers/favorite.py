@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from backend.core.etag import make_etag, etag_matches, not_modified
+from backend.core.cache_control import cache_control, PRIVATE_REVALIDATE
+from backend.core.negotiation import NegotiatedRoute
+from backend.core.bulkhead import bulkhead_guard
 from backend.core.security import get_current_user
 from backend.db.schemas.favorite import FavoriteListOut
 from backend.db.models import favorite as favorite_crud
 from backend.db.models import route as route_crud
 from bson import ObjectId
 
-router = APIRouter(prefix="/favorites", tags=["favorites"])
+router = APIRouter(prefix="/favorites", tags=["favorites"], route_class=NegotiatedRoute,
+                   dependencies=[Depends(bulkhead_guard())])
 
 @router.post("/{route_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def add_favorite(route_id: str, current_user: dict = Depends(get_current_user)):
@@ -32,10 +37,17 @@ async def remove_favorite(route_id: str, current_user: dict = Depends(get_curren
 
 
 @router.get("/me", response_model=FavoriteListOut)
-async def list_my_favorites(current_user: dict = Depends(get_current_user)):
+@cache_control(PRIVATE_REVALIDATE)
+async def list_my_favorites(request: Request, response: Response,
+                            current_user: dict = Depends(get_current_user)):
     """
     Devuelve la lista de IDs de rutas favoritas del usuario actual.
     Si el documento del usuario no existía, lo crea vacío.
+    El ETag sale de la propia lista (el documento solo contiene los IDs).
     """
     route_ids = await favorite_crud.list_favorites(current_user["_id"])
+    etag = make_etag("favorites", str(current_user["_id"]), route_ids)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return {"route_ids": route_ids}
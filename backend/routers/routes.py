@@ -1,13 +1,43 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+import asyncio
+import math
+import time
+from typing import Any, Literal
+from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Body, File, Form, HTTPException, status, Depends, Query, Request, Response, UploadFile
+from pydantic import ValidationError
 from backend.db.models import route as route_crud
 from backend.db.models import user as user_crud
-from backend.db.schemas.route import RouteCreate, RoutePublic
-from backend.core.security import get_current_user
+from backend.db.schemas.route import (
+    RouteCreate, RoutePublic, RoutePointsPage, RouteBulkItemResult, RouteBulkResult, RouteClusterPage,
+)
+from backend.core.config import settings
+from backend.core.security import get_current_user, get_optional_user
+from backend.core.cache_control import (
+    cache_control, CachePolicy, PUBLIC_CATALOG, PRIVATE_REVALIDATE, NO_STORE,
+)
+from backend.core.body_limit import max_body_size
+from backend.core.bulkhead import bulkhead_guard, hold_for_stream
+from backend.core.circuit_breaker import serves_from_snapshot, stale_on_outage
+from backend.core.deadline import request_budget
+from backend.core.negotiation import JSON, NegotiatedRoute, current_media_type
+from backend.core.serialization import (
+    encoded_response, json_response, public_points, route_response, routes_response,
+)
+from backend.core.etag import make_etag, etag_matches, has_conditional, not_modified, document_version
+from backend.db.catalog import public_catalog, sort_key as catalog_order
+from backend.geo import exporters
+from backend.geo.points import count_points
+from backend.geo.thumbnail import STYLE_VERSION, thumbnails
+from backend.geo.clusters import route_clusters
+from backend.geo.importers import FORMATS, ImportFormatError, detect_format, import_track
+from backend.jobs.route_jobs import enqueue_route_jobs, enqueue_bulk_route_jobs
 from pymongo.errors import DuplicateKeyError
 
-router = APIRouter(prefix="/routes", tags=["routes"])
+router = APIRouter(prefix="/routes", tags=["routes"], route_class=NegotiatedRoute,
+                   dependencies=[Depends(bulkhead_guard())])
 
 @router.get("/check-name")
+@cache_control(NO_STORE)
 async def check_name(name: str = Query(..., min_length=1), current_user: dict = Depends(get_current_user)):
     """
     Devuelve {"exists": true|false} si el nombre ya existe para el usuario autenticado.
@@ -36,33 +66,304 @@ async def create_route_endpoint(payload: RouteCreate, current_user: dict = Depen
         route = await route_crud.create_route(current_user["_id"], payload.model_dump())
     except DuplicateKeyError:
         raise HTTPException(status_code=409, detail="Este nombre de ruta ya existe")
-    
+
+    # Métricas y demás trabajo caro: en segundo plano (jobs/route_jobs.py)
+    await enqueue_route_jobs(route["_id"])
+
     # Normalización _id para el response model (alias "_id" -> "id")
     route["_id"] = str(route["_id"])
     return route
 
+def _validation_message(exc: ValidationError) -> str:
+    # Mismos textos que ve la UI en POST /routes (sin el prefijo "Value error, " de pydantic)
+    err = exc.errors()[0]
+    msg = err["msg"]
+    if msg.startswith("Value error, "):
+        return msg[len("Value error, "):]
+    loc = ".".join(str(p) for p in err.get("loc", ()))
+    return f"{loc}: {msg}" if loc else msg
+
+def _bulk_error(index: int, status_code: int, error: str) -> RouteBulkItemResult:
+    return RouteBulkItemResult(index=index, status="error", status_code=status_code, error=error)
+
+@router.post("/bulk", response_model=RouteBulkResult)
+@request_budget(30)
+async def create_routes_bulk_endpoint(
+    payload: list[dict[str, Any]] = Body(..., description="Lista de rutas con el formato de RouteCreate"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Crea varias rutas de una vez. Cada elemento se valida como RouteCreate por separado y
+    el resultado indica, en el mismo orden, si se creó o por qué no; un elemento inválido
+    no invalida el resto. Los límites de tamaño del lote rechazan la petición entera (413).
+    """
+    if len(payload) > settings.BULK_ROUTES_MAX_ITEMS:
+        raise HTTPException(status_code=413,
+                            detail=f"Máximo {settings.BULK_ROUTES_MAX_ITEMS} rutas por lote")
+    # Antes de validar nada: contar puntos es barato y evita procesar lotes enormes.
+    # count_points no valida: "points" que no sea una lista cuenta 0 y el elemento
+    # acaba en su 422 al validarlo con RouteCreate, sin tumbar el lote
+    total_points = sum(count_points(item.get("points")) for item in payload if isinstance(item, dict))
+    if total_points > settings.BULK_ROUTES_MAX_TOTAL_POINTS:
+        raise HTTPException(status_code=413,
+                            detail=f"Máximo {settings.BULK_ROUTES_MAX_TOTAL_POINTS} puntos por lote")
+
+    results: dict[int, RouteBulkItemResult] = {}
+    valid: dict[int, RouteCreate] = {}
+    seen: set[str] = set()
+    for i, item in enumerate(payload):
+        try:
+            route = RouteCreate.model_validate(item)
+        except ValidationError as exc:
+            results[i] = _bulk_error(i, 422, _validation_message(exc))
+            continue
+        if route.name in seen:
+            results[i] = _bulk_error(i, 409, "Nombre de ruta repetido en el lote")
+            continue
+        seen.add(route.name)
+        valid[i] = route
+
+    # Una sola consulta para los conflictos con rutas ya guardadas
+    taken = await route_crud.get_existing_route_names(current_user["_id"], list(seen))
+    for i in [i for i, r in valid.items() if r.name in taken]:
+        results[i] = _bulk_error(i, 409, "Este nombre de ruta ya existe")
+        del valid[i]
+
+    indexes = list(valid)
+    inserted, failed = await route_crud.create_routes_bulk(
+        current_user["_id"], [valid[i].model_dump() for i in indexes]
+    )
+    inserted_iter = iter(inserted)
+    for pos, i in enumerate(indexes):
+        if pos in failed:
+            # 11000: índice único (owner_id, name) si otra petición se adelantó
+            if failed[pos] == 11000:
+                results[i] = _bulk_error(i, 409, "Este nombre de ruta ya existe")
+            else:
+                results[i] = _bulk_error(i, 500, "No se ha podido guardar la ruta")
+        else:
+            doc = next(inserted_iter)
+            results[i] = RouteBulkItemResult(index=i, status="created", status_code=201, id=str(doc["_id"]))
+    await enqueue_bulk_route_jobs(doc["_id"] for doc in inserted)
+
+    ordered = [results[i] for i in range(len(payload))]
+    created = sum(1 for r in ordered if r.status == "created")
+    return RouteBulkResult(created=created, failed=len(ordered) - created, results=ordered)
+
+async def _upload_chunks(file: UploadFile):
+    # Lectura a trozos con límite de tamaño (Starlette ya vuelca a disco los ficheros grandes)
+    read = 0
+    while chunk := await file.read(settings.ROUTE_IMPORT_CHUNK_SIZE):
+        read += len(chunk)
+        if read > settings.ROUTE_IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="El archivo es demasiado grande")
+        yield chunk
+
+@router.post("/import", response_model=RoutePublic, status_code=status.HTTP_201_CREATED)
+@request_budget(60)
+@max_body_size(lambda: settings.ROUTE_IMPORT_MAX_BYTES + 64 * 1024)     # fichero + campos del formulario
+async def import_route_endpoint(
+    response: Response,
+    file: UploadFile = File(..., description="Track en GPX o GeoJSON"),
+    category: str = Form(...),
+    name: str | None = Form(None),
+    description: str | None = Form(None),
+    visibility: bool = Form(False),
+    format_: str | None = Form(None, alias="format", description="gpx | geojson (por defecto, según el fichero)"),
+    min_distance_m: float = Form(0.0, ge=0, description="Descarta puntos a menos de esta distancia"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Crea una ruta a partir de un fichero GPX o GeoJSON. El fichero se parsea en streaming
+    y se diezma durante la ingesta (como mucho ROUTE_IMPORT_MAX_POINTS puntos); nombre y
+    descripción se toman del fichero si no vienen en el formulario.
+    """
+    fmt = format_.lower() if format_ else detect_format(file.filename, file.content_type)
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=415, detail="Formato no soportado: usa GPX o GeoJSON")
+    if file.size is not None and file.size > settings.ROUTE_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="El archivo es demasiado grande")
+
+    try:
+        track = await import_track(_upload_chunks(file), fmt, min_distance_m=min_distance_m,
+                                   max_points=settings.ROUTE_IMPORT_MAX_POINTS)
+    except ImportFormatError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    try:
+        payload = RouteCreate(
+            name=name or track.name or "",
+            points=track.points,
+            visibility=visibility,
+            description=description or track.description or "",
+            category=category,
+        )
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=_validation_message(exc))
+
+    if await route_crud.get_route_by_name(current_user["_id"], payload.name):
+        raise HTTPException(status_code=409, detail="Este nombre de ruta ya existe")
+    try:
+        route = await route_crud.create_route(current_user["_id"], payload.model_dump())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Este nombre de ruta ya existe")
+
+    await enqueue_route_jobs(route["_id"])
+
+    response.headers["X-Import-Points-Read"] = str(track.total_points)
+    response.headers["X-Import-Points-Kept"] = str(len(track.points))
+    route["_id"] = str(route["_id"])
+    return route
+
+def _public_list_from_snapshot(request: Request) -> bool:
+    # public_only=false siempre lee de BD
+    public_only = request.query_params.get("public_only", "true").lower() in ("true", "1", "yes", "on", "t", "y")
+    return public_only and public_catalog.available()
+
 @router.get("", response_model=list[RoutePublic])
-async def list_routes(public_only: bool=True):  # Parametro para elegir públicas o todas
+@cache_control(PUBLIC_CATALOG)
+@stale_on_outage
+@serves_from_snapshot(_public_list_from_snapshot)
+async def list_routes(public_only: bool=True,  # Parametro para elegir públicas o todas
+                      page: int | None = Query(None, ge=0),
+):
     '''
-    Lista todas las rutas públicas
+    Lista todas las rutas públicas (opcionalmente una página de PUBLIC_CATALOG_PAGE_SIZE)
     '''
+    # Camino rápido: foto en memoria ya serializada, si no está demasiado vieja
+    snap = public_catalog.current() if public_only else None
+    if snap is not None:
+        if current_media_type() == JSON:
+            return json_response(snap.body if page is None else snap.page(page))
+        # MessagePack / CBOR: se codifica desde los documentos de la foto
+        routes = snap.routes
+        if page is not None:
+            routes = routes[page * snap.page_size:(page + 1) * snap.page_size]
+        return routes_response(routes)
+
+    headers = None
+    if not public_only:
+        # Incluye rutas privadas: nunca debe acabar en una caché compartida
+        headers = {"Cache-Control": NO_STORE.header_value()}
+
     routes = await route_crud.get_all_routes(public_only)
-    for route in routes:
-        route["_id"] = str(route["_id"])
-    return routes
+    if page is not None:
+        # Mismo orden que la foto: una página no cambia según de dónde se sirva
+        size = public_catalog.page_size
+        routes = sorted(routes, key=catalog_order)[page * size:(page + 1) * size]
+    return routes_response(routes, headers=headers)
+
+def _wrap_lon(lon: float) -> float:
+    return lon if -180 <= lon <= 180 else (lon + 180) % 360 - 180
+
+def _parse_bbox(raw: str) -> tuple[float, float, float, float]:
+    '''
+    Caja del mapa. Al desplazarse por copias del mundo los mapas dan longitudes
+    fuera de ±180: se llevan a su rango y, si la caja cruza el antimeridiano,
+    queda min_lon > max_lon (geo/clusters.bbox_cells lo entiende)
+    '''
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in raw.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox debe ser min_lon,min_lat,max_lon,max_lat")
+    if not all(math.isfinite(v) for v in (min_lon, max_lon)) or not -90 <= min_lat <= max_lat <= 90:
+        raise HTTPException(status_code=422, detail="bbox fuera de rango")
+    if max_lon - min_lon >= 360:
+        return -180.0, min_lat, 180.0, max_lat          # el mundo entero
+    return _wrap_lon(min_lon), min_lat, _wrap_lon(max_lon), max_lat
+
+# Sin foto del catálogo las salidas se leen de BD con una proyección mínima,
+# como mucho una vez por intervalo de refresco del catálogo (como routers/tiles.py)
+_clusters_fallback_lock = asyncio.Lock()
+_clusters_loaded_at = float("-inf")
+
+async def _sync_clusters_from_db() -> None:
+    global _clusters_loaded_at
+    async with _clusters_fallback_lock:
+        if time.monotonic() - _clusters_loaded_at < settings.PUBLIC_CATALOG_REFRESH_SECONDS:
+            return
+        await route_clusters.sync(await route_crud.get_public_route_starts())
+        _clusters_loaded_at = time.monotonic()
+
+@router.get("/clusters", response_model=RouteClusterPage)
+@cache_control(PUBLIC_CATALOG)
+@stale_on_outage
+@serves_from_snapshot(public_catalog.available)
+async def route_clusters_endpoint(request: Request,
+                                  bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+                                  zoom: int = Query(..., ge=0, le=24)):
+    '''
+    Salidas de las rutas públicas agrupadas por celdas del zoom del mapa: centroide,
+    número de rutas y una ruta representativa por grupo. Si no caben en
+    CLUSTERS_MAX_RESULTS se agrupan a un zoom menor (campo `zoom` de la respuesta).
+    '''
+    box = _parse_bbox(bbox)
+    # Índice en memoria al día con la foto del catálogo (o con BD si no hay foto)
+    snap = public_catalog.current()
+    if snap is not None:
+        await route_clusters.sync(snap.routes, source=snap)
+    else:
+        await _sync_clusters_from_db()
+
+    used, clusters = route_clusters.query(box, zoom)
+    etag = make_etag("clusters", used, clusters)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return encoded_response({"zoom": used, "clusters": clusters}, headers={"ETag": etag})
+
+def _routes_page_etag(owner_id: str, skip: int, limit: int, docs: list[dict]) -> str:
+    return make_etag("routes/me", owner_id, skip, limit,
+                     [(str(d["_id"]), document_version(d)) for d in docs])
 
 @router.get("/me", response_model=list[RoutePublic])
-async def my_routes(current_user: dict = Depends(get_current_user),
+@cache_control(PRIVATE_REVALIDATE)
+async def my_routes(request: Request,
+                    current_user: dict = Depends(get_current_user),
                     skip: int = Query(0, ge=0),
                     limit: int = Query(50, ge=1, le=200),
 ):
     '''
-    Lista todas las rutas del usuario autenticado
+    Lista todas las rutas del usuario autenticado (con ETag / If-None-Match)
+    '''
+    owner_id = current_user["_id"]
+    if has_conditional(request):
+        # Solo versiones: si el cliente ya tiene la página no se leen los puntos
+        versions = await route_crud.get_route_versions_by_owner(owner_id, skip=skip, limit=limit)
+        etag = _routes_page_etag(owner_id, skip, limit, versions)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    routes = await route_crud.get_routes_by_owner(owner_id, public_only=None, skip=skip, limit=limit)
+    return routes_response(routes, headers={"ETag": _routes_page_etag(owner_id, skip, limit, routes)})
+
+ExportFormat = Literal["gpx", "geojson", "kml"]
+
+def _attachment(request: Request, body, filename: str, media_type: str) -> StreamingResponse:
+    # El cuerpo sigue leyendo del cursor: mantiene el hueco del bulkhead hasta el final
+    return hold_for_stream(request, StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}))
+
+# Declarado antes de /{route_id}/export para que "me" no se tome como un ID
+@router.get("/me/export")
+@cache_control(NO_STORE)
+async def export_my_routes(request: Request,
+                           format_: ExportFormat = Query("geojson", alias="format"),
+                           archive: bool = Query(False, description="Un fichero por ruta dentro de un zip"),
+                           current_user: dict = Depends(get_current_user)):
+    '''
+    Exporta todas las rutas del usuario en streaming desde el cursor: un único fichero
+    (FeatureCollection, GPX con un track por ruta o KML) o un zip con un fichero por ruta.
     '''
-    routes = await route_crud.get_routes_by_owner(current_user["_id"], public_only=None, skip=skip, limit=limit)
-    return routes
+    routes = route_crud.iter_routes_by_owner(current_user["_id"])
+    if archive:
+        return _attachment(request, exporters.zip_stream(routes, format_), f"rutas-{format_}.zip",
+                           exporters.MEDIA_TYPES["zip"])
+    return _attachment(request, exporters.collection_stream(routes, format_), f"rutas.{format_}",
+                       exporters.MEDIA_TYPES[format_])
 
 @router.get("/user/{username}", response_model=list[RoutePublic])
+@cache_control(PUBLIC_CATALOG)
+@stale_on_outage
 async def list_user_public_routes(
     username: str,
     skip: int = Query(0, ge=0),
@@ -76,29 +377,134 @@ async def list_user_public_routes(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     routes = await route_crud.get_routes_by_owner(
-        u["_id"], public_only=True, skip=skip, limit=limit
+        str(u["_id"]), public_only=True, skip=skip, limit=limit
     )
-    return routes
+    return routes_response(routes)
+
+def _check_route_access(route: dict | None, current_user: dict) -> None:
+    if not route:
+        raise HTTPException(status_code=404, detail="Ruta no encontrada")
+
+    is_public = bool(route.get("visibility"))
+    is_owner = route.get("owner_id") == current_user["_id"]
+
+    if not is_public and not is_owner:
+        raise HTTPException(status_code=403, detail="No autorizado o ruta inexistente")
 
 @router.get("/{route_id}", response_model=RoutePublic)
-async def get_route(route_id: str, current_user: dict = Depends(get_current_user)):
+@cache_control(PRIVATE_REVALIDATE)
+@stale_on_outage
+async def get_route(route_id: str, request: Request,
+                    current_user: dict = Depends(get_current_user)):
     '''
-    Obtiene una ruta por su ID si es pública o pertenece al usuario autenticado
+    Obtiene una ruta por su ID si es pública o pertenece al usuario autenticado.
+    Devuelve ETag y responde 304 si el cliente ya tiene esa versión.
     '''
+    if has_conditional(request):
+        # Proyección sin puntos: basta para permisos y versión
+        version = await route_crud.get_route_version(route_id)
+        _check_route_access(version, current_user)
+        etag = make_etag("route", route_id, document_version(version))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
     route = await route_crud.get_route_by_id(route_id)
+    _check_route_access(route, current_user)
+
+    return route_response(route, headers={"ETag": make_etag("route", route_id, document_version(route))})
+
+@router.get("/{route_id}/points", response_model=RoutePointsPage)
+@cache_control(PRIVATE_REVALIDATE)
+async def get_route_points(route_id: str, request: Request,
+                           offset: int = Query(0, ge=0),
+                           limit: int = Query(500, ge=1, le=5000),
+                           current_user: dict = Depends(get_current_user)):
+    '''
+    Puntos de una ruta por tramos, para pintar tracks largos de forma progresiva.
+    Solo se lee de la base de datos el rango pedido.
+    '''
+    route = await route_crud.get_route_metadata(route_id)
+    _check_route_access(route, current_user)
+    etag = make_etag("points", route_id, document_version(route), offset, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    total, points = await route_crud.get_route_points(route, offset=offset, limit=limit)
+    page = {
+        "route_id": route_id,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "points": public_points(points),
+    }
+    return encoded_response(page, headers={"ETag": etag})
+
+@router.get("/{route_id}/thumbnail.png", response_class=Response,
+            responses={200: {"content": {"image/png": {}}}})
+@cache_control(PRIVATE_REVALIDATE)     # declarada; el handler pone la suya (pública si la ruta lo es)
+async def get_route_thumbnail(route_id: str, request: Request,
+                              size: int = Query(settings.THUMBNAIL_DEFAULT_SIZE),
+                              current_user: dict | None = Depends(get_optional_user)):
+    '''
+    Miniatura PNG del trazado (para <img> en listados). Las rutas públicas no
+    necesitan sesión; las privadas, la del propietario.
+    '''
+    if size not in settings.THUMBNAIL_SIZES:
+        raise HTTPException(status_code=422, detail=f"size debe ser uno de {settings.THUMBNAIL_SIZES}")
+    route = await route_crud.get_route_metadata(route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Ruta no encontrada")
-    
     is_public = bool(route.get("visibility"))
-    is_owner = route.get("owner_id") == current_user["_id"]
+    if not is_public:
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="No autenticado")
+        _check_route_access(route, current_user)
 
-    if not is_public and not is_owner:
-        raise HTTPException(status_code=403, detail="No autorizado o ruta inexistente")
-    
-    route["_id"] = str(route["_id"])
-    return route
+    # El ETag depende solo de la forma: con el hash ya medido (jobs/route_jobs.py)
+    # ni el 304 ni un acierto de la caché en disco leen los puntos
+    policy = CachePolicy(public=is_public, private=not is_public, max_age=settings.THUMBNAIL_MAX_AGE)
+    headers = {"Cache-Control": policy.header_value()}
+    known_hash = (route.get("measures") or {}).get("geometry_hash")
+    if known_hash:
+        headers["ETag"] = make_etag("thumbnail", known_hash, size, STYLE_VERSION)
+        if etag_matches(request, headers["ETag"]):
+            response = not_modified(headers["ETag"])
+            response.headers["Cache-Control"] = headers["Cache-Control"]
+            return response
+        png = await thumbnails.cached(known_hash, size)
+        if png is not None:
+            return Response(content=png, media_type="image/png", headers=headers)
+
+    full = await route_crud.get_route_by_id(route_id)
+    if not full:
+        raise HTTPException(status_code=404, detail="Ruta no encontrada")
+    if known_hash:
+        png = await thumbnails.render(full.get("points") or [], size, known_hash)
+    else:
+        digest, png = await thumbnails.png(full.get("points") or [], size)
+        headers["ETag"] = make_etag("thumbnail", digest, size, STYLE_VERSION)
+        if etag_matches(request, headers["ETag"]):
+            response = not_modified(headers["ETag"])
+            response.headers["Cache-Control"] = headers["Cache-Control"]
+            return response
+    return Response(content=png, media_type="image/png", headers=headers)
+
+@router.get("/{route_id}/export")
+@cache_control(PRIVATE_REVALIDATE)
+async def export_route(route_id: str, request: Request, format_: ExportFormat = Query("gpx", alias="format"),
+                       current_user: dict = Depends(get_current_user)):
+    '''
+    Descarga una ruta en GPX, GeoJSON o KML (mismos permisos que GET /routes/{route_id})
+    '''
+    route = await route_crud.get_route_by_id(route_id)
+    _check_route_access(route, current_user)
+    filename = f"{exporters.safe_filename(route.get('name', ''))}.{format_}"
+    return _attachment(request, exporters.route_document(route, format_), filename, exporters.MEDIA_TYPES[format_])
 
 @router.get("/by-name/{name}", response_model=RoutePublic)
+@cache_control(PUBLIC_CATALOG)
+@stale_on_outage
 async def get_public_route_by_name(name: str, current_user: dict = Depends(get_current_user)):
     """
     Devuelve una ruta PÚBLICA por nombre.
@@ -108,8 +514,7 @@ async def get_public_route_by_name(name: str, current_user: dict = Depends(get_c
     route = await route_crud.get_public_route_by_name(name)
     if not route:
         raise HTTPException(status_code=404, detail="Ruta no encontrada")
-    route["_id"] = str(route["_id"])
-    return route
+    return route_response(route)
 
 @router.delete("/{route_id}", status_code=204)
 async def delete_route(route_id: str, current_user: dict = Depends(get_current_user)):
@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Response
+from backend.core.config import settings
+from backend.core.cache_control import CachePolicyRoute, cache_control, PUBLIC_CATALOG
+from backend.core.bulkhead import bulkhead_guard
+from backend.core.circuit_breaker import serves_from_snapshot
+from backend.core.etag import make_etag, etag_matches, not_modified
+from backend.db.catalog import public_catalog
+from backend.db.models import route as route_crud
+from backend.geo.tiles import route_tiles
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+router = APIRouter(prefix="/tiles", tags=["tiles"], route_class=CachePolicyRoute,
+                   dependencies=[Depends(bulkhead_guard())])
+
+# Sin foto del catálogo las rutas se leen de BD, pero como mucho una vez por
+# intervalo de refresco del catálogo y en una sola petición: las demás esperan y
+# reutilizan el índice cargado
+_fallback_lock = asyncio.Lock()
+_fallback_loaded_at = float("-inf")
+
+
+async def _sync_from_db() -> None:
+    global _fallback_loaded_at
+    async with _fallback_lock:
+        if time.monotonic() - _fallback_loaded_at < settings.PUBLIC_CATALOG_REFRESH_SECONDS:
+            return
+        await route_tiles.sync(await route_crud.get_all_routes(True))
+        _fallback_loaded_at = time.monotonic()
+
+
+@router.get("/routes/{z}/{x}/{y}.mvt", response_class=Response,
+            responses={200: {"content": {MVT_MEDIA_TYPE: {}}}})
+@cache_control(PUBLIC_CATALOG)
+@serves_from_snapshot(public_catalog.available)
+async def route_tile(request: Request,
+                     z: int = Path(..., ge=0, le=settings.TILES_MAX_ZOOM),
+                     x: int = Path(..., ge=0),
+                     y: int = Path(..., ge=0)):
+    '''
+    Tesela vectorial (MVT, capa "routes") con los trazados públicos que la cruzan,
+    recortados y simplificados para su zoom. Propiedades: id, name, category.
+    '''
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(status_code=404, detail="Tesela fuera de rango")
+
+    # Foto del catálogo en memoria; sin ella (desactivado o demasiado vieja) se lee de BD
+    snap = public_catalog.current()
+    if snap is not None:
+        await route_tiles.sync(snap.routes, source=snap)
+    else:
+        await _sync_from_db()
+
+    data = await route_tiles.tile(z, x, y)
+    etag = make_etag("tile", z, x, y, hashlib.sha256(data).hexdigest())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=data, media_type=MVT_MEDIA_TYPE, headers={"ETag": etag})
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from ..core.bulkhead import AUTH, bulkhead_guard
+from ..core.deadline import DeadlineRoute
 from ..db.models import user as user_crud
 from ..db.schemas.user import UserCreate, UserPublic
 
 
-router = APIRouter(prefix="/users", tags=["users"])
+# Registro: mismo compartimento que el login
+router = APIRouter(prefix="/users", tags=["users"], route_class=DeadlineRoute,
+                   dependencies=[Depends(bulkhead_guard(AUTH))])
 
 @router.post('', response_model=UserPublic, status_code=201)
 async def register_user(payload: UserCreate):
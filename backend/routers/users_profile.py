@@ -1,5 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from ..core.security import get_current_user
+from ..core.etag import make_etag, etag_matches, not_modified
+from ..core.serialization import routes_response
+from ..core.cache_control import CachePolicyRoute, cache_control, PRIVATE_REVALIDATE, NO_STORE
+from ..core.bulkhead import bulkhead_guard
 from ..db.models import user as user_crud
 from ..db.models import route as route_crud
 from ..db.schemas.user import UserProfile, UserUpdate, ProfileStats, UserPublic
@@ -7,10 +11,12 @@ from ..db.schemas.route import RoutePublic
 from ..db.models import favorite as favorite_crud
 from pymongo.errors import DuplicateKeyError
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=CachePolicyRoute,
+                   dependencies=[Depends(bulkhead_guard())])
 
 # === Datos básicos del usuario autenticado (como el response del registro) ===
 @router.get("/me", response_model=UserPublic, response_model_exclude_none=True)
+@cache_control(PRIVATE_REVALIDATE)
 async def get_me(user = Depends(get_current_user)):
     return {
         "id": str(user["_id"]),
@@ -21,13 +27,21 @@ async def get_me(user = Depends(get_current_user)):
 
 # Perfil completo (datos + métricas)
 @router.get("/me/profile", response_model=UserProfile)
-async def get_my_profile(user = Depends(get_current_user)):
+@cache_control(PRIVATE_REVALIDATE)
+async def get_my_profile(request: Request, response: Response, user = Depends(get_current_user)):
     """
     Devuelve el perfil del usuario autenticado (datos personales + métricas).
+    Con If-None-Match responde 304 sin validar ni serializar el perfil.
     """
-    return await user_crud.get_user_profile_dict(user)  # <-- faltaba await
+    profile = await user_crud.get_user_profile_dict(user)  # <-- faltaba await
+    etag = make_etag("profile", profile)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return profile
 
 @router.get("/check-username")
+@cache_control(NO_STORE)
 async def check_username(
     username: str = Query(..., min_length=3),
     user = Depends(get_current_user),
@@ -67,6 +81,7 @@ async def update_my_profile(payload: UserUpdate, user = Depends(get_current_user
 
 # ---- Stats agrupadas ----
 @router.get("/me/stats", response_model=ProfileStats)
+@cache_control(PRIVATE_REVALIDATE)
 async def get_my_stats(user = Depends(get_current_user)):
     uid = str(user["_id"])
     return ProfileStats(
@@ -77,22 +92,26 @@ async def get_my_stats(user = Depends(get_current_user)):
 
 # ---- Stats puntuales ----
 @router.get("/me/stats/routes-created", response_model=dict)
+@cache_control(PRIVATE_REVALIDATE)
 async def get_my_routes_created_count(user = Depends(get_current_user)):
     uid = str(user["_id"])
     return {"count": await user_crud.count_routes_created(uid)}
 
 @router.get("/me/stats/routes-completed", response_model=dict)
+@cache_control(PRIVATE_REVALIDATE)
 async def get_my_routes_completed_count(user = Depends(get_current_user)):
     uid = str(user["_id"])
     return {"count": await user_crud.count_routes_completed(uid)}
 
 @router.get("/me/stats/favorites", response_model=dict)
+@cache_control(PRIVATE_REVALIDATE)
 async def get_my_favorites_count(user = Depends(get_current_user)):
     uid = str(user["_id"])
     return {"count": await user_crud.count_favorites(uid)}
 
 # --- Getter para ver las rutas favoritas ---
 @router.get("/me/routes/favorites", response_model=list[RoutePublic])
+@cache_control(PRIVATE_REVALIDATE)
 async def list_my_favorite_routes(
     user = Depends(get_current_user),
     skip: int = Query(0, ge=0),
@@ -123,13 +142,7 @@ async def list_my_favorite_routes(
         else:
             owner_usernames[owner_id] = None
 
-    # Mapear a RoutePublic
-    payload = [
-        RoutePublic(
-            **{k: v for k, v in d.items() if k != "_id"},
-            owner_username=owner_usernames.get(str(d.get("owner_id"))),
-            **{"_id": d.get("_id") or d.get("id")}
-        )
-        for d in docs
-    ]
-    return payload
+    # Serialización directa a la forma de RoutePublic (sin re-validar lo que ya está en BD)
+    for d in docs:
+        d["owner_username"] = owner_usernames.get(str(d.get("owner_id")))
+    return routes_response(docs)
@@ -0,0 +1,230 @@
+'''
+Servidor de producción: gunicorn como gestor de procesos y workers uvicorn.
+
+Uso:
+    python -m backend.server                      # configuración de core/config.py (SERVER_*)
+    python -m backend.server --workers 4 --preload
+    python -m backend.server --print-config       # solo muestra la configuración efectiva
+
+- Nº de workers: uno por núcleo disponible (afinidad de CPU y cuota del cgroup, que
+  es lo que ve un contenedor), limitado por MONGO_POOL_BUDGET: cada worker abre su
+  propio pool de Motor, así que el presupuesto se reparte entre ellos y nunca se
+  arrancan más workers de los que caben con MONGO_MIN_POOL_PER_WORKER conexiones.
+- --preload importa la app una vez en el proceso maestro (arranque más rápido y
+  memoria compartida). Motor se crea en el startup de cada worker, después del fork.
+- Pool de geometría (geo/pool.py): los núcleos se reparten entre los workers, así
+  que cada uno arranca como mucho núcleos / workers procesos de cálculo.
+- SIGTERM: gunicorn deja de aceptar conexiones y cada worker drena las peticiones en
+  curso durante `drain_timeout` segundos; después corre el shutdown de la app
+  (close_db, change feed, catálogo) antes de que venza SERVER_GRACEFUL_TIMEOUT.
+'''
+import argparse
+import json
+import math
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from backend.core.config import settings
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+# Margen que queda tras el drenaje para el shutdown de la app (cerrar Motor, etc.)
+SHUTDOWN_MARGIN_SECONDS = 5
+
+
+# ============ NÚCLEOS Y WORKERS ============
+def cgroup_cpu_quota(root: Path = CGROUP_ROOT) -> Optional[float]:
+    '''
+    Núcleos que permite la cuota de CPU del cgroup (v2 o v1); None si no hay límite
+    '''
+    try:
+        quota, period = (root / "cpu.max").read_text().split()[:2]          # cgroup v2
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())         # cgroup v1
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:                  # macOS / Windows
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+@dataclass(frozen=True)
+class WorkerPlan:
+    workers: int
+    pool_size: int                          # maxPoolSize de Motor en cada worker
+
+
+def plan_workers(cpus: int, *, requested: Optional[int] = None, pool_size: int = 100,
+                 pool_budget: Optional[int] = None, min_pool_per_worker: int = 10) -> WorkerPlan:
+    '''
+    Workers y tamaño de pool por worker. Con presupuesto, workers x pool <= presupuesto
+    (salvo que se pidan explícitamente más workers de los que caben, a 1 conexión cada uno).
+    '''
+    workers = requested or cpus
+    if pool_budget is None:
+        return WorkerPlan(workers=max(1, workers), pool_size=pool_size)
+    if not requested:
+        workers = min(workers, pool_budget // max(1, min_pool_per_worker))
+    workers = max(1, workers)
+    return WorkerPlan(workers=workers, pool_size=max(1, min(pool_size, pool_budget // workers)))
+
+
+def geometry_workers(cpus: int, workers: int, requested: Optional[int] = None) -> int:
+    '''
+    Procesos del pool de geometría por worker: sin sobresuscribir los núcleos
+    '''
+    if requested is not None:
+        return requested
+    return max(1, cpus // max(1, workers))
+
+
+def drain_seconds(graceful_timeout: float) -> float:
+    return max(1.0, graceful_timeout - SHUTDOWN_MARGIN_SECONDS)
+
+
+# ============ CONFIGURACIÓN EFECTIVA ============
+@dataclass(frozen=True)
+class ServerConfig:
+    bind: str
+    workers: int
+    worker_pool_size: int
+    geometry_workers: int
+    mongo_pool_budget: Optional[int]
+    cpus: int
+    preload: bool
+    graceful_timeout: int
+    drain_timeout: float
+    timeout: int
+    keepalive: int
+    max_requests: int
+    max_requests_jitter: int
+
+    @property
+    def max_mongo_connections(self) -> int:
+        return self.workers * self.worker_pool_size
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "max_mongo_connections": self.max_mongo_connections}
+
+    def gunicorn_options(self) -> dict:
+        return {
+            "bind": self.bind,
+            "workers": self.workers,
+            "worker_class": DrainingUvicornWorker,
+            "preload_app": self.preload,
+            "graceful_timeout": self.graceful_timeout,
+            "timeout": self.timeout,
+            "keepalive": self.keepalive,
+            "max_requests": self.max_requests,
+            "max_requests_jitter": self.max_requests_jitter,
+        }
+
+
+def build_config(args: Optional[argparse.Namespace] = None) -> ServerConfig:
+    '''
+    Configuración efectiva: argumentos de línea de comandos sobre core/config.py
+    '''
+    args = args or parse_args([])
+    cpus = available_cpus()
+    plan = plan_workers(
+        cpus,
+        requested=args.workers,
+        pool_size=settings.MONGO_MAX_POOL_SIZE,
+        pool_budget=settings.MONGO_POOL_BUDGET,
+        min_pool_per_worker=settings.MONGO_MIN_POOL_PER_WORKER,
+    )
+    return ServerConfig(
+        bind=args.bind,
+        workers=plan.workers,
+        worker_pool_size=plan.pool_size,
+        geometry_workers=geometry_workers(cpus, plan.workers, settings.GEOMETRY_POOL_WORKERS),
+        mongo_pool_budget=settings.MONGO_POOL_BUDGET,
+        cpus=cpus,
+        preload=args.preload,
+        graceful_timeout=args.graceful_timeout,
+        drain_timeout=drain_seconds(args.graceful_timeout),
+        timeout=settings.SERVER_TIMEOUT,
+        keepalive=settings.SERVER_KEEPALIVE,
+        max_requests=settings.SERVER_MAX_REQUESTS,
+        max_requests_jitter=settings.SERVER_MAX_REQUESTS_JITTER,
+    )
+
+
+# ============ GUNICORN ============
+class DrainingUvicornWorker(UvicornWorker):
+    '''
+    Worker uvicorn que, al recibir SIGTERM, espera a las peticiones en curso como
+    mucho `drain_seconds(graceful_timeout)` y luego ejecuta el shutdown de la app.
+    '''
+    CONFIG_KWARGS = {"loop": "auto", "http": "auto", "lifespan": "on"}
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = drain_seconds(self.cfg.graceful_timeout)
+
+
+class RexApplication(BaseApplication):
+    def __init__(self, config: ServerConfig) -> None:
+        self.server_config = config
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.server_config.gunicorn_options().items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from backend.main import app
+        return app
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m backend.server", description="Servidor de producción de Rex")
+    parser.add_argument("--bind", default=f"{settings.SERVER_HOST}:{settings.SERVER_PORT}")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="Por defecto: núcleos disponibles, limitado por MONGO_POOL_BUDGET")
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=settings.SERVER_PRELOAD)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.SERVER_GRACEFUL_TIMEOUT)
+    parser.add_argument("--print-config", action="store_true",
+                        help="Muestra la configuración efectiva y sale")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    config = build_config(args)
+    print(json.dumps({"server": config.as_dict()}), flush=True)
+    if args.print_config:
+        return
+    # Cada worker hereda el tamaño de pool repartido (también sin --preload: la config
+    # ya está importada en el maestro antes del fork)
+    settings.MONGO_MAX_POOL_SIZE = config.worker_pool_size
+    os.environ["MONGO_MAX_POOL_SIZE"] = str(config.worker_pool_size)
+    settings.GEOMETRY_POOL_WORKERS = config.geometry_workers
+    os.environ["GEOMETRY_POOL_WORKERS"] = str(config.geometry_workers)
+    RexApplication(config).run()
+
+
+if __name__ == "__main__":
+    main()
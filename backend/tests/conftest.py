@@ -9,6 +9,9 @@ os.environ.setdefault("CORS_ORIGINS", "[]")  # Pydantic espera JSON para listas
 # Si tu Settings usa DATABASE_NAME y no tiene default:
 os.environ.setdefault("DATABASE_NAME", "rex_test")
 
+# Trabajos en segundo plano en memoria: los endpoints encolan sin tocar Mongo
+os.environ.setdefault("JOBS_BACKEND", "memory")
+
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient, ASGITransport
@@ -0,0 +1,64 @@
+import pytest
+from fastapi import APIRouter, FastAPI, File, UploadFile
+from httpx import AsyncClient, ASGITransport
+
+from backend.core.body_limit import BodyLimitRoute, max_body_size
+
+
+@pytest.fixture
+def received():
+    return []
+
+
+@pytest.fixture
+async def ac(received):
+    router = APIRouter(route_class=BodyLimitRoute)
+
+    @router.post("/upload")
+    @max_body_size(1000)
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    @router.post("/free")
+    async def free(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async def counting(scope, receive, send):
+        async def counted():
+            message = await receive()
+            received.append(len(message.get("body", b"")))
+            return message
+        await app(scope, counted, send)
+
+    async with AsyncClient(transport=ASGITransport(app=counting), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_small_uploads_pass(ac):
+    r = await ac.post("/upload", files={"file": ("a.gpx", b"x" * 500)})
+    assert r.status_code == 200 and r.json() == {"size": 500}
+    assert (await ac.post("/free", files={"file": ("a.gpx", b"x" * 5000)})).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_content_length_over_the_limit_is_rejected_unread(ac, received):
+    r = await ac.post("/upload", files={"file": ("a.gpx", b"x" * 5000)})
+    assert r.status_code == 413
+    assert received == []                   # ni un byte del cuerpo
+
+
+@pytest.mark.anyio
+async def test_chunked_body_is_cut_when_it_passes_the_limit(ac, received):
+    async def chunks():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.gpx"\r\n\r\n'
+        for _ in range(100):
+            yield b"x" * 400
+
+    r = await ac.post("/upload", content=chunks(),
+                      headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert r.status_code == 413
+    assert sum(received) <= 1400
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, Request
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient, ASGITransport
+
+from backend.core import metrics
+from backend.core.bulkhead import (
+    AUTH, READS, WRITES, Bulkhead, BulkheadFull, bulkhead, bulkhead_guard, get_bulkhead, hold_for_stream,
+    reset_bulkheads,
+)
+from backend.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def small_bulkheads(monkeypatch):
+    monkeypatch.setattr(settings, "MONGO_MAX_POOL_SIZE", 10)
+    monkeypatch.setattr(settings, "BULKHEAD_POOL_SHARES", {READS: 0.1, WRITES: 0.2, AUTH: 0.1})
+    monkeypatch.setattr(settings, "BULKHEAD_QUEUE_SIZES", {READS: 1, WRITES: 0, AUTH: 0})
+    monkeypatch.setattr(settings, "BULKHEAD_QUEUE_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "BULKHEAD_RETRY_AFTER_SECONDS", 3)
+    reset_bulkheads()
+    yield
+    reset_bulkheads()
+
+
+@pytest.mark.anyio
+async def test_waits_in_queue_then_enters():
+    bh = Bulkhead("t", limit=1, max_queue=1, timeout=1.0)
+    await bh.acquire()
+    waiter = asyncio.create_task(bh.acquire())
+    await asyncio.sleep(0)
+    assert bh.waiting == 1
+    bh.release()
+    await waiter
+    assert bh.in_use == 1 and bh.waiting == 0
+    assert bh.acquired_total == 2
+
+
+@pytest.mark.anyio
+async def test_rejects_when_queue_full_or_wait_times_out():
+    bh = Bulkhead("t", limit=1, max_queue=1, timeout=0.05)
+    await bh.acquire()
+    waiter = asyncio.create_task(bh.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(BulkheadFull) as exc:
+        await bh.acquire()
+    assert exc.value.reason == "queue_full"
+    with pytest.raises(BulkheadFull) as exc:
+        await waiter
+    assert exc.value.reason == "timeout"
+    assert bh.rejected == {"queue_full": 1, "timeout": 1}
+    assert bh.waiting == 0 and bh.in_use == 1
+
+
+def test_limits_come_from_pool_shares():
+    assert get_bulkhead(READS).limit == 1
+    assert get_bulkhead(WRITES).limit == 2
+    assert get_bulkhead(AUTH).max_queue == 0
+
+
+@pytest.fixture
+def gate():
+    return asyncio.Event()
+
+
+@pytest.fixture
+def test_app(gate):
+    api = APIRouter(prefix="/api", dependencies=[Depends(bulkhead_guard())])
+
+    @api.get("/slow")
+    async def slow():
+        await gate.wait()
+        return {"ok": True}
+
+    @api.get("/export")
+    async def export(request: Request, held: bool = True):
+        async def body():
+            # Mientras se envía el cuerpo (como un export desde el cursor)
+            for _ in range(3):
+                yield f"{get_bulkhead(READS).in_use},".encode()
+        response = StreamingResponse(body())
+        return hold_for_stream(request, response) if held else response
+
+    @api.get("/login-like")
+    @bulkhead(AUTH)
+    async def login_like():
+        return {"ok": True}
+
+    @api.post("/write")
+    async def write():
+        return {"ok": True}
+
+    auth = APIRouter(prefix="/auth", dependencies=[Depends(bulkhead_guard(AUTH))])
+
+    @auth.get("/me")
+    async def me():
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(api)
+    app.include_router(auth)
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_saturated_reads_get_503_but_auth_and_writes_keep_capacity(ac, gate):
+    first = asyncio.create_task(ac.get("/api/slow"))
+    while get_bulkhead(READS).in_use == 0:
+        await asyncio.sleep(0.001)
+
+    # Lecturas: una en cola hasta el timeout, la siguiente ni siquiera cabe en la cola
+    queued = asyncio.create_task(ac.get("/api/slow"))
+    while get_bulkhead(READS).waiting == 0:
+        await asyncio.sleep(0.001)
+    rejected = await ac.get("/api/slow")
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "3"
+
+    # Capacidad reservada: login (por endpoint o por router) y escrituras siguen entrando
+    assert (await ac.get("/api/login-like")).status_code == 200
+    assert (await ac.get("/auth/me")).status_code == 200
+    assert (await ac.post("/api/write")).status_code == 200
+
+    assert (await queued).status_code == 503
+    gate.set()
+    assert (await first).status_code == 200
+    assert get_bulkhead(READS).in_use == 0
+
+    text = metrics.render()
+    assert 'rex_bulkhead_rejected_total{bulkhead="reads",reason="queue_full"} 1' in text
+    assert 'rex_bulkhead_rejected_total{bulkhead="reads",reason="timeout"} 1' in text
+    assert 'rex_bulkhead_queue_depth_max{bulkhead="reads"} 1' in text
+    assert 'rex_bulkhead_acquired_total{bulkhead="auth"} 2' in text
+
+
+@pytest.mark.anyio
+async def test_disabled(ac, gate, monkeypatch):
+    monkeypatch.setattr(settings, "BULKHEADS_ENABLED", False)
+    gate.set()
+    results = await asyncio.gather(*(ac.get("/api/slow") for _ in range(5)))
+    assert all(r.status_code == 200 for r in results)
+
+
+@pytest.mark.anyio
+async def test_streaming_body_keeps_the_slot(ac):
+    held = await ac.get("/api/export")
+    assert held.status_code == 200 and held.text == "1,1,1,"
+    assert get_bulkhead(READS).in_use == 0
+
+    # Sin traspaso, el hueco se libera antes de enviar el cuerpo
+    assert (await ac.get("/api/export", params={"held": False})).text == "0,0,0,"
+    assert get_bulkhead(READS).in_use == 0
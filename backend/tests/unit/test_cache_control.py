@@ -0,0 +1,134 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from httpx import AsyncClient, ASGITransport
+
+from backend.core.cache_control import (
+    CachePolicy, get_cache_policy, PUBLIC_CATALOG, PRIVATE_REVALIDATE, NO_STORE,
+)
+from backend.core.config import settings
+from backend.routers import routes as routes_mod
+from backend.routers import favorite as favorite_mod
+from backend.routers import users_profile as users_profile_mod
+from backend.routers import auth as auth_mod
+
+
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123", "email": "u@e.com", "is_active": True}
+
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+def _route(_id="1", vis=True):
+    return {
+        "_id": _id, "name": "R", "visibility": vis, "owner_id": "x",
+        "points": [{"latitude": 1, "longitude": 1}] * 3,
+        "description": "d", "category": "c", "created_at": "2025-01-01T00:00:00Z",
+    }
+
+
+# ---------- Políticas ----------
+
+def test_policy_header_values():
+    assert PUBLIC_CATALOG.header_value() == (
+        f"public, max-age={settings.CACHE_PUBLIC_MAX_AGE}, "
+        f"stale-while-revalidate={settings.CACHE_PUBLIC_STALE_WHILE_REVALIDATE}, "
+        f"stale-if-error={settings.CACHE_PUBLIC_STALE_IF_ERROR}"
+    )
+    assert PRIVATE_REVALIDATE.header_value() == "private, no-cache"
+    assert NO_STORE.header_value() == "no-store"
+    assert CachePolicy(no_store=True, public=True).header_value() == "no-store"
+
+
+def _policies(router):
+    return {
+        (route.path, method): get_cache_policy(route.endpoint)
+        for route in router.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+
+
+def test_public_catalog_endpoints_are_public():
+    policies = _policies(routes_mod.router)
+    for path in ("/routes", "/routes/user/{username}", "/routes/by-name/{name}", "/routes/clusters"):
+        assert policies[(path, "GET")] is PUBLIC_CATALOG, path
+
+
+def test_user_scoped_endpoints_are_never_public():
+    policies = {}
+    for router in (routes_mod.router, favorite_mod.router, users_profile_mod.router, auth_mod.router):
+        policies.update(_policies(router))
+
+    public_paths = {"/routes", "/routes/user/{username}", "/routes/by-name/{name}", "/routes/clusters"}
+    for (path, method), policy in policies.items():
+        if method != "GET" or path in public_paths:
+            continue
+        # Todo GET debe declarar política y ninguna puede ser pública
+        assert policy is not None, path
+        assert not policy.public, path
+        assert policy.private or policy.no_store, path
+
+
+# ---------- Cabeceras en las respuestas ----------
+
+@pytest.mark.anyio
+async def test_list_routes_sends_public_cache_control(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_all_routes(public_only):
+        return [_route()]
+
+    monkeypatch.setattr(route_crud, "get_all_routes", fake_get_all_routes, raising=True)
+    res = await ac.get("/routes")
+    assert res.status_code == 200
+    assert res.headers["cache-control"] == PUBLIC_CATALOG.header_value()
+
+
+@pytest.mark.anyio
+async def test_list_all_routes_including_private_is_no_store(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_all_routes(public_only):
+        return [_route(vis=False)]
+
+    monkeypatch.setattr(route_crud, "get_all_routes", fake_get_all_routes, raising=True)
+    res = await ac.get("/routes", params={"public_only": "false"})
+    assert res.headers["cache-control"] == "no-store"
+
+
+@pytest.mark.anyio
+async def test_my_routes_is_private(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_routes_by_owner(owner_id, *, public_only=None, skip=0, limit=50):
+        return [_route()]
+
+    monkeypatch.setattr(route_crud, "get_routes_by_owner", fake_get_routes_by_owner, raising=True)
+    res = await ac.get("/routes/me")
+    assert res.headers["cache-control"] == "private, no-cache"
+
+
+@pytest.mark.anyio
+async def test_errors_do_not_get_cache_policy(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_public_route_by_name(name):
+        return None
+
+    monkeypatch.setattr(route_crud, "get_public_route_by_name", fake_get_public_route_by_name, raising=True)
+    res = await ac.get("/routes/by-name/nada")
+    assert res.status_code == 404
+    assert "cache-control" not in res.headers
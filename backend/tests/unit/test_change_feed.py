@@ -0,0 +1,211 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import backend.db.client as db_client
+from backend.db.client import InvalidationEvent
+
+
+@pytest.fixture
+def events():
+    # Suscriptor de prueba sobre las tres colecciones vigiladas
+    received: list[InvalidationEvent] = []
+    for coll in db_client.WATCHED_COLLECTIONS:
+        db_client.subscribe(coll, received.append)
+    yield received
+    for coll in db_client.WATCHED_COLLECTIONS:
+        db_client.unsubscribe(coll, received.append)
+
+
+# ---------- Bus local ----------
+
+def test_publish_reaches_only_collection_subscribers(events):
+    db_client.publish(InvalidationEvent("routes", "insert", "r1"))
+    db_client.publish(InvalidationEvent("other", "insert", "x"))
+    assert events == [InvalidationEvent("routes", "insert", "r1")]
+
+
+def test_failing_subscriber_does_not_block_others(events):
+    def boom(_event):
+        raise RuntimeError("fallo")
+
+    db_client.subscribe("routes", boom)
+    try:
+        db_client.publish(InvalidationEvent("routes", "delete", "r1"))
+    finally:
+        db_client.unsubscribe("routes", boom)
+    assert len(events) == 1
+
+
+def test_notify_change_is_local_only_without_change_stream(events, monkeypatch):
+    db_client.notify_change("users", "update", ObjectId("65e1234567890abcdef12345"))
+    assert events == [InvalidationEvent("users", "update", "65e1234567890abcdef12345")]
+    assert db_client.change_feed_mode() == "local"
+
+    # Con change stream activo el evento llegará por el stream, no se duplica
+    monkeypatch.setattr(db_client, "_change_feed_active", True)
+    db_client.notify_change("users", "update", "u1")
+    assert len(events) == 1
+
+
+@pytest.mark.anyio
+async def test_route_crud_writes_publish_events(events, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    class _Col:
+        async def insert_one(self, doc):
+            class _R:
+                inserted_id = ObjectId()
+            return _R()
+
+        async def delete_one(self, filter_):
+            class _D:
+                deleted_count = 1
+            return _D()
+
+    class _DB:
+        def __getitem__(self, name):
+            return _Col()
+
+    monkeypatch.setattr(db_client, "db", _DB(), raising=True)
+    route = await route_crud.create_route("u1", {
+        "name": "R", "points": [], "description": "d", "category": "c",
+    })
+    await route_crud.delete_route(str(route["_id"]), "u1")
+
+    assert [(e.collection, e.operation) for e in events] == [("routes", "insert"), ("routes", "delete")]
+    assert events[0].document_id == str(route["_id"])
+
+
+# ---------- Change stream ----------
+
+class FakeStateCol:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, filter_):
+        return self.docs.get(filter_["_id"])
+
+    async def update_one(self, filter_, update, upsert=False):
+        self.docs.setdefault(filter_["_id"], {"_id": filter_["_id"]}).update(update["$set"])
+
+
+class FakeStream:
+    def __init__(self, changes):
+        self._changes = list(changes)
+        self.resume_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._changes:
+            raise StopAsyncIteration
+        change = self._changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+
+def _change(token, coll, op, key="k1"):
+    return {"_id": {"_data": token}, "ns": {"db": "rex", "coll": coll},
+            "operationType": op, "documentKey": {"_id": key}}
+
+
+@pytest.mark.anyio
+async def test_consume_publishes_typed_events_and_persists_token(events, monkeypatch):
+    state = FakeStateCol()
+
+    class _DB:
+        def __getitem__(self, name):
+            assert name == db_client.CHANGE_FEED_STATE_COLL
+            return state
+
+    monkeypatch.setattr(db_client, "db", _DB(), raising=True)
+    stream = FakeStream([
+        _change("t1", "routes", "insert", "r1"),
+        _change("t2", "favorites", "update", "u1"),
+        _change("t3", "users", "drop"),
+    ])
+    await db_client._consume(stream)
+
+    assert events == [
+        InvalidationEvent("routes", "insert", "r1"),
+        InvalidationEvent("favorites", "update", "u1"),
+        InvalidationEvent("users", "invalidate", None),
+    ]
+    # El último token queda guardado para reanudar tras un reinicio
+    assert await db_client._load_resume_token() == {"_data": "t3"}
+
+
+@pytest.mark.anyio
+async def test_change_feed_falls_back_to_local_bus_on_standalone(monkeypatch):
+    state = FakeStateCol()
+
+    class _Watch:
+        async def __aenter__(self):
+            raise OperationFailure("$changeStream only supported on replica sets", code=40573)
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _DB:
+        def __getitem__(self, name):
+            return state
+
+        def watch(self, pipeline, resume_after=None):
+            return _Watch()
+
+    monkeypatch.setattr(db_client, "db", _DB(), raising=True)
+    # Termina sin reintentos: queda el bus local
+    await db_client._run_change_feed()
+    assert db_client.change_feed_mode() == "local"
+
+
+def test_catalog_subscribes_to_route_events(monkeypatch):
+    from backend.db.catalog import public_catalog
+
+    public_catalog._wake.clear()
+    db_client.publish(InvalidationEvent("routes", "delete", "r1"))
+    assert public_catalog._wake.is_set()
+    public_catalog._wake.clear()
+
+
+@pytest.mark.anyio
+async def test_expired_token_is_dropped_even_if_it_cannot_be_cleared(events, monkeypatch):
+    from pymongo.errors import AutoReconnect
+
+    state = FakeStateCol()
+    state.docs[db_client.settings.CHANGE_FEED_NAME] = {"resume_token": {"_data": "viejo"}}
+
+    async def failing_update(*args, **kwargs):
+        raise AutoReconnect("primario caído")
+    state.update_one = failing_update
+    resumed = []
+
+    class _Watch:
+        def __init__(self, token):
+            resumed.append(token)
+
+        async def __aenter__(self):
+            if len(resumed) == 1:
+                raise OperationFailure("resume point no longer in the oplog", code=286)
+            raise OperationFailure("$changeStream only supported on replica sets", code=40573)
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _DB:
+        def __getitem__(self, name):
+            return state
+
+        def watch(self, pipeline, resume_after=None):
+            return _Watch(resume_after)
+
+    async def no_sleep(seconds):
+        pass
+    monkeypatch.setattr(db_client, "db", _DB(), raising=True)
+    monkeypatch.setattr(db_client.asyncio, "sleep", no_sleep)
+    await db_client._run_change_feed()
+    # El fallo al borrar no escapa del bucle y no se vuelve a usar el token caducado
+    assert resumed == [{"_data": "viejo"}, None]
+    assert ("routes", "invalidate") in [(e.collection, e.operation) for e in events]
@@ -0,0 +1,308 @@
+import time
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
+from httpx import AsyncClient, ASGITransport
+from pymongo.errors import NetworkTimeout, ServerSelectionTimeoutError
+
+from backend.core import circuit_breaker as cb
+from backend.core.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, StaleCache, stale_on_outage,
+)
+from backend.core.config import settings
+from backend.core.deadline import DeadlineRoute
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+# ---------- Máquina de estados ----------
+def test_opens_after_consecutive_failures_and_success_resets_count():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()                 # ya no son seguidos
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+    assert breaker.acquire() is None
+    assert breaker.rejected == 1
+
+
+def test_half_open_lets_a_single_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 4
+    assert breaker.retry_after() == 6
+    clock.now += 6
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire() == HALF_OPEN
+    assert breaker.acquire() is None         # solo una prueba a la vez
+    breaker.end_probe()                      # la prueba no tocó Mongo: otra puede probar
+    assert breaker.acquire() == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.acquire() == CLOSED
+
+
+def test_failed_probe_reopens_for_a_new_period():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.acquire() == HALF_OPEN
+    breaker.record_failure()                 # basta un fallo en semiabierto
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    clock.now += 9
+    assert breaker.acquire() is None
+
+
+def test_listener_closes_the_circuit_on_any_completed_command():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, clock=FakeClock())
+    breaker.record_failure()
+    cb.BreakerListener(breaker).succeeded(object())
+    assert breaker.state == CLOSED
+
+
+# ---------- Caché de la última respuesta buena ----------
+def test_stale_cache_is_bounded_by_entries_bytes_and_age():
+    clock = FakeClock()
+    cache = StaleCache(max_entries=2, max_bytes=10, max_age=60, clock=clock)
+    cache.put(("a",), JSONResponse([1]))
+    cache.put(("b",), JSONResponse([2]))
+    cache.get(("a",))                        # "a" pasa a ser la más reciente
+    cache.put(("c",), JSONResponse([3]))
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None
+    cache.put(("big",), JSONResponse(list(range(20))))      # más grande que todo el límite
+    assert cache.get(("big",)) is None
+    clock.now += 61
+    assert cache.get(("a",)) is None
+    assert cache.get(("c",)) is None
+    assert len(cache) == 0 and cache.size == 0
+
+
+# ---------- Integración con los routers ----------
+@pytest.fixture
+def breaker(monkeypatch):
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.clock = clock
+    monkeypatch.setattr(cb, "db_breaker", breaker)
+    monkeypatch.setattr(cb, "stale_cache", StaleCache(max_entries=10, max_bytes=1 << 20, max_age=3600))
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", True)
+    return breaker
+
+
+@pytest.fixture
+def mongo():
+    return {"up": True, "calls": 0, "version": 1}
+
+
+@pytest.fixture
+def test_app(mongo):
+    router = APIRouter(route_class=DeadlineRoute)
+
+    def read():
+        mongo["calls"] += 1
+        if not mongo["up"]:
+            raise ServerSelectionTimeoutError("No servers found yet")
+        return {"version": mongo["version"]}
+
+    @router.get("/routes")
+    @stale_on_outage
+    async def list_routes():
+        return JSONResponse(read(), headers={"ETag": f'"v{mongo["version"]}"'})
+
+    @router.get("/plain")
+    async def plain():
+        return read()
+
+    @router.post("/routes")
+    async def create():
+        return read()
+
+    @router.get("/slow")
+    async def slow():
+        # La consulta consume todo el presupuesto y pymongo corta por el deadline
+        time.sleep(0.12)
+        raise NetworkTimeout("timed out")
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_outage_serves_last_good_response_marked_stale(ac, breaker, mongo):
+    assert (await ac.get("/routes")).json() == {"version": 1}
+    mongo["up"] = False
+
+    # Mientras se acumulan fallos ya se sirve la copia (stale-if-error)
+    r = await ac.get("/routes")
+    assert r.status_code == 200
+    assert r.json() == {"version": 1}
+    assert r.headers["x-cache"] == "STALE"
+    assert r.headers["warning"] == '110 - "Response is Stale"'
+    assert r.headers["cache-control"] == "no-store"
+    assert r.headers["etag"] == '"v1"'
+
+    await ac.get("/routes")
+    assert breaker.state == OPEN
+    calls = mongo["calls"]
+    r = await ac.get("/routes")
+    assert r.json() == {"version": 1}
+    assert mongo["calls"] == calls           # con el circuito abierto no se toca Mongo
+
+    r = await ac.get("/routes", headers={"If-None-Match": '"v1"'})
+    assert r.status_code == 304
+    assert r.headers["x-cache"] == "STALE"
+
+
+@pytest.mark.anyio
+async def test_open_circuit_fails_fast_for_writes_and_uncached_reads(ac, breaker, mongo):
+    mongo["up"] = False
+    for _ in range(2):
+        r = await ac.post("/routes")
+        assert r.status_code == 503
+    assert breaker.state == OPEN
+    calls = mongo["calls"]
+
+    breaker.clock.now += 3
+    r = await ac.post("/routes")
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "7"
+    assert (await ac.get("/plain")).status_code == 503
+    assert (await ac.get("/routes")).status_code == 503     # nada guardado todavía
+    assert mongo["calls"] == calls
+
+
+@pytest.mark.anyio
+async def test_stale_copy_is_scoped_to_the_credential(ac, breaker, mongo):
+    assert (await ac.get("/routes", headers={"Authorization": "Bearer alice"})).status_code == 200
+    mongo["up"] = False
+    r = await ac.get("/routes", headers={"Authorization": "Bearer bob"})
+    assert r.status_code == 503
+    r = await ac.get("/routes", headers={"Authorization": "Bearer alice"})
+    assert r.headers["x-cache"] == "STALE"
+
+
+@pytest.mark.anyio
+async def test_probe_after_reset_timeout_closes_the_circuit(ac, breaker, mongo):
+    await ac.get("/routes")
+    mongo["up"] = False
+    await ac.get("/plain")
+    await ac.get("/plain")
+    assert breaker.state == OPEN
+
+    mongo["up"] = True
+    mongo["version"] = 2
+    breaker.clock.now += 10
+    r = await ac.get("/plain")
+    assert r.status_code == 200
+    # En producción lo cierra el listener de pymongo al completar el comando
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    r = await ac.get("/routes")
+    assert r.json() == {"version": 2}
+    assert "x-cache" not in r.headers
+
+
+@pytest.mark.anyio
+async def test_disabled_breaker_leaves_errors_to_the_deadline(ac, breaker, mongo, monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", False)
+    mongo["up"] = False
+    for _ in range(3):
+        assert (await ac.post("/routes")).status_code == 504
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.anyio
+async def test_expired_deadline_is_a_504_not_a_breaker_failure(ac, breaker):
+    for _ in range(3):
+        r = await ac.get("/slow", headers={"X-Request-Timeout": "0.1"})
+        assert r.status_code == 504
+    assert breaker.state == CLOSED and breaker._failures == 0
+@pytest.mark.anyio
+async def test_public_user_routes_survive_an_outage(breaker, monkeypatch):
+    from backend.routers import routes as routes_router
+    from backend.db.models import route as route_crud
+    from backend.db.models import user as user_crud
+
+    up = {"value": True}
+
+    async def fake_get_user_by_username(username):
+        if not up["value"]:
+            raise ServerSelectionTimeoutError("No servers found yet")
+        return {"_id": "u1", "username": username}
+
+    async def fake_get_routes_by_owner(owner_id, public_only=None, skip=0, limit=50):
+        return []
+
+    monkeypatch.setattr(user_crud, "get_user_by_username", fake_get_user_by_username, raising=True)
+    monkeypatch.setattr(route_crud, "get_routes_by_owner", fake_get_routes_by_owner, raising=True)
+
+    app = FastAPI()
+    app.include_router(routes_router.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.get("/routes/user/ana")).status_code == 200
+        up["value"] = False
+        r = await ac.get("/routes/user/ana")
+        assert r.status_code == 200
+        assert r.json() == []
+        assert r.headers["x-cache"] == "STALE"
+        assert (await ac.get("/routes/user/otro")).status_code == 503
+
+
+@pytest.mark.anyio
+async def test_snapshot_backed_endpoints_keep_serving_with_the_circuit_open(breaker, monkeypatch):
+    from datetime import datetime, timezone
+    from backend.db.catalog import build_snapshot, public_catalog
+    from backend.geo.clusters import RouteClusters
+    from backend.geo.tiles import RouteTiles, TileCache
+    from backend.routers import routes as routes_router
+    from backend.routers import tiles as tiles_router
+
+    doc = {"_id": "r1", "name": "Ruta", "description": "d", "category": "trail", "visibility": True,
+           "owner_id": "u1", "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+           "points": [{"latitude": 40.0, "longitude": -3.0}, {"latitude": 40.1, "longitude": -3.1}]}
+    monkeypatch.setattr(public_catalog, "_snapshot", build_snapshot([doc], 100))
+    monkeypatch.setattr(tiles_router, "route_tiles", RouteTiles(TileCache(max_entries=10, max_bytes=1 << 20)))
+    monkeypatch.setattr(routes_router, "route_clusters", RouteClusters(max_zoom=12, grid=8, max_results=50))
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    app = FastAPI()
+    app.include_router(routes_router.router)
+    app.include_router(tiles_router.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        r = await ac.get("/routes")
+        assert r.status_code == 200 and "x-cache" not in r.headers
+        assert [d["name"] for d in r.json()] == ["Ruta"]
+        assert (await ac.get("/tiles/routes/0/0/0.mvt")).status_code == 200
+        assert (await ac.get("/routes/clusters", params={"bbox": "-10,35,5,44", "zoom": 3})).status_code == 200
+        # Lo que no está en la foto sigue cortado
+        assert (await ac.get("/routes", params={"public_only": "false"})).status_code == 503
+
+        monkeypatch.setattr(public_catalog, "_snapshot", None)
+        assert (await ac.get("/tiles/routes/0/0/0.mvt")).status_code == 503
@@ -0,0 +1,156 @@
+import json
+import random
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.geo.clusters import RouteClusters, bbox_cells, start_point
+from backend.routers import routes as routes_mod
+
+CREATED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORLD = (-180.0, -85.0, 180.0, 85.0)
+SPAIN = (-10.0, 35.0, 5.0, 44.0)
+
+
+def route(route_id, lat, lon, **extra):
+    return {"_id": route_id, "visibility": True, "created_at": CREATED,
+            "points": [{"latitude": lat, "longitude": lon}, {"latitude": lat + 0.01, "longitude": lon}], **extra}
+
+
+def make_index(**kwargs):
+    options = dict(max_zoom=12, grid=8, max_results=50)
+    options.update(kwargs)
+    return RouteClusters(**options)
+
+
+def by_count(clusters):
+    return sorted(c["count"] for c in clusters)
+
+
+# ---------- Índice ----------
+def test_start_point_prefers_stored_measure():
+    assert start_point(route("a", 40.0, -3.0)) == (40.0, -3.0)
+    assert start_point(route("a", 40.0, -3.0, measures={"start": [41.0, -4.0]})) == (41.0, -4.0)
+    assert start_point({"_id": "x", "points": []}) is None
+
+
+def test_bbox_cells_split_at_the_antimeridian():
+    assert len(bbox_cells((170.0, -10.0, -170.0, 10.0), 2, 8)) == 2
+    ((x0, y0, x1, y1),) = bbox_cells(WORLD, 0, 8)
+    assert (x0, x1) == (0, 7) and y0 == 0 and y1 == 7
+
+
+def test_nearby_starts_merge_at_low_zoom_and_split_when_zooming_in():
+    index = make_index()
+    index.add("madrid-1", 40.41, -3.70)
+    index.add("madrid-2", 40.42, -3.71)
+    index.add("bcn", 41.39, 2.17)
+
+    zoom, clusters = index.query(SPAIN, 3)
+    assert zoom == 3 and by_count(clusters) == [1, 2]
+    madrid = next(c for c in clusters if c["count"] == 2)
+    assert madrid["route_id"] in {"madrid-1", "madrid-2"}
+    assert madrid["lat"] == pytest.approx(40.415) and madrid["lon"] == pytest.approx(-3.705)
+
+    _, clusters = index.query((-3.8, 40.3, -3.6, 40.5), 12)
+    assert by_count(clusters) == [1, 1]
+
+
+def test_remove_updates_every_level_and_representatives():
+    index = make_index()
+    index.add("a", 40.41, -3.70)
+    index.add("b", 40.42, -3.71)
+    (cluster,) = index.query(SPAIN, 2)[1]
+    rep = cluster["route_id"]
+
+    assert index.remove(rep)
+    (cluster,) = index.query(SPAIN, 2)[1]
+    assert cluster["count"] == 1 and cluster["route_id"] == ({"a", "b"} - {rep}).pop()
+    assert cluster["lat"] == pytest.approx(40.41 if rep == "b" else 40.42)
+
+    index.remove(cluster["route_id"])
+    assert index.query(WORLD, 5) == (5, [])
+    assert all(not level for level in index._levels)
+    assert not index.remove("nope")
+
+
+def test_large_boxes_fall_back_to_coarser_zooms():
+    rng = random.Random(7)
+    index = make_index(max_results=40)
+    for n in range(2000):
+        index.add(str(n), rng.uniform(-60, 70), rng.uniform(-179, 179))
+    zoom, clusters = index.query(WORLD, 10)
+    assert zoom < 10 and 0 < len(clusters) <= 40
+    assert sum(c["count"] for c in clusters) == 2000
+    assert len(json.dumps(clusters)) < 4096          # unos pocos KB
+
+
+@pytest.mark.anyio
+async def test_sync_applies_only_the_changes():
+    index = make_index()
+    docs = [route("a", 40.0, -3.0), route("b", 41.0, 2.0)]
+    assert await index.sync(docs, source="snap-1") == 2
+    assert await index.sync(docs, source="snap-1") == 0
+    # La medida guardada más tarde no cambia la salida: no se toca el índice
+    measured = [dict(docs[0], measures={"start": [40.0, -3.0]}), docs[1]]
+    generation = index.generation
+    assert await index.sync(measured, source="snap-2") == 0 and index.generation == generation
+
+    assert await index.sync([measured[0], route("c", 10.0, 10.0)], source="snap-3") == 2   # baja de b, alta de c
+    assert sorted(index._routes) == ["a", "c"]
+
+
+@pytest.mark.anyio
+async def test_many_changes_rebuild_the_index_off_the_loop():
+    index = make_index(rebuild_threshold=5)
+    await index.sync([route("old", 10.0, 10.0)])
+    docs = [route(str(n), 40.0 + n * 0.01, -3.0) for n in range(20)]
+    assert await index.sync(docs) == 21
+    assert "old" not in index._routes and len(index) == 20
+    (cluster,) = index.query(SPAIN, 2)[1]
+    assert cluster["count"] == 20
+    index.remove("0")                         # el índice reconstruido sigue siendo incremental
+    assert index.query(SPAIN, 2)[1][0]["count"] == 19
+
+
+# ---------- Endpoint ----------
+@pytest.mark.anyio
+async def test_clusters_endpoint(monkeypatch):
+    from backend.db.models import route as route_crud
+
+    index = make_index()
+    monkeypatch.setattr(routes_mod, "route_clusters", index)
+    monkeypatch.setattr(routes_mod.public_catalog, "current", lambda: None)
+    monkeypatch.setattr(routes_mod, "_clusters_loaded_at", float("-inf"))
+    loads = []
+
+    async def fake_get_public_route_starts():
+        loads.append(1)
+        return [route("a", 40.41, -3.70), route("b", 40.42, -3.71), route("c", 41.39, 2.17)]
+    monkeypatch.setattr(route_crud, "get_public_route_starts", fake_get_public_route_starts, raising=True)
+
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        r = await ac.get("/routes/clusters", params={"bbox": "-10,35,5,44", "zoom": 3})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["zoom"] == 3 and by_count(body["clusters"]) == [1, 2]
+        assert r.headers["cache-control"].startswith("public")
+
+        again = await ac.get("/routes/clusters", params={"bbox": "-10,35,5,44", "zoom": 3},
+                             headers={"If-None-Match": r.headers["etag"]})
+        assert again.status_code == 304
+
+        assert (await ac.get("/routes/clusters", params={"bbox": "1,2,3", "zoom": 3})).status_code == 422
+        assert (await ac.get("/routes/clusters", params={"bbox": "0,50,1,40", "zoom": 3})).status_code == 422
+
+        # Copias del mundo: longitudes fuera de ±180 se llevan a su rango
+        wrapped = await ac.get("/routes/clusters", params={"bbox": "350,35,365,44", "zoom": 3})
+        assert wrapped.status_code == 200 and by_count(wrapped.json()["clusters"]) == [1, 2]
+        whole = await ac.get("/routes/clusters", params={"bbox": "-400,-80,400,80", "zoom": 0})
+        assert sum(c["count"] for c in whole.json()["clusters"]) == 3
+        # Sin foto del catálogo la BD se lee una vez, no en cada consulta
+        assert len(loads) == 1
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, Request, Response
+from httpx import AsyncClient, ASGITransport
+
+from backend.core.coalescing import RequestCoalescingMiddleware
+
+
+@pytest.fixture
+def calls():
+    return {"n": 0}
+
+
+@pytest.fixture
+def coalesced_app(calls):
+    app = FastAPI()
+
+    # Handlers lentos: dan tiempo a que lleguen peticiones idénticas en paralelo
+    @app.get("/routes")
+    async def list_routes():
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        return [{"id": "1", "call": calls["n"]}]
+
+    @app.get("/routes/me")
+    async def my_routes():
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        return []
+
+    @app.get("/routes/etag")
+    async def with_etag(request: Request):
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        if request.headers.get("if-none-match") == '"v1"':
+            return Response(status_code=304, headers={"ETag": '"v1"'})
+        return Response(b'[{"id": "1"}]', media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/routes/cookie")
+    async def with_cookie(response: Response):
+        calls["n"] += 1
+        await asyncio.sleep(0.05)
+        response.set_cookie("x", "1")
+        return {}
+
+    app.add_middleware(RequestCoalescingMiddleware, paths=["/routes"], exclude_paths=["/routes/me"])
+    return app
+
+
+@pytest.fixture
+async def ac_coalesced(coalesced_app):
+    transport = ASGITransport(app=coalesced_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_identical_anonymous_requests_run_handler_once(ac_coalesced, calls):
+    results = await asyncio.gather(*[ac_coalesced.get("/routes") for _ in range(5)])
+
+    assert calls["n"] == 1
+    assert all(r.status_code == 200 for r in results)
+    # Todos reciben exactamente los mismos bytes
+    assert len({r.content for r in results}) == 1
+
+
+@pytest.mark.anyio
+async def test_different_query_is_not_coalesced(ac_coalesced, calls):
+    await asyncio.gather(
+        ac_coalesced.get("/routes", params={"public_only": "true"}),
+        ac_coalesced.get("/routes", params={"public_only": "false"}),
+    )
+    assert calls["n"] == 2
+
+
+@pytest.mark.anyio
+async def test_different_users_are_never_coalesced(ac_coalesced, calls):
+    await asyncio.gather(
+        ac_coalesced.get("/routes", headers={"Authorization": "Bearer a"}),
+        ac_coalesced.get("/routes", headers={"Authorization": "Bearer b"}),
+        ac_coalesced.get("/routes"),
+    )
+    assert calls["n"] == 3
+
+
+@pytest.mark.anyio
+async def test_same_user_requests_are_coalesced(ac_coalesced, calls):
+    await asyncio.gather(*[
+        ac_coalesced.get("/routes", headers={"Authorization": "Bearer a"}) for _ in range(3)
+    ])
+    assert calls["n"] == 1
+
+
+@pytest.mark.anyio
+async def test_excluded_user_paths_are_not_coalesced(ac_coalesced, calls):
+    await asyncio.gather(*[ac_coalesced.get("/routes/me") for _ in range(3)])
+    assert calls["n"] == 3
+
+
+@pytest.mark.anyio
+async def test_set_cookie_responses_are_not_shared(ac_coalesced, calls):
+    # Los seguidores no reciben la cookie del líder: ejecutan su propio handler
+    await asyncio.gather(*[ac_coalesced.get("/routes/cookie") for _ in range(3)])
+    assert calls["n"] == 3
+
+
+@pytest.mark.anyio
+async def test_sequential_requests_are_not_cached(ac_coalesced, calls):
+    # Solo se agrupan peticiones en vuelo, no es una caché
+    await ac_coalesced.get("/routes")
+    await ac_coalesced.get("/routes")
+    assert calls["n"] == 2
+
+
+@pytest.mark.anyio
+async def test_conditional_leader_does_not_share_its_304(ac_coalesced, calls):
+    async def plain():
+        await asyncio.sleep(0.01)           # llega con el líder condicional en curso
+        return await ac_coalesced.get("/routes/etag")
+
+    conditional, unconditional = await asyncio.gather(
+        ac_coalesced.get("/routes/etag", headers={"If-None-Match": '"v1"'}), plain(),
+    )
+    assert conditional.status_code == 304
+    assert unconditional.status_code == 200 and unconditional.json() == [{"id": "1"}]
+    assert calls["n"] == 2
+
+    # Dos peticiones con el mismo If-None-Match sí comparten el 304
+    same = await asyncio.gather(*[
+        ac_coalesced.get("/routes/etag", headers={"If-None-Match": '"v1"'}) for _ in range(3)])
+    assert [r.status_code for r in same] == [304] * 3 and calls["n"] == 3
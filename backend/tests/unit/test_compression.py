@@ -0,0 +1,121 @@
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import AsyncClient, ASGITransport
+
+from backend.core import compression as compression_mod
+from backend.core.compression import JSONCompressionMiddleware, accepts_gzip, gzip_etag
+from backend.core.etag import etag_matches
+
+BIG = [{"latitude": 41.387 + i * 1e-5, "longitude": 2.168} for i in range(2000)]
+
+
+@pytest.fixture
+def comp_app():
+    app = FastAPI()
+
+    @app.get("/big")
+    async def big(response: Response):
+        response.headers["ETag"] = '"v1"'
+        return BIG
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("x" * 5000)
+
+    @app.get("/stream")
+    async def stream():
+        async def gen():
+            for i in range(50):
+                yield (b'{"i":%d,"pad":"' % i) + b"y" * 200 + b'"}\n'
+        return StreamingResponse(gen(), media_type="application/geo+json")
+
+    app.add_middleware(
+        JSONCompressionMiddleware,
+        minimum_size=1024,
+        level=6,
+        content_types=["application/json", "application/geo+json"],
+        offload_size=10_000,
+    )
+    return app
+
+
+@pytest.fixture
+async def ac_comp(comp_app):
+    async with AsyncClient(transport=ASGITransport(app=comp_app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_large_json_is_gzipped(ac_comp):
+    res = await ac_comp.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in res.headers["vary"]
+    assert int(res.headers["content-length"]) < len(res.content)
+    assert res.json() == BIG
+    # ETag de la variante comprimida, distinta pero reconocible
+    assert res.headers["etag"] == '"v1-gzip"'
+
+
+@pytest.mark.anyio
+async def test_small_bodies_and_other_types_are_untouched(ac_comp):
+    small = await ac_comp.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    text = await ac_comp.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in text.headers
+
+
+@pytest.mark.anyio
+async def test_client_without_gzip_gets_identity(ac_comp):
+    res = await ac_comp.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in res.headers
+    assert res.json() == BIG
+
+    refused = await ac_comp.get("/big", headers={"Accept-Encoding": "br, gzip;q=0"})
+    assert "content-encoding" not in refused.headers
+    assert refused.json() == BIG
+
+
+def test_accepts_gzip_reads_q_values():
+    assert accepts_gzip("gzip") and accepts_gzip("br;q=1.0, gzip;q=0.5") and accepts_gzip("*")
+    assert accepts_gzip("GZIP ; Q=0.1")
+    assert not accepts_gzip("gzip;q=0") and not accepts_gzip("gzip; q=0.0, br")
+    assert not accepts_gzip("*, gzip;q=0") and not accepts_gzip("*;q=0") and not accepts_gzip("")
+    assert not accepts_gzip("x-gzipped")
+
+
+@pytest.mark.anyio
+async def test_streaming_responses_are_compressed_incrementally(ac_comp):
+    res = await ac_comp.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip"
+    assert "content-length" not in res.headers
+    assert res.text.count("\n") == 50
+
+
+@pytest.mark.anyio
+async def test_large_bodies_are_compressed_off_the_event_loop(ac_comp, monkeypatch):
+    calls = []
+    real = compression_mod.anyio.to_thread.run_sync
+
+    async def spy(fn, *args, **kwargs):
+        calls.append(fn)
+        return await real(fn, *args, **kwargs)
+
+    monkeypatch.setattr(compression_mod.anyio.to_thread, "run_sync", spy)
+    res = await ac_comp.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert calls == [compression_mod.gzip_bytes]
+
+
+def test_gzip_etag_still_matches_original_version():
+    class _Req:
+        headers = {"if-none-match": gzip_etag('"abc"')}
+
+    assert gzip_etag('"abc"') == '"abc-gzip"'
+    assert etag_matches(_Req(), '"abc"')
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from httpx import AsyncClient, ASGITransport
+from motor.frameworks.asyncio import run_on_executor
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout
+
+from backend.core import deadline
+from backend.core.config import settings
+from backend.core.deadline import DeadlineRoute, request_budget
+
+
+@pytest.fixture
+def state():
+    return {}
+
+
+@pytest.fixture
+def test_app(state):
+    router = APIRouter(route_class=DeadlineRoute)
+
+    @router.get("/budget")
+    async def budget():
+        # Lo que vería un hilo de Motor: el contexto (y el deadline de pymongo) viaja con él
+        loop = asyncio.get_running_loop()
+        in_thread = await run_on_executor(loop, _csot.remaining)
+        return {"remaining": deadline.remaining(), "pymongo": _csot.get_timeout(), "thread": in_thread}
+
+    @router.get("/slow")
+    @request_budget(0.05)
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return {"ok": True}
+
+    @router.get("/mongo-timeout")
+    async def mongo_timeout():
+        raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    @router.get("/unbounded")
+    @request_budget(None)
+    async def unbounded():
+        return {"remaining": deadline.remaining()}
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_default_budget_reaches_pymongo_and_motor_threads(ac, monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_SECONDS", 8.0)
+    body = (await ac.get("/budget")).json()
+    assert 7.0 < body["remaining"] <= 8.0
+    assert body["pymongo"] == 8.0
+    assert 7.0 < body["thread"] <= 8.0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("header, expected", [
+    ("2", 2.0),
+    ("30", 8.0),            # el cliente no puede alargar el presupuesto
+    ("0.001", 0.1),         # mínimo REQUEST_DEADLINE_MIN_SECONDS
+    ("abc", 8.0),
+    ("-1", 8.0),
+])
+async def test_client_header_can_only_shorten(ac, monkeypatch, header, expected):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_SECONDS", 8.0)
+    body = (await ac.get("/budget", headers={"X-Request-Timeout": header})).json()
+    assert body["pymongo"] == expected
+
+
+@pytest.mark.anyio
+async def test_expired_deadline_cancels_handler_with_504(ac, state):
+    res = await ac.get("/slow")
+    assert res.status_code == 504
+    assert res.json()["detail"] == "La petición ha superado su tiempo límite"
+    assert state["cancelled"] is True
+
+
+@pytest.mark.anyio
+async def test_mongo_timeout_becomes_504(ac):
+    res = await ac.get("/mongo-timeout")
+    assert res.status_code == 504
+
+
+@pytest.mark.anyio
+async def test_endpoint_without_deadline(ac):
+    assert (await ac.get("/unbounded")).json() == {"remaining": None}
+
+
+@pytest.mark.anyio
+async def test_disabled(ac, monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_ENABLED", False)
+    body = (await ac.get("/budget")).json()
+    assert body["remaining"] is None and body["pymongo"] is None
+
+
+def test_nested_scopes_only_shorten():
+    with deadline.deadline_scope(5):
+        with deadline.deadline_scope(10):
+            assert deadline.remaining() <= 5
+        with deadline.deadline_scope(1):
+            assert deadline.remaining() <= 1
+    assert deadline.remaining() is None
@@ -0,0 +1,184 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.core.etag import make_etag
+from backend.routers import routes as routes_mod
+from backend.routers import favorite as favorite_mod
+from backend.routers import users_profile as users_profile_mod
+
+
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+    app.include_router(favorite_mod.router)
+    app.include_router(users_profile_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123", "email": "u@e.com", "username": "u", "is_active": True}
+
+    for mod in (routes_mod, favorite_mod, users_profile_mod):
+        app.dependency_overrides[mod.get_current_user] = fake_current_user
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+def _route(_id="R1", owner="user123", vis=True):
+    return {
+        "_id": _id,
+        "name": "Ruta",
+        "owner_id": owner,
+        "visibility": vis,
+        "points": [{"latitude": 1, "longitude": 1}] * 3,
+        "description": "d",
+        "category": "c",
+        "created_at": "2025-01-01T00:00:00Z",
+    }
+
+
+def test_make_etag_is_strong_and_stable():
+    a = make_etag("route", "R1", "2025-01-01")
+    assert a.startswith('"') and a.endswith('"')
+    assert a == make_etag("route", "R1", "2025-01-01")
+    assert a != make_etag("route", "R1", "2025-01-02")
+
+
+# ---------- GET /routes/{route_id} ----------
+
+@pytest.mark.anyio
+async def test_get_route_returns_etag_and_304_from_version_projection(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_route_by_id(route_id):
+        return _route(route_id)
+
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+    res = await ac.get("/routes/R1")
+    assert res.status_code == 200
+    etag = res.headers["etag"]
+
+    # Revalidación: solo se usa la proyección de versión, nunca el documento completo
+    async def fake_get_route_version(route_id):
+        return {"_id": route_id, "owner_id": "user123", "visibility": True,
+                "created_at": "2025-01-01T00:00:00Z"}
+
+    async def fail_get_route_by_id(route_id):
+        raise AssertionError("No debe leerse el documento completo")
+
+    monkeypatch.setattr(route_crud, "get_route_version", fake_get_route_version, raising=True)
+    monkeypatch.setattr(route_crud, "get_route_by_id", fail_get_route_by_id, raising=True)
+
+    res = await ac.get("/routes/R1", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+    assert res.headers["etag"] == etag
+
+
+@pytest.mark.anyio
+async def test_get_route_stale_etag_returns_200(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_route_version(route_id):
+        return {"_id": route_id, "owner_id": "user123", "visibility": True,
+                "created_at": "2025-01-01T00:00:00Z", "updated_at": "2025-02-01T00:00:00Z"}
+
+    async def fake_get_route_by_id(route_id):
+        return {**_route(route_id), "updated_at": "2025-02-01T00:00:00Z"}
+
+    monkeypatch.setattr(route_crud, "get_route_version", fake_get_route_version, raising=True)
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+
+    res = await ac.get("/routes/R1", headers={"If-None-Match": '"viejo"'})
+    assert res.status_code == 200
+    assert res.json()["id"] == "R1"
+
+
+@pytest.mark.anyio
+async def test_get_route_conditional_keeps_access_rules(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_route_version(route_id):
+        return {"_id": route_id, "owner_id": "otro", "visibility": False,
+                "created_at": "2025-01-01T00:00:00Z"}
+
+    monkeypatch.setattr(route_crud, "get_route_version", fake_get_route_version, raising=True)
+    res = await ac.get("/routes/R1", headers={"If-None-Match": "*"})
+    assert res.status_code == 403
+
+
+# ---------- GET /routes/me ----------
+
+@pytest.mark.anyio
+async def test_my_routes_304_with_versions_only(ac, monkeypatch):
+    from backend.db.models import route as route_crud
+
+    async def fake_get_routes_by_owner(owner_id, *, public_only=None, skip=0, limit=50):
+        return [_route("1"), _route("2")]
+
+    monkeypatch.setattr(route_crud, "get_routes_by_owner", fake_get_routes_by_owner, raising=True)
+    res = await ac.get("/routes/me")
+    etag = res.headers["etag"]
+
+    async def fake_versions(owner_id, *, skip=0, limit=50):
+        return [{"_id": "1", "created_at": "2025-01-01T00:00:00Z"},
+                {"_id": "2", "created_at": "2025-01-01T00:00:00Z"}]
+
+    async def fail_by_owner(*a, **kw):
+        raise AssertionError("No debe leerse la página completa")
+
+    monkeypatch.setattr(route_crud, "get_route_versions_by_owner", fake_versions, raising=True)
+    monkeypatch.setattr(route_crud, "get_routes_by_owner", fail_by_owner, raising=True)
+
+    res = await ac.get("/routes/me", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+
+# ---------- /users/me/profile y /favorites/me ----------
+
+@pytest.mark.anyio
+async def test_profile_etag_roundtrip(ac, monkeypatch):
+    from backend.db.models import user as user_crud
+
+    profile = {
+        "id": "user123", "username": "u", "email": "u@e.com", "phone": None,
+        "preferred_units": "km", "avatar_url": None,
+        "stats": {"routes_created": 1, "routes_completed": 0, "routes_favorites": 2},
+    }
+
+    async def fake_profile(user):
+        return dict(profile)
+
+    monkeypatch.setattr(user_crud, "get_user_profile_dict", fake_profile, raising=True)
+    res = await ac.get("/users/me/profile")
+    etag = res.headers["etag"]
+
+    res = await ac.get("/users/me/profile", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    # Cambia una métrica -> nueva versión
+    profile["stats"] = {**profile["stats"], "routes_created": 2}
+    res = await ac.get("/users/me/profile", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_favorites_etag_roundtrip(ac, monkeypatch):
+    from backend.db.models import favorite as favorite_crud
+
+    async def fake_list_favorites(user_id):
+        return ["r1", "r2"]
+
+    monkeypatch.setattr(favorite_crud, "list_favorites", fake_list_favorites, raising=True)
+    res = await ac.get("/favorites/me")
+    etag = res.headers["etag"]
+
+    res = await ac.get("/favorites/me", headers={"If-None-Match": f'W/{etag}, "otro"'})
+    assert res.status_code == 304
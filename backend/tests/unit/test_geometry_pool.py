@@ -0,0 +1,124 @@
+import math
+import os
+from array import array
+
+import pytest
+
+from backend.db.models.route import PackedPoints
+from backend.geo import kernels
+from backend.geo.measure import route_measures
+from backend.geo.points import validate_points
+from backend.geo.pool import INLINE, POOL, GeometryPool, flatten
+from backend.server import geometry_workers
+
+
+def zigzag(n):
+    # Línea hacia el norte con un pequeño zigzag de ~1 m
+    return [{"latitude": 40.0 + i * 1e-4, "longitude": -3.0 + (1e-5 if i % 2 else 0.0)} for i in range(n)]
+
+
+def shm_names():
+    try:
+        return set(os.listdir("/dev/shm"))
+    except FileNotFoundError:           # pragma: no cover - sin /dev/shm
+        return set()
+
+
+# ---------- Conversión ----------
+def test_flatten_accepts_every_point_shape():
+    expected = array("d", [1.0, 2.0, 3.0, 4.0])
+    packed = PackedPoints(array("i", [10_000_000, 20_000_000, 30_000_000, 40_000_000]))
+    assert flatten([{"latitude": 1, "longitude": 2}, {"latitude": 3, "longitude": 4}]) == expected
+    assert flatten([[1, 2], [3, 4]]) == expected
+    assert flatten([1, 2, 3, 4]) == expected
+    assert flatten(validate_points([[1, 2], [3, 4]])) == expected
+    assert flatten(packed) == expected
+
+
+# ---------- Núcleos ----------
+def test_measure_kernel_matches_reference():
+    points = zigzag(50)
+    flat = flatten(points)
+    got = kernels.measure(flat, 50)
+    ref = route_measures((p["latitude"], p["longitude"]) for p in points)
+    assert got["points"] == ref["points"] and got["bbox"] == ref["bbox"] and got["start"] == ref["start"]
+    assert got["length_m"] == pytest.approx(ref["length_m"], abs=0.2)
+    assert kernels.measure(array("d"), 0) is None
+
+
+def test_simplify_kernel_drops_noise_but_keeps_corners():
+    # Ida al norte y vuelta al este: la esquina debe quedarse
+    north = [(40.0 + i * 1e-4, -3.0 + (1e-6 if i % 2 else 0.0)) for i in range(100)]
+    east = [(40.0099, -3.0 + i * 1e-4) for i in range(1, 100)]
+    flat = flatten(north + east)
+    keep = kernels.simplify_indices(flat, len(north) + len(east), 5.0)
+    assert list(keep) == [0, 99, 198]
+    assert list(kernels.simplify_indices(flat, 199, 0.0))[:3] == [0, 1, 2]
+
+
+def test_hausdorff_kernel():
+    a = flatten([(40.0, -3.0), (40.001, -3.0)])
+    b = flatten([(40.0, -3.0), (40.001, -3.0), (40.0005, -3.0)])
+    assert kernels.hausdorff_m(a, 2, a, 2) == 0.0
+    assert kernels.hausdorff_m(a, 2, b, 3) == pytest.approx(55.6, abs=0.5)
+    shifted = flatten([(40.0, -2.999), (40.001, -2.999)])
+    assert kernels.hausdorff_m(a, 2, shifted, 2) == pytest.approx(85.2, abs=0.5)
+    assert math.isinf(kernels.hausdorff_m(a, 2, array("d"), 0))
+
+
+# ---------- Servicio ----------
+@pytest.mark.anyio
+async def test_small_inputs_run_inline_without_starting_processes():
+    pool = GeometryPool(workers=2, min_points=1000)
+    result = await pool.measure(zigzag(10))
+    assert result["points"] == 10
+    assert pool._executor is None
+    assert pool.tasks[("measure", INLINE)] == 1
+
+
+@pytest.mark.anyio
+async def test_zero_workers_disables_the_pool():
+    pool = GeometryPool(workers=0, min_points=0)
+    assert (await pool.measure(zigzag(5)))["points"] == 5
+    assert pool._executor is None
+
+
+@pytest.mark.anyio
+async def test_large_inputs_go_through_shared_memory_processes():
+    pool = GeometryPool(workers=1, min_points=100)
+    before = shm_names()
+    try:
+        points = zigzag(2000)
+        measured = await pool.measure(points)
+        inline = GeometryPool(workers=0, min_points=0)
+        assert measured == await inline.measure(points)
+
+        simplified = await pool.simplify(points, 5.0)
+        assert simplified == [(40.0, -3.0), (points[-1]["latitude"], points[-1]["longitude"])]
+        assert await pool.hausdorff_m(points, points) == 0.0
+
+        assert pool.tasks[("measure", POOL)] == 1
+        assert pool.tasks[("simplify", POOL)] == 1
+        assert pool.tasks[("hausdorff", POOL)] == 1
+        assert pool.in_flight == 0
+    finally:
+        await pool.stop()
+    assert shm_names() <= before         # ningún bloque se queda sin liberar
+
+
+@pytest.mark.anyio
+async def test_errors_in_the_pool_are_reported_without_leaking_blocks():
+    pool = GeometryPool(workers=1, min_points=1)
+    before = shm_names()
+    try:
+        with pytest.raises(kernels.GeometryTaskError, match="TypeError"):
+            await pool.run("simplify", zigzag(10), args=("no es un número",))
+    finally:
+        await pool.stop()
+    assert shm_names() <= before
+
+
+def test_geometry_workers_share_the_cores_between_web_workers():
+    assert geometry_workers(8, 4) == 2
+    assert geometry_workers(2, 4) == 1
+    assert geometry_workers(8, 4, requested=0) == 0
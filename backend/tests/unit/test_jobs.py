@@ -0,0 +1,329 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.jobs import route_jobs
+from backend.jobs import runner as runner_mod
+from backend.jobs.runner import JobRunner
+from backend.jobs.stores import DONE, FAILED, PENDING, RUNNING, MemoryJobStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(clock):
+    return MemoryJobStore(clock=clock)
+
+
+def make_runner(store, **kwargs):
+    options = dict(concurrency=2, poll_interval=0.01, lease_seconds=5, max_attempts=3,
+                   backoff_base=10, backoff_max=100, drain_seconds=1, rng=lambda: 1.0)
+    options.update(kwargs)
+    return JobRunner(store, **options)
+
+
+# ---------- Almacén en memoria ----------
+@pytest.mark.anyio
+async def test_dedupe_key_only_merges_pending_jobs(store):
+    first, created = await store.add("a", {}, dedupe_key="k", max_attempts=3)
+    again, created_again = await store.add("a", {}, dedupe_key="k", max_attempts=3)
+    assert created and not created_again and again == first
+
+    await store.claim(lease_seconds=5, worker="w")
+    # Ya en ejecución: puede haber leído datos viejos, así que se encola otro
+    third, created_third = await store.add("a", {}, dedupe_key="k", max_attempts=3)
+    assert created_third and third != first
+
+
+@pytest.mark.anyio
+async def test_claim_respects_run_at_and_expired_leases(store, clock):
+    await store.add("later", {}, max_attempts=3, delay=60)
+    await store.add("now", {}, max_attempts=3)
+    job = await store.claim(lease_seconds=5, worker="w1")
+    assert job["name"] == "now" and job["status"] == RUNNING and job["attempts"] == 1
+    assert await store.claim(lease_seconds=5, worker="w2") is None
+
+    clock.advance(6)                    # el worker w1 murió: vence el lease
+    job = await store.claim(lease_seconds=5, worker="w2")
+    assert job["name"] == "now" and job["worker"] == "w2" and job["attempts"] == 2
+    await store.complete(job)
+
+    clock.advance(60)
+    assert (await store.claim(lease_seconds=5, worker="w2"))["name"] == "later"
+
+
+# ---------- Ejecutor ----------
+@pytest.mark.anyio
+async def test_retries_with_exponential_backoff_then_fails(store, clock):
+    runner = make_runner(store)
+    calls = []
+
+    @runner.handler("flaky")
+    async def flaky(payload):
+        calls.append(payload["n"])
+        raise ValueError("boom")
+
+    job_id = await runner.enqueue("flaky", {"n": 1})
+    stored = next(iter(store.jobs.values()))
+
+    assert await runner.run_once()
+    assert stored["status"] == PENDING and stored["last_error"] == "ValueError: boom"
+    assert stored["run_at"] == clock.now + timedelta(seconds=10)
+    assert not await runner.run_once()  # todavía no toca
+
+    clock.advance(10)
+    await runner.run_once()
+    assert stored["run_at"] == clock.now + timedelta(seconds=20)
+
+    clock.advance(20)
+    await runner.run_once()
+    assert stored["status"] == FAILED
+    assert calls == [1, 1, 1]
+    assert str(stored["_id"]) == job_id
+    assert runner._stats["flaky"].retried == 2 and runner._stats["flaky"].failed == 1
+
+
+@pytest.mark.anyio
+async def test_success_unknown_handler_and_metrics(store):
+    runner = make_runner(store)
+    seen = []
+
+    @runner.handler("ok")
+    async def ok(payload):
+        seen.append(payload)
+
+    await runner.enqueue("ok", {"x": 1}, dedupe_key="ok:1")
+    await runner.enqueue("ok", {"x": 1}, dedupe_key="ok:1")
+    await runner.enqueue("missing")
+    assert await runner.run_until_idle() == 2
+
+    statuses = sorted(j["status"] for j in store.jobs.values())
+    assert statuses == [DONE, FAILED]
+    assert seen == [{"x": 1}]
+    by_name = {(s.name, s.labels.get("job")): s.value for s in runner.samples()}
+    assert by_name[("rex_jobs_enqueued_total", "ok")] == 1
+    assert by_name[("rex_jobs_deduplicated_total", "ok")] == 1
+    assert by_name[("rex_jobs_succeeded_total", "ok")] == 1
+    assert by_name[("rex_jobs_failed_total", "missing")] == 1
+
+
+def test_backoff_is_capped_and_jittered():
+    runner = make_runner(MemoryJobStore(), backoff_base=2, backoff_max=30, rng=lambda: 0.0)
+    assert [runner.backoff(n) for n in (1, 2, 3, 10)] == [1.0, 2.0, 4.0, 15.0]
+
+
+@pytest.mark.anyio
+async def test_loop_limits_concurrency_and_stop_requeues_unfinished(store):
+    runner = make_runner(store, concurrency=2, drain_seconds=0.05)
+    active = {"now": 0, "max": 0}
+    release = asyncio.Event()
+
+    @runner.handler("slow")
+    async def slow(payload):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        try:
+            await release.wait()
+        finally:
+            active["now"] -= 1
+
+    for n in range(5):
+        await runner.enqueue("slow", {"n": n})
+    await runner.start()
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+        if active["now"] == 2:
+            break
+    assert active["max"] == 2
+
+    await runner.stop()                 # no terminan en drain_seconds: se cancelan
+    statuses = [j["status"] for j in store.jobs.values()]
+    assert statuses.count(RUNNING) == 0
+    assert statuses.count(PENDING) == 5
+    assert all(j["attempts"] == 0 for j in store.jobs.values())
+
+
+# ---------- Trabajos de rutas ----------
+@pytest.mark.anyio
+async def test_route_metrics_job_stores_measures(monkeypatch):
+    from backend.db.models import route as route_crud
+
+    saved = {}
+
+    async def fake_get_route_by_id(route_id):
+        return {"_id": route_id, "points": [
+            {"latitude": 40.0, "longitude": -3.0},
+            {"latitude": 40.001, "longitude": -3.0},
+            {"latitude": 40.001, "longitude": -2.999},
+        ]}
+
+    async def fake_set_route_measures(route_id, measures):
+        saved[route_id] = measures
+        return True
+
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+    monkeypatch.setattr(route_crud, "set_route_measures", fake_set_route_measures, raising=True)
+
+    await route_jobs.compute_route_metrics({"route_id": "r1"})
+    m = saved["r1"]
+    assert m["points"] == 3
+    assert m["start"] == [40.0, -3.0]
+    assert m["bbox"] == [40.0, -3.0, 40.001, -2.999]
+    assert 190 < m["length_m"] < 200        # ~111 m + ~85 m
+
+
+@pytest.mark.anyio
+async def test_create_route_enqueues_metrics_job(monkeypatch, store):
+    from fastapi import FastAPI
+    from httpx import AsyncClient, ASGITransport
+    from backend.db.models import route as route_crud
+    from backend.routers import routes as routes_mod
+
+    runner = make_runner(store)
+    runner._handlers = runner_mod.job_runner._handlers
+    monkeypatch.setattr(runner_mod, "job_runner", runner)
+
+    async def fake_get_route_by_name(owner_id, name):
+        return None
+
+    async def fake_create_route(owner_id, data):
+        return {"_id": "65f000000000000000000001", "owner_id": owner_id,
+                "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc), **data}
+
+    monkeypatch.setattr(route_crud, "get_route_by_name", fake_get_route_by_name, raising=True)
+    monkeypatch.setattr(route_crud, "create_route", fake_create_route, raising=True)
+
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123", "email": "u@e.com", "is_active": True}
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+
+    payload = {"name": "R", "points": [[40.0, -3.0], [40.1, -3.1], [40.2, -3.2]], "description": "d", "category": "c"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/routes", json=payload)).status_code == 201
+
+    (job,) = store.jobs.values()
+    assert job["name"] == route_jobs.ROUTE_METRICS
+    assert job["payload"] == {"route_id": "65f000000000000000000001"}
+    assert job["dedupe_key"] == "route.metrics:65f000000000000000000001"
+
+
+# ---------- Encolado por lotes ----------
+@pytest.mark.anyio
+async def test_enqueue_many_dedupes_and_counts(store):
+    runner = make_runner(store)
+    await runner.enqueue("ok", {"x": 0}, dedupe_key="ok:0")
+    created = await runner.enqueue_many("ok", [({"x": 0}, "ok:0"), ({"x": 1}, "ok:1"), ({"x": 2}, None)])
+    assert created == 2 and len(store.jobs) == 3
+    counters = runner._counters("ok")
+    assert counters.enqueued == 3 and counters.deduplicated == 1
+
+
+class FakeJobsCol:
+    '''
+    insert_many(ordered=False) con el índice único parcial de dedupe_key
+    '''
+
+    def __init__(self, queued_keys=()):
+        self.docs = [{"_id": k, "dedupe_key": k, "queued": True} for k in queued_keys]
+        self.insert_many_calls = 0
+
+    async def insert_many(self, docs, ordered=True):
+        from pymongo.errors import BulkWriteError
+        assert ordered is False
+        self.insert_many_calls += 1
+        taken = {d["dedupe_key"] for d in self.docs if d.get("queued")}
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc.get("dedupe_key") in taken:
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    def find(self, filter_, projection=None):
+        keys = set(filter_["dedupe_key"]["$in"])
+
+        async def gen():
+            for d in self.docs:
+                if d.get("queued") and d.get("dedupe_key") in keys:
+                    yield d
+        return gen()
+
+
+@pytest.mark.anyio
+async def test_mongo_add_many_is_one_insert_and_tolerates_dedupe_conflicts(clock, monkeypatch):
+    from backend.jobs.stores import MongoJobStore
+
+    col = FakeJobsCol(queued_keys=["k1"])
+    mongo = MongoJobStore(clock=clock)
+    monkeypatch.setattr(mongo, "_col", lambda: col)
+    created, deduplicated = await mongo.add_many("a", [({}, "k1"), ({}, "k2"), ({}, None)], max_attempts=3)
+    assert (created, deduplicated) == (2, 1)
+    assert col.insert_many_calls == 1
+    assert sorted(str(d.get("dedupe_key")) for d in col.docs) == ["None", "k1", "k2"]
+
+
+@pytest.mark.anyio
+async def test_bulk_create_enqueues_metrics_jobs_once(monkeypatch, store):
+    from fastapi import FastAPI
+    from httpx import AsyncClient, ASGITransport
+    from backend.db.models import route as route_crud
+    from backend.routers import routes as routes_mod
+
+    runner = make_runner(store)
+    runner._handlers = runner_mod.job_runner._handlers
+    monkeypatch.setattr(runner_mod, "job_runner", runner)
+    batches = []
+    original_add_many = store.add_many
+
+    async def counting_add_many(name, jobs, **kwargs):
+        batches.append(len(jobs))
+        return await original_add_many(name, jobs, **kwargs)
+    monkeypatch.setattr(store, "add_many", counting_add_many)
+
+    async def fake_existing_names(owner_id, names):
+        return set()
+
+    async def fake_create_routes_bulk(owner_id, routes):
+        return [{"_id": f"65f00000000000000000000{i}", **r} for i, r in enumerate(routes)], {}
+
+    monkeypatch.setattr(route_crud, "get_existing_route_names", fake_existing_names, raising=True)
+    monkeypatch.setattr(route_crud, "create_routes_bulk", fake_create_routes_bulk, raising=True)
+
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123", "email": "u@e.com", "is_active": True}
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+
+    points = [[40.0, -3.0], [40.1, -3.1], [40.2, -3.2]]
+    payload = [{"name": f"R{i}", "points": points, "description": "d", "category": "c"} for i in range(3)]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.post("/routes/bulk", json=payload)).json()["created"] == 3
+
+    assert batches == [3]
+    assert sorted(j["dedupe_key"] for j in store.jobs.values()) == [
+        f"route.metrics:65f00000000000000000000{i}" for i in range(3)]
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.core import metrics
+from backend.core.load_shedding import (
+    CRITICAL, LOW, NORMAL, LoadShedder, LoadSheddingMiddleware, MongoLatencyListener,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _shedder(clock, **kwargs):
+    return LoadShedder(target=0.05, interval=1.0, clock=clock, rng=lambda: 0.5, **kwargs)
+
+
+def _window(shedder, clock, db=None, lag=0.0, seconds=1.0):
+    if db is not None:
+        shedder.observe_db(db)
+    shedder.observe_loop_lag(lag)
+    clock.now += seconds
+    return shedder.tick()
+
+
+def test_slow_db_raises_level_progressively_then_recovers():
+    clock = FakeClock()
+    shedder = _shedder(clock)
+    levels = [_window(shedder, clock, db=0.3) for _ in range(6)]
+    # Un intervalo completo por encima antes de actuar; luego sube cada interval/sqrt(n)
+    assert levels[0] == 0
+    assert levels[1] == 1
+    assert levels == sorted(levels) and levels[-1] == 4
+
+    assert shedder.shed_probability(LOW) == 1.0
+    assert shedder.shed_probability(NORMAL) == 1.0
+    assert shedder.shed_probability(CRITICAL) == 0.0
+
+    recovering = [_window(shedder, clock, db=0.01) for _ in range(4)]
+    assert recovering == [3, 2, 1, 0]
+
+
+def test_bursts_do_not_trigger_shedding():
+    clock = FakeClock()
+    shedder = _shedder(clock)
+    for _ in range(5):
+        shedder.observe_db(2.0)         # una consulta lenta suelta...
+        shedder.observe_db(0.004)       # ...entre consultas rápidas
+        _window(shedder, clock, lag=0.001)
+    assert shedder.level == 0
+
+
+def test_low_priority_is_shed_before_normal():
+    clock = FakeClock()
+    shedder = _shedder(clock)
+    shedder.level = 1
+    assert shedder.shed_probability(LOW) == 0.5
+    assert shedder.shed_probability(NORMAL) == 0.0
+    shedder.level = 3
+    assert shedder.shed_probability(LOW) == 1.0
+    assert shedder.shed_probability(NORMAL) == 0.5
+    assert not shedder.should_shed(CRITICAL)
+
+
+def test_listener_feeds_command_and_pool_wait_latency():
+    clock = FakeClock()
+    shedder = _shedder(clock)
+    listener = MongoLatencyListener(shedder)
+    listener.succeeded(SimpleNamespace(command_name="find", request_id=1, duration_micros=120_000))
+    listener.connection_checked_out(SimpleNamespace(duration=0.09))
+    clock.now += 1.0
+    shedder.tick()
+    assert shedder.last_db == pytest.approx(0.09)
+
+
+def test_listener_ignores_change_stream_long_polls():
+    clock = FakeClock()
+    shedder = _shedder(clock)
+    listener = MongoLatencyListener(shedder)
+    watch = SimpleNamespace(command_name="aggregate", request_id=7, duration_micros=300_000,
+                            command={"aggregate": 1, "pipeline": [{"$changeStream": {}}]})
+    listener.started(watch)
+    listener.succeeded(watch)
+    for _ in range(3):
+        # El servidor retiene cada getMore del change stream hasta que hay cambios o pasa ~1 s
+        listener.succeeded(SimpleNamespace(command_name="getMore", request_id=8, duration_micros=1_000_000))
+    clock.now += 1.0
+    shedder.tick()
+    assert shedder.last_db is None and shedder.level == 0
+
+@pytest.mark.anyio
+async def test_event_loop_lag_is_sampled():
+    shedder = LoadShedder(target=0.01, interval=0.05, sample_period=0.005)
+    shedder.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while shedder.level == 0 and time.monotonic() < deadline:
+            time.sleep(0.04)            # handler que bloquea el loop
+            await asyncio.sleep(0)
+    finally:
+        await shedder.stop()
+    assert shedder.level >= 1
+    assert shedder.last_lag > 0.01
+
+
+# ---------- Middleware: escenario de Mongo lenta ----------
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def shedder(clock):
+    return _shedder(clock)
+
+
+@pytest.fixture
+def test_app(shedder, clock):
+    listener = MongoLatencyListener(shedder)
+    db_latency = {"seconds": 0.3}
+
+    async def fake_query():
+        # Cada petición "consulta" Mongo y el reloj avanza medio intervalo
+        listener.succeeded(SimpleNamespace(command_name="find", request_id=1,
+                                           duration_micros=int(db_latency["seconds"] * 1e6)))
+        clock.now += 0.5
+        shedder.tick()
+
+    app = FastAPI()
+
+    @app.get("/routes")
+    async def catalog():
+        await fake_query()
+        return []
+
+    @app.get("/routes/me")
+    async def mine():
+        await fake_query()
+        return []
+
+    @app.post("/auth/login")
+    async def login():
+        await fake_query()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.state.db_latency = db_latency
+    app.add_middleware(
+        LoadSheddingMiddleware, shedder=shedder,
+        low_priority=["GET /routes", "GET /users/me/stats*"],
+        critical=["* /auth/*"],
+        exempt_paths=["/health"],
+        retry_after=7,
+    )
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_slow_db_sheds_public_listing_first_and_never_auth(ac, shedder):
+    statuses = {"/routes": [], "/routes/me": []}
+    for _ in range(6):
+        for path in statuses:
+            statuses[path].append((await ac.get(path)).status_code)
+        assert (await ac.post("/auth/login")).status_code == 200
+
+    assert statuses["/routes"][0] == 200
+    assert 503 in statuses["/routes"]
+    first_low = statuses["/routes"].index(503)
+    first_normal = statuses["/routes/me"].index(503) if 503 in statuses["/routes/me"] else 99
+    assert first_low < first_normal
+    assert shedder.rejected[CRITICAL] == 0
+
+    res = await ac.get("/routes")
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "7"
+    assert res.json()["detail"].startswith("Servidor sobrecargado")
+    assert (await ac.get("/health")).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_priority_rules(test_app):
+    mw = LoadSheddingMiddleware(test_app, shedder=_shedder(FakeClock()),
+                                low_priority=["GET /routes", "GET /users/me/stats*"],
+                                critical=["* /auth/*"])
+    assert mw.priority("GET", "/routes") == LOW
+    assert mw.priority("GET", "/users/me/stats/favorites") == LOW
+    assert mw.priority("GET", "/routes/me") == NORMAL
+    assert mw.priority("POST", "/routes") == CRITICAL
+    assert mw.priority("GET", "/auth/me") == CRITICAL
+
+
+def test_metrics_are_exported(shedder):
+    metrics.register("test_shedder", shedder.samples)
+    try:
+        text = metrics.render()
+    finally:
+        metrics.unregister("test_shedder")
+    assert "rex_load_shed_level 0" in text
+    assert 'rex_load_shed_rejected_total{priority="low"} 0' in text
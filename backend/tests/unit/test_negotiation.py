@@ -0,0 +1,157 @@
+from datetime import datetime
+
+import cbor2
+import msgpack
+import orjson
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.core.config import settings
+from backend.core.negotiation import CBOR, JSON, MSGPACK, encode, negotiate
+from backend.core.serialization import dump_routes, route_public_dict
+from backend.db.models import favorite as favorite_crud
+from backend.db.models import route as route_crud
+from backend.routers import favorite as favorite_mod
+from backend.routers import routes as routes_mod
+
+
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+    app.include_router(favorite_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123", "email": "u@e.com", "username": "u", "is_active": True}
+
+    for mod in (routes_mod, favorite_mod):
+        app.dependency_overrides[mod.get_current_user] = fake_current_user
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+def _route(_id="R1"):
+    return {
+        "_id": _id,
+        "name": "Ruta",
+        "owner_id": "user123",
+        "visibility": True,
+        "points": [{"latitude": 41.1, "longitude": 2.1}] * 3,
+        "description": "d",
+        "category": "c",
+        "created_at": datetime(2025, 1, 1, 12, 30, 0, 250000),
+    }
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON),
+    ("", JSON),
+    ("application/json", JSON),
+    ("application/msgpack", MSGPACK),
+    ("application/x-msgpack", MSGPACK),
+    ("application/cbor", CBOR),
+    ("*/*", JSON),
+    ("application/msgpack, */*", MSGPACK),
+    ("application/json;q=0.5, application/cbor", CBOR),
+    ("application/msgpack;q=0.2, application/json;q=0.9", JSON),
+    ("application/msgpack;q=0", JSON),
+    ("text/html", JSON),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_negotiate_ignores_binary_formats_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "BINARY_RESPONSES_ENABLED", False)
+    assert negotiate("application/msgpack") == JSON
+
+
+def test_binary_encodings_carry_the_json_data():
+    docs = [_route("R1"), _route("R2")]
+    as_json = orjson.loads(dump_routes(docs))
+    public = [route_public_dict(d) for d in docs]
+    assert msgpack.unpackb(encode(public, MSGPACK)) == as_json
+    assert cbor2.loads(encode(public, CBOR)) == as_json
+    assert as_json[0]["created_at"] == "2025-01-01T12:30:00.250000"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("media, decode", [(MSGPACK, msgpack.unpackb), (CBOR, cbor2.loads)])
+async def test_my_routes_in_binary_format(ac, monkeypatch, media, decode):
+    async def fake_get_routes_by_owner(owner_id, public_only=None, skip=0, limit=50):
+        return [_route("R1"), _route("R2")]
+
+    async def fake_get_route_versions_by_owner(owner_id, skip=0, limit=50):
+        return await fake_get_routes_by_owner(owner_id)
+
+    monkeypatch.setattr(route_crud, "get_routes_by_owner", fake_get_routes_by_owner, raising=True)
+    monkeypatch.setattr(route_crud, "get_route_versions_by_owner", fake_get_route_versions_by_owner,
+                        raising=True)
+    as_json = await ac.get("/routes/me")
+    res = await ac.get("/routes/me", headers={"Accept": media})
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == media
+    assert "Accept" in res.headers["vary"]
+    assert decode(res.content) == as_json.json()
+    assert len(res.content) < len(as_json.content)
+    # Variante distinta, misma versión: revalida con 304
+    assert res.headers["etag"] != as_json.headers["etag"]
+    again = await ac.get("/routes/me", headers={"Accept": media, "If-None-Match": res.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["etag"] == res.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_json_stays_default_and_declares_vary(ac, monkeypatch):
+    async def fake_get_route_by_id(route_id):
+        return _route(route_id)
+
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+    res = await ac.get("/routes/R1")
+    assert res.headers["content-type"] == JSON
+    assert res.headers["vary"] == "Accept"
+    assert res.json()["id"] == "R1"
+
+
+@pytest.mark.anyio
+async def test_response_model_endpoints_are_transcoded(ac, monkeypatch):
+    async def fake_list_favorites(user_id):
+        return ["R1", "R2"]
+
+    monkeypatch.setattr(favorite_crud, "list_favorites", fake_list_favorites, raising=True)
+    res = await ac.get("/favorites/me", headers={"Accept": MSGPACK})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(res.content) == {"route_ids": ["R1", "R2"]}
+    assert res.headers["etag"].endswith('-msgpack"')
+    assert int(res.headers["content-length"]) == len(res.content)
+
+
+@pytest.mark.anyio
+async def test_errors_stay_json(ac, monkeypatch):
+    async def fake_get_route_by_id(route_id):
+        return None
+
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+    res = await ac.get("/routes/nope", headers={"Accept": MSGPACK})
+    assert res.status_code == 404
+    assert res.headers["content-type"] == JSON
+
+
+def test_openapi_documents_binary_media_types(test_app):
+    spec = test_app.openapi()
+    content = spec["paths"]["/routes/me"]["get"]["responses"]["200"]["content"]
+    assert content[MSGPACK]["schema"]["items"]["$ref"] == "#/components/schemas/RoutePublic"
+    assert content[CBOR] == content[MSGPACK]
+    detail = spec["paths"]["/routes/{route_id}"]["get"]["responses"]["200"]["content"]
+    assert detail[MSGPACK]["schema"] == {"$ref": "#/components/schemas/RoutePublic"}
+    favorites = spec["paths"]["/favorites/me"]["get"]["responses"]["200"]["content"]
+    assert favorites[CBOR]["schema"] == {"$ref": "#/components/schemas/FavoriteListOut"}
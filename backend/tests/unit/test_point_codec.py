@@ -0,0 +1,172 @@
+import bson
+import pytest
+from bson import Binary, ObjectId
+
+import backend.db.client as db_client
+from backend.benchmarks.payloads import make_points
+from backend.core.config import settings
+from backend.core.serialization import dump_route, route_public_dict
+from backend.db.models import route as route_crud
+from backend.db.models.route import PackedPoints, decode_points, encode_points
+
+POINTS = make_points(500) + [
+    {"latitude": -89.9999999, "longitude": -179.9999999},
+    {"latitude": 90.0, "longitude": 180.0},
+    {"latitude": 0.0, "longitude": 0.0},
+]
+
+
+@pytest.mark.parametrize("codec", ["int32", "varint"])
+def test_round_trip_is_exact_to_seven_decimals(codec):
+    packed = encode_points(POINTS, codec)
+    assert isinstance(packed, Binary)
+    decoded = decode_points(packed, codec)
+    assert len(decoded) == len(POINTS)
+    assert decoded == POINTS
+    assert decoded.to_list() == POINTS
+
+
+def test_varint_is_smaller_than_int32_for_gps_tracks():
+    pts = make_points(2000)
+    dicts = len(bson.encode({"points": pts}))
+    int32 = len(bson.encode({"points": encode_points(pts, "int32")}))
+    varint = len(bson.encode({"points": encode_points(pts, "varint")}))
+    assert varint < int32 < dicts / 4
+
+
+def test_int32_decoding_is_zero_copy():
+    packed = encode_points(POINTS, "int32")
+    decoded = decode_points(packed, "int32")
+    assert decoded._ints.obj is packed
+    tail = decoded[10:20]
+    assert isinstance(tail, PackedPoints) and tail._ints.obj is packed
+    assert tail.to_list() == POINTS[10:20]
+
+
+def test_packed_points_sequence_behaviour():
+    decoded = decode_points(encode_points(POINTS[:5], "varint"), "varint")
+    assert decoded[-1] == POINTS[4]
+    assert decoded[::2] == POINTS[:5:2]
+    assert list(decoded.coords())[0] == (POINTS[0]["latitude"], POINTS[0]["longitude"])
+    with pytest.raises(IndexError):
+        decoded[5]
+
+
+def test_out_of_range_coordinates_do_not_fit():
+    with pytest.raises(OverflowError):
+        encode_points([{"latitude": 1, "longitude": 500}], "int32")
+
+
+def test_serialization_accepts_packed_points():
+    doc = {"_id": "r1", "owner_id": "u1", "name": "n", "description": "d", "category": "c",
+           "visibility": True, "created_at": "t"}
+    plain = route_public_dict({**doc, "points": POINTS})
+    packed = route_public_dict({**doc, "points": decode_points(encode_points(POINTS, "int32"), "int32")})
+    assert packed == plain
+    assert dump_route({**doc, "points": decode_points(encode_points(POINTS, "varint"), "varint")})
+
+
+# ---- Transparente para el CRUD ----
+class FakeRoutesCol:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        doc = dict(doc)
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(doc)
+
+        class _R:
+            inserted_id = doc["_id"]
+        return _R()
+
+    async def find_one(self, filter_, projection=None):
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in filter_.items()):
+                return dict(d)
+        return None
+
+    async def update_one(self, filter_, update):
+        for d in self.docs:
+            if all(d.get(k) == v for k, v in filter_.items()):
+                d.update(update.get("$set", {}))
+                for k in update.get("$unset", {}):
+                    d.pop(k, None)
+
+    def find(self, filter_, projection=None):
+        col = self
+
+        class _Cur:
+            def batch_size(self, n):
+                return self
+
+            def __aiter__(self):
+                async def gen():
+                    codec = filter_["points_codec"]
+                    for d in list(col.docs):
+                        if ("$ne" in codec and d.get("points_codec") != codec["$ne"]) or \
+                           ("$exists" in codec and ("points_codec" in d) == codec["$exists"]):
+                            yield dict(d)
+                return gen()
+        return _Cur()
+
+
+class FakeDB:
+    def __init__(self):
+        self.routes = FakeRoutesCol()
+
+    def __getitem__(self, name):
+        assert name == "routes"
+        return self.routes
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    monkeypatch.setattr(db_client, "db", FakeDB(), raising=True)
+    return db_client.db
+
+
+def _route(name="Ruta", points=POINTS):
+    return {"name": name, "points": points, "visibility": True, "description": "d", "category": "c"}
+
+
+@pytest.mark.anyio
+async def test_crud_stores_binary_and_reads_packed_points(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "ROUTE_POINTS_CODEC", "varint")
+    created = await route_crud.create_route("u1", _route())
+    assert created["points"] == POINTS and "points_codec" not in created
+
+    stored = fake_db.routes.docs[0]
+    assert isinstance(stored["points"], Binary)
+    assert stored["points_codec"] == "varint" and stored["points_count"] == len(POINTS)
+
+    got = await route_crud.get_route_by_id(str(created["_id"]))
+    assert isinstance(got["points"], PackedPoints) and got["points"] == POINTS
+
+    meta = {k: v for k, v in stored.items() if k != "points"}
+    total, page = await route_crud.get_route_points(meta, offset=498, limit=10)
+    assert total == len(POINTS) and page == POINTS[498:508]
+
+
+@pytest.mark.anyio
+async def test_out_of_range_route_falls_back_to_dicts(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "ROUTE_POINTS_CODEC", "int32")
+    weird = [{"latitude": 1, "longitude": 500}] * 3
+    await route_crud.create_route("u1", _route(points=weird))
+    assert fake_db.routes.docs[0]["points"] == weird
+    assert "points_codec" not in fake_db.routes.docs[0]
+
+
+@pytest.mark.anyio
+async def test_codec_migration(fake_db, monkeypatch):
+    await route_crud.create_route("u1", _route("A"))
+    await route_crud.create_route("u1", _route("B", POINTS[:3]))
+
+    assert await route_crud.migrate_points_codec("int32") == 2
+    assert all(d["points_codec"] == "int32" for d in fake_db.routes.docs)
+    assert await route_crud.migrate_points_codec("int32") == 0
+
+    assert await route_crud.migrate_points_codec("varint") == 2
+    assert await route_crud.migrate_points_codec("dicts") == 2
+    assert fake_db.routes.docs[0]["points"] == POINTS
+    assert "points_codec" not in fake_db.routes.docs[1]
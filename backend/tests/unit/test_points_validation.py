@@ -0,0 +1,91 @@
+import math
+
+import pytest
+from pydantic import ValidationError
+
+from backend.core.config import settings
+from backend.db.schemas.route import RouteCreate, RoutePublic
+from backend.geo import points as points_mod
+from backend.geo.points import PointArray, count_points, validate_points
+
+DICTS = [
+    {"latitude": 41.38, "longitude": 2.17},
+    {"latitude": 41.39, "longitude": 2.18},
+    {"latitude": 41.40, "longitude": 2.19},
+]
+PAIRS = [[p["latitude"], p["longitude"]] for p in DICTS]
+FLAT = [c for pair in PAIRS for c in pair]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(points_mod, "np", None)
+    elif points_mod.np is None:
+        pytest.skip("NumPy no instalado")
+    return request.param
+
+
+def _create(points):
+    return RouteCreate(name="R", category="running", description="d", visibility=True, points=points)
+
+
+@pytest.mark.parametrize("value", [DICTS, PAIRS, FLAT])
+def test_all_input_forms_are_equivalent(backend, value):
+    route = _create(value)
+    assert isinstance(route.points, PointArray)
+    assert route.points == DICTS
+    assert route.model_dump()["points"] == DICTS
+    assert route.points[1].latitude == 41.39
+
+
+def test_compact_input_drops_consecutive_duplicates(backend):
+    value = [PAIRS[0], PAIRS[0], PAIRS[1], PAIRS[1], PAIRS[2], PAIRS[0]]
+    assert validate_points(value).to_list() == DICTS + [DICTS[0]]
+
+
+def test_dict_input_keeps_duplicates(backend):
+    value = [DICTS[0]] * 3
+    assert len(validate_points(value)) == 3
+
+
+@pytest.mark.parametrize("bad, msg", [
+    ([[91, 0], [0, 0], [1, 1]], "Latitud fuera de rango"),
+    ([[0, 181], [0, 0], [1, 1]], "Longitud fuera de rango"),
+    ([[math.nan, 0], [0, 0], [1, 1]], "NaN"),
+    ([{"latitude": math.inf, "longitude": 0}] * 3, "NaN"),
+    ([1.0, 2.0, 3.0], "Formato de puntos no válido"),
+    ([[1, 2, 3], [1, 2], [3, 4]], "Formato de puntos no válido"),
+    ([{"lat": 1, "lon": 2}] * 3, "Formato de puntos no válido"),
+    ([["a", "b"], [1, 2], [3, 4]], "Formato de puntos no válido"),
+])
+def test_invalid_points_are_rejected(backend, bad, msg):
+    with pytest.raises(ValidationError) as exc:
+        _create(bad)
+    assert msg in str(exc.value)
+
+
+def test_min_points_message_after_dedupe(backend):
+    with pytest.raises(ValidationError) as exc:
+        _create([PAIRS[0], PAIRS[0], PAIRS[1]])
+    assert "Mínimo se han de seleccionar 3 puntos" in str(exc.value)
+
+
+def test_max_points(backend, monkeypatch):
+    monkeypatch.setattr(settings, "ROUTE_MAX_POINTS", 4)
+    assert len(validate_points(FLAT + FLAT[:2])) == 4
+    with pytest.raises(ValueError, match="más de 4 puntos"):
+        validate_points(FLAT + FLAT[:4])
+
+
+def test_count_points():
+    assert count_points(DICTS) == count_points(PAIRS) == count_points(FLAT) == 3
+    assert count_points(None) == 0
+
+
+def test_openapi_schema_lists_compact_forms():
+    validation = RouteCreate.model_json_schema(mode="validation")["properties"]["points"]
+    assert len(validation["anyOf"]) == 3
+    assert validation["anyOf"][0]["items"]["$ref"].endswith("/Point")
+    serialization = RoutePublic.model_json_schema(mode="serialization")["properties"]["points"]
+    assert serialization["items"]["$ref"].endswith("/Point")
@@ -0,0 +1,187 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.db import catalog as catalog_mod
+from backend.db.catalog import PublicRouteCatalog
+from backend.db.models import route as route_crud
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _doc(_id, name, minutes=0, vis=True):
+    return {
+        "_id": _id,
+        "owner_id": "u1",
+        "name": name,
+        "points": [{"latitude": 1, "longitude": 1}] * 3,
+        "visibility": vis,
+        "description": "d",
+        "category": "c",
+        "created_at": T0 + timedelta(minutes=minutes),
+    }
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # "Colección" en memoria detrás de las consultas incrementales del CRUD
+    docs: dict[str, dict] = {}
+    calls = {"since": [], "ids": 0, "by_ids": []}
+
+    async def fake_since(created_after):
+        calls["since"].append(created_after)
+        return [
+            dict(d) for d in docs.values()
+            if d["visibility"] and (created_after is None or d["created_at"] >= created_after)
+        ]
+
+    async def fake_ids():
+        calls["ids"] += 1
+        return {k for k, d in docs.items() if d["visibility"]}
+
+    async def fake_by_ids(ids):
+        calls["by_ids"].append(sorted(ids))
+        return [dict(docs[i]) for i in ids if i in docs]
+
+    monkeypatch.setattr(route_crud, "get_public_routes_since", fake_since, raising=True)
+    monkeypatch.setattr(route_crud, "get_public_route_ids", fake_ids, raising=True)
+    monkeypatch.setattr(route_crud, "get_routes_by_ids", fake_by_ids, raising=True)
+    return docs, calls
+
+
+def _catalog(**kw):
+    opts = {"page_size": 2, "refresh_seconds": 60, "max_staleness_seconds": 60}
+    opts.update(kw)
+    return PublicRouteCatalog(**opts)
+
+
+@pytest.mark.anyio
+async def test_initial_refresh_builds_serialized_snapshot(store):
+    docs, _ = store
+    docs["a"] = _doc("a", "A", 0)
+    docs["b"] = _doc("b", "B", 1)
+    docs["c"] = _doc("c", "C", 2)
+
+    snap = await _catalog().refresh()
+
+    body = json.loads(snap.body)
+    assert [r["id"] for r in body] == ["a", "b", "c"]
+    # Páginas de 2 rutas ya serializadas
+    assert [r["id"] for r in json.loads(snap.page(0))] == ["a", "b"]
+    assert [r["id"] for r in json.loads(snap.page(1))] == ["c"]
+    assert snap.page(5) == b"[]"
+
+
+@pytest.mark.anyio
+async def test_incremental_refresh_adds_new_and_drops_deleted(store):
+    docs, calls = store
+    docs["a"] = _doc("a", "A", 0)
+    docs["b"] = _doc("b", "B", 1)
+    cat = _catalog()
+    first = await cat.refresh()
+
+    # Nueva ruta pública y otra borrada
+    docs["c"] = _doc("c", "C", 5)
+    del docs["a"]
+    snap = await cat.refresh()
+
+    assert snap is not first
+    assert snap.ids == {"b", "c"}
+    # El segundo refresco solo pide lo creado desde el último created_at conocido
+    assert calls["since"][-1] == T0 + timedelta(minutes=1)
+
+
+@pytest.mark.anyio
+async def test_incremental_refresh_fetches_stragglers_by_id(store):
+    docs, calls = store
+    docs["b"] = _doc("b", "B", 5)
+    cat = _catalog()
+    await cat.refresh()
+
+    # Ruta con created_at anterior al último conocido (p. ej. reloj desfasado)
+    docs["a"] = _doc("a", "A", 0)
+    snap = await cat.refresh()
+
+    assert snap.ids == {"a", "b"}
+    assert calls["by_ids"] == [["a"]]
+
+
+@pytest.mark.anyio
+async def test_unchanged_refresh_keeps_bytes(store):
+    docs, _ = store
+    docs["a"] = _doc("a", "A", 0)
+    cat = _catalog()
+    first = await cat.refresh()
+    second = await cat.refresh()
+    assert second.body is first.body
+    assert second.built_at >= first.built_at
+
+
+@pytest.mark.anyio
+async def test_current_respects_staleness_bound(store):
+    docs, _ = store
+    docs["a"] = _doc("a", "A", 0)
+    cat = _catalog(max_staleness_seconds=0)
+    await cat.refresh()
+    assert cat.current() is None
+
+    fresh = _catalog()
+    assert fresh.current() is None      # aún sin foto
+    await fresh.refresh()
+    assert fresh.current() is not None
+
+
+# ---------- GET /routes servido desde la foto ----------
+
+@pytest.mark.anyio
+async def test_list_routes_serves_snapshot_without_db(store, monkeypatch):
+    from backend.routers import routes as routes_mod
+
+    docs, _ = store
+    docs["a"] = _doc("a", "A", 0)
+    docs["b"] = _doc("b", "B", 1)
+    docs["c"] = _doc("c", "C", 2)
+    cat = _catalog()
+    await cat.refresh()
+    monkeypatch.setattr(routes_mod, "public_catalog", cat, raising=True)
+
+    async def fail_get_all_routes(public_only):
+        raise AssertionError("Con foto fresca no debe consultarse la BD")
+
+    monkeypatch.setattr(route_crud, "get_all_routes", fail_get_all_routes, raising=True)
+
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        res = await ac.get("/routes")
+        assert res.status_code == 200
+        assert [r["id"] for r in res.json()] == ["a", "b", "c"]
+
+        res = await ac.get("/routes", params={"page": 1})
+        assert [r["id"] for r in res.json()] == ["c"]
+
+
+@pytest.mark.anyio
+async def test_db_fallback_pages_in_snapshot_order(monkeypatch):
+    from backend.routers import routes as routes_mod
+
+    cat = _catalog()                    # sin foto: se lee de BD
+    monkeypatch.setattr(routes_mod, "public_catalog", cat, raising=True)
+
+    async def unsorted_get_all_routes(public_only):
+        return [_doc("c", "C", 2), _doc("a", "A", 0), _doc("b", "B", 1)]
+
+    monkeypatch.setattr(route_crud, "get_all_routes", unsorted_get_all_routes, raising=True)
+
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert [r["id"] for r in (await ac.get("/routes", params={"page": 0})).json()] == ["a", "b"]
+        assert [r["id"] for r in (await ac.get("/routes", params={"page": 1})).json()] == ["c"]
+
+
+def test_module_singleton_uses_settings():
+    from backend.core.config import settings
+    assert catalog_mod.public_catalog.page_size == settings.PUBLIC_CATALOG_PAGE_SIZE
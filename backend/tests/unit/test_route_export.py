@@ -0,0 +1,181 @@
+import io
+import json
+import zipfile
+import xml.etree.ElementTree as ET
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.benchmarks.payloads import make_points
+from backend.db.models import route as route_crud
+from backend.geo import exporters
+from backend.geo.importers import GeoJSONParser, GPXParser
+from backend.routers import routes as routes_mod
+
+
+def _route(i=0, n=2500, **overrides):
+    base = {
+        "_id": f"r{i}",
+        "owner_id": "user123",
+        "name": f"Ruta <{i}> & ñ",
+        "points": make_points(n, seed=i),
+        "visibility": False,
+        "description": "Por la costa",
+        "category": "naturaleza",
+        "created_at": "2025-01-01T00:00:00Z",
+    }
+    base.update(overrides)
+    return base
+
+
+def _expected(route):
+    return [(p["latitude"], p["longitude"]) for p in route["points"]]
+
+
+def _parse(parser, data: bytes):
+    return parser.feed(data) + parser.close()
+
+
+async def _collect(agen) -> bytes:
+    return b"".join([c async for c in agen])
+
+
+async def _aiter(routes, pulled=None):
+    for r in routes:
+        if pulled is not None:
+            pulled.append(r["_id"])
+        yield r
+
+
+def test_single_route_round_trips_through_importers():
+    route = _route()
+    gpx = b"".join(exporters.route_document(route, "gpx"))
+    parser = GPXParser()
+    assert _parse(parser, gpx) == _expected(route)
+    assert parser.name == route["name"]
+
+    geo = b"".join(exporters.route_document(route, "geojson"))
+    assert json.loads(geo)["properties"]["name"] == route["name"]
+    assert _parse(GeoJSONParser(), geo) == _expected(route)
+
+    kml = ET.fromstring(b"".join(exporters.route_document(route, "kml")))
+    coords = kml.find(".//{http://www.opengis.net/kml/2.2}coordinates").text.split()
+    assert [(float(c.split(",")[1]), float(c.split(",")[0])) for c in coords] == _expected(route)
+
+
+def test_route_document_is_chunked():
+    chunks = list(exporters.route_document(_route(n=2500), "gpx"))
+    assert len(chunks) > 3
+    assert max(map(len, chunks)) < 100_000
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("fmt", exporters.FORMATS)
+async def test_collection_contains_every_route(fmt):
+    routes = [_route(i, n=10) for i in range(3)]
+    body = await _collect(exporters.collection_stream(_aiter(routes), fmt))
+    if fmt == "geojson":
+        doc = json.loads(body)
+        assert doc["type"] == "FeatureCollection"
+        assert [f["properties"]["id"] for f in doc["features"]] == ["r0", "r1", "r2"]
+    elif fmt == "gpx":
+        assert _parse(GPXParser(), body) == sum((_expected(r) for r in routes), [])
+    else:
+        assert len(ET.fromstring(body).findall(".//{http://www.opengis.net/kml/2.2}Placemark")) == 3
+
+
+@pytest.mark.anyio
+async def test_empty_collection_is_valid():
+    body = await _collect(exporters.collection_stream(_aiter([]), "geojson"))
+    assert json.loads(body) == {"type": "FeatureCollection", "features": []}
+
+
+@pytest.mark.anyio
+async def test_collection_pulls_routes_lazily():
+    pulled = []
+    stream = exporters.collection_stream(_aiter([_route(i, n=5) for i in range(5)], pulled), "geojson")
+    await stream.__anext__()            # cabecera
+    await stream.__anext__()            # primera ruta
+    assert pulled == ["r0"]
+    await stream.aclose()
+
+
+@pytest.mark.anyio
+async def test_zip_stream_is_a_valid_archive():
+    routes = [_route(0, n=50, name="Misma"), _route(1, n=50, name="Misma"), _route(2, n=50, name="Otra")]
+    chunks = [c async for c in exporters.zip_stream(_aiter(routes), "gpx")]
+    assert len(chunks) > 3              # se emite por entradas, no al final
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.namelist() == ["misma.gpx", "misma-2.gpx", "otra.gpx"]
+        assert _parse(GPXParser(), zf.read("otra.gpx")) == _expected(routes[2])
+
+
+def test_safe_filename():
+    assert exporters.safe_filename("Ruta Ñandú / 2") == "ruta-nandu-2"
+    assert exporters.safe_filename("¿?") == "ruta"
+
+
+# ---- Endpoints ----
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123"}
+
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    async with AsyncClient(transport=ASGITransport(app=test_app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_export_single_route(ac, monkeypatch):
+    route = _route(n=20, name="Ruta Ñ")
+
+    async def fake_get_route_by_id(route_id):
+        return route if route_id == "r0" else None
+
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+
+    res = await ac.get("/routes/r0/export", params={"format": "kml"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/vnd.google-earth.kml+xml")
+    assert res.headers["content-disposition"] == 'attachment; filename="ruta-n.kml"'
+
+    assert (await ac.get("/routes/r0/export")).headers["content-type"].startswith("application/gpx+xml")
+    assert (await ac.get("/routes/r0/export", params={"format": "shp"})).status_code == 422
+    assert (await ac.get("/routes/otra/export")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_export_other_users_private_route_is_forbidden(ac, monkeypatch):
+    async def fake_get_route_by_id(route_id):
+        return _route(owner_id="otro", visibility=False)
+
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+    assert (await ac.get("/routes/r0/export")).status_code == 403
+
+
+@pytest.mark.anyio
+async def test_export_my_routes(ac, monkeypatch):
+    def fake_iter_routes_by_owner(owner_id):
+        assert owner_id == "user123"
+        return _aiter([_route(i, n=5) for i in range(4)])
+
+    monkeypatch.setattr(route_crud, "iter_routes_by_owner", fake_iter_routes_by_owner, raising=True)
+
+    res = await ac.get("/routes/me/export")
+    assert res.status_code == 200
+    assert res.headers["cache-control"] == "no-store"
+    assert len(res.json()["features"]) == 4
+
+    res = await ac.get("/routes/me/export", params={"format": "kml", "archive": "true"})
+    assert res.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(res.content)) as zf:
+        assert len(zf.namelist()) == 4
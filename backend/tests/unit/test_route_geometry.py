@@ -0,0 +1,358 @@
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+import backend.db.client as db_client
+from backend.core.config import settings
+from backend.db.models import route as route_crud
+from backend.db.models import route_geometry as geometry
+from backend.routers import routes as routes_mod
+
+
+# ---- Fakes: colecciones en memoria y bucket GridFS ----
+def _match(doc, filter_):
+    for k, v in filter_.items():
+        if isinstance(v, dict) and "$in" in v:
+            if doc.get(k) not in v["$in"]:
+                return False
+        elif isinstance(v, dict) and "$exists" in v:
+            if (k in doc) != v["$exists"]:
+                return False
+        elif isinstance(v, dict) and "$ne" in v:
+            if doc.get(k) == v["$ne"]:
+                return False
+        elif doc.get(k) != v:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    if all(v == 0 for v in projection.values()):
+        return {k: v for k, v in doc.items() if k not in projection}
+    return {k: v for k, v in doc.items() if k in projection or k == "_id"}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def skip(self, n):
+        self._docs = self._docs[n:]
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._docs)
+
+    def __aiter__(self):
+        async def gen():
+            for d in self._docs:
+                yield d
+        return gen()
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.reads = 0              # documentos devueltos (para ver qué se toca)
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(dict(doc))
+
+        class _R:
+            inserted_id = doc["_id"]
+        return _R()
+
+    async def insert_many(self, docs, ordered=True):
+        for d in docs:
+            await self.insert_one(d)
+
+    async def replace_one(self, filter_, doc, upsert=False):
+        self.docs = [d for d in self.docs if not _match(d, filter_)]
+        self.docs.append({**doc, **filter_})
+
+    async def update_one(self, filter_, update):
+        for d in self.docs:
+            if _match(d, filter_):
+                d.update(update.get("$set", {}))
+                for k in update.get("$unset", {}):
+                    d.pop(k, None)
+
+    async def find_one(self, filter_, projection=None):
+        for d in self.docs:
+            if _match(d, filter_):
+                self.reads += 1
+                return _project(d, projection)
+        return None
+
+    def find(self, filter_, projection=None):
+        found = [_project(d, projection) for d in self.docs if _match(d, filter_)]
+        self.reads += len(found)
+        return FakeCursor(found)
+
+    def aggregate(self, pipeline):
+        match, project = pipeline[0]["$match"], pipeline[1]["$project"]
+        _, offset, limit = project["points"]["$slice"]
+        out = []
+        for d in self.docs:
+            if _match(d, match):
+                pts = d.get("points", [])
+                out.append({"total": len(pts), "points": pts[offset:offset + limit]})
+        return FakeCursor(out)
+
+    async def delete_one(self, filter_):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not _match(d, filter_)]
+
+        class _D:
+            deleted_count = before - len(self.docs)
+        return _D()
+
+
+class FakeDB:
+    def __init__(self):
+        self.cols = {"routes": FakeCollection(), geometry.COLL: FakeCollection()}
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+
+class FakeGridOut:
+    def __init__(self, data):
+        self._data, self._pos = data, 0
+        self.reads = []
+
+    def seek(self, pos):
+        self._pos = pos
+
+    async def read(self, size=-1):
+        end = len(self._data) if size < 0 else self._pos + size
+        chunk = self._data[self._pos:end]
+        self._pos += len(chunk)
+        return chunk
+
+
+class FakeBucket:
+    def __init__(self):
+        self.files = {}
+
+    async def upload_from_stream_with_id(self, file_id, filename, source, metadata=None):
+        self.files[file_id] = source
+
+    async def open_download_stream(self, file_id):
+        return FakeGridOut(self.files[file_id])
+
+    async def delete(self, file_id):
+        if file_id not in self.files:
+            raise geometry.NoFile()
+        del self.files[file_id]
+
+
+@pytest.fixture
+def separate(monkeypatch):
+    db, bucket = FakeDB(), FakeBucket()
+    monkeypatch.setattr(db_client, "db", db, raising=True)
+    monkeypatch.setattr(geometry, "_bucket", lambda: bucket, raising=True)
+    monkeypatch.setattr(settings, "ROUTE_GEOMETRY_STORAGE", "separate")
+    monkeypatch.setattr(settings, "ROUTE_GEOMETRY_GRIDFS_MIN_POINTS", 100)
+    return db, bucket
+
+
+def _data(name, n):
+    return {
+        "name": name,
+        "points": [{"latitude": 41 + i * 1e-4, "longitude": 2 + i * 1e-4} for i in range(n)],
+        "visibility": True,
+        "description": "d",
+        "category": "c",
+    }
+
+
+def test_pack_pairs_round_trip():
+    pts = [{"latitude": 41.123456789, "longitude": -2.5}, {"latitude": -90.0, "longitude": 180.0}]
+    assert geometry.unpack_pairs(geometry.pack_pairs(pts)) == pts
+
+
+@pytest.mark.anyio
+async def test_separate_layout_keeps_route_documents_small(separate):
+    db, bucket = separate
+    small = await route_crud.create_route("u1", _data("Corta", 10))
+    big = await route_crud.create_route("u1", _data("Larga", 150))
+    # El documento devuelto por create_route sigue llevando los puntos (respuesta del POST)
+    assert len(small["points"]) == 10
+
+    stored = {d["name"]: d for d in db["routes"].docs}
+    assert "points" not in stored["Corta"] and stored["Corta"]["geometry"] == "collection"
+    assert stored["Larga"]["geometry"] == "gridfs" and stored["Larga"]["points_count"] == 150
+    assert big["_id"] in bucket.files
+
+    # Consultas de metadatos: no leen route_geometries
+    assert await route_crud.get_route_by_name("u1", "Corta") is not None
+    assert db[geometry.COLL].reads == 0
+
+    got = await route_crud.get_route_by_id(str(big["_id"]))
+    assert got["points"] == _data("x", 150)["points"]
+    listed = await route_crud.get_routes_by_owner("u1")
+    assert [len(r["points"]) for r in listed] == [10, 150]
+
+
+@pytest.mark.anyio
+async def test_points_slices_for_each_layout(separate, monkeypatch):
+    db, _ = separate
+    small = await route_crud.create_route("u1", _data("Corta", 10))
+    big = await route_crud.create_route("u1", _data("Larga", 150))
+    monkeypatch.setattr(settings, "ROUTE_GEOMETRY_STORAGE", "embedded")
+    embedded = await route_crud.create_route("u1", _data("Embebida", 20))
+
+    expected = {"Corta": _data("", 10)["points"], "Larga": _data("", 150)["points"],
+                "Embebida": _data("", 20)["points"]}
+    for route in (small, big, embedded):
+        meta = await route_crud.get_route_metadata(str(route["_id"]))
+        assert "points" not in meta
+        total, pts = await route_crud.get_route_points(meta, offset=5, limit=7)
+        assert total == len(expected[route["name"]])
+        assert pts == expected[route["name"]][5:12]
+        assert (await route_crud.get_route_points(meta, offset=500, limit=7))[1] == []
+
+
+@pytest.mark.anyio
+async def test_delete_removes_geometry(separate):
+    db, bucket = separate
+    small = await route_crud.create_route("u1", _data("Corta", 10))
+    big = await route_crud.create_route("u1", _data("Larga", 150))
+    assert await route_crud.delete_route(str(small["_id"]), "u1")
+    assert await route_crud.delete_route(str(big["_id"]), "u1")
+    assert db[geometry.COLL].docs == [] and bucket.files == {}
+
+
+@pytest.mark.anyio
+async def test_failed_insert_does_not_orphan_geometry(separate, monkeypatch):
+    from pymongo.errors import DuplicateKeyError
+    db, bucket = separate
+
+    async def duplicate(doc):
+        raise DuplicateKeyError("E11000 duplicate key")
+    monkeypatch.setattr(db["routes"], "insert_one", duplicate)
+
+    for n in (10, 150):
+        with pytest.raises(DuplicateKeyError):
+            await route_crud.create_route("u1", _data("Repetida", n))
+    assert db[geometry.COLL].docs == [] and bucket.files == {}
+
+
+@pytest.mark.anyio
+async def test_migration_both_ways(separate, monkeypatch):
+    db, bucket = separate
+    monkeypatch.setattr(settings, "ROUTE_GEOMETRY_STORAGE", "embedded")
+    await route_crud.create_route("u1", _data("A", 10))
+    await route_crud.create_route("u1", _data("B", 150))
+
+    assert await geometry.migrate("separate") == 2
+    assert all("points" not in d for d in db["routes"].docs)
+    assert await geometry.migrate("separate") == 0          # idempotente
+    assert [len(r["points"]) for r in await route_crud.get_all_routes()] == [10, 150]
+
+    assert await geometry.migrate("embedded") == 2
+    assert [len(d["points"]) for d in db["routes"].docs] == [10, 150]
+    assert db[geometry.COLL].docs == [] and bucket.files == {}
+
+
+@pytest.mark.anyio
+async def test_layout_migration_counts_packed_points(separate, monkeypatch):
+    db, _ = separate
+    monkeypatch.setattr(settings, "ROUTE_GEOMETRY_STORAGE", "embedded")
+    monkeypatch.setattr(settings, "ROUTE_POINTS_CODEC", "varint")
+    created = await route_crud.create_route("u1", _data("A", 150))
+    db["routes"].docs[0].pop("points_count")        # documento anterior al recuento
+
+    assert await geometry.migrate("separate") == 1
+    assert db["routes"].docs[0]["points_count"] == 150
+    got = await route_crud.get_route_by_id(str(created["_id"]))
+    assert got["points"] == _data("", 150)["points"]
+
+
+@pytest.mark.anyio
+async def test_codec_migration_moves_large_routes_to_gridfs(separate, monkeypatch):
+    db, bucket = separate
+    monkeypatch.setattr(settings, "ROUTE_POINTS_CODEC", "varint")
+    big = await route_crud.create_route("u1", _data("Larga", 150))
+    assert db["routes"].docs[0]["geometry"] == "collection"     # empaquetada: en la colección
+
+    assert await route_crud.migrate_points_codec("dicts") == 1
+    stored = db["routes"].docs[0]
+    assert stored["geometry"] == "gridfs" and "points_codec" not in stored
+    assert big["_id"] in bucket.files and db[geometry.COLL].docs == []
+    got = await route_crud.get_route_by_id(str(big["_id"]))
+    assert got["points"] == _data("", 150)["points"]
+
+
+# ---- GET /routes/{route_id}/points ----
+@pytest.fixture
+async def ac():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123"}
+
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_points_endpoint_pages_and_etag(ac, monkeypatch):
+    pts = [{"latitude": i, "longitude": -i} for i in range(25)]
+
+    async def fake_meta(route_id):
+        return {"_id": route_id, "owner_id": "user123", "visibility": False, "created_at": "t"}
+
+    async def fake_points(route, *, offset, limit):
+        return len(pts), pts[offset:offset + limit]
+
+    monkeypatch.setattr(route_crud, "get_route_metadata", fake_meta, raising=True)
+    monkeypatch.setattr(route_crud, "get_route_points", fake_points, raising=True)
+
+    res = await ac.get("/routes/r1/points", params={"offset": 20, "limit": 10})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["total"] == 25 and body["next_offset"] is None
+    assert body["points"][0] == {"latitude": 20.0, "longitude": -20.0}
+    assert (await ac.get("/routes/r1/points", params={"limit": 10})).json()["next_offset"] == 10
+
+    again = await ac.get("/routes/r1/points", params={"offset": 20, "limit": 10},
+                         headers={"If-None-Match": res.headers["etag"]})
+    assert again.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_points_endpoint_checks_access(ac, monkeypatch):
+    async def fake_meta(route_id):
+        return {"_id": route_id, "owner_id": "otro", "visibility": False} if route_id == "r1" else None
+
+    monkeypatch.setattr(route_crud, "get_route_metadata", fake_meta, raising=True)
+    assert (await ac.get("/routes/r1/points")).status_code == 403
+    assert (await ac.get("/routes/r2/points")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_public_route_starts_read_only_the_first_point(separate):
+    from backend.geo.clusters import start_point
+    await route_crud.create_route("u1", _data("Corta", 10))
+    await route_crud.create_route("u1", _data("Larga", 150))
+    starts = await route_crud.get_public_route_starts()
+    assert [start_point(d) for d in starts] == [(41.0, 2.0), (41.0, 2.0)]
+    assert all(len(d["points"]) == 1 for d in starts)
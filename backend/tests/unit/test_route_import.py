@@ -0,0 +1,206 @@
+import json
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.benchmarks.payloads import iter_geojson, iter_gpx, make_points
+from backend.core.config import settings
+from backend.db.models import route as route_crud
+from backend.geo.importers import (
+    Decimator, GeoJSONParser, GPXParser, ImportFormatError, detect_format,
+)
+from backend.routers import routes as routes_mod
+
+POINTS = make_points(40)
+EXPECTED = [(p["latitude"], p["longitude"]) for p in POINTS]
+
+
+def _parse(parser, data: bytes, size: int):
+    out = []
+    for i in range(0, len(data), size):
+        out += parser.feed(data[i:i + size])
+    out += parser.close()
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 100_000])
+def test_gpx_any_chunking(size):
+    parser = GPXParser()
+    assert _parse(parser, b"".join(iter_gpx(POINTS, name="Mi ruta")), size) == EXPECTED
+    assert parser.name == "Mi ruta"
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 100_000])
+def test_geojson_any_chunking(size):
+    parser = GeoJSONParser()
+    assert _parse(parser, b"".join(iter_geojson(POINTS, name="Ruta ñ")), size) == EXPECTED
+    assert parser.name == "Ruta ñ"
+
+
+def test_geojson_feature_collection_and_multilinestring():
+    doc = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "properties": {"name": "A", "description": "desc"},
+             "geometry": {"type": "MultiLineString", "coordinates": [[[1, 2], [3, 4]], [[5, 6]]]}},
+            {"type": "Feature", "properties": {"name": "B", "coordinates": "no"},
+             "geometry": {"type": "Point", "coordinates": [7.5, 8.5, 100]}},
+        ],
+    }
+    parser = GeoJSONParser()
+    assert _parse(parser, json.dumps(doc, indent=2).encode(), 5) == [(2, 1), (4, 3), (6, 5), (8.5, 7.5)]
+    assert (parser.name, parser.description) == ("A", "desc")
+
+
+@pytest.mark.parametrize("parser_cls,data", [
+    (GPXParser, b"<gpx><trk><trkseg><trkpt lat='1' lon='2'></trkseg>"),
+    (GPXParser, b"<gpx><trk><trkseg><trkpt lat='95' lon='2'/></trkseg></trk></gpx>"),
+    (GeoJSONParser, b'{"type":"LineString","coordinates":[[1,2],[3'),
+    (GeoJSONParser, b'{"type":"LineString","coordinates":[[1,2]]]'),
+])
+def test_invalid_files_raise(parser_cls, data):
+    with pytest.raises(ImportFormatError):
+        _parse(parser_cls(), data, 3)
+
+
+def test_gpx_tree_does_not_grow():
+    parser = GPXParser()
+    chunks = iter_gpx(make_points(2000))
+    parser.feed(next(chunks))
+    for c in chunks:
+        parser.feed(c)
+        # Solo queda la cadena de ancestros abiertos, sin hijos ya procesados
+        assert all(len(e) <= 1 for e in parser._stack)
+
+
+def test_decimator_bounds_memory_and_keeps_endpoints():
+    pts = [(41.0 + i * 1e-4, 2.0) for i in range(10_001)]
+    dec = Decimator(max_points=100)
+    for p in pts:
+        dec.add(p)
+        assert len(dec.points) <= 100
+    out = dec.finish()
+    assert out[0] == pts[0] and out[-1] == pts[-1]
+    assert 50 <= len(out) <= 100
+    assert dec.total == len(pts)
+
+
+def test_decimator_min_distance():
+    # Pasos de ~11 m: con 25 m se conserva uno de cada tres
+    pts = [(41.0 + i * 1e-4, 2.0) for i in range(31)]
+    dec = Decimator(min_distance_m=25)
+    dec.extend(pts)
+    assert dec.finish() == pts[::3]
+
+
+def test_detect_format():
+    assert detect_format("a.GPX", None) == "gpx"
+    assert detect_format("a.geojson", None) == "geojson"
+    assert detect_format("x", "application/geo+json") == "geojson"
+    assert detect_format("a.kml", "application/octet-stream") is None
+
+
+# ---- POST /routes/import ----
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123"}
+
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    async with AsyncClient(transport=ASGITransport(app=test_app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def created(monkeypatch):
+    saved = []
+
+    async def fake_get_route_by_name(owner_id, name):
+        return None
+
+    async def fake_create_route(owner_id, data):
+        doc = {**data, "_id": "r1", "owner_id": owner_id, "created_at": "2025-01-01T00:00:00Z"}
+        saved.append(doc)
+        return doc
+
+    monkeypatch.setattr(route_crud, "get_route_by_name", fake_get_route_by_name, raising=True)
+    monkeypatch.setattr(route_crud, "create_route", fake_create_route, raising=True)
+    return saved
+
+
+@pytest.mark.anyio
+async def test_import_gpx_uses_file_name_and_decimates(ac, created, monkeypatch):
+    monkeypatch.setattr(settings, "ROUTE_IMPORT_MAX_POINTS", 10)
+    monkeypatch.setattr(settings, "ROUTE_IMPORT_CHUNK_SIZE", 256)
+    body = b"".join(iter_gpx(make_points(500), name="Del GPX"))
+    res = await ac.post(
+        "/routes/import",
+        files={"file": ("track.gpx", body, "application/gpx+xml")},
+        data={"category": "naturaleza", "description": "Paseo", "visibility": "true"},
+    )
+    assert res.status_code == 201, res.text
+    assert res.json()["name"] == "Del GPX"
+    assert res.headers["x-import-points-read"] == "500"
+    assert 3 <= len(created[0]["points"]) <= 10
+    assert created[0]["visibility"] is True
+
+
+@pytest.mark.anyio
+async def test_import_geojson_form_name_wins(ac, created):
+    body = b"".join(iter_geojson(make_points(20), name="Del fichero"))
+    res = await ac.post(
+        "/routes/import",
+        files={"file": ("track.json", body, "application/json")},
+        data={"category": "c", "description": "d", "name": "Del formulario"},
+    )
+    assert res.status_code == 201
+    assert created[0]["name"] == "Del formulario"
+    assert len(created[0]["points"]) == 20
+
+
+@pytest.mark.anyio
+async def test_import_errors(ac, created, monkeypatch):
+    res = await ac.post("/routes/import", files={"file": ("t.kml", b"<kml/>", "text/xml")},
+                        data={"category": "c", "description": "d"})
+    assert res.status_code == 415
+
+    res = await ac.post("/routes/import", files={"file": ("t.gpx", b"<gpx><trk>", "text/xml")},
+                        data={"category": "c", "description": "d"})
+    assert res.status_code == 422
+
+    few = b"".join(iter_gpx(make_points(2), name="Corta"))
+    res = await ac.post("/routes/import", files={"file": ("t.gpx", few, "text/xml")},
+                        data={"category": "c", "description": "d"})
+    assert res.status_code == 422
+    assert res.json()["detail"] == "Mínimo se han de seleccionar 3 puntos de interés"
+
+    monkeypatch.setattr(settings, "ROUTE_IMPORT_MAX_BYTES", 100)
+    big = b"".join(iter_gpx(make_points(50)))
+    res = await ac.post("/routes/import", files={"file": ("t.gpx", big, "text/xml")},
+                        data={"category": "c", "description": "d"})
+    assert res.status_code == 413
+    assert created == []
+
+
+@pytest.mark.anyio
+async def test_import_rejects_oversized_upload_before_parsing(ac, created, monkeypatch):
+    monkeypatch.setattr(settings, "ROUTE_IMPORT_MAX_BYTES", 1000)
+
+    async def never(*args, **kwargs):
+        raise AssertionError("no debe llegar a parsearse")
+    monkeypatch.setattr(routes_mod, "import_track", never)
+
+    huge = b"".join(iter_gpx(make_points(5000)))
+    assert len(huge) > 1000 + 64 * 1024
+    res = await ac.post("/routes/import", files={"file": ("t.gpx", huge, "text/xml")},
+                        data={"category": "c", "description": "d"})
+    assert res.status_code == 413
+    assert created == []
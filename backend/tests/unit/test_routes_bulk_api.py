@@ -0,0 +1,170 @@
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from pymongo.errors import BulkWriteError
+
+import backend.db.client as db_client
+from backend.core.config import settings
+from backend.db.models import route as route_crud
+from backend.routers import routes as routes_mod
+
+
+@pytest.fixture
+def test_app():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_current_user(_request=None):
+        return {"_id": "user123", "email": "u@e.com", "is_active": True}
+
+    app.dependency_overrides[routes_mod.get_current_user] = fake_current_user
+    return app
+
+
+@pytest.fixture
+async def ac(test_app):
+    async with AsyncClient(transport=ASGITransport(app=test_app), base_url="http://test") as client:
+        yield client
+
+
+def _item(name, **overrides):
+    base = {
+        "name": name,
+        "points": [{"latitude": 1.0, "longitude": 2.0}] * 3,
+        "visibility": True,
+        "description": "d",
+        "category": "c",
+    }
+    base.update(overrides)
+    return base
+
+
+# ---- Fake de la colección con insert_many(ordered=False) ----
+class FakeRoutesCol:
+    def __init__(self, existing=(), fail_names=()):
+        self.docs = [{"_id": ObjectId(), "owner_id": "user123", "name": n} for n in existing]
+        self.fail_names = set(fail_names)    # simulan una carrera con el índice único
+        self.find_calls = []
+        self.insert_many_calls = 0
+
+    def find(self, filter_, projection=None):
+        self.find_calls.append(filter_)
+        names = set(filter_["name"]["$in"])
+        docs = [d for d in self.docs if d["owner_id"] == filter_["owner_id"] and d["name"] in names]
+
+        async def gen():
+            for d in docs:
+                yield d
+        return gen()
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.insert_many_calls += 1
+        errors = []
+        for i, d in enumerate(docs):
+            d["_id"] = ObjectId()
+            if d["name"] in self.fail_names:
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.docs.append(d)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+class FakeDB:
+    def __init__(self, col):
+        self.routes = col
+
+    def __getitem__(self, name):
+        assert name == "routes"
+        return self.routes
+
+
+@pytest.fixture
+def routes_col(monkeypatch):
+    col = FakeRoutesCol(existing=["Existente"], fail_names=["Carrera"])
+    monkeypatch.setattr(db_client, "db", FakeDB(col), raising=True)
+    return col
+
+
+@pytest.mark.anyio
+async def test_bulk_reports_each_item_in_order(ac, routes_col):
+    payload = [
+        _item("Nueva 1"),
+        _item("Existente"),                      # ya guardada por el usuario
+        _item("Pocos", points=[{"latitude": 1, "longitude": 2}]),
+        _item("Nueva 1"),                        # repetida dentro del lote
+        _item("Carrera"),                        # falla en insert_many
+        _item("Nueva 2", visibility=False),
+    ]
+    res = await ac.post("/routes/bulk", json=payload)
+    assert res.status_code == 200
+    body = res.json()
+    assert body["created"] == 2 and body["failed"] == 4
+
+    results = body["results"]
+    assert [r["index"] for r in results] == list(range(6))
+    assert [r["status_code"] for r in results] == [201, 409, 422, 409, 409, 201]
+    assert results[1]["error"] == "Este nombre de ruta ya existe"
+    assert results[2]["error"] == "Mínimo se han de seleccionar 3 puntos de interés"
+    assert results[4]["error"] == "Este nombre de ruta ya existe"
+
+    stored = {d["name"]: d for d in routes_col.docs}
+    assert results[0]["id"] == str(stored["Nueva 1"]["_id"])
+    assert results[5]["id"] == str(stored["Nueva 2"]["_id"])
+    assert stored["Nueva 2"]["owner_id"] == "user123"
+    # Una consulta de nombres y una inserción para todo el lote
+    assert len(routes_col.find_calls) == 1
+    assert routes_col.insert_many_calls == 1
+
+
+@pytest.mark.anyio
+async def test_bulk_notifies_inserted_routes(ac, routes_col, monkeypatch):
+    events = []
+    monkeypatch.setattr(db_client, "notify_change", lambda *args: events.append(args))
+    await ac.post("/routes/bulk", json=[_item("A"), _item("Carrera"), _item("B")])
+    assert [e[:2] for e in events] == [("routes", "insert")] * 2
+
+
+@pytest.mark.anyio
+async def test_bulk_missing_field_message(ac, routes_col):
+    item = _item("Sin categoría")
+    item.pop("category")
+    res = await ac.post("/routes/bulk", json=[item])
+    result = res.json()["results"][0]
+    assert result["status_code"] == 422
+    assert result["error"].startswith("category")
+
+
+@pytest.mark.anyio
+async def test_bulk_limits(ac, routes_col, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_ROUTES_MAX_ITEMS", 2)
+    res = await ac.post("/routes/bulk", json=[_item("A"), _item("B"), _item("C")])
+    assert res.status_code == 413
+
+    monkeypatch.setattr(settings, "BULK_ROUTES_MAX_ITEMS", 100)
+    monkeypatch.setattr(settings, "BULK_ROUTES_MAX_TOTAL_POINTS", 5)
+    res = await ac.post("/routes/bulk", json=[_item("A"), _item("B")])
+    assert res.status_code == 413
+    assert routes_col.insert_many_calls == 0
+
+
+@pytest.mark.anyio
+async def test_bulk_all_invalid_skips_insert(ac, routes_col):
+    res = await ac.post("/routes/bulk", json=[_item("  ")])
+    assert res.json() == {
+        "created": 0, "failed": 1,
+        "results": [{"index": 0, "status": "error", "status_code": 422, "id": None,
+                     "error": "Falta añadir nombre a la ruta"}],
+    }
+    assert routes_col.insert_many_calls == 0
+
+
+@pytest.mark.anyio
+async def test_bulk_malformed_points_are_per_item_errors(ac, routes_col):
+    payload = [_item("Número", points=5), _item("Texto", points="1,2,3"), _item("Objeto", points={"a": 1}),
+               _item("Nulo", points=None), _item("Buena")]
+    res = await ac.post("/routes/bulk", json=payload)
+    assert res.status_code == 200
+    assert [r["status_code"] for r in res.json()["results"]] == [422, 422, 422, 422, 201]
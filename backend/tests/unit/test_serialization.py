@@ -0,0 +1,70 @@
+import json
+import pytest
+from bson import ObjectId
+from datetime import datetime, timezone
+from fastapi import FastAPI
+from pydantic import TypeAdapter
+
+from backend.core.serialization import dump_route, dump_routes, route_public_dict
+from backend.db.schemas.route import RoutePublic
+from backend.routers import routes as routes_mod
+
+_adapter = TypeAdapter(list[RoutePublic])
+
+
+def _pydantic_path(docs) -> list:
+    # Lo que hacía FastAPI con response_model=list[RoutePublic]
+    docs = [{**d, "_id": str(d["_id"])} for d in docs]
+    return json.loads(_adapter.dump_json(_adapter.validate_python(docs), by_alias=True))
+
+
+def _doc(**overrides):
+    base = {
+        "_id": ObjectId("65e1234567890abcdef12345"),
+        "owner_id": "u1",
+        "name": "Ruta",
+        "points": [{"latitude": 1, "longitude": 2}, {"latitude": 1.5, "longitude": 2.5},
+                   {"latitude": -3, "longitude": 4.25}],
+        "visibility": True,
+        "description": "d",
+        "category": "c",
+        "created_at": datetime(2025, 1, 1, 10, 30, 0, 123000, tzinfo=timezone.utc),
+        "duration_minutes": 30,
+        "rating": 4,
+    }
+    base.update(overrides)
+    return base
+
+
+@pytest.mark.parametrize("doc", [
+    _doc(),
+    # Mongo devuelve fechas naive (UTC)
+    _doc(created_at=datetime(2025, 1, 1, 10, 30)),
+    _doc(duration_minutes=None, rating=None),
+    # Campos internos que no forman parte de RoutePublic
+    _doc(updated_at=datetime(2025, 2, 1), points_count=3),
+    _doc(owner_username="ana"),
+])
+def test_fast_path_matches_pydantic_output(doc):
+    assert json.loads(dump_routes([doc])) == _pydantic_path([doc])
+    assert json.loads(dump_route(doc)) == _pydantic_path([doc])[0]
+
+
+def test_points_are_emitted_as_floats():
+    out = json.loads(dump_route(_doc()))
+    assert out["points"][0] == {"latitude": 1.0, "longitude": 2.0}
+    assert isinstance(out["points"][0]["latitude"], float)
+
+
+def test_owner_username_override():
+    assert route_public_dict(_doc(), owner_username="ana")["owner_username"] == "ana"
+
+
+def test_openapi_schema_still_uses_route_public():
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+    schema = app.openapi()
+    listing = schema["paths"]["/routes"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert listing["items"]["$ref"].endswith("/RoutePublic")
+    single = schema["paths"]["/routes/{route_id}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert single["$ref"].endswith("/RoutePublic")
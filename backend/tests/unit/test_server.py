@@ -0,0 +1,77 @@
+import pytest
+
+from backend import server
+from backend.core.config import settings
+from backend.server import (
+    DrainingUvicornWorker, RexApplication, build_config, cgroup_cpu_quota, drain_seconds,
+    parse_args, plan_workers,
+)
+
+
+def test_cgroup_v2_quota(tmp_path):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert cgroup_cpu_quota(tmp_path) == 1.5
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_cgroup_v1_quota(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000")
+    assert cgroup_cpu_quota(tmp_path) == 2.0
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1")
+    assert cgroup_cpu_quota(tmp_path) is None
+
+
+def test_available_cpus_respects_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert server.available_cpus(tmp_path) == 3
+    assert server.available_cpus(tmp_path / "missing") == 8
+
+
+@pytest.mark.parametrize("kwargs, expected", [
+    (dict(cpus=4), (4, 100)),
+    (dict(cpus=4, pool_budget=200), (4, 50)),
+    (dict(cpus=8, pool_budget=50, min_pool_per_worker=10), (5, 10)),
+    (dict(cpus=4, pool_budget=5, min_pool_per_worker=10), (1, 5)),
+    (dict(cpus=2, pool_budget=1000), (2, 100)),
+    (dict(cpus=2, requested=6, pool_budget=30), (6, 5)),
+])
+def test_plan_workers(kwargs, expected):
+    cpus = kwargs.pop("cpus")
+    plan = plan_workers(cpus, **kwargs)
+    assert (plan.workers, plan.pool_size) == expected
+    if kwargs.get("pool_budget"):
+        assert plan.workers * plan.pool_size <= kwargs["pool_budget"]
+
+
+def test_drain_leaves_time_for_app_shutdown():
+    assert drain_seconds(30) == 25
+    assert drain_seconds(2) == 1
+
+
+def test_effective_config_and_gunicorn_options(monkeypatch):
+    monkeypatch.setattr(server, "available_cpus", lambda: 4)
+    monkeypatch.setattr(settings, "MONGO_POOL_BUDGET", 120)
+    config = build_config(parse_args(["--bind", "127.0.0.1:9000", "--preload", "--graceful-timeout", "20"]))
+    assert config.workers == 4 and config.worker_pool_size == 30
+    assert config.as_dict()["max_mongo_connections"] == 120
+    assert config.drain_timeout == 15
+
+    app = RexApplication(config)
+    assert app.cfg.bind == ["127.0.0.1:9000"]
+    assert app.cfg.workers == 4
+    assert app.cfg.preload_app is True
+    assert app.cfg.graceful_timeout == 20
+    assert app.cfg.worker_class is DrainingUvicornWorker
+
+
+def test_print_config_does_not_start_the_server(monkeypatch, capsys):
+    def fail(self):
+        raise AssertionError("No debe arrancar")
+
+    monkeypatch.setattr(RexApplication, "run", fail)
+    server.main(["--print-config", "--workers", "3"])
+    assert '"workers": 3' in capsys.readouterr().out
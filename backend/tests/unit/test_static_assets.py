@@ -0,0 +1,122 @@
+import gzip
+import os
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.core import static_assets
+from backend.core.static_assets import (
+    PrecompressedStaticFiles, build_index, choose_encoding, precompress_directory,
+)
+
+JS = ("export const rutas = [" + ",".join(f'"ruta-{i}"' for i in range(500)) + "];\n").encode()
+
+
+@pytest.fixture
+def dist(tmp_path):
+    # Estructura típica de `vite build`
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<!doctype html><div id=root></div>" + " " * 2000)
+    (tmp_path / "assets" / "index-B4x9Zq1L.js").write_bytes(JS)
+    (tmp_path / "assets" / "logo-C2a8Pq0W.png").write_bytes(b"\x89PNG" + b"\x00" * 4000)
+    (tmp_path / "vite.svg").write_text("<svg/>")
+    return tmp_path
+
+
+@pytest.fixture
+async def ac_static(dist):
+    app = FastAPI()
+    app.mount("/", PrecompressedStaticFiles(dist, html=True), name="frontend")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def test_precompress_writes_variants_only_for_text_assets(dist):
+    precompress_directory(dist)
+    gz = dist / "assets" / "index-B4x9Zq1L.js.gz"
+    assert gz.exists()
+    assert gzip.decompress(gz.read_bytes()) == JS
+    # Binarios y ficheros pequeños no se comprimen
+    assert not (dist / "assets" / "logo-C2a8Pq0W.png.gz").exists()
+    assert not (dist / "vite.svg.gz").exists()
+
+
+def test_precompress_leaves_no_temp_files(dist):
+    # Otro worker dejó su temporal a medias: no se reutiliza ni se sirve
+    (dist / "assets" / "index-B4x9Zq1L.js.gz.tmp").write_bytes(b"basura")
+    precompress_directory(dist)
+    assert gzip.decompress((dist / "assets" / "index-B4x9Zq1L.js.gz").read_bytes()) == JS
+    assert not [p for p in (dist / "assets").iterdir() if p.name.startswith(".")]
+
+
+def test_index_marks_hashed_assets_immutable(dist):
+    precompress_directory(dist)
+    index = build_index(dist)
+    assert "assets/index-B4x9Zq1L.js.gz" not in index      # las variantes no son rutas propias
+    assert index["assets/index-B4x9Zq1L.js"].cache_control == static_assets.IMMUTABLE_CACHE
+    assert index["index.html"].cache_control == "no-cache"
+    assert "gzip" in index["assets/index-B4x9Zq1L.js"].encoded
+
+
+def test_choose_encoding_respects_q_values(dist):
+    precompress_directory(dist)
+    asset = build_index(dist)["assets/index-B4x9Zq1L.js"]
+    assert choose_encoding(asset, "gzip, deflate, br") == "gzip"
+    assert choose_encoding(asset, "gzip;q=0") is None
+    assert choose_encoding(asset, "identity") is None
+    assert choose_encoding(asset, "") is None
+
+
+@pytest.mark.anyio
+async def test_serves_gzip_variant_with_immutable_cache(ac_static):
+    res = await ac_static.get("/assets/index-B4x9Zq1L.js", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.headers["vary"] == "Accept-Encoding"
+    assert res.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert res.content == JS                                  # httpx descomprime
+    assert int(res.headers["content-length"]) < len(JS)
+
+
+@pytest.mark.anyio
+async def test_serves_identity_without_accept_encoding(ac_static):
+    res = await ac_static.get("/assets/index-B4x9Zq1L.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in res.headers
+    assert res.content == JS
+
+
+@pytest.mark.anyio
+async def test_root_serves_index_html_with_revalidation(ac_static):
+    res = await ac_static.get("/")
+    assert res.status_code == 200
+    assert res.headers["cache-control"] == "no-cache"
+    assert "<div id=root>" in res.text
+
+
+@pytest.mark.anyio
+async def test_etag_per_variant_and_304(ac_static):
+    gz = await ac_static.get("/assets/index-B4x9Zq1L.js", headers={"Accept-Encoding": "gzip"})
+    plain = await ac_static.get("/assets/index-B4x9Zq1L.js", headers={"Accept-Encoding": "identity"})
+    assert gz.headers["etag"] != plain.headers["etag"]
+
+    res = await ac_static.get(
+        "/assets/index-B4x9Zq1L.js",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["etag"]},
+    )
+    assert res.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_missing_file_is_404(ac_static):
+    res = await ac_static.get("/assets/nope.js")
+    assert res.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_requests_do_not_stat_the_filesystem(ac_static, monkeypatch):
+    def no_stat(*args, **kwargs):
+        raise AssertionError("stat durante una petición")
+
+    monkeypatch.setattr(os, "stat", no_stat)
+    res = await ac_static.get("/assets/index-B4x9Zq1L.js", headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
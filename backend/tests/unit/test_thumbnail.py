@@ -0,0 +1,165 @@
+import struct
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.db.models import route as route_crud
+from backend.geo.measure import geometry_hash
+from backend.geo.pool import flatten
+from backend.geo.thumbnail import LINE, START, ThumbnailCache, Thumbnails, render_png
+from backend.routers import routes as routes_mod
+
+POINTS = [{"latitude": 40.0 + i * 1e-3, "longitude": -3.0 + (i % 7) * 1e-3} for i in range(40)]
+OWNER = "user123"
+
+
+def decode_png(data):
+    '''
+    (ancho, alto, índices de paleta) de un PNG de paleta con filtro 0
+    '''
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        kind = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + body)
+        chunks[kind] = chunks.get(kind, b"") + body
+        pos += 12 + length
+    width, height, depth, color = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color) == (8, 3)
+    raw = zlib.decompress(chunks[b"IDAT"])
+    rows = [raw[y * (width + 1):(y + 1) * (width + 1)] for y in range(height)]
+    assert all(r[0] == 0 for r in rows)
+    return width, height, b"".join(r[1:] for r in rows)
+
+
+# ---------- Dibujo ----------
+def test_render_draws_the_track_and_markers():
+    width, height, pixels = decode_png(render_png(flatten(POINTS), 128))
+    assert (width, height) == (128, 128)
+    assert LINE in pixels and START in pixels
+    assert pixels[0] == 0                  # esquina: fondo (margen)
+
+
+def test_render_degenerate_tracks():
+    assert decode_png(render_png(flatten([]), 128))[2] == bytes(128 * 128)
+    assert START in decode_png(render_png(flatten([(40.0, -3.0)]), 128))[2]
+
+
+# ---------- Caché en disco ----------
+def test_cache_roundtrip_and_prune(tmp_path):
+    cache = ThumbnailCache(tmp_path, max_bytes=150, prune_every=1000)
+    assert cache.get("ab" * 16, 128) is None
+    for n in range(3):
+        cache.put(f"{n:02d}" * 16, 128, b"x" * 100)
+    assert cache.get("00" * 16, 128) == b"x" * 100
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+    assert cache.prune() == 2
+    assert len(list(tmp_path.glob("*/*.png"))) == 1
+
+
+@pytest.mark.anyio
+async def test_service_renders_once_then_hits_cache(tmp_path):
+    service = Thumbnails(ThumbnailCache(tmp_path, max_bytes=10**6))
+    digest, first = await service.png(POINTS, 128)
+    assert digest == geometry_hash(flatten(POINTS))
+    _, second = await service.png(POINTS, 128)
+    assert first == second and service.renders == 1 and service.cache.hits == 1
+
+
+# ---------- Endpoint ----------
+def make_app(monkeypatch, tmp_path, route, user=None):
+    async def fake_get_route_metadata(route_id):
+        return {k: v for k, v in route.items() if k != "points"} if route else None
+
+    async def fake_get_route_by_id(route_id):
+        loads.append(route_id)
+        return route
+
+    loads = []
+    monkeypatch.setattr(route_crud, "get_route_metadata", fake_get_route_metadata, raising=True)
+    monkeypatch.setattr(route_crud, "get_route_by_id", fake_get_route_by_id, raising=True)
+    monkeypatch.setattr(routes_mod, "thumbnails", Thumbnails(ThumbnailCache(tmp_path, max_bytes=10**6)))
+
+    app = FastAPI()
+    app.include_router(routes_mod.router)
+
+    async def fake_optional_user(_request=None):
+        return user
+    app.dependency_overrides[routes_mod.get_optional_user] = fake_optional_user
+    return app, loads
+
+
+def client(app):
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_public_thumbnail_is_cacheable_and_revalidates(monkeypatch, tmp_path):
+    route = {"_id": "r1", "owner_id": OWNER, "visibility": True, "points": POINTS}
+    app, loads = make_app(monkeypatch, tmp_path, route)
+    async with client(app) as ac:
+        r = await ac.get("/routes/r1/thumbnail.png?size=128")
+        assert r.status_code == 200
+        assert r.headers["content-type"] == "image/png"
+        assert r.headers["cache-control"].startswith("public")
+        assert decode_png(r.content)[0] == 128
+        # Sin hash medido el 304 llega después de leer los puntos, pero con su Cache-Control
+        late = await ac.get("/routes/r1/thumbnail.png?size=128", headers={"If-None-Match": r.headers["etag"]})
+        assert late.status_code == 304 and late.headers["cache-control"] == r.headers["cache-control"]
+
+        # Con el hash ya medido, el 304 no lee los puntos
+        route["measures"] = {"geometry_hash": geometry_hash(flatten(POINTS))}
+        loads.clear()
+        r2 = await ac.get("/routes/r1/thumbnail.png?size=128", headers={"If-None-Match": r.headers["etag"]})
+        assert r2.status_code == 304 and loads == []
+        assert r2.headers["cache-control"] == r.headers["cache-control"]
+        # ... y un acierto de la caché en disco tampoco
+        r3 = await ac.get("/routes/r1/thumbnail.png?size=128")
+        assert r3.status_code == 200 and r3.content == r.content and loads == []
+
+        assert (await ac.get("/routes/r1/thumbnail.png?size=100")).status_code == 422
+
+
+@pytest.mark.anyio
+async def test_private_thumbnail_needs_the_owner(monkeypatch, tmp_path):
+    route = {"_id": "r2", "owner_id": OWNER, "visibility": False, "points": POINTS}
+    app, _ = make_app(monkeypatch, tmp_path, route)
+    async with client(app) as ac:
+        assert (await ac.get("/routes/r2/thumbnail.png")).status_code == 401
+
+    app, _ = make_app(monkeypatch, tmp_path, route, user={"_id": "other"})
+    async with client(app) as ac:
+        assert (await ac.get("/routes/r2/thumbnail.png")).status_code == 403
+
+    app, _ = make_app(monkeypatch, tmp_path, route, user={"_id": OWNER})
+    async with client(app) as ac:
+        r = await ac.get("/routes/r2/thumbnail.png")
+        assert r.status_code == 200 and r.headers["cache-control"].startswith("private")
+        assert decode_png(r.content)[0] == 256
+
+    app, _ = make_app(monkeypatch, tmp_path, None)
+    async with client(app) as ac:
+        assert (await ac.get("/routes/nope/thumbnail.png")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_stale_session_cookie_is_anonymous(monkeypatch, tmp_path):
+    public = {"_id": "r1", "owner_id": OWNER, "visibility": True, "points": POINTS}
+    app, _ = make_app(monkeypatch, tmp_path, public)
+    app.dependency_overrides.clear()            # get_optional_user de verdad
+    async with client(app) as ac:
+        ac.cookies.set("access_token", "caducado")
+        assert (await ac.get("/routes/r1/thumbnail.png")).status_code == 200
+
+    private = {**public, "visibility": False}
+    app, _ = make_app(monkeypatch, tmp_path, private)
+    app.dependency_overrides.clear()
+    async with client(app) as ac:
+        r = await ac.get("/routes/r1/thumbnail.png", headers={"Authorization": "Bearer caducado"})
+        assert r.status_code == 401
@@ -0,0 +1,194 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from backend.geo import mvt
+from backend.geo.tiles import RouteTiles, TileCache
+from backend.routers import tiles as tiles_mod
+
+CREATED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def route(route_id, points, **extra):
+    return {"_id": route_id, "name": f"ruta {route_id}", "category": "trail", "visibility": True,
+            "created_at": CREATED, "points": [{"latitude": a, "longitude": b} for a, b in points], **extra}
+
+
+MADRID = route("r1", [(40.40 + i * 1e-3, -3.70 + i * 1e-3) for i in range(50)])
+SYDNEY = route("r2", [(-33.87, 151.20), (-33.86, 151.21)])
+
+
+# ---------- Protobuf mínimo para leer las teselas ----------
+def read_varint(buf, pos):
+    value = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        shift += 7
+        if b < 0x80:
+            return value, pos
+
+
+def read_message(buf):
+    fields, pos = [], 0
+    while pos < len(buf):
+        key, pos = read_varint(buf, pos)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = read_varint(buf, pos)
+        else:
+            assert wire == 2
+            length, pos = read_varint(buf, pos)
+            value, pos = bytes(buf[pos:pos + length]), pos + length
+        fields.append((number, value))
+    return fields
+
+
+def packed(buf):
+    out, pos = [], 0
+    while pos < len(buf):
+        v, pos = read_varint(buf, pos)
+        out.append(v)
+    return out
+
+
+def decode_tile(data):
+    '''
+    {capa: [(propiedades, comandos), ...]}
+    '''
+    layers = {}
+    for number, layer in read_message(data):
+        assert number == 3
+        fields = read_message(layer)
+        name = next(v for n, v in fields if n == 1).decode()
+        keys = [v.decode() for n, v in fields if n == 3]
+        values = [read_message(v)[0][1] for n, v in fields if n == 4]
+        assert (15, 2) in fields and (5, mvt.EXTENT) in fields
+        features = []
+        for n, feature in fields:
+            if n != 2:
+                continue
+            f = dict(read_message(feature))
+            tags = packed(f[2])
+            props = {keys[tags[i]]: values[tags[i + 1]].decode() for i in range(0, len(tags), 2)}
+            assert f[3] == mvt.LINESTRING
+            features.append((props, packed(f[4])))
+        layers[name] = features
+    return layers
+
+
+def tile_of(lat, lon, z):
+    wx, wy = mvt.world_xy(lat, lon)
+    return z, int(wx * (1 << z)), int(wy * (1 << z))
+
+
+# ---------- Codificación ----------
+def test_line_geometry_commands():
+    assert mvt.line_geometry([[(2, 2), (2, 10), (10, 10)]]) == [9, 4, 4, 18, 0, 16, 16, 0]
+    # Segundo tramo: MoveTo relativo al último punto
+    assert mvt.line_geometry([[(0, 0), (1, 0)], [(5, 5), (5, 6)]])[6:9] == [9, 8, 10]
+
+
+def test_clip_line_splits_when_leaving_the_tile():
+    points = [(-50, 10), (50, 10), (150, 10), (150, 90), (50, 90)]
+    assert mvt.clip_line(points, 0, 100) == [[(0, 10), (50, 10), (100, 10)], [(100, 90), (50, 90)]]
+    assert mvt.clip_line([(200, 200), (300, 300)], 0, 100) == []
+
+
+# ---------- Servicio ----------
+@pytest.mark.anyio
+async def test_tile_contains_only_routes_that_cross_it():
+    tiles = RouteTiles(TileCache(max_entries=100, max_bytes=10**6))
+    await tiles.sync([MADRID, SYDNEY])
+
+    layers = decode_tile(await tiles.tile(*tile_of(40.42, -3.68, 12)))
+    ((props, geometry),) = layers["routes"]
+    assert props == {"id": "r1", "name": "ruta r1", "category": "trail"}
+    assert geometry[0] == 9 and geometry[3] & 7 == 2
+
+    assert await tiles.tile(*tile_of(10.0, 10.0, 12)) == b""
+    # Zoom 0: la de Sídney (~1 km) cabe en un píxel y desaparece; la de Madrid (~7 km) no
+    assert [p["id"] for p, _ in decode_tile(await tiles.tile(0, 0, 0))["routes"]] == ["r1"]
+
+
+@pytest.mark.anyio
+async def test_low_zoom_simplifies_long_tracks():
+    long = route("r3", [(40.0 + i * 1e-5, -3.0 + (i % 2) * 1e-6) for i in range(5000)])
+    tiles = RouteTiles(TileCache(max_entries=100, max_bytes=10**6))
+    await tiles.sync([long])
+    ((_, geometry),) = decode_tile(await tiles.tile(*tile_of(40.02, -3.0, 8)))["routes"]
+    assert len(geometry) < 20                # una recta: MoveTo + un par de LineTo
+
+
+@pytest.mark.anyio
+async def test_sync_invalidates_only_tiles_touched_by_changed_routes():
+    tiles = RouteTiles(TileCache(max_entries=100, max_bytes=10**6))
+    await tiles.sync([MADRID, SYDNEY], source="snap-1")
+    madrid, sydney = tile_of(40.42, -3.68, 10), tile_of(-33.87, 151.2, 10)
+    await tiles.tile(*madrid)
+    await tiles.tile(*sydney)
+    await tiles.tile(0, 0, 0)
+    assert len(tiles.cache) == 3
+
+    assert await tiles.sync([MADRID, SYDNEY], source="snap-1") == 0      # misma foto
+    assert await tiles.sync([dict(MADRID), SYDNEY], source="snap-2") == 0  # mismas versiones
+
+    moved = route("r2", [(-33.80, 151.20), (-33.79, 151.21)], updated_at=datetime(2024, 2, 1, tzinfo=timezone.utc))
+    assert await tiles.sync([MADRID, moved], source="snap-3") == 1
+    assert tiles.cache.get(madrid) is not None
+    assert tiles.cache.get(sydney) is None and tiles.cache.get((0, 0, 0)) is None
+
+    await tiles.tile(*sydney)
+    assert await tiles.sync([MADRID], source="snap-4") == 1                # ruta borrada u ocultada
+    assert tiles.cache.get(sydney) is None and tiles.cache.get(madrid) is not None
+
+
+def test_cache_is_bounded():
+    cache = TileCache(max_entries=2, max_bytes=10)
+    cache.put((1, 0, 0), b"aaaa")
+    cache.put((1, 0, 1), b"bbbb")
+    cache.get((1, 0, 0))
+    cache.put((1, 1, 0), b"cccc")            # sale la menos usada
+    assert cache.get((1, 0, 1)) is None and cache.bytes == 8
+    cache.put((1, 1, 1), b"x" * 10)
+    assert len(cache) == 1 and cache.bytes == 10
+
+
+# ---------- Endpoint ----------
+@pytest.mark.anyio
+async def test_tile_endpoint(monkeypatch):
+    from backend.db.models import route as route_crud
+
+    tiles = RouteTiles(TileCache(max_entries=100, max_bytes=10**6))
+    monkeypatch.setattr(tiles_mod, "route_tiles", tiles)
+    monkeypatch.setattr(tiles_mod.public_catalog, "current", lambda: None)
+    monkeypatch.setattr(tiles_mod, "_fallback_loaded_at", float("-inf"))
+    loads = []
+
+    async def fake_get_all_routes(public_only):
+        assert public_only
+        loads.append(1)
+        return [MADRID]
+    monkeypatch.setattr(route_crud, "get_all_routes", fake_get_all_routes, raising=True)
+
+    app = FastAPI()
+    app.include_router(tiles_mod.router)
+    z, x, y = tile_of(40.42, -3.68, 12)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        r = await ac.get(f"/tiles/routes/{z}/{x}/{y}.mvt")
+        assert r.status_code == 200
+        assert r.headers["content-type"] == tiles_mod.MVT_MEDIA_TYPE
+        assert r.headers["cache-control"].startswith("public")
+        assert decode_tile(r.content)["routes"][0][0]["id"] == "r1"
+
+        again = await ac.get(f"/tiles/routes/{z}/{x}/{y}.mvt", headers={"If-None-Match": r.headers["etag"]})
+        assert again.status_code == 304
+        assert tiles.cache.hits == 1
+
+        assert (await ac.get("/tiles/routes/2/4/0.mvt")).status_code == 404
+        assert (await ac.get("/tiles/routes/99/0/0.mvt")).status_code == 422
+        # Sin foto del catálogo la BD se lee una vez, no en cada tesela
+        assert len(loads) == 1
@@ -4,6 +4,8 @@ import type { Feature, FeatureCollection, Point, LineString } from "geojson";
 
 mapboxgl.accessToken = import.meta.env.VITE_MAPBOX_TOKEN || "";
 
+const API = import.meta.env.VITE_API_URL || window.location.origin;
+
 type MarkerData = { id: string; title?: string; lng: number; lat: number };
 
 type Props = {
@@ -14,6 +16,7 @@ type Props = {
   allowPickPoint?: boolean;
   onPickPoint?: (lng: number, lat: number) => void;
   highlightPoints?: Array<[number, number]>;
+  showPublicRoutes?: boolean;
 };
 
 export default function MapView({
@@ -23,6 +26,7 @@ export default function MapView({
   allowPickPoint = false,
   onPickPoint,
   highlightPoints = [],
+  showPublicRoutes = false,
 }: Props) {
   const containerRef = useRef<HTMLDivElement | null>(null);
   const mapRef = useRef<Map | null>(null);
@@ -58,6 +62,92 @@ export default function MapView({
         }
       });
 
+      // Rutas públicas como teselas vectoriales: solo se descarga lo visible
+      if (showPublicRoutes) {
+        map.addSource("public-routes", {
+          type: "vector",
+          tiles: [`${API}/tiles/routes/{z}/{x}/{y}.mvt`],
+          maxzoom: 18,
+        });
+
+        map.addLayer({
+          id: "public-routes-line",
+          type: "line",
+          source: "public-routes",
+          "source-layer": "routes",
+          layout: {
+            "line-join": "round",
+            "line-cap": "round",
+          },
+          paint: {
+            "line-color": "#64748b",
+            "line-width": 2,
+            "line-opacity": 0.7,
+          },
+        });
+
+        // Salidas agrupadas por zoom (unos pocos KB por vista)
+        map.addSource("route-clusters", {
+          type: "geojson",
+          data: { type: "FeatureCollection", features: [] } as FeatureCollection,
+        });
+
+        map.addLayer({
+          id: "route-clusters-circle",
+          type: "circle",
+          source: "route-clusters",
+          paint: {
+            "circle-color": "#0f766e",
+            "circle-opacity": 0.85,
+            "circle-radius": ["interpolate", ["linear"], ["get", "count"], 1, 6, 100, 18, 1000, 26],
+            "circle-stroke-width": 1,
+            "circle-stroke-color": "#fff",
+          },
+        });
+
+        map.addLayer({
+          id: "route-clusters-count",
+          type: "symbol",
+          source: "route-clusters",
+          filter: [">", ["get", "count"], 1],
+          layout: {
+            "text-field": ["to-string", ["get", "count"]],
+            "text-size": 12,
+          },
+          paint: { "text-color": "#fff" },
+        });
+
+        const loadClusters = async () => {
+          const b = map.getBounds();
+          if (!b) return;
+          const bbox = [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()]
+            .map((v) => v.toFixed(5))
+            .join(",");
+          try {
+            const res = await fetch(
+              `${API}/routes/clusters?bbox=${bbox}&zoom=${Math.floor(map.getZoom())}`
+            );
+            if (!res.ok) return;
+            const data: { clusters: Array<{ lat: number; lon: number; count: number; route_id: string }> } =
+              await res.json();
+            const source = map.getSource("route-clusters") as mapboxgl.GeoJSONSource | undefined;
+            source?.setData({
+              type: "FeatureCollection",
+              features: data.clusters.map<Feature<Point>>((c) => ({
+                type: "Feature",
+                geometry: { type: "Point", coordinates: [c.lon, c.lat] },
+                properties: { count: c.count, route_id: c.route_id },
+              })),
+            });
+          } catch {
+            // Sin grupos: el mapa sigue mostrando las teselas
+          }
+        };
+
+        map.on("moveend", loadClusters);
+        loadClusters();
+      }
+
       map.addSource("highlight-route", {
         type: "geojson",
         data: {
@@ -114,7 +204,7 @@ export default function MapView({
       mapRef.current = null;
       setMapLoaded(false);
     };
-  }, [allowPickPoint, onPickPoint]);
+  }, [allowPickPoint, onPickPoint, showPublicRoutes]);
 
   useEffect(() => {
     const map = mapRef.current;
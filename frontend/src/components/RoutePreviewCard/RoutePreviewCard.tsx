@@ -32,6 +32,7 @@ const RoutePreviewCard: React.FC<Props> = ({
 }) => {
   const [saved, setSaved] = useState(initialSaved);
   const [loading, setLoading] = useState(false);
+  const [thumbFailed, setThumbFailed] = useState(false);
   const { showAlert } = useAlert();
   const { token } = useAuth();
 
@@ -89,6 +90,18 @@ const RoutePreviewCard: React.FC<Props> = ({
       }}
     >
       <div className="route-preview-content">
+        {!thumbFailed && (
+          <img
+            className="route-preview-thumb"
+            src={`${API}/routes/${id}/thumbnail.png?size=128`}
+            alt=""
+            width={64}
+            height={64}
+            loading="lazy"
+            decoding="async"
+            onError={() => setThumbFailed(true)}
+          />
+        )}
         <div className="route-preview-texts">
           <h3 className="route-preview-title">{name}</h3>
           <p className="route-preview-category">Categoría: {category}</p>
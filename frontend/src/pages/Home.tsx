@@ -278,6 +278,7 @@ export default function Home() {
             allowPickPoint={routeCardOpen}
             onPickPoint={handleMapClick}
             highlightPoints={selectedRoutePoints}
+            showPublicRoutes
           />
 
           <button